@@ -1,3 +1,4 @@
+import collections
 import threading
 import typing
 
@@ -33,6 +34,8 @@ basic_permission_to_str_lookup[ CLIENT_API_PERMISSION_ADD_NOTES ] = 'add notes t
 
 SEARCH_RESULTS_CACHE_TIMEOUT = 4 * 3600
 
+MAX_SEARCH_CURSORS = 5
+
 SESSION_EXPIRY = 86400
 
 api_request_dialog_open = False
@@ -237,6 +240,8 @@ class APIPermissions( HydrusSerialisable.SerialisableBaseNamed ):
         self._last_search_results = None
         self._search_results_timeout = 0
         
+        self._search_cursors_to_results = collections.OrderedDict()
+        
         self._lock = threading.Lock()
         
     
@@ -327,13 +332,47 @@ class APIPermissions( HydrusSerialisable.SerialisableBaseNamed ):
                 return
                 
             
-            if self._last_search_results is None:
+            if self._last_search_results is None and len( self._search_cursors_to_results ) == 0:
                 
                 raise HydrusExceptions.BadRequestException( 'It looks like those search results are no longer available--please run the search again!' )
                 
             
+            hash_ids = set( hash_ids )
+            
             num_files_asked_for = len( hash_ids )
-            num_files_allowed_to_see = len( self._last_search_results.intersection( hash_ids ) )
+            
+            if self._last_search_results is None:
+                
+                unseen_hash_ids = set( hash_ids )
+                
+            else:
+                
+                unseen_hash_ids = hash_ids.difference( self._last_search_results )
+                
+                if len( unseen_hash_ids ) < num_files_asked_for:
+                    
+                    self._search_results_timeout = HydrusData.GetNow() + SEARCH_RESULTS_CACHE_TIMEOUT
+                    
+                
+            
+            # a client paging through a cursor may have run another search since, so anything a live cursor holds is fine too
+            
+            for ( cursor, ( cursor_hash_ids, cursor_hash_ids_set, timeout ) ) in list( self._search_cursors_to_results.items() ):
+                
+                if len( unseen_hash_ids ) == 0:
+                    
+                    break
+                    
+                
+                if not unseen_hash_ids.isdisjoint( cursor_hash_ids_set ):
+                    
+                    unseen_hash_ids.difference_update( cursor_hash_ids_set )
+                    
+                    self._search_cursors_to_results[ cursor ] = ( cursor_hash_ids, cursor_hash_ids_set, HydrusData.GetNow() + SEARCH_RESULTS_CACHE_TIMEOUT )
+                    
+                
+            
+            num_files_allowed_to_see = num_files_asked_for - len( unseen_hash_ids )
             
             if num_files_allowed_to_see != num_files_asked_for:
                 
@@ -344,7 +383,22 @@ class APIPermissions( HydrusSerialisable.SerialisableBaseNamed ):
                 raise HydrusExceptions.InsufficientCredentialsException( error_text )
                 
             
-            self._search_results_timeout = HydrusData.GetNow() + SEARCH_RESULTS_CACHE_TIMEOUT
+        
+    
+    def CreateSearchCursor( self, hash_ids: typing.List[ int ] ) -> bytes:
+        
+        with self._lock:
+            
+            cursor = HydrusData.GenerateKey()
+            
+            self._search_cursors_to_results[ cursor ] = ( hash_ids, set( hash_ids ), HydrusData.GetNow() + SEARCH_RESULTS_CACHE_TIMEOUT )
+            
+            while len( self._search_cursors_to_results ) > MAX_SEARCH_CURSORS:
+                
+                self._search_cursors_to_results.popitem( last = False )
+                
+            
+            return cursor
             
         
     
@@ -410,6 +464,25 @@ class APIPermissions( HydrusSerialisable.SerialisableBaseNamed ):
             
         
     
+    def GetSearchCursorResults( self, cursor: bytes ) -> typing.List[ int ]:
+        
+        with self._lock:
+            
+            if cursor not in self._search_cursors_to_results:
+                
+                raise HydrusExceptions.BadRequestException( 'It looks like that search cursor is no longer available--please run the search again!' )
+                
+            
+            ( hash_ids, hash_ids_set, timeout ) = self._search_cursors_to_results[ cursor ]
+            
+            self._search_cursors_to_results[ cursor ] = ( hash_ids, hash_ids_set, HydrusData.GetNow() + SEARCH_RESULTS_CACHE_TIMEOUT )
+            
+            self._search_cursors_to_results.move_to_end( cursor )
+            
+            return hash_ids
+            
+        
+    
     def GetSearchTagFilter( self ):
         
         with self._lock:
@@ -435,6 +508,13 @@ class APIPermissions( HydrusSerialisable.SerialisableBaseNamed ):
                 self._last_search_results = None
                 
             
+            expired_cursors = [ cursor for ( cursor, ( hash_ids, hash_ids_set, timeout ) ) in self._search_cursors_to_results.items() if HydrusData.TimeHasPassed( timeout ) ]
+            
+            for cursor in expired_cursors:
+                
+                del self._search_cursors_to_results[ cursor ]
+                
+            
         
     
     def SetLastSearchResults( self, hash_ids ):
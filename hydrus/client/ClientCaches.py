@@ -27,10 +27,15 @@ class DataCache( object ):
         self._timeout = timeout
         
         self._keys_to_data = {}
+        self._keys_to_estimated_memory_footprints = {}
         self._keys_fifo = collections.OrderedDict()
         
         self._total_estimated_memory_footprint = 0
         
+        self._num_hits = 0
+        self._num_misses = 0
+        self._num_evictions = 0
+        
         self._lock = threading.Lock()
         
         self._controller.sub( self, 'MaintainCache', 'memory_maintenance_pulse' )
@@ -45,7 +50,14 @@ class DataCache( object ):
         
         del self._keys_to_data[ key ]
         
-        self._RecalcMemoryUsage()
+        self._total_estimated_memory_footprint -= self._keys_to_estimated_memory_footprints[ key ]
+        
+        del self._keys_to_estimated_memory_footprints[ key ]
+        
+        if key in self._keys_fifo:
+            
+            del self._keys_fifo[ key ]
+            
         
         if HG.cache_report_mode:
             
@@ -59,28 +71,31 @@ class DataCache( object ):
         
         self._Delete( deletee_key )
         
+        self._num_evictions += 1
+        
     
     def _RecalcMemoryUsage( self ):
         
-        self._total_estimated_memory_footprint = sum( ( data.GetEstimatedMemoryFootprint() for data in self._keys_to_data.values() ) )
+        # the running total uses the footprint each item had when it was added, but some items (image renderers) change size as they load, so we true it up now and then
+        
+        self._keys_to_estimated_memory_footprints = { key : data.GetEstimatedMemoryFootprint() for ( key, data ) in self._keys_to_data.items() }
+        
+        self._total_estimated_memory_footprint = sum( self._keys_to_estimated_memory_footprints.values() )
         
     
     def _TouchKey( self, key ):
         
-        # have to delete first, rather than overwriting, so the ordereddict updates its internal order
-        if key in self._keys_fifo:
-            
-            del self._keys_fifo[ key ]
-            
-        
         self._keys_fifo[ key ] = HydrusData.GetNow()
         
+        self._keys_fifo.move_to_end( key )
+        
     
     def Clear( self ):
         
         with self._lock:
             
             self._keys_to_data = {}
+            self._keys_to_estimated_memory_footprints = {}
             self._keys_fifo = collections.OrderedDict()
             
             self._total_estimated_memory_footprint = 0
@@ -93,16 +108,20 @@ class DataCache( object ):
             
             if key not in self._keys_to_data:
                 
-                while self._total_estimated_memory_footprint > self._cache_size:
+                estimated_memory_footprint = data.GetEstimatedMemoryFootprint()
+                
+                # least recently used goes first, and we make room for the new item before it goes in
+                while len( self._keys_fifo ) > 0 and self._total_estimated_memory_footprint + estimated_memory_footprint > self._cache_size:
                     
                     self._DeleteItem()
                     
                 
                 self._keys_to_data[ key ] = data
+                self._keys_to_estimated_memory_footprints[ key ] = estimated_memory_footprint
                 
-                self._TouchKey( key )
+                self._total_estimated_memory_footprint += estimated_memory_footprint
                 
-                self._RecalcMemoryUsage()
+                self._TouchKey( key )
                 
                 if HG.cache_report_mode:
                     
@@ -110,7 +129,7 @@ class DataCache( object ):
                         'Cache "{}" adding "{}" ({}). Current size {}.'.format(
                             self._name,
                             key,
-                            HydrusData.ToHumanBytes( data.GetEstimatedMemoryFootprint() ),
+                            HydrusData.ToHumanBytes( estimated_memory_footprint ),
                             HydrusData.ConvertValueRangeToBytes( self._total_estimated_memory_footprint, self._cache_size )
                         )
                     )
@@ -133,9 +152,13 @@ class DataCache( object ):
             
             if key not in self._keys_to_data:
                 
+                self._num_misses += 1
+                
                 raise Exception( 'Cache error! Looking for {}, but it was missing.'.format( key ) )
                 
             
+            self._num_hits += 1
+            
             self._TouchKey( key )
             
             return self._keys_to_data[ key ]
@@ -148,12 +171,16 @@ class DataCache( object ):
             
             if key in self._keys_to_data:
                 
+                self._num_hits += 1
+                
                 self._TouchKey( key )
                 
                 return self._keys_to_data[ key ]
                 
             else:
                 
+                self._num_misses += 1
+                
                 return None
                 
             
@@ -167,6 +194,22 @@ class DataCache( object ):
             
         
     
+    def GetStatistics( self ):
+        
+        with self._lock:
+            
+            return {
+                'name' : self._name,
+                'num_items' : len( self._keys_to_data ),
+                'estimated_memory_footprint' : self._total_estimated_memory_footprint,
+                'size_limit' : self._cache_size,
+                'num_hits' : self._num_hits,
+                'num_misses' : self._num_misses,
+                'num_evictions' : self._num_evictions
+            }
+            
+        
+    
     def HasData( self, key ):
         
         with self._lock:
@@ -179,6 +222,8 @@ class DataCache( object ):
         
         with self._lock:
             
+            self._RecalcMemoryUsage()
+            
             while True:
                 
                 if len( self._keys_fifo ) == 0:
@@ -189,7 +234,7 @@ class DataCache( object ):
                     
                     ( key, last_access_time ) = next( iter( self._keys_fifo.items() ) )
                     
-                    if HydrusData.TimeHasPassed( last_access_time + self._timeout ):
+                    if HydrusData.TimeHasPassed( last_access_time + self._timeout ) or self._total_estimated_memory_footprint > self._cache_size:
                         
                         self._DeleteItem()
                         
@@ -518,6 +563,11 @@ class ImageRendererCache( object ):
         return image_renderer
         
     
+    def GetStatistics( self ):
+        
+        return self._data_cache.GetStatistics()
+        
+    
     def HasImageRenderer( self, hash ):
         
         key = hash
@@ -567,6 +617,11 @@ class ImageTileCache( object ):
         self._data_cache.Clear()
         
     
+    def GetStatistics( self ):
+        
+        return self._data_cache.GetStatistics()
+        
+    
     def GetTile( self, image_renderer: ClientRendering.ImageRenderer, media, clip_rect, target_resolution ):
         
         hash = media.GetHash()
@@ -647,7 +702,7 @@ class ThumbnailCache( object ):
         self._controller.sub( self, 'NotifyNewOptions', 'notify_new_options' )
         
     
-    def _GetThumbnailHydrusBitmap( self, display_media ):
+    def _GetThumbnailHydrusBitmap( self, display_media, thumbnail_bytes = None ):
         
         hash = display_media.GetHash()
         mime = display_media.GetMime()
@@ -664,25 +719,28 @@ class ThumbnailCache( object ):
         
         locations_manager = display_media.GetLocationsManager()
         
-        try:
-            
-            path = self._controller.client_files_manager.GetThumbnailPath( display_media )
+        if thumbnail_bytes is None:
             
-        except HydrusExceptions.FileMissingException as e:
-            
-            if locations_manager.IsLocal():
+            try:
                 
-                summary = 'Unable to get thumbnail for file {}.'.format( hash.hex() )
+                thumbnail_bytes = self._controller.client_files_manager.GetThumbnailBytes( display_media )
                 
-                self._HandleThumbnailException( e, summary )
+            except HydrusExceptions.FileMissingException as e:
+                
+                if locations_manager.IsLocal():
+                    
+                    summary = 'Unable to get thumbnail for file {}.'.format( hash.hex() )
+                    
+                    self._HandleThumbnailException( e, summary )
+                    
+                
+                return self._special_thumbs[ 'hydrus' ]
                 
-            
-            return self._special_thumbs[ 'hydrus' ]
             
         
         try:
             
-            numpy_image = ClientImageHandling.GenerateNumPyImage( path, thumbnail_mime )
+            numpy_image = ClientImageHandling.GenerateNumPyImageFromBytes( thumbnail_bytes, thumbnail_mime )
             
         except Exception as e:
             
@@ -702,7 +760,9 @@ class ThumbnailCache( object ):
             
             try:
                 
-                numpy_image = ClientImageHandling.GenerateNumPyImage( path, thumbnail_mime )
+                thumbnail_bytes = self._controller.client_files_manager.GetThumbnailBytes( display_media )
+                
+                numpy_image = ClientImageHandling.GenerateNumPyImageFromBytes( thumbnail_bytes, thumbnail_mime )
                 
             except Exception as e:
                 
@@ -1003,7 +1063,12 @@ class ThumbnailCache( object ):
             
         
     
-    def GetThumbnail( self, media ):
+    def GetStatistics( self ):
+        
+        return self._data_cache.GetStatistics()
+        
+    
+    def GetThumbnail( self, media, hashes_to_prefetched_thumbnail_bytes = None ):
         
         display_media = media.GetDisplayMedia()
         
@@ -1029,9 +1094,16 @@ class ThumbnailCache( object ):
                 
                 if result is None:
                     
+                    thumbnail_bytes = None
+                    
+                    if hashes_to_prefetched_thumbnail_bytes is not None:
+                        
+                        thumbnail_bytes = hashes_to_prefetched_thumbnail_bytes.get( hash, None )
+                        
+                    
                     try:
                         
-                        hydrus_bitmap = self._GetThumbnailHydrusBitmap( display_media )
+                        hydrus_bitmap = self._GetThumbnailHydrusBitmap( display_media, thumbnail_bytes = thumbnail_bytes )
                         
                     except:
                         
@@ -1137,6 +1209,25 @@ class ThumbnailCache( object ):
             num_done = 0
             max_at_once = 16
             
+            with self._lock:
+                
+                # the next few thumbs are probably neighbours on the page, so we read their bytes in one go
+                upcoming_results = self._waterfall_queue[ - max_at_once : ]
+                
+            
+            upcoming_display_medias = [ media.GetDisplayMedia() for ( page_key, media ) in upcoming_results ]
+            
+            upcoming_display_medias = [ display_media for display_media in upcoming_display_medias if display_media is not None and display_media.GetMime() in HC.MIMES_WITH_THUMBNAILS and not self._data_cache.HasData( display_media.GetHash() ) ]
+            
+            if len( upcoming_display_medias ) > 1:
+                
+                hashes_to_prefetched_thumbnail_bytes = self._controller.client_files_manager.GetThumbnailsBytes( upcoming_display_medias )
+                
+            else:
+                
+                hashes_to_prefetched_thumbnail_bytes = None
+                
+            
             while not HydrusData.TimeHasPassedPrecise( stop_time ) and num_done <= max_at_once:
                 
                 with self._lock:
@@ -1160,7 +1251,7 @@ class ThumbnailCache( object ):
                 
                 if media.GetDisplayMedia() is not None:
                     
-                    self.GetThumbnail( media )
+                    self.GetThumbnail( media, hashes_to_prefetched_thumbnail_bytes = hashes_to_prefetched_thumbnail_bytes )
                     
                     page_keys_to_rendered_medias[ page_key ].append( media )
                     
@@ -4,6 +4,7 @@ import queue
 import random
 import threading
 import time
+import typing
 
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
@@ -19,6 +20,7 @@ from hydrus.client import ClientConstants as CC
 from hydrus.client import ClientImageHandling
 from hydrus.client import ClientPaths
 from hydrus.client import ClientThreading
+from hydrus.client import ClientThumbnailPacks
 from hydrus.client.gui import QtPorting as QP
 from hydrus.client.metadata import ClientTags
 
@@ -179,6 +181,8 @@ regen_file_enum_to_overruled_jobs = {
     REGENERATE_FILE_DATA_JOB_PIXEL_HASH : []
 }
 
+FILE_INTEGRITY_JOBS = { REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE_REMOVE_RECORD, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE_DELETE_RECORD, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE_TRY_URL, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE_TRY_URL_ELSE_REMOVE_RECORD, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA_REMOVE_RECORD, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA_TRY_URL, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA_TRY_URL_ELSE_REMOVE_RECORD, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA_SILENT_DELETE, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE_LOG_ONLY }
+
 ALL_REGEN_JOBS_IN_PREFERRED_ORDER = [ REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE_TRY_URL_ELSE_REMOVE_RECORD, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE_TRY_URL, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA_TRY_URL_ELSE_REMOVE_RECORD, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA_TRY_URL, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE_REMOVE_RECORD, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE_DELETE_RECORD, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA_REMOVE_RECORD, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA_SILENT_DELETE, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE_LOG_ONLY, REGENERATE_FILE_DATA_JOB_FILE_METADATA, REGENERATE_FILE_DATA_JOB_REFIT_THUMBNAIL, REGENERATE_FILE_DATA_JOB_FORCE_THUMBNAIL, REGENERATE_FILE_DATA_JOB_SIMILAR_FILES_METADATA, REGENERATE_FILE_DATA_JOB_CHECK_SIMILAR_FILES_MEMBERSHIP, REGENERATE_FILE_DATA_JOB_FIX_PERMISSIONS, REGENERATE_FILE_DATA_JOB_FILE_MODIFIED_TIMESTAMP, REGENERATE_FILE_DATA_JOB_OTHER_HASHES, REGENERATE_FILE_DATA_JOB_FILE_HAS_EXIF, REGENERATE_FILE_DATA_JOB_FILE_HAS_HUMAN_READABLE_EMBEDDED_METADATA, REGENERATE_FILE_DATA_JOB_FILE_HAS_ICC_PROFILE, REGENERATE_FILE_DATA_JOB_PIXEL_HASH, REGENERATE_FILE_DATA_JOB_DELETE_NEIGHBOUR_DUPES ]
 
 def GetAllFilePaths( raw_paths, do_human_sort = True, clear_out_sidecars = True ):
@@ -266,6 +270,10 @@ class ClientFilesManager( object ):
         self._bad_error_occurred = False
         self._missing_locations = set()
         
+        self._locations_to_packed_thumbnail_stores = {}
+        self._moving_thumbnails_to_folders = False
+        self._packed_thumbnail_flush_scheduled = False
+        
         self._Reinit()
         
         self._controller.sub( self, 'shutdown', 'shutdown' )
@@ -364,6 +372,49 @@ class ClientFilesManager( object ):
     
     def _AddThumbnailFromBytes( self, hash, thumbnail_bytes, silent = False ):
         
+        if self._UsingPackedThumbnails():
+            
+            location = self._prefixes_to_locations[ 't' + hash.hex()[:2] ]
+            
+            if HG.file_report_mode:
+                
+                HydrusData.ShowText( 'Adding thumbnail to pack: ' + str( ( len( thumbnail_bytes ), hash.hex() ) ) )
+                
+            
+            try:
+                
+                self._GetPackedThumbnailStore( location, create_if_missing = True ).AddThumbnail( hash, thumbnail_bytes )
+                
+            except Exception as e:
+                
+                raise HydrusExceptions.FileMissingException( 'The thumbnail for file "{}" failed to write to the thumbnail pack at "{}". This event suggests that hydrus does not have permission to write there or the disk is full. Please check everything is ok. The error was: {}'.format( hash.hex(), self._GetPackedThumbnailStoreDir( location ), e ) )
+                
+            
+            if not self._packed_thumbnail_flush_scheduled:
+                
+                self._packed_thumbnail_flush_scheduled = True
+                
+                self._controller.CallLater( ClientThumbnailPacks.PackedThumbnailStore.MAX_PENDING_PERIOD, self.FlushPackedThumbnails )
+                
+            
+            # a thumbnail only lives in one place, so an older loose copy cannot be moved back over this one later
+            
+            old_path = self._GenerateExpectedThumbnailPath( hash )
+            
+            if os.path.exists( old_path ):
+                
+                ClientPaths.DeletePath( old_path, always_delete_fully = True )
+                
+            
+            if not silent:
+                
+                self._controller.pub( 'clear_thumbnails', { hash } )
+                self._controller.pub( 'new_thumbnails', { hash } )
+                
+            
+            return
+            
+        
         dest_path = self._GenerateExpectedThumbnailPath( hash )
         
         if HG.file_report_mode:
@@ -398,6 +449,13 @@ class ClientFilesManager( object ):
             raise HydrusExceptions.FileMissingException( 'The thumbnail for file "{}" failed to write to path "{}". This event suggests that hydrus does not have permission to write to its thumbnail folder. Please check everything is ok.'.format( hash.hex(), dest_path ) )
             
         
+        # we may be partway through moving out of packs
+        
+        for store in self._GetPackedThumbnailStores():
+            
+            store.DeleteThumbnail( hash )
+            
+        
         if not silent:
             
             self._controller.pub( 'clear_thumbnails', { hash } )
@@ -584,6 +642,42 @@ class ClientFilesManager( object ):
         return thumbnail_bytes
         
     
+    def _GetPackedThumbnailStore( self, location, create_if_missing = False ) -> typing.Optional[ ClientThumbnailPacks.PackedThumbnailStore ]:
+        
+        if location not in self._locations_to_packed_thumbnail_stores:
+            
+            if not create_if_missing:
+                
+                return None
+                
+            
+            self._locations_to_packed_thumbnail_stores[ location ] = ClientThumbnailPacks.PackedThumbnailStore( self._GetPackedThumbnailStoreDir( location ) )
+            
+        
+        return self._locations_to_packed_thumbnail_stores[ location ]
+        
+    
+    def _GetPackedThumbnailStoreDir( self, location ):
+        
+        return os.path.join( location, 'thumbnail_packs' )
+        
+    
+    def _GetPackedThumbnailStores( self, hash = None ) -> typing.List[ ClientThumbnailPacks.PackedThumbnailStore ]:
+        
+        locations_and_stores = list( self._locations_to_packed_thumbnail_stores.items() )
+        
+        if hash is not None:
+            
+            # the store at the hash's current location first, but an interrupted rebalance may have left it in another
+            
+            location = self._prefixes_to_locations[ 't' + hash.hex()[:2] ]
+            
+            locations_and_stores.sort( key = lambda location_and_store: location_and_store[0] != location )
+            
+        
+        return [ store for ( location, store ) in locations_and_stores ]
+        
+    
     def _GetRecoverTuple( self ):
         
         all_locations = { location for location in list(self._prefixes_to_locations.values()) }
@@ -773,10 +867,83 @@ class ClientFilesManager( object ):
         raise HydrusExceptions.FileMissingException( 'File for ' + hash.hex() + ' not found!' )
         
     
+    def _LookForThumbnailBytes( self, hash ):
+        
+        for store in self._GetPackedThumbnailStores( hash = hash ):
+            
+            thumbnail_bytes = store.GetThumbnailBytes( hash )
+            
+            if thumbnail_bytes is not None:
+                
+                return thumbnail_bytes
+                
+            
+        
+        # it may still be in the old folders if a move into packs was interrupted
+        
+        
+        path = self._GenerateExpectedThumbnailPath( hash )
+        
+        if not os.path.exists( path ):
+            
+            raise HydrusExceptions.FileMissingException( 'Thumbnail for ' + hash.hex() + ' not found!' )
+            
+        
+        with open( path, 'rb' ) as f:
+            
+            thumbnail_bytes = f.read()
+            
+        
+        return thumbnail_bytes
+        
+    
+    def _MovePackedThumbnailPrefix( self, prefix, source_location, dest_location ):
+        
+        source_store = self._GetPackedThumbnailStore( source_location )
+        
+        if source_store is None:
+            
+            return
+            
+        
+        dest_store = self._GetPackedThumbnailStore( dest_location, create_if_missing = True )
+        
+        hex_prefix = prefix[1:]
+        
+        hashes = [ hash for hash in source_store.GetHashes() if hash.hex()[:2] == hex_prefix ]
+        
+        for block_of_hashes in HydrusData.SplitListIntoChunks( hashes, 256 ):
+            
+            dest_store.AddThumbnails( list( source_store.GetManyThumbnailBytes( block_of_hashes ).items() ) )
+            
+            source_store.DeleteThumbnails( block_of_hashes )
+            
+        
+        thumbnail_locations = { location for ( location_prefix, location ) in self._prefixes_to_locations.items() if location_prefix.startswith( 't' ) }
+        
+        if source_location not in thumbnail_locations and source_store.GetNumThumbnails() == 0:
+            
+            source_store.Close()
+            
+            del self._locations_to_packed_thumbnail_stores[ source_location ]
+            
+            HydrusPaths.DeletePath( self._GetPackedThumbnailStoreDir( source_location ) )
+            
+        
+        
+    
     def _Reinit( self ):
         
         self._prefixes_to_locations = self._controller.Read( 'client_files_locations' )
         
+        for ( prefix, location ) in self._prefixes_to_locations.items():
+            
+            if prefix.startswith( 't' ) and ClientThumbnailPacks.PackedThumbnailStoreExists( self._GetPackedThumbnailStoreDir( location ) ):
+                
+                self._GetPackedThumbnailStore( location, create_if_missing = True )
+                
+            
+        
         if HG.client_controller.IsFirstStart():
             
             try:
@@ -881,6 +1048,26 @@ class ClientFilesManager( object ):
             
         
     
+    def _RemoveEmptyPackedThumbnailStores( self ):
+        
+        for ( location, store ) in list( self._locations_to_packed_thumbnail_stores.items() ):
+            
+            if store.GetNumThumbnails() == 0:
+                
+                store.Close()
+                
+                del self._locations_to_packed_thumbnail_stores[ location ]
+                
+                HydrusPaths.DeletePath( self._GetPackedThumbnailStoreDir( location ) )
+                
+            
+        
+    
+    def _UsingPackedThumbnails( self ):
+        
+        return len( self._locations_to_packed_thumbnail_stores ) > 0 and not self._moving_thumbnails_to_folders
+        
+    
     def _WaitOnWakeup( self ):
         
         if HG.client_controller.new_options.GetBoolean( 'file_system_waits_on_wakeup' ):
@@ -946,6 +1133,23 @@ class ClientFilesManager( object ):
             
         
     
+    def BackupThumbnailPacks( self, source_root, dest_root ):
+        
+        # the db backup mirrors client_files wholesale, but a live pack index needs a consistent copy
+        
+        for ( location, store ) in list( self._locations_to_packed_thumbnail_stores.items() ):
+            
+            relative_location = os.path.relpath( location, source_root )
+            
+            if relative_location.startswith( '..' ):
+                
+                continue
+                
+            
+            store.Backup( self._GetPackedThumbnailStoreDir( os.path.normpath( os.path.join( dest_root, relative_location ) ) ) )
+            
+        
+    
     def ChangeFileExt( self, hash, old_mime, mime ):
         
         with self._rwlock.write:
@@ -1061,6 +1265,36 @@ class ClientFilesManager( object ):
                     
                 
             
+            stores_to_orphan_packed_thumbnail_hashes = collections.defaultdict( list )
+            num_orphan_packed_thumbnails = 0
+            
+            for store in self._GetPackedThumbnailStores():
+                
+                for ( i, hash ) in enumerate( store.GetHashes() ):
+                    
+                    ( i_paused, should_quit ) = job_key.WaitIfNeeded()
+                    
+                    if should_quit:
+                        
+                        return
+                        
+                    
+                    if i % 100 == 0:
+                        
+                        status = 'reviewed ' + HydrusData.ToHumanInt( i ) + ' packed thumbnails, found ' + HydrusData.ToHumanInt( num_orphan_packed_thumbnails ) + ' orphans'
+                        
+                        job_key.SetVariable( 'popup_text_1', status )
+                        
+                    
+                    if HG.client_controller.Read( 'is_an_orphan', 'thumbnail', hash ):
+                        
+                        stores_to_orphan_packed_thumbnail_hashes[ store ].append( hash )
+                        
+                        num_orphan_packed_thumbnails += 1
+                        
+                    
+                
+            
             time.sleep( 2 )
             
             if move_location is None and len( orphan_paths ) > 0:
@@ -1117,13 +1351,25 @@ class ClientFilesManager( object ):
                     
                 
             
-            if len( orphan_paths ) == 0 and len( orphan_thumbnails ) == 0:
+            for ( store, hashes ) in stores_to_orphan_packed_thumbnail_hashes.items():
+                
+                for hash in hashes:
+                    
+                    HydrusData.Print( 'Deleting the packed orphan thumbnail ' + hash.hex() )
+                    
+                
+                store.DeleteThumbnails( hashes )
+                
+            
+            num_orphan_thumbnails = len( orphan_thumbnails ) + num_orphan_packed_thumbnails
+            
+            if len( orphan_paths ) == 0 and num_orphan_thumbnails == 0:
                 
                 final_text = 'no orphans found!'
                 
             else:
                 
-                final_text = HydrusData.ToHumanInt( len( orphan_paths ) ) + ' orphan files and ' + HydrusData.ToHumanInt( len( orphan_thumbnails ) ) + ' orphan thumbnails cleared!'
+                final_text = HydrusData.ToHumanInt( len( orphan_paths ) ) + ' orphan files and ' + HydrusData.ToHumanInt( num_orphan_thumbnails ) + ' orphan thumbnails cleared!'
                 
             
             job_key.SetVariable( 'popup_text_1', final_text )
@@ -1205,6 +1451,14 @@ class ClientFilesManager( object ):
                 
                 if thumbnail_hash is not None:
                     
+                    for store in self._GetPackedThumbnailStores():
+                        
+                        if store.DeleteThumbnail( thumbnail_hash ):
+                            
+                            num_thumbnails_deleted += 1
+                            
+                        
+                    
                     path = self._GenerateExpectedThumbnailPath( thumbnail_hash )
                     
                     if os.path.exists( path ):
@@ -1234,6 +1488,18 @@ class ClientFilesManager( object ):
             
         
     
+    def FlushPackedThumbnails( self ):
+        
+        # no rwlock, so this is safe at shutdown. a store that has since been closed has nothing pending, so flushing it does nothing
+        
+        self._packed_thumbnail_flush_scheduled = False
+        
+        for store in self._GetPackedThumbnailStores():
+            
+            store.Flush()
+            
+        
+    
     def GetCurrentFileLocations( self ):
         
         with self._rwlock.read:
@@ -1297,33 +1563,89 @@ class ClientFilesManager( object ):
         return self._missing_locations
         
     
-    def GetThumbnailPath( self, media ):
+    def GetThumbnailBytes( self, media ):
         
         hash = media.GetHash()
         mime = media.GetMime()
         
         if HG.file_report_mode:
             
-            HydrusData.ShowText( 'Thumbnail path request: ' + str( ( hash, mime ) ) )
+            HydrusData.ShowText( 'Thumbnail request: ' + str( ( hash, mime ) ) )
             
         
         with self._rwlock.read:
             
-            path = self._GenerateExpectedThumbnailPath( hash )
+            try:
+                
+                return self._LookForThumbnailBytes( hash )
+                
+            except HydrusExceptions.FileMissingException:
+                
+                pass
+                
+            
+        
+        self.RegenerateThumbnail( media )
+        
+        with self._rwlock.read:
             
-            thumb_missing = not os.path.exists( path )
+            return self._LookForThumbnailBytes( hash )
             
         
-        if thumb_missing:
+    
+    def GetThumbnailsBytes( self, medias ):
+        
+        # a batch read for the thumbnail waterfall. missing thumbs are simply left out, and the caller can fall back to GetThumbnailBytes
+        
+        hashes = [ media.GetHash() for media in medias ]
+        
+        hashes_to_thumbnail_bytes = {}
+        
+        with self._rwlock.read:
             
-            self.RegenerateThumbnail( media )
+            locations_to_hashes = HydrusData.BuildKeyToListDict( ( ( self._prefixes_to_locations[ 't' + hash.hex()[:2] ], hash ) for hash in hashes ) )
+            
+            for ( location, location_hashes ) in locations_to_hashes.items():
+                
+                store = self._GetPackedThumbnailStore( location )
+                
+                if store is not None:
+                    
+                    hashes_to_thumbnail_bytes.update( store.GetManyThumbnailBytes( location_hashes ) )
+                    
+                
+            
+            for hash in hashes:
+                
+                if hash in hashes_to_thumbnail_bytes:
+                    
+                    continue
+                    
+                
+                try:
+                    
+                    hashes_to_thumbnail_bytes[ hash ] = self._LookForThumbnailBytes( hash )
+                    
+                except HydrusExceptions.FileMissingException:
+                    
+                    pass
+                    
+                
             
         
-        return path
+        return hashes_to_thumbnail_bytes
         
     
     def LocklessHasThumbnail( self, hash ):
         
+        for store in self._GetPackedThumbnailStores( hash = hash ):
+            
+            if store.HasThumbnail( hash ):
+                
+                return True
+                
+            
+        
         path = self._GenerateExpectedThumbnailPath( hash )
         
         if HG.file_report_mode:
@@ -1334,6 +1656,195 @@ class ClientFilesManager( object ):
         return os.path.exists( path )
         
     
+    def MoveThumbnailsToFolders( self ):
+        
+        job_key = ClientThreading.JobKey( cancellable = True )
+        
+        job_key.SetStatusTitle( 'moving thumbnails back to folders' )
+        
+        self._controller.pub( 'message', job_key )
+        
+        try:
+            
+            with self._rwlock.write:
+                
+                # new thumbnails go to the folders from now on
+                self._moving_thumbnails_to_folders = True
+                
+                stores = self._GetPackedThumbnailStores()
+                
+            
+            hashes_and_stores = [ ( hash, store ) for store in stores for hash in store.GetHashes() ]
+            
+            num_done = 0
+            
+            # we only hold the write lock a chunk at a time, so thumbnails stay available while this runs
+            
+            for block_of_hashes_and_stores in HydrusData.SplitListIntoChunks( hashes_and_stores, 256 ):
+                
+                ( i_paused, should_quit ) = job_key.WaitIfNeeded()
+                
+                if should_quit:
+                    
+                    return
+                    
+                
+                with self._rwlock.write:
+                    
+                    stores_to_hashes = HydrusData.BuildKeyToListDict( ( ( store, hash ) for ( hash, store ) in block_of_hashes_and_stores ) )
+                    
+                    for ( store, hashes ) in stores_to_hashes.items():
+                        
+                        hashes_to_thumbnail_bytes = store.GetManyThumbnailBytes( hashes )
+                        
+                        for ( hash, thumbnail_bytes ) in hashes_to_thumbnail_bytes.items():
+                            
+                            path = self._GenerateExpectedThumbnailPath( hash )
+                            
+                            HydrusPaths.TryToGiveFileNicePermissionBits( path )
+                            
+                            with open( path, 'wb' ) as f:
+                                
+                                f.write( thumbnail_bytes )
+                                
+                            
+                        
+                        store.DeleteThumbnails( list( hashes_to_thumbnail_bytes.keys() ) )
+                        
+                    
+                
+                num_done += len( block_of_hashes_and_stores )
+                
+                job_key.SetVariable( 'popup_text_1', HydrusData.ConvertValueRangeToPrettyString( num_done, len( hashes_and_stores ) ) )
+                job_key.SetVariable( 'popup_gauge_1', ( num_done, len( hashes_and_stores ) ) )
+                
+                time.sleep( 0.01 )
+                
+            
+            with self._rwlock.write:
+                
+                # everything is safely in the folders, so we can drop the packs
+                
+                self._RemoveEmptyPackedThumbnailStores()
+                
+                self._moving_thumbnails_to_folders = False
+                
+            
+        finally:
+            
+            job_key.SetVariable( 'popup_text_1', 'done!' )
+            job_key.DeleteVariable( 'popup_gauge_1' )
+            
+            job_key.Finish()
+            
+        
+    
+    def MoveThumbnailsToPacks( self ):
+        
+        job_key = ClientThreading.JobKey( cancellable = True )
+        
+        job_key.SetStatusTitle( 'moving thumbnails into packs' )
+        
+        self._controller.pub( 'message', job_key )
+        
+        try:
+            
+            with self._rwlock.write:
+                
+                self._moving_thumbnails_to_folders = False
+                
+                # new thumbnails go to the packs from now on
+                
+                for ( prefix, location ) in self._prefixes_to_locations.items():
+                    
+                    if prefix.startswith( 't' ):
+                        
+                        self._GetPackedThumbnailStore( location, create_if_missing = True )
+                        
+                    
+                
+                paths = list( self._IterateAllThumbnailPaths() )
+                
+            
+            num_done = 0
+            
+            # we only hold the write lock a chunk at a time, so thumbnails stay available while this runs
+            
+            for block_of_paths in HydrusData.SplitListIntoChunks( paths, 256 ):
+                
+                ( i_paused, should_quit ) = job_key.WaitIfNeeded()
+                
+                if should_quit:
+                    
+                    return
+                    
+                
+                with self._rwlock.write:
+                    
+                    stores_to_hashes_and_thumbnail_bytes = collections.defaultdict( list )
+                    packed_paths = []
+                    
+                    for path in block_of_paths:
+                        
+                        ( directory, filename ) = os.path.split( path )
+                        
+                        try:
+                            
+                            hash = bytes.fromhex( filename[:64] )
+                            
+                        except ValueError:
+                            
+                            continue
+                            
+                        
+                        if not os.path.exists( path ):
+                            
+                            continue
+                            
+                        
+                        with open( path, 'rb' ) as f:
+                            
+                            thumbnail_bytes = f.read()
+                            
+                        
+                        location = self._prefixes_to_locations[ 't' + hash.hex()[:2] ]
+                        
+                        store = self._GetPackedThumbnailStore( location, create_if_missing = True )
+                        
+                        stores_to_hashes_and_thumbnail_bytes[ store ].append( ( hash, thumbnail_bytes ) )
+                        packed_paths.append( path )
+                        
+                    
+                    for ( store, hashes_and_thumbnail_bytes ) in stores_to_hashes_and_thumbnail_bytes.items():
+                        
+                        store.AddThumbnails( hashes_and_thumbnail_bytes )
+                        
+                    
+                    # only once it is committed to the pack do we delete the loose file
+                    
+                    for path in packed_paths:
+                        
+                        ClientPaths.DeletePath( path, always_delete_fully = True )
+                        
+                    
+                
+                num_done += len( block_of_paths )
+                
+                job_key.SetVariable( 'popup_text_1', HydrusData.ConvertValueRangeToPrettyString( num_done, len( paths ) ) )
+                job_key.SetVariable( 'popup_gauge_1', ( num_done, len( paths ) ) )
+                
+                time.sleep( 0.01 )
+                
+            
+        finally:
+            
+            job_key.SetVariable( 'popup_text_1', 'done!' )
+            job_key.DeleteVariable( 'popup_gauge_1' )
+            
+            job_key.Finish()
+            
+        
+    
     def NotifyNewPhysicalFileDeletes( self ):
         
         self._new_physical_file_deletes.set()
@@ -1374,6 +1885,11 @@ class ClientFilesManager( object ):
                     
                     self._Reinit()
                     
+                    if prefix.startswith( 't' ):
+                        
+                        self._MovePackedThumbnailPrefix( prefix, overweight_location, underweight_location )
+                        
+                    
                     rebalance_tuple = self._GetRebalanceTuple()
                     
                     time.sleep( 0.01 )
@@ -1469,9 +1985,9 @@ class ClientFilesManager( object ):
             
             ( media_width, media_height ) = media.GetResolution()
             
-            path = self._GenerateExpectedThumbnailPath( hash )
+            thumbnail_bytes = self._LookForThumbnailBytes( hash )
             
-            numpy_image = ClientImageHandling.GenerateNumPyImage( path, mime )
+            numpy_image = ClientImageHandling.GenerateNumPyImageFromBytes( thumbnail_bytes, mime )
             
             ( current_width, current_height ) = HydrusImageHandling.GetResolutionNumPy( numpy_image )
             
@@ -1502,6 +2018,13 @@ class ClientFilesManager( object ):
         
         self._new_physical_file_deletes.set()
         
+        self.FlushPackedThumbnails()
+        
+    
+    def UsingPackedThumbnails( self ):
+        
+        return self._UsingPackedThumbnails()
+        
     
 class FilesMaintenanceManager( object ):
     
@@ -2158,32 +2681,33 @@ class FilesMaintenanceManager( object ):
     
     def _RunJob( self, media_results, job_type, job_key, job_done_hook = None ):
         
-        next_gc_collect = HydrusData.GetNow() + 10
+        cleared_jobs = []
         
         try:
             
-            big_pauser = HydrusData.BigJobPauser( wait_time = 0.8 )
-            
             last_time_jobs_were_cleared = HydrusData.GetNow()
-            cleared_jobs = []
             
             num_to_do = len( media_results )
             
+            num_workers = min( self._controller.new_options.GetInteger( 'file_maintenance_num_workers' ), num_to_do )
+            
             if HG.file_report_mode:
                 
-                HydrusData.ShowText( 'file maintenance: {} for {} files'.format( regen_file_enum_to_str_lookup[ job_type ], HydrusData.ToHumanInt( num_to_do ) ) )
+                HydrusData.ShowText( 'file maintenance: {} for {} files on {} workers'.format( regen_file_enum_to_str_lookup[ job_type ], HydrusData.ToHumanInt( num_to_do ), HydrusData.ToHumanInt( num_workers ) ) )
                 
             
-            for ( i, media_result ) in enumerate( media_results ):
+            if num_workers > 1:
                 
-                big_pauser.Pause()
+                results = self._RunJobWorkParallel( media_results, job_type, job_key, num_workers )
                 
-                hash = media_result.GetHash()
+            else:
                 
-                if job_key.IsCancelled():
-                    
-                    return
-                    
+                results = self._RunJobWorkSerial( media_results, job_type, job_key )
+                
+            
+            for ( media_result, result, e ) in results:
+                
+                hash = media_result.GetHash()
                 
                 if job_done_hook is not None:
                     
@@ -2192,104 +2716,54 @@ class FilesMaintenanceManager( object ):
                 
                 additional_data = None
                 
-                try:
+                if e is None:
                     
-                    if job_type == REGENERATE_FILE_DATA_JOB_FILE_METADATA:
-                        
-                        additional_data = self._RegenFileMetadata( media_result )
-                        
-                    elif job_type == REGENERATE_FILE_DATA_JOB_FILE_MODIFIED_TIMESTAMP:
-                        
-                        additional_data = self._RegenFileModifiedTimestamp( media_result )
-                        
-                    elif job_type == REGENERATE_FILE_DATA_JOB_OTHER_HASHES:
-                        
-                        additional_data = self._RegenFileOtherHashes( media_result )
-                        
-                    elif job_type == REGENERATE_FILE_DATA_JOB_FILE_HAS_EXIF:
-                        
-                        additional_data = self._HasEXIF( media_result )
-                        
-                    elif job_type == REGENERATE_FILE_DATA_JOB_FILE_HAS_HUMAN_READABLE_EMBEDDED_METADATA:
-                        
-                        additional_data = self._HasHumanReadableEmbeddedMetadata( media_result )
+                    if job_type == REGENERATE_FILE_DATA_JOB_REFIT_THUMBNAIL:
                         
-                    elif job_type == REGENERATE_FILE_DATA_JOB_FILE_HAS_ICC_PROFILE:
-                        
-                        additional_data = self._HasICCProfile( media_result )
-                        
-                    elif job_type == REGENERATE_FILE_DATA_JOB_PIXEL_HASH:
-                        
-                        additional_data = self._RegenPixelHash( media_result )
-                        
-                    elif job_type == REGENERATE_FILE_DATA_JOB_FORCE_THUMBNAIL:
-                        
-                        self._RegenFileThumbnailForce( media_result )
-                        
-                    elif job_type == REGENERATE_FILE_DATA_JOB_REFIT_THUMBNAIL:
+                        num_thumb_refits = job_key.GetIfHasVariable( 'num_thumb_refits' )
                         
-                        if not job_key.HasVariable( 'num_thumb_refits' ):
+                        if num_thumb_refits is None:
                             
-                            job_key.SetVariable( 'num_thumb_refits', 0 ) 
+                            num_thumb_refits = 0
                             
                         
-                        num_thumb_refits = job_key.GetIfHasVariable( 'num_thumb_refits' )
-                        
-                        was_regenerated = self._RegenFileThumbnailRefit( media_result )
+                        was_regenerated = result
                         
                         if was_regenerated:
                             
                             num_thumb_refits += 1
                             
-                            job_key.SetVariable( 'num_thumb_refits', num_thumb_refits )
-                            
-                        
-                        job_key.SetVariable( 'popup_text_2', 'thumbs needing regen: {}'.format( HydrusData.ToHumanInt( num_thumb_refits ) ) )
-                        
-                    elif job_type == REGENERATE_FILE_DATA_JOB_DELETE_NEIGHBOUR_DUPES:
-                        
-                        self._DeleteNeighbourDupes( media_result )
-                        
-                    elif job_type == REGENERATE_FILE_DATA_JOB_CHECK_SIMILAR_FILES_MEMBERSHIP:
                         
-                        additional_data = self._CheckSimilarFilesMembership( media_result )
+                        job_key.SetVariable( 'num_thumb_refits', num_thumb_refits )
                         
-                    elif job_type == REGENERATE_FILE_DATA_JOB_SIMILAR_FILES_METADATA:
-                        
-                        additional_data = self._RegenSimilarFilesMetadata( media_result )
-                        
-                    elif job_type == REGENERATE_FILE_DATA_JOB_FIX_PERMISSIONS:
+                        job_key.SetVariable( 'popup_text_2', 'thumbs needing regen: {}'.format( HydrusData.ToHumanInt( num_thumb_refits ) ) )
                         
-                        self._FixFilePermissions( media_result )
+                    elif job_type in FILE_INTEGRITY_JOBS:
                         
-                    elif job_type in ( REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE_REMOVE_RECORD, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE_DELETE_RECORD, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE_TRY_URL, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE_TRY_URL_ELSE_REMOVE_RECORD, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA_REMOVE_RECORD, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA_TRY_URL, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA_TRY_URL_ELSE_REMOVE_RECORD, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA_SILENT_DELETE, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE_LOG_ONLY ):
+                        num_bad_files = job_key.GetIfHasVariable( 'num_bad_files' )
                         
-                        if not job_key.HasVariable( 'num_bad_files' ):
+                        if num_bad_files is None:
                             
-                            job_key.SetVariable( 'num_bad_files', 0 ) 
+                            num_bad_files = 0
                             
                         
-                        num_bad_files = job_key.GetIfHasVariable( 'num_bad_files' )
-                        
-                        file_was_bad = self._CheckFileIntegrity( media_result, job_type )
+                        file_was_bad = result
                         
                         if file_was_bad:
                             
                             num_bad_files += 1
                             
-                            job_key.SetVariable( 'num_bad_files', num_bad_files ) 
-                            
+                        
+                        job_key.SetVariable( 'num_bad_files', num_bad_files )
                         
                         job_key.SetVariable( 'popup_text_2', 'missing or invalid files: {}'.format( HydrusData.ToHumanInt( num_bad_files ) ) )
                         
+                    else:
+                        
+                        additional_data = result
+                        
                     
-                except HydrusExceptions.ShutdownException:
-                    
-                    # no worries
-                    
-                    pass
-                    
-                except Exception as e:
+                elif not isinstance( e, HydrusExceptions.ShutdownException ):
                     
                     HydrusData.PrintException( e )
                     
@@ -2299,17 +2773,16 @@ class FilesMaintenanceManager( object ):
                     
                     HydrusData.ShowText( message )
                     
-                finally:
-                    
-                    self._work_tracker.ReportRequestUsed( num_requests = regen_file_enum_to_job_weight_lookup[ job_type ] )
-                    
-                    cleared_jobs.append( ( hash, job_type, additional_data ) )
-                    
+                
+                self._work_tracker.ReportRequestUsed( num_requests = regen_file_enum_to_job_weight_lookup[ job_type ] )
+                
+                cleared_jobs.append( ( hash, job_type, additional_data ) )
                 
                 if HydrusData.TimeHasPassed( last_time_jobs_were_cleared + 10 ) or len( cleared_jobs ) > 256:
                     
                     self._controller.WriteSynchronous( 'file_maintenance_clear_jobs', cleared_jobs )
                     
+                    last_time_jobs_were_cleared = HydrusData.GetNow()
                     cleared_jobs = []
                     
                 
@@ -2323,6 +2796,138 @@ class FilesMaintenanceManager( object ):
             
         
     
+    def _RunJobOnMediaResult( self, media_result, job_type ):
+        
+        if job_type == REGENERATE_FILE_DATA_JOB_FILE_METADATA: return self._RegenFileMetadata( media_result )
+        elif job_type == REGENERATE_FILE_DATA_JOB_FILE_MODIFIED_TIMESTAMP: return self._RegenFileModifiedTimestamp( media_result )
+        elif job_type == REGENERATE_FILE_DATA_JOB_OTHER_HASHES: return self._RegenFileOtherHashes( media_result )
+        elif job_type == REGENERATE_FILE_DATA_JOB_FILE_HAS_EXIF: return self._HasEXIF( media_result )
+        elif job_type == REGENERATE_FILE_DATA_JOB_FILE_HAS_HUMAN_READABLE_EMBEDDED_METADATA: return self._HasHumanReadableEmbeddedMetadata( media_result )
+        elif job_type == REGENERATE_FILE_DATA_JOB_FILE_HAS_ICC_PROFILE: return self._HasICCProfile( media_result )
+        elif job_type == REGENERATE_FILE_DATA_JOB_PIXEL_HASH: return self._RegenPixelHash( media_result )
+        elif job_type == REGENERATE_FILE_DATA_JOB_FORCE_THUMBNAIL: return self._RegenFileThumbnailForce( media_result )
+        elif job_type == REGENERATE_FILE_DATA_JOB_REFIT_THUMBNAIL: return self._RegenFileThumbnailRefit( media_result )
+        elif job_type == REGENERATE_FILE_DATA_JOB_DELETE_NEIGHBOUR_DUPES: return self._DeleteNeighbourDupes( media_result )
+        elif job_type == REGENERATE_FILE_DATA_JOB_CHECK_SIMILAR_FILES_MEMBERSHIP: return self._CheckSimilarFilesMembership( media_result )
+        elif job_type == REGENERATE_FILE_DATA_JOB_SIMILAR_FILES_METADATA: return self._RegenSimilarFilesMetadata( media_result )
+        elif job_type == REGENERATE_FILE_DATA_JOB_FIX_PERMISSIONS: return self._FixFilePermissions( media_result )
+        elif job_type in FILE_INTEGRITY_JOBS: return self._CheckFileIntegrity( media_result, job_type )
+        
+        return None
+        
+    
+    def _RunJobWorkParallel( self, media_results, job_type, job_key, num_workers ):
+        
+        # the per-file work is mostly decoding and hashing, which release the GIL, so a few threads will chew through a big job on all cores
+        # the results come back here so the job bookkeeping and the clear_jobs writes stay on this one thread
+        
+        media_results_queue = queue.Queue()
+        
+        for media_result in media_results:
+            
+            media_results_queue.put( media_result )
+            
+        
+        results_queue = queue.Queue()
+        
+        stop_event = threading.Event()
+        
+        def do_work():
+            
+            big_pauser = HydrusData.BigJobPauser( wait_time = 0.8 )
+            
+            while not stop_event.is_set():
+                
+                try:
+                    
+                    media_result = media_results_queue.get_nowait()
+                    
+                except queue.Empty:
+                    
+                    return
+                    
+                
+                big_pauser.Pause()
+                
+                try:
+                    
+                    result = self._RunJobOnMediaResult( media_result, job_type )
+                    
+                    results_queue.put( ( media_result, result, None ) )
+                    
+                except Exception as e:
+                    
+                    results_queue.put( ( media_result, None, e ) )
+                    
+                
+            
+        
+        for i in range( num_workers ):
+            
+            self._controller.CallToThread( do_work )
+            
+        
+        num_done = 0
+        
+        try:
+            
+            while num_done < len( media_results ):
+                
+                if job_key.IsCancelled() or HydrusThreading.IsThreadShuttingDown() or self._shutdown:
+                    
+                    return
+                    
+                
+                try:
+                    
+                    ( media_result, result, e ) = results_queue.get( timeout = 0.5 )
+                    
+                except queue.Empty:
+                    
+                    continue
+                    
+                
+                num_done += 1
+                
+                yield ( media_result, result, e )
+                
+            
+        finally:
+            
+            # anything the workers finish after this is dropped, and those jobs will be picked up again next time
+            stop_event.set()
+            
+        
+    
+    def _RunJobWorkSerial( self, media_results, job_type, job_key ):
+        
+        big_pauser = HydrusData.BigJobPauser( wait_time = 0.8 )
+        
+        for media_result in media_results:
+            
+            big_pauser.Pause()
+            
+            if job_key.IsCancelled():
+                
+                return
+                
+            
+            try:
+                
+                result = self._RunJobOnMediaResult( media_result, job_type )
+                
+                e = None
+                
+            except Exception as e_caught:
+                
+                result = None
+                e = e_caught
+                
+            
+            yield ( media_result, result, e )
+            
+        
+    
     def CancelJobs( self, job_type ):
         
         with self._lock:
@@ -2404,7 +3009,9 @@ class FilesMaintenanceManager( object ):
                     
                     ( hashes, job_type ) = job
                     
-                    media_results = self._controller.Read( 'media_results', hashes )
+                    # maintenance jobs work off file info and locations, so tags and notes are left to load only if something asks
+                    
+                    media_results = self._controller.Read( 'media_results', hashes, lazy = True )
                     
                     hashes_to_media_results = { media_result.GetHash() : media_result for media_result in media_results }
                     
@@ -2512,7 +3119,7 @@ class FilesMaintenanceManager( object ):
                             
                             ( hashes, job_type ) = job
                             
-                            media_results = self._controller.Read( 'media_results', hashes )
+                            media_results = self._controller.Read( 'media_results', hashes, lazy = True )
                             
                             hashes_to_media_results = { media_result.GetHash() : media_result for media_result in media_results }
                             
@@ -2520,7 +3127,10 @@ class FilesMaintenanceManager( object ):
                             
                             self._ClearJobs( missing_hashes, job_type )
                             
-                            for media_result in media_results:
+                            # we check our throttle before every file, or every block of files if we have several workers
+                            num_workers = self._controller.new_options.GetInteger( 'file_maintenance_num_workers' )
+                            
+                            for block_of_media_results in HydrusData.SplitListIntoChunks( media_results, num_workers ):
                                 
                                 wait_on_maintenance()
                                 
@@ -2531,16 +3141,19 @@ class FilesMaintenanceManager( object ):
                                 
                                 with self._lock:
                                     
-                                    self._RunJob( ( media_result, ), job_type, job_key )
+                                    self._RunJob( block_of_media_results, job_type, job_key )
                                     
                                 
                                 time.sleep( 0.0001 )
                                 
-                                i += 1
-                                
-                                if i % 100 == 0:
+                                for media_result in block_of_media_results:
+                                    
+                                    i += 1
                                     
-                                    self._controller.pub( 'notify_files_maintenance_done' )
+                                    if i % 100 == 0:
+                                        
+                                        self._controller.pub( 'notify_files_maintenance_done' )
+                                        
                                     
                                 
                             
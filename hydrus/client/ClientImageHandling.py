@@ -24,20 +24,32 @@ def DiscardBlankPerceptualHashes( perceptual_hashes ):
     
     return perceptual_hashes
     
-def GenerateNumPyImage( path, mime ):
+def GenerateNumPyImage( path, mime, reduction_factor = 1 ):
     
     force_pil = HG.client_controller.new_options.GetBoolean( 'load_images_with_pil' )
     
-    return HydrusImageHandling.GenerateNumPyImage( path, mime, force_pil = force_pil )
+    return HydrusImageHandling.GenerateNumPyImage( path, mime, force_pil = force_pil, reduction_factor = reduction_factor )
     
-def GenerateShapePerceptualHashes( path, mime ):
+def GenerateNumPyImageFromBytes( image_bytes, mime ):
     
-    if HG.phash_generation_report_mode:
+    force_pil = HG.client_controller.new_options.GetBoolean( 'load_images_with_pil' )
+    
+    return HydrusImageHandling.GenerateNumPyImageFromBytes( image_bytes, mime, force_pil = force_pil )
+    
+def GenerateShapePerceptualHashes( path, mime, numpy_image = None ):
+    
+    if numpy_image is None:
         
-        HydrusData.ShowText( 'phash generation: loading image' )
+        if HG.phash_generation_report_mode:
+            
+            HydrusData.ShowText( 'phash generation: loading image' )
+            
+        
+        # we squash to 32x32 in a moment, so a jpeg decoded at 1/8 scale is as good as the full thing
+        reduction_factor = HydrusImageHandling.GetDecodeReductionFactor( path, mime, ( 256, 256 ) )
+        
+        numpy_image = GenerateNumPyImage( path, mime, reduction_factor = reduction_factor )
         
-    
-    numpy_image = GenerateNumPyImage( path, mime )
     
     if HG.phash_generation_report_mode:
         
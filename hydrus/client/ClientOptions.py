@@ -146,6 +146,7 @@ class ClientOptions( HydrusSerialisable.SerialisableBase ):
         self._dictionary[ 'booleans' ][ 'elide_page_tab_names' ] = True
         
         self._dictionary[ 'booleans' ][ 'maintain_similar_files_duplicate_pairs_during_idle' ] = False
+        self._dictionary[ 'booleans' ][ 'similar_files_search_uses_in_memory_index' ] = False
         
         self._dictionary[ 'booleans' ][ 'show_namespaces' ] = True
         self._dictionary[ 'booleans' ][ 'show_number_namespaces' ] = True
@@ -175,6 +176,7 @@ class ClientOptions( HydrusSerialisable.SerialisableBase ):
         
         self._dictionary[ 'booleans' ][ 'tag_display_maintenance_during_idle' ] = True
         self._dictionary[ 'booleans' ][ 'tag_display_maintenance_during_active' ] = True
+        self._dictionary[ 'booleans' ][ 'tag_display_maintenance_bulk_sync' ] = True
         
         self._dictionary[ 'booleans' ][ 'save_page_sort_on_change' ] = False
         self._dictionary[ 'booleans' ][ 'force_hide_page_signal_on_new_page' ] = False
@@ -370,6 +372,8 @@ class ClientOptions( HydrusSerialisable.SerialisableBase ):
         self._dictionary[ 'integers' ][ 'max_network_jobs' ] = 15
         self._dictionary[ 'integers' ][ 'max_network_jobs_per_domain' ] = 3
         
+        self._dictionary[ 'integers' ][ 'network_connection_pool_size' ] = 10
+        
         self._dictionary[ 'integers' ][ 'max_connection_attempts_allowed' ] = 5
         self._dictionary[ 'integers' ][ 'max_request_attempts_allowed_get' ] = 5
         
@@ -427,6 +431,10 @@ class ClientOptions( HydrusSerialisable.SerialisableBase ):
         self._dictionary[ 'integers' ][ 'file_maintenance_active_throttle_files' ] = 1
         self._dictionary[ 'integers' ][ 'file_maintenance_active_throttle_time_delta' ] = 20
         
+        self._dictionary[ 'integers' ][ 'file_maintenance_num_workers' ] = 1
+        
+        self._dictionary[ 'integers' ][ 'file_import_num_workers' ] = 1
+        
         self._dictionary[ 'integers' ][ 'subscription_network_error_delay' ] = 12 * 3600
         self._dictionary[ 'integers' ][ 'subscription_other_error_delay' ] = 36 * 3600
         self._dictionary[ 'integers' ][ 'downloader_network_error_delay' ] = 90 * 60
@@ -2419,6 +2419,16 @@ class ServiceRepository( ServiceRestricted ):
             
         
     
+    def GetUpdateFormat( self ) -> int:
+        
+        with self._lock:
+            
+            # older servers do not say, and they only make json
+            
+            return self._service_options.get( 'update_format', HydrusNetwork.UPDATE_FORMAT_JSON )
+            
+        
+    
     def GetUpdatePeriod( self ) -> int:
         
         with self._lock:
@@ -0,0 +1,374 @@
+import mmap
+import os
+import sqlite3
+import threading
+import typing
+
+from hydrus.core import HydrusData
+from hydrus.core import HydrusExceptions
+from hydrus.core import HydrusPaths
+
+# rather than millions of tiny files, we can store thumbnails in a handful of append-only segment files
+# a small sqlite index maps hash -> ( segment, offset, length ), and we read the bytes back through mmap
+# a rewritten or deleted thumbnail just leaves dead bytes in its segment. moving back to folders and then packing again will compact everything
+# single adds are batched, so a burst of new thumbnails costs one fsync and one index commit, not one each. pending adds are still readable
+
+INDEX_FILENAME = 'thumbnails_index.db'
+
+def GetSegmentFilename( segment: int ):
+    
+    return 'thumbnails_{}.pack'.format( str( segment ).zfill( 4 ) )
+    
+
+class PackedThumbnailStore( object ):
+    
+    MAX_SEGMENT_SIZE = 1024 * 1048576
+    MAX_PENDING_ROWS = 256
+    MAX_PENDING_PERIOD = 5
+    
+    def __init__( self, directory: str ):
+        
+        self._directory = directory
+        
+        HydrusPaths.MakeSureDirectoryExists( self._directory )
+        
+        self._lock = threading.Lock()
+        
+        self._db = sqlite3.connect( os.path.join( self._directory, INDEX_FILENAME ), isolation_level = None, check_same_thread = False )
+        
+        self._db.execute( 'PRAGMA journal_mode = WAL;' )
+        self._db.execute( 'PRAGMA synchronous = NORMAL;' )
+        
+        self._db.execute( 'CREATE TABLE IF NOT EXISTS thumbnails ( hash BLOB PRIMARY KEY, segment INTEGER, offset INTEGER, length INTEGER );' )
+        
+        self._segments_to_mmaps = {}
+        
+        ( self._current_segment, ) = self._db.execute( 'SELECT IFNULL( MAX( segment ), 0 ) FROM thumbnails;' ).fetchone()
+        
+        self._current_segment_file = None
+        
+        self._pending_hashes_to_rows = {}
+        self._time_first_pending = None
+        
+    
+    def _AppendThumbnails( self, hashes_and_thumbnail_bytes ):
+        
+        for ( hash, thumbnail_bytes ) in hashes_and_thumbnail_bytes:
+            
+            if self._current_segment_file is None:
+                
+                self._current_segment_file = open( os.path.join( self._directory, GetSegmentFilename( self._current_segment ) ), 'ab' )
+                
+            
+            offset = self._current_segment_file.tell()
+            
+            if offset > 0 and offset + len( thumbnail_bytes ) > self.MAX_SEGMENT_SIZE:
+                
+                self._current_segment_file.close()
+                
+                self._current_segment += 1
+                
+                self._current_segment_file = open( os.path.join( self._directory, GetSegmentFilename( self._current_segment ) ), 'ab' )
+                
+                offset = self._current_segment_file.tell()
+                
+            
+            self._current_segment_file.write( thumbnail_bytes )
+            
+            self._pending_hashes_to_rows[ hash ] = ( self._current_segment, offset, len( thumbnail_bytes ) )
+            
+        
+        if self._time_first_pending is None:
+            
+            self._time_first_pending = HydrusData.GetNow()
+            
+        
+    
+    def _FlushPending( self ):
+        
+        if len( self._pending_hashes_to_rows ) == 0:
+            
+            return
+            
+        
+        # the bytes have to be on disk before the index points at them
+        self._current_segment_file.flush()
+        
+        os.fsync( self._current_segment_file.fileno() )
+        
+        rows = [ ( sqlite3.Binary( hash ), segment, offset, length ) for ( hash, ( segment, offset, length ) ) in self._pending_hashes_to_rows.items() ]
+        
+        self._db.execute( 'BEGIN IMMEDIATE;' )
+        
+        self._db.executemany( 'REPLACE INTO thumbnails ( hash, segment, offset, length ) VALUES ( ?, ?, ?, ? );', rows )
+        
+        self._db.execute( 'COMMIT;' )
+        
+        self._pending_hashes_to_rows = {}
+        self._time_first_pending = None
+        
+    
+    def _GetMMap( self, segment: int, needed_size: int ):
+        
+        if segment in self._segments_to_mmaps:
+            
+            segment_mmap = self._segments_to_mmaps[ segment ]
+            
+            if len( segment_mmap ) >= needed_size:
+                
+                return segment_mmap
+                
+            
+            # the segment has grown since we mapped it
+            segment_mmap.close()
+            
+            del self._segments_to_mmaps[ segment ]
+            
+        
+        path = os.path.join( self._directory, GetSegmentFilename( segment ) )
+        
+        if not os.path.exists( path ) or os.path.getsize( path ) < needed_size:
+            
+            raise HydrusExceptions.FileMissingException( 'The thumbnail pack segment "{}" is missing or truncated!'.format( path ) )
+            
+        
+        with open( path, 'rb' ) as f:
+            
+            segment_mmap = mmap.mmap( f.fileno(), 0, access = mmap.ACCESS_READ )
+            
+        
+        self._segments_to_mmaps[ segment ] = segment_mmap
+        
+        return segment_mmap
+        
+    
+    def _GetRow( self, hash: bytes ):
+        
+        if hash in self._pending_hashes_to_rows:
+            
+            # not fsynced yet, but it has to be out of our write buffer before we can map it
+            self._current_segment_file.flush()
+            
+            return self._pending_hashes_to_rows[ hash ]
+            
+        
+        return self._db.execute( 'SELECT segment, offset, length FROM thumbnails WHERE hash = ?;', ( sqlite3.Binary( hash ), ) ).fetchone()
+        
+    
+    def _ReadThumbnailBytes( self, segment: int, offset: int, length: int ) -> bytes:
+        
+        segment_mmap = self._GetMMap( segment, offset + length )
+        
+        return segment_mmap[ offset : offset + length ]
+        
+    
+    def AddThumbnail( self, hash: bytes, thumbnail_bytes: bytes ):
+        
+        with self._lock:
+            
+            self._AppendThumbnails( [ ( hash, thumbnail_bytes ) ] )
+            
+            if len( self._pending_hashes_to_rows ) >= self.MAX_PENDING_ROWS or HydrusData.TimeHasPassed( self._time_first_pending + self.MAX_PENDING_PERIOD ):
+                
+                self._FlushPending()
+                
+            
+        
+    
+    def AddThumbnails( self, hashes_and_thumbnail_bytes: typing.Collection[ typing.Tuple[ bytes, bytes ] ] ):
+        
+        if len( hashes_and_thumbnail_bytes ) == 0:
+            
+            return
+            
+        
+        with self._lock:
+            
+            self._AppendThumbnails( hashes_and_thumbnail_bytes )
+            
+            self._FlushPending()
+            
+        
+    
+    def Backup( self, dest_directory: str ):
+        
+        # the segments are append-only and the index only ever points at fsynced bytes, so under the lock we can take a consistent copy while the client runs
+        
+        with self._lock:
+            
+            self._FlushPending()
+            
+            HydrusPaths.MakeSureDirectoryExists( dest_directory )
+            
+            for filename in os.listdir( self._directory ):
+                
+                if filename.endswith( '.pack' ):
+                    
+                    HydrusPaths.MirrorFile( os.path.join( self._directory, filename ), os.path.join( dest_directory, filename ) )
+                    
+                
+            
+            dest_index_path = os.path.join( dest_directory, INDEX_FILENAME )
+            
+            # a stale wal next to the destination index would be replayed over our fresh copy
+            for path in ( dest_index_path, dest_index_path + '-wal', dest_index_path + '-shm' ):
+                
+                if os.path.exists( path ):
+                    
+                    HydrusPaths.DeletePath( path )
+                    
+                
+            
+            dest_db = sqlite3.connect( dest_index_path )
+            
+            try:
+                
+                self._db.backup( dest_db )
+                
+            finally:
+                
+                dest_db.close()
+                
+            
+        
+    
+    def Close( self ):
+        
+        with self._lock:
+            
+            self._FlushPending()
+            
+            for segment_mmap in self._segments_to_mmaps.values():
+                
+                segment_mmap.close()
+                
+            
+            self._segments_to_mmaps = {}
+            
+            if self._current_segment_file is not None:
+                
+                self._current_segment_file.close()
+                
+                self._current_segment_file = None
+                
+            
+            self._db.close()
+            
+        
+    
+    def DeleteThumbnail( self, hash: bytes ) -> bool:
+        
+        with self._lock:
+            
+            was_pending = self._pending_hashes_to_rows.pop( hash, None ) is not None
+            
+            cursor = self._db.execute( 'DELETE FROM thumbnails WHERE hash = ?;', ( sqlite3.Binary( hash ), ) )
+            
+            return was_pending or cursor.rowcount > 0
+            
+        
+    
+    def DeleteThumbnails( self, hashes: typing.Collection[ bytes ] ):
+        
+        with self._lock:
+            
+            self._FlushPending()
+            
+            self._db.execute( 'BEGIN IMMEDIATE;' )
+            
+            self._db.executemany( 'DELETE FROM thumbnails WHERE hash = ?;', ( ( sqlite3.Binary( hash ), ) for hash in hashes ) )
+            
+            self._db.execute( 'COMMIT;' )
+            
+        
+    
+    def Flush( self ):
+        
+        with self._lock:
+            
+            self._FlushPending()
+            
+        
+    
+    def GetHashes( self ) -> typing.List[ bytes ]:
+        
+        with self._lock:
+            
+            self._FlushPending()
+            
+            return [ bytes( hash ) for ( hash, ) in self._db.execute( 'SELECT hash FROM thumbnails;' ) ]
+            
+        
+    
+    def GetManyThumbnailBytes( self, hashes: typing.Collection[ bytes ] ) -> typing.Dict[ bytes, bytes ]:
+        
+        hashes_to_thumbnail_bytes = {}
+        
+        with self._lock:
+            
+            rows = []
+            
+            for hash in hashes:
+                
+                result = self._GetRow( hash )
+                
+                if result is not None:
+                    
+                    rows.append( ( result, hash ) )
+                    
+                
+            
+            # read in disk order, so a cold page of thumbs is a few sweeps over the segments rather than a random walk
+            rows.sort()
+            
+            for ( ( segment, offset, length ), hash ) in rows:
+                
+                hashes_to_thumbnail_bytes[ hash ] = self._ReadThumbnailBytes( segment, offset, length )
+                
+            
+        
+        return hashes_to_thumbnail_bytes
+        
+    
+    def GetNumThumbnails( self ) -> int:
+        
+        with self._lock:
+            
+            self._FlushPending()
+            
+            ( num_thumbnails, ) = self._db.execute( 'SELECT COUNT( * ) FROM thumbnails;' ).fetchone()
+            
+            return num_thumbnails
+            
+        
+    
+    def GetThumbnailBytes( self, hash: bytes ) -> typing.Optional[ bytes ]:
+        
+        with self._lock:
+            
+            result = self._GetRow( hash )
+            
+            if result is None:
+                
+                return None
+                
+            
+            ( segment, offset, length ) = result
+            
+            return self._ReadThumbnailBytes( segment, offset, length )
+            
+        
+    
+    def HasThumbnail( self, hash: bytes ) -> bool:
+        
+        with self._lock:
+            
+            return self._GetRow( hash ) is not None
+            
+        
+    
+
+def PackedThumbnailStoreExists( directory: str ):
+    
+    return os.path.exists( os.path.join( directory, INDEX_FILENAME ) )
+    
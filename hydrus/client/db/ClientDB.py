@@ -4,6 +4,7 @@ import itertools
 import os
 import random
 import sqlite3
+import sys
 import time
 import traceback
 import typing
@@ -17,6 +18,7 @@ from hydrus.core import HydrusDB
 from hydrus.core import HydrusDBBase
 from hydrus.core import HydrusExceptions
 from hydrus.core import HydrusGlobals as HG
+from hydrus.core import HydrusIntegerSets
 from hydrus.core import HydrusPaths
 from hydrus.core import HydrusSerialisable
 from hydrus.core import HydrusTags
@@ -54,6 +56,7 @@ from hydrus.client.db import ClientDBMappingsCountsUpdate
 from hydrus.client.db import ClientDBMappingsStorage
 from hydrus.client.db import ClientDBMaster
 from hydrus.client.db import ClientDBNotesMap
+from hydrus.client.db import ClientDBParallelReads
 from hydrus.client.db import ClientDBRepositories
 from hydrus.client.db import ClientDBSerialisable
 from hydrus.client.db import ClientDBServicePaths
@@ -225,6 +228,68 @@ class JobDatabaseClient( HydrusData.JobDatabase ):
 class DB( HydrusDB.HydrusDB ):
     
     READ_WRITE_ACTIONS = [ 'service_info', 'system_predicates', 'missing_thumbnail_hashes' ]
+    PARALLEL_READ_ACTIONS = ClientDBParallelReads.PARALLEL_READ_ACTIONS
+    BACKGROUND_ACTIONS = {
+        'analyze',
+        'file_maintenance_clear_jobs',
+        'file_maintenance_get_job',
+        'maintain_hashed_serialisables',
+        'maintain_similar_files_search_for_potential_duplicates',
+        'maintain_similar_files_tree',
+        'process_repository_content',
+        'process_repository_definitions',
+        'repository_update_hashes_to_process',
+        'sync_tag_display_maintenance',
+        'sync_tag_display_maintenance_bulk',
+        'vacuum'
+    }
+    COALESCABLE_WRITE_ACTIONS = {
+        'content_updates',
+        'file_maintenance_add_jobs',
+        'file_maintenance_add_jobs_hashes',
+        'file_maintenance_clear_jobs'
+    }
+    FILE_SEARCH_PLAN_PROBE_LIMIT = 100000
+    TAG_DISPLAY_BULK_SYNC_MAX_ROWS_PER_JOB = 256
+    TAG_DISPLAY_BULK_SYNC_MAX_WEIGHT_PER_JOB = 100000
+    # these writes cannot change what a file search returns. content updates, imports and file maintenance patch the search cache themselves, and anything else clears it
+    FILE_SEARCH_CACHE_SAFE_WRITE_ACTIONS = {
+        'analyze',
+        'backup',
+        'content_updates',
+        'delete_imageboard',
+        'delete_local_booru_share',
+        'delete_serialisable_named',
+        'delete_service_info',
+        'file_maintenance_add_jobs',
+        'file_maintenance_add_jobs_hashes',
+        'file_maintenance_cancel_jobs',
+        'file_maintenance_clear_jobs',
+        'ideal_client_files_locations',
+        'import_file',
+        'local_booru_share',
+        'maintain_hashed_serialisables',
+        'maintain_similar_files_search_for_potential_duplicates',
+        'maintain_similar_files_tree',
+        'push_recent_tags',
+        'register_shutdown_work',
+        'save_options',
+        'serialisable',
+        'serialisable_atomic',
+        'serialisable_simple',
+        'serialisables_overwrite',
+        'set_password',
+        'vacuum'
+    }
+    FILE_SEARCH_CACHE_PATCHABLE_CONTENT_TYPES = {
+        HC.CONTENT_TYPE_FILES,
+        HC.CONTENT_TYPE_FILE_VIEWING_STATS,
+        HC.CONTENT_TYPE_MAPPINGS,
+        HC.CONTENT_TYPE_NOTES,
+        HC.CONTENT_TYPE_RATINGS,
+        HC.CONTENT_TYPE_TIMESTAMP,
+        HC.CONTENT_TYPE_URLS
+    }
     
     def __init__( self, controller, db_dir, db_name ):
         
@@ -238,6 +303,8 @@ class DB( HydrusDB.HydrusDB ):
         self._regen_tags_managers_hash_ids = set()
         self._regen_tags_managers_tag_ids = set()
         
+        self._file_search_results_cache = ClientDBFilesSearch.FileSearchResultsCache()
+        
         HydrusDB.HydrusDB.__init__( self, controller, db_dir, db_name )
         
     
@@ -366,6 +433,8 @@ class DB( HydrusDB.HydrusDB ):
         
         self._AddServiceCreateMappingsTables( service_id, service_type )
         
+        self._ResetParallelReaders()
+        
     
     def _AddServiceCreateFilesTables( self, service_id, service_type ):
         
@@ -481,6 +550,15 @@ class DB( HydrusDB.HydrusDB ):
                 
                 HydrusPaths.MirrorTree( client_files_default, os.path.join( path, 'client_files' ), text_update_hook = text_update_hook, is_cancelled_hook = is_cancelled_hook )
                 
+                if not job_key.IsCancelled():
+                    
+                    # packed thumbnails live under client_files, so a restore brings them back with everything else
+                    
+                    job_key.SetVariable( 'popup_text_1', 'copying thumbnail packs' )
+                    
+                    self._controller.client_files_manager.BackupThumbnailPacks( client_files_default, os.path.join( path, 'client_files' ) )
+                    
+                
             
         finally:
             
@@ -492,6 +570,72 @@ class DB( HydrusDB.HydrusDB ):
             
         
     
+    def _CacheTagDisplayApplyImplicationChanges( self, tag_service_id, possibly_affected_tag_ids, previous_chain_tag_ids_to_implied_by, after_chain_tag_ids_to_implied_by ):
+        
+        all_tag_ids_altered = set()
+        
+        tag_ids_to_delete_implied_by = collections.defaultdict( set )
+        tag_ids_to_add_implied_by = collections.defaultdict( set )
+        
+        for tag_id in possibly_affected_tag_ids:
+            
+            previous_implied_by = previous_chain_tag_ids_to_implied_by[ tag_id ]
+            after_implied_by = after_chain_tag_ids_to_implied_by[ tag_id ]
+            
+            to_delete = previous_implied_by.difference( after_implied_by )
+            to_add = after_implied_by.difference( previous_implied_by )
+            
+            if len( to_delete ) > 0:
+                
+                tag_ids_to_delete_implied_by[ tag_id ] = to_delete
+                
+                all_tag_ids_altered.add( tag_id )
+                all_tag_ids_altered.update( to_delete )
+                
+            
+            if len( to_add ) > 0:
+                
+                tag_ids_to_add_implied_by[ tag_id ] = to_add
+                
+                all_tag_ids_altered.add( tag_id )
+                all_tag_ids_altered.update( to_add )
+                
+            
+        
+        # now do the implications
+        
+        # if I am feeling very clever, I could potentially add tag_ids_to_migrate_implied_by, which would be an UPDATE
+        # this would only work for tag_ids that have the same current implied by in actual and ideal (e.g. moving a tag sibling from A->B to B->A)
+        # may be better to do this in a merged add/deleteimplication function that would be able to well detect this with 'same current implied' of count > 0 for that domain
+        
+        file_service_ids = self.modules_services.GetServiceIds( HC.FILE_SERVICES_WITH_SPECIFIC_MAPPING_CACHES )
+        
+        for file_service_id in file_service_ids:
+            
+            for ( tag_id, implication_tag_ids ) in tag_ids_to_delete_implied_by.items():
+                
+                self.modules_mappings_cache_specific_display.DeleteImplications( file_service_id, tag_service_id, implication_tag_ids, tag_id )
+                
+            
+            for ( tag_id, implication_tag_ids ) in tag_ids_to_add_implied_by.items():
+                
+                self.modules_mappings_cache_specific_display.AddImplications( file_service_id, tag_service_id, implication_tag_ids, tag_id )
+                
+            
+        
+        for ( tag_id, implication_tag_ids ) in tag_ids_to_delete_implied_by.items():
+            
+            self.modules_mappings_cache_combined_files_display.DeleteImplications( tag_service_id, implication_tag_ids, tag_id )
+            
+        
+        for ( tag_id, implication_tag_ids ) in tag_ids_to_add_implied_by.items():
+            
+            self.modules_mappings_cache_combined_files_display.AddImplications( tag_service_id, implication_tag_ids, tag_id )
+            
+        
+        return all_tag_ids_altered
+        
+    
     def _CacheTagDisplayForceFullSyncTagsOnSpecifics( self, tag_service_id, file_service_ids ):
         
         # this assumes the caches are empty. it is a 'quick' force repopulation for emergency fill-in maintenance
@@ -881,66 +1025,221 @@ class DB( HydrusDB.HydrusDB ):
             
             #
             
-            tag_ids_to_delete_implied_by = collections.defaultdict( set )
-            tag_ids_to_add_implied_by = collections.defaultdict( set )
+            all_tag_ids_altered.update( self._CacheTagDisplayApplyImplicationChanges( tag_service_id, possibly_affected_tag_ids, previous_chain_tag_ids_to_implied_by, after_chain_tag_ids_to_implied_by ) )
             
-            for tag_id in possibly_affected_tag_ids:
+            ( sibling_rows_to_add, sibling_rows_to_remove, parent_rows_to_add, parent_rows_to_remove, num_actual_rows, num_ideal_rows ) = self.modules_tag_display.GetApplicationStatus( tag_service_id )
+            
+            if self._InteractiveJobsWaiting():
                 
-                previous_implied_by = previous_chain_tag_ids_to_implied_by[ tag_id ]
-                after_implied_by = after_chain_tag_ids_to_implied_by[ tag_id ]
+                break
                 
-                to_delete = previous_implied_by.difference( after_implied_by )
-                to_add = after_implied_by.difference( previous_implied_by )
+            
+        
+        if len( all_tag_ids_altered ) > 0:
+            
+            self._regen_tags_managers_tag_ids.update( all_tag_ids_altered )
+            
+            self._CacheTagsSyncTags( tag_service_id, all_tag_ids_altered )
+            
+            self._cursor_transaction_wrapper.pub_after_job( 'notify_new_tag_display_sync_status', service_key )
+            
+        
+        still_needs_work = len( sibling_rows_to_add ) + len( sibling_rows_to_remove ) + len( parent_rows_to_add ) + len( parent_rows_to_remove ) > 0
+        
+        return still_needs_work
+        
+    
+    def _CacheTagDisplaySyncBulk( self, service_key: bytes, work_time = 30, maintenance_mode = HC.MAINTENANCE_FORCED ):
+        
+        # the normal sync above does one carefully weighted row at a time so no single job ever lags the client
+        # that is great for responsiveness but hopeless for a big PTR sibling import, so this is for idle time and 'work hard now!'
+        # we get the whole actual->ideal diff once, group the rows into the chains they touch, and then migrate a whole chain's rows in one go
+        # rows in separate chains cannot interfere, and rows in the same chain are applied together, so actual is always valid between jobs
+        # a chain like 'azur lane' can touch millions of mappings, so we weigh the rows the same way the normal sync does and split big chains into blocks we can stop between
+        
+        time_started = HydrusData.GetNowFloat()
+        
+        tag_service_id = self.modules_services.GetServiceId( service_key )
+        
+        ( cache_ideal_tag_siblings_lookup_table_name, cache_actual_tag_siblings_lookup_table_name ) = ClientDBTagSiblings.GenerateTagSiblingsLookupCacheTableNames( tag_service_id )
+        ( cache_ideal_tag_parents_lookup_table_name, cache_actual_tag_parents_lookup_table_name ) = ClientDBTagParents.GenerateTagParentsLookupCacheTableNames( tag_service_id )
+        
+        ( sibling_rows_to_add, sibling_rows_to_remove, parent_rows_to_add, parent_rows_to_remove, num_actual_rows, num_ideal_rows ) = self.modules_tag_display.GetApplicationStatus( tag_service_id )
+        
+        jobs = []
+        
+        jobs.extend( ( ( HC.CONTENT_TYPE_TAG_SIBLINGS, HC.CONTENT_UPDATE_DELETE, row ) for row in sibling_rows_to_remove ) )
+        jobs.extend( ( ( HC.CONTENT_TYPE_TAG_PARENTS, HC.CONTENT_UPDATE_DELETE, row ) for row in parent_rows_to_remove ) )
+        jobs.extend( ( ( HC.CONTENT_TYPE_TAG_SIBLINGS, HC.CONTENT_UPDATE_ADD, row ) for row in sibling_rows_to_add ) )
+        jobs.extend( ( ( HC.CONTENT_TYPE_TAG_PARENTS, HC.CONTENT_UPDATE_ADD, row ) for row in parent_rows_to_add ) )
+        
+        # group the rows into chains with a quick union-find on their tags
+        
+        tag_ids_to_chain_roots = {}
+        
+        def GetChainRoot( tag_id ):
+            
+            root = tag_id
+            
+            while tag_ids_to_chain_roots.setdefault( root, root ) != root:
+                
+                root = tag_ids_to_chain_roots[ root ]
+                
+            
+            tag_ids_to_chain_roots[ tag_id ] = root
+            
+            return root
+            
+        
+        for ( content_type, action, ( a, b ) ) in jobs:
+            
+            tag_ids_to_chain_roots[ GetChainRoot( a ) ] = GetChainRoot( b )
+            
+        
+        chain_roots_to_jobs = collections.defaultdict( list )
+        
+        # removes stay in front of adds within a chain, so a big chain that we have to split still never has A->B and A->C in actual at once
+        
+        for job in jobs:
+            
+            ( content_type, action, ( a, b ) ) = job
+            
+            chain_roots_to_jobs[ GetChainRoot( a ) ].append( job )
+            
+        
+        def GetJobWeights( chain_jobs ):
+            
+            # these are the same estimates as the normal sync's weighted rows
+            # sibling A->B: A * count( all the B->X implications ). parent A->B: sum( all the X->A implications )
+            
+            sibling_ideal_tag_ids = { b for ( content_type, action, ( a, b ) ) in chain_jobs if content_type == HC.CONTENT_TYPE_TAG_SIBLINGS }
+            parent_child_tag_ids = { a for ( content_type, action, ( a, b ) ) in chain_jobs if content_type == HC.CONTENT_TYPE_TAG_PARENTS }
+            
+            ideal_tag_ids_to_implies = self.modules_tag_display.GetTagsToImplies( ClientTags.TAG_DISPLAY_ACTUAL, tag_service_id, sibling_ideal_tag_ids )
+            child_tag_ids_to_implied_by = self.modules_tag_display.GetTagsToImpliedBy( ClientTags.TAG_DISPLAY_ACTUAL, tag_service_id, parent_child_tag_ids )
+            
+            countable_tag_ids = { a for ( content_type, action, ( a, b ) ) in chain_jobs if content_type == HC.CONTENT_TYPE_TAG_SIBLINGS }
+            countable_tag_ids.update( parent_child_tag_ids )
+            countable_tag_ids.update( itertools.chain.from_iterable( child_tag_ids_to_implied_by.values() ) )
+            
+            tag_ids_to_count = self.modules_mappings_counts.GetCountsEstimate( ClientTags.TAG_DISPLAY_STORAGE, tag_service_id, self.modules_services.combined_file_service_id, countable_tag_ids, True, True )
+            
+            job_weights = []
+            
+            for ( content_type, action, ( a, b ) ) in chain_jobs:
                 
-                if len( to_delete ) > 0:
+                if content_type == HC.CONTENT_TYPE_TAG_SIBLINGS:
                     
-                    tag_ids_to_delete_implied_by[ tag_id ] = to_delete
+                    weight = tag_ids_to_count[ a ] * len( ideal_tag_ids_to_implies[ b ] ) + 1
                     
-                    all_tag_ids_altered.add( tag_id )
-                    all_tag_ids_altered.update( to_delete )
+                else:
+                    
+                    weight = sum( ( tag_ids_to_count[ implied_by ] for implied_by in child_tag_ids_to_implied_by[ a ] ) ) + 1
                     
                 
-                if len( to_add ) > 0:
+                job_weights.append( weight )
+                
+            
+            return job_weights
+            
+        
+        def SplitChainIntoBlocks( chain_jobs ):
+            
+            # order is preserved, so removes still go before adds. a single job heavier than the limit gets a block to itself
+            
+            block_of_jobs = []
+            block_weight = 0
+            
+            for ( job, weight ) in zip( chain_jobs, GetJobWeights( chain_jobs ) ):
+                
+                if len( block_of_jobs ) > 0 and ( len( block_of_jobs ) >= self.TAG_DISPLAY_BULK_SYNC_MAX_ROWS_PER_JOB or block_weight + weight > self.TAG_DISPLAY_BULK_SYNC_MAX_WEIGHT_PER_JOB ):
                     
-                    tag_ids_to_add_implied_by[ tag_id ] = to_add
+                    yield block_of_jobs
                     
-                    all_tag_ids_altered.add( tag_id )
-                    all_tag_ids_altered.update( to_add )
+                    block_of_jobs = []
+                    block_weight = 0
                     
                 
+                block_of_jobs.append( job )
+                block_weight += weight
+                
             
-            # now do the implications
-            
-            # if I am feeling very clever, I could potentially add tag_ids_to_migrate_implied_by, which would be an UPDATE
-            # this would only work for tag_ids that have the same current implied by in actual and ideal (e.g. moving a tag sibling from A->B to B->A)
-            # may be better to do this in a merged add/deleteimplication function that would be able to well detect this with 'same current implied' of count > 0 for that domain
+            if len( block_of_jobs ) > 0:
+                
+                yield block_of_jobs
+                
             
-            file_service_ids = self.modules_services.GetServiceIds( HC.FILE_SERVICES_WITH_SPECIFIC_MAPPING_CACHES )
+        
+        all_tag_ids_altered = set()
+        
+        num_rows_synced = 0
+        
+        time_to_stop = False
+        
+        for chain_jobs in chain_roots_to_jobs.values():
             
-            for file_service_id in file_service_ids:
+            for block_of_jobs in SplitChainIntoBlocks( chain_jobs ):
+                
+                row_tag_ids = set( itertools.chain.from_iterable( ( row for ( content_type, action, row ) in block_of_jobs ) ) )
+                
+                possibly_affected_tag_ids = set( row_tag_ids )
+                
+                possibly_affected_tag_ids.update( itertools.chain.from_iterable( self.modules_tag_display.GetTagsToImpliedBy( ClientTags.TAG_DISPLAY_ACTUAL, tag_service_id, row_tag_ids ).values() ) )
+                possibly_affected_tag_ids.update( itertools.chain.from_iterable( self.modules_tag_display.GetTagsToImplies( ClientTags.TAG_DISPLAY_ACTUAL, tag_service_id, row_tag_ids ).values() ) )
+                
+                previous_chain_tag_ids_to_implied_by = self.modules_tag_display.GetTagsToImpliedBy( ClientTags.TAG_DISPLAY_ACTUAL, tag_service_id, possibly_affected_tag_ids )
                 
-                for ( tag_id, implication_tag_ids ) in tag_ids_to_delete_implied_by.items():
+                rows = collections.defaultdict( list )
+                
+                for ( content_type, action, row ) in block_of_jobs:
                     
-                    self.modules_mappings_cache_specific_display.DeleteImplications( file_service_id, tag_service_id, implication_tag_ids, tag_id )
+                    rows[ ( content_type, action ) ].append( row )
                     
                 
-                for ( tag_id, implication_tag_ids ) in tag_ids_to_add_implied_by.items():
+                self._ExecuteMany( 'DELETE FROM {} WHERE bad_tag_id = ? AND ideal_tag_id = ?;'.format( cache_actual_tag_siblings_lookup_table_name ), rows[ ( HC.CONTENT_TYPE_TAG_SIBLINGS, HC.CONTENT_UPDATE_DELETE ) ] )
+                self._ExecuteMany( 'DELETE FROM {} WHERE child_tag_id = ? AND ancestor_tag_id = ?;'.format( cache_actual_tag_parents_lookup_table_name ), rows[ ( HC.CONTENT_TYPE_TAG_PARENTS, HC.CONTENT_UPDATE_DELETE ) ] )
+                self._ExecuteMany( 'INSERT OR IGNORE INTO {} ( bad_tag_id, ideal_tag_id ) VALUES ( ?, ? );'.format( cache_actual_tag_siblings_lookup_table_name ), rows[ ( HC.CONTENT_TYPE_TAG_SIBLINGS, HC.CONTENT_UPDATE_ADD ) ] )
+                self._ExecuteMany( 'INSERT OR IGNORE INTO {} ( child_tag_id, ancestor_tag_id ) VALUES ( ?, ? );'.format( cache_actual_tag_parents_lookup_table_name ), rows[ ( HC.CONTENT_TYPE_TAG_PARENTS, HC.CONTENT_UPDATE_ADD ) ] )
+                
+                for row in rows[ ( HC.CONTENT_TYPE_TAG_SIBLINGS, HC.CONTENT_UPDATE_DELETE ) ]:
                     
-                    self.modules_mappings_cache_specific_display.AddImplications( file_service_id, tag_service_id, implication_tag_ids, tag_id )
+                    self.modules_tag_siblings.NotifySiblingDeleteRowSynced( tag_service_id, row )
                     
                 
-            
-            for ( tag_id, implication_tag_ids ) in tag_ids_to_delete_implied_by.items():
+                for row in rows[ ( HC.CONTENT_TYPE_TAG_PARENTS, HC.CONTENT_UPDATE_DELETE ) ]:
+                    
+                    self.modules_tag_parents.NotifyParentDeleteRowSynced( tag_service_id, row )
+                    
                 
-                self.modules_mappings_cache_combined_files_display.DeleteImplications( tag_service_id, implication_tag_ids, tag_id )
+                for row in rows[ ( HC.CONTENT_TYPE_TAG_SIBLINGS, HC.CONTENT_UPDATE_ADD ) ]:
+                    
+                    self.modules_tag_siblings.NotifySiblingAddRowSynced( tag_service_id, row )
+                    
+                
+                for row in rows[ ( HC.CONTENT_TYPE_TAG_PARENTS, HC.CONTENT_UPDATE_ADD ) ]:
+                    
+                    self.modules_tag_parents.NotifyParentAddRowSynced( tag_service_id, row )
+                    
                 
-            
-            for ( tag_id, implication_tag_ids ) in tag_ids_to_add_implied_by.items():
                 
-                self.modules_mappings_cache_combined_files_display.AddImplications( tag_service_id, implication_tag_ids, tag_id )
+                after_chain_tag_ids_to_implied_by = self.modules_tag_display.GetTagsToImpliedBy( ClientTags.TAG_DISPLAY_ACTUAL, tag_service_id, possibly_affected_tag_ids )
+                
+                all_tag_ids_altered.update( self._CacheTagDisplayApplyImplicationChanges( tag_service_id, possibly_affected_tag_ids, previous_chain_tag_ids_to_implied_by, after_chain_tag_ids_to_implied_by ) )
+                
+                num_rows_synced += len( block_of_jobs )
+                
+                if HydrusData.TimeHasPassedFloat( time_started + work_time ) or self._controller.ShouldStopThisWork( maintenance_mode ) or self._InteractiveJobsWaiting():
+                    
+                    time_to_stop = True
+                    
+                    break
+                    
                 
             
-            ( sibling_rows_to_add, sibling_rows_to_remove, parent_rows_to_add, parent_rows_to_remove, num_actual_rows, num_ideal_rows ) = self.modules_tag_display.GetApplicationStatus( tag_service_id )
+            if time_to_stop:
+                
+                break
+                
             
         
         if len( all_tag_ids_altered ) > 0:
@@ -952,9 +1251,9 @@ class DB( HydrusDB.HydrusDB ):
             self._cursor_transaction_wrapper.pub_after_job( 'notify_new_tag_display_sync_status', service_key )
             
         
-        still_needs_work = len( sibling_rows_to_add ) + len( sibling_rows_to_remove ) + len( parent_rows_to_add ) + len( parent_rows_to_remove ) > 0
+        still_needs_work = num_rows_synced < len( jobs )
         
-        return still_needs_work
+        return ( still_needs_work, num_rows_synced )
         
     
     def _CacheTagsPopulate( self, file_service_id, tag_service_id, status_hook = None ):
@@ -1664,6 +1963,8 @@ class DB( HydrusDB.HydrusDB ):
         
         self.modules_services.DeleteService( service_id )
         
+        self._ResetParallelReaders()
+        
         service_update = HydrusData.ServiceUpdate( HC.SERVICE_UPDATE_RESET )
         
         service_keys_to_service_updates = { service_key : [ service_update ] }
@@ -1778,6 +2079,40 @@ class DB( HydrusDB.HydrusDB ):
         self._cursor_transaction_wrapper.pub_after_job( 'notify_new_pending' )
         
     
+    def _DirtyFileSearchResultsCache( self, service_keys_to_content_updates ):
+        
+        if self._file_search_results_cache.IsEmpty():
+            
+            return
+            
+        
+        hashes = set()
+        
+        for content_updates in service_keys_to_content_updates.values():
+            
+            for content_update in content_updates:
+                
+                ( data_type, action, row ) = content_update.ToTuple()
+                
+                content_update_hashes = content_update.GetHashes()
+                
+                # siblings, parents, advanced mass edits and so on change more than we can see here
+                if data_type not in self.FILE_SEARCH_CACHE_PATCHABLE_CONTENT_TYPES or action == HC.CONTENT_UPDATE_ADVANCED or len( content_update_hashes ) == 0:
+                    
+                    self._file_search_results_cache.Clear()
+                    
+                    return
+                    
+                
+                hashes.update( content_update_hashes )
+                
+            
+        
+        hash_ids = self.modules_hashes_local_cache.GetHashIds( hashes )
+        
+        self._file_search_results_cache.DirtyHashIds( hash_ids )
+        
+    
     def _DisplayCatastrophicError( self, text ):
         
         message = 'The db encountered a serious error! This is going to be written to the log as well, but here it is for a screenshot:'
@@ -1831,6 +2166,13 @@ class DB( HydrusDB.HydrusDB ):
         HydrusDB.HydrusDB._DoAfterJobWork( self )
         
     
+    def _DoAfterRollbackWork( self ):
+        
+        self.modules_similar_files.NotifyRollback()
+        
+        HydrusDB.HydrusDB._DoAfterRollbackWork( self )
+        
+    
     def _DuplicatesGetRandomPotentialDuplicateHashes( self, file_search_context: ClientSearch.FileSearchContext, both_files_match, pixel_dupes_preference, max_hamming_distance ):
         
         db_location_context = self.modules_files_storage.GetDBLocationContext( file_search_context.GetLocationContext() )
@@ -2366,6 +2708,11 @@ class DB( HydrusDB.HydrusDB ):
         return JobDatabaseClient( job_type, synchronous, action, *args, **kwargs )
         
     
+    def _GenerateParallelReader( self, cursor: sqlite3.Cursor ):
+        
+        return ClientDBParallelReads.ClientDBParallelReader( cursor )
+        
+    
     def _GetBonedStats( self ):
         
         boned_stats = {}
@@ -2545,6 +2892,83 @@ class DB( HydrusDB.HydrusDB ):
         return file_info_managers
         
     
+    def _GetFileSearchPlan( self, file_search_context: ClientSearch.FileSearchContext, location_context: ClientLocation.LocationContext, tag_context: ClientSearch.TagContext, tags_to_include, namespaces_to_include, wildcards_to_include, is_inbox: bool, files_info_predicates: typing.List[ str ] ):
+        
+        # a search is a chain of intersections, and every step after the first can be constrained to what we have so far
+        # so we want the smallest step first. tags have cached counts and we know the inbox size, so those are easy
+        # namespaces and wildcards have no cheap count, so they go after, in their old order
+        # the file info preds are probed with a capped COUNT over all files, which only has to tell us if they beat the best of the rest
+        
+        search_plan = []
+        
+        if is_inbox:
+            
+            search_plan.append( ( 'inbox', None, len( self.modules_files_inbox.inbox_hash_ids ) ) )
+            
+        
+        # this old heuristic is now just the tiebreak
+        def sort_longest_tag_first_key( s ):
+            
+            return ( 1 if HydrusTags.IsUnnamespaced( s ) else 0, -len( s ) )
+            
+        
+        for tag in sorted( tags_to_include, key = sort_longest_tag_first_key ):
+            
+            estimate = self.modules_files_search.GetTagCountEstimate( ClientTags.TAG_DISPLAY_ACTUAL, location_context, tag_context, tag )
+            
+            search_plan.append( ( 'tag', tag, estimate ) )
+            
+        
+        for namespace in sorted( namespaces_to_include, key = lambda n: -len( n ) ):
+            
+            search_plan.append( ( 'namespace', namespace, None ) )
+            
+        
+        for wildcard in sorted( wildcards_to_include, key = lambda w: -len( w ) ):
+            
+            search_plan.append( ( 'wildcard', wildcard, None ) )
+            
+        
+        # with no file domain to join against, the file info preds are done later, in the old way
+        if len( files_info_predicates ) > 0 and not location_context.IsAllKnownFiles():
+            
+            estimate = None
+            
+            known_estimates = [ step_estimate for ( step_type, step_value, step_estimate ) in search_plan if step_estimate is not None ]
+            
+            if len( known_estimates ) > 0:
+                
+                probe_limit = min( min( known_estimates ), self.FILE_SEARCH_PLAN_PROBE_LIMIT )
+                
+                if probe_limit > 0:
+                    
+                    ( count, ) = self._Execute( 'SELECT COUNT( * ) FROM ( SELECT 1 FROM files_info WHERE {} LIMIT {} );'.format( ' AND '.join( files_info_predicates ), probe_limit ) ).fetchone()
+                    
+                    if count < probe_limit:
+                        
+                        estimate = count
+                        
+                    
+                
+            
+            search_plan.append( ( 'files_info', ' AND '.join( files_info_predicates ), estimate ) )
+            
+        
+        # unknowns last, and a stable sort keeps ties in the order above
+        search_plan.sort( key = lambda step: ( step[2] is None, step[2] if step[2] is not None else 0 ) )
+        
+        if HG.query_planner_mode:
+            
+            query = 'file search plan: {}'.format( ', '.join( sorted( predicate.ToString( with_count = False ) for predicate in file_search_context.GetPredicates() ) ) )
+            
+            plan_lines = [ '{} {}: {}'.format( step_type, '' if step_value is None else '"{}"'.format( step_value ), 'unknown' if estimate is None else '~{}'.format( HydrusData.ToHumanInt( estimate ) ) ) for ( step_type, step_value, estimate ) in search_plan ]
+            
+            HG.controller.PrintQueryPlan( query, plan_lines )
+            
+        
+        return search_plan
+        
+    
     def _GetFileSystemPredicates( self, file_search_context: ClientSearch.FileSearchContext, force_system_everything = False ):
         
         location_context = file_search_context.GetLocationContext()
@@ -2828,7 +3252,9 @@ class DB( HydrusDB.HydrusDB ):
         seen_tag_ids = { tag_id for ( hash_id, ( tag_service_id, status, tag_id ) ) in storage_tag_data }
         seen_tag_ids.update( ( tag_id for ( hash_id, ( tag_service_id, status, tag_id ) ) in display_tag_data ) )
         
-        tag_ids_to_tags = self.modules_tags_local_cache.GetTagIdsToTags( tag_ids = seen_tag_ids )
+        # sqlite gives us a fresh string every time, so a popular tag would otherwise be held once per batch of files. interning shares one copy across every tags manager
+        
+        tag_ids_to_tags = { tag_id : sys.intern( tag ) for ( tag_id, tag ) in self.modules_tags_local_cache.GetTagIdsToTags( tag_ids = seen_tag_ids ).items() }
         
         service_ids_to_service_keys = self.modules_services.GetServiceIdsToServiceKeys()
         
@@ -2916,7 +3342,7 @@ class DB( HydrusDB.HydrusDB ):
         return ( storage_tag_data, display_tag_data )
         
     
-    def _GetHashIdsFromQuery( self, file_search_context: ClientSearch.FileSearchContext, job_key = None, query_hash_ids: typing.Optional[ set ] = None, apply_implicit_limit = True, sort_by = None, limit_sort_by = None ):
+    def _GetHashIdsFromQuery( self, file_search_context: ClientSearch.FileSearchContext, job_key = None, query_hash_ids: typing.Optional[ set ] = None, apply_implicit_limit = True, sort_by = None, limit_sort_by = None, explain = False ):
         
         if job_key is None:
             
@@ -2925,7 +3351,14 @@ class DB( HydrusDB.HydrusDB ):
         
         if query_hash_ids is not None:
             
-            query_hash_ids = set( query_hash_ids )
+            if isinstance( query_hash_ids, HydrusIntegerSets.SortedIntegerSet ):
+                
+                query_hash_ids = query_hash_ids.copy()
+                
+            else:
+                
+                query_hash_ids = set( query_hash_ids )
+                
             
         
         have_cross_referenced_file_locations = False
@@ -2937,6 +3370,42 @@ class DB( HydrusDB.HydrusDB ):
         location_context = file_search_context.GetLocationContext()
         tag_context = file_search_context.GetTagContext()
         
+        file_search_results_cache_key = None
+        
+        if query_hash_ids is None and not explain and ClientDBFilesSearch.FileSearchContextIsCacheable( file_search_context ):
+            
+            file_search_results_cache_key = ClientDBFilesSearch.GetFileSearchContextCacheKey( file_search_context )
+            
+            cached_result = self._file_search_results_cache.GetResult( file_search_results_cache_key )
+            
+            if cached_result is not None:
+                
+                ( result_hash_ids, dirty_hash_ids ) = cached_result
+                
+                if len( dirty_hash_ids ) > 0:
+                    
+                    # we only need to re-check the files that changed since we last ran this. the limit is applied afterwards, so it must not apply here
+                    recheck_search_context = file_search_context.Duplicate()
+                    
+                    recheck_search_context.SetPredicates( [ predicate for predicate in file_search_context.GetPredicates() if predicate.GetType() != ClientSearch.PREDICATE_TYPE_SYSTEM_LIMIT ] )
+                    
+                    still_matching_hash_ids = self._GetHashIdsFromQuery( recheck_search_context, job_key = job_key, query_hash_ids = dirty_hash_ids, apply_implicit_limit = False )
+                    
+                    if job_key.IsCancelled():
+                        
+                        return set()
+                        
+                    
+                    result_hash_ids.difference_update( dirty_hash_ids )
+                    result_hash_ids.update( still_matching_hash_ids )
+                    
+                    dirty_hash_ids.clear()
+                    
+                
+                return self._LimitAndSortQueryHashIds( location_context, system_predicates, result_hash_ids, apply_implicit_limit, sort_by, limit_sort_by )
+                
+            
+        
         tag_service_key = tag_context.service_key
         
         include_current_tags = tag_context.include_current_tags
@@ -3257,35 +3726,79 @@ class DB( HydrusDB.HydrusDB ):
         
         there_are_simple_files_info_preds_to_search_for = len( files_info_predicates ) > 0
         
+        is_inbox = system_predicates.MustBeInbox()
+        
+        # the inbox, tags and simple file info preds all narrow the domain, so we do the smallest first and constrain the rest to it
+        search_plan = self._GetFileSearchPlan( file_search_context, location_context, tag_context, tags_to_include, namespaces_to_include, wildcards_to_include, is_inbox, files_info_predicates )
+        
+        if explain:
+            
+            return search_plan
+            
+        
         # start with some quick ways to populate query_hash_ids
         
-        def intersection_update_qhi( query_hash_ids, some_hash_ids, force_create_new_set = False ) -> set:
+        def intersection_update_qhi( query_hash_ids, some_hash_ids, force_create_new_set = False ) -> typing.Union[ set, HydrusIntegerSets.SortedIntegerSet ]:
+            
+            # big domains (all my files, inbox, a broad tag) are held as compact sorted arrays, which are cheap to intersect and far smaller than a set
+            # once the search narrows below the threshold, we drop back to a normal set for everything else
             
             if query_hash_ids is None:
                 
-                if not isinstance( some_hash_ids, set ) or force_create_new_set:
+                if isinstance( some_hash_ids, HydrusIntegerSets.SortedIntegerSet ):
+                    
+                    if force_create_new_set:
+                        
+                        some_hash_ids = some_hash_ids.copy()
+                        
+                    
+                elif isinstance( some_hash_ids, set ) and HydrusIntegerSets.IsCompactableSize( some_hash_ids ):
+                    
+                    some_hash_ids = HydrusIntegerSets.SortedIntegerSet( some_hash_ids )
+                    
+                elif not isinstance( some_hash_ids, set ) or force_create_new_set:
                     
                     some_hash_ids = set( some_hash_ids )
                     
                 
-                return some_hash_ids
+                query_hash_ids = some_hash_ids
+                
+            elif isinstance( some_hash_ids, HydrusIntegerSets.SortedIntegerSet ) and not isinstance( query_hash_ids, HydrusIntegerSets.SortedIntegerSet ):
+                
+                # don't walk the big one in python
+                query_hash_ids = some_hash_ids.intersection( query_hash_ids )
                 
             else:
                 
                 query_hash_ids.intersection_update( some_hash_ids )
                 
-                return query_hash_ids
+            
+            if isinstance( query_hash_ids, HydrusIntegerSets.SortedIntegerSet ) and not HydrusIntegerSets.IsCompactableSize( query_hash_ids ):
+                
+                query_hash_ids = set( query_hash_ids )
                 
             
+            return query_hash_ids
+            
         
         #
         
         def do_or_preds( or_predicates, query_hash_ids ) -> set:
             
-            # better typically to sort by fewest num of preds first, establishing query_hash_ids for longer chains
+            # do the smallest OR first, establishing query_hash_ids for the rest. an OR of plain tags can be estimated from the tag counts
+            # anything else is a guess, so they go after, fewest num of preds first
             def or_sort_key( p ):
                 
-                return len( p.GetValue() )
+                subpredicates = p.GetValue()
+                
+                if not all( ( subpredicate.GetType() == ClientSearch.PREDICATE_TYPE_TAG and subpredicate.IsInclusive() for subpredicate in subpredicates ) ):
+                    
+                    return ( 1, 0, len( subpredicates ) )
+                    
+                
+                estimate = sum( ( self.modules_files_search.GetTagCountEstimate( ClientTags.TAG_DISPLAY_ACTUAL, location_context, tag_context, subpredicate.GetValue() ) for subpredicate in subpredicates ) )
+                
+                return ( 0, estimate, len( subpredicates ) )
                 
             
             or_predicates = sorted( or_predicates, key = or_sort_key )
@@ -3531,13 +4044,6 @@ class DB( HydrusDB.HydrusDB ):
                 
             
         
-        is_inbox = system_predicates.MustBeInbox()
-        
-        if is_inbox:
-            
-            query_hash_ids = intersection_update_qhi( query_hash_ids, self.modules_files_inbox.inbox_hash_ids, force_create_new_set = True )
-            
-        
         for ( operator, num_relationships, dupe_type ) in system_predicates.GetDuplicateRelationshipCountPredicates():
             
             only_do_zero = ( operator in ( '=', CC.UNICODE_ALMOST_EQUAL_TO ) and num_relationships == 0 ) or ( operator == '<' and num_relationships == 1 )
@@ -3582,20 +4088,77 @@ class DB( HydrusDB.HydrusDB ):
                 
             
         
-        # first tags
+        # now the planned searches
         
-        if there_are_tags_to_search:
+        done_files_info_predicates = False
+        
+        def do_files_info_domain_search( query_hash_ids ):
             
-            def sort_longest_tag_first_key( s ):
+            if len( files_info_predicates ) == 0:
+                
+                predicates = [ '1=1' ]
+                include_files_info = False
+                
+            else:
                 
-                return ( 1 if HydrusTags.IsUnnamespaced( s ) else 0, -len( s ) )
+                predicates = files_info_predicates
+                include_files_info = True
                 
             
-            tags_to_include = list( tags_to_include )
+            file_info_query_hash_ids = set()
             
-            tags_to_include.sort( key = sort_longest_tag_first_key )
+            for files_table_name in db_location_context.GetMultipleFilesTableNames():
+                
+                if include_files_info:
+                    
+                    # if a file is missing a files_info row, we can't search it with a file system pred. it is just unknown
+                    files_table_name = '{} NATURAL JOIN files_info'.format( files_table_name )
+                    
+                
+                if query_hash_ids is None:
+                    
+                    # this is often the whole domain, so pull it straight into a compact set
+                    loop_query_hash_ids = self._STSIS( self._Execute( 'SELECT hash_id FROM {} WHERE {};'.format( files_table_name, ' AND '.join( predicates ) ) ) )
+                    
+                else:
+                    
+                    if is_inbox and len( query_hash_ids ) == len( self.modules_files_inbox.inbox_hash_ids ):
+                        
+                        loop_query_hash_ids = self._STS( self._Execute( 'SELECT hash_id FROM {} NATURAL JOIN {} WHERE {};'.format( 'file_inbox', files_table_name, ' AND '.join( predicates ) ) ) )
+                        
+                    else:
+                        
+                        with self._MakeTemporaryIntegerTable( query_hash_ids, 'hash_id' ) as temp_table_name:
+                            
+                            self._AnalyzeTempTable( temp_table_name )
+                            
+                            loop_query_hash_ids = self._STS( self._Execute( 'SELECT hash_id FROM {} NATURAL JOIN {} WHERE {};'.format( temp_table_name, files_table_name, ' AND '.join( predicates ) ) ) )
+                            
+                        
+                    
+                
+                if len( file_info_query_hash_ids ) == 0:
+                    
+                    file_info_query_hash_ids = loop_query_hash_ids
+                    
+                else:
+                    
+                    file_info_query_hash_ids.update( loop_query_hash_ids )
+                    
+                
+            
+            return intersection_update_qhi( query_hash_ids, file_info_query_hash_ids )
             
-            for tag in tags_to_include:
+        
+        for ( step_type, step_value, estimate ) in search_plan:
+            
+            if step_type == 'inbox':
+                
+                query_hash_ids = intersection_update_qhi( query_hash_ids, self.modules_files_inbox.inbox_hash_ids, force_create_new_set = True )
+                
+            elif step_type == 'tag':
+                
+                tag = step_value
                 
                 if query_hash_ids is None:
                     
@@ -3617,17 +4180,9 @@ class DB( HydrusDB.HydrusDB ):
                 
                 have_cross_referenced_file_locations = True
                 
-                if len( query_hash_ids ) == 0:
-                    
-                    return query_hash_ids
-                    
+            elif step_type == 'namespace':
                 
-            
-            namespaces_to_include = list( namespaces_to_include )
-            
-            namespaces_to_include.sort( key = lambda n: -len( n ) )
-            
-            for namespace in namespaces_to_include:
+                namespace = step_value
                 
                 if query_hash_ids is None or ( is_inbox and len( query_hash_ids ) == len( self.modules_files_inbox.inbox_hash_ids ) ):
                     
@@ -3647,17 +4202,9 @@ class DB( HydrusDB.HydrusDB ):
                 
                 have_cross_referenced_file_locations = True
                 
-                if len( query_hash_ids ) == 0:
-                    
-                    return query_hash_ids
-                    
+            elif step_type == 'wildcard':
                 
-            
-            wildcards_to_include = list( wildcards_to_include )
-            
-            wildcards_to_include.sort( key = lambda w: -len( w ) )
-            
-            for wildcard in wildcards_to_include:
+                wildcard = step_value
                 
                 if query_hash_ids is None:
                     
@@ -3677,10 +4224,22 @@ class DB( HydrusDB.HydrusDB ):
                 
                 have_cross_referenced_file_locations = True
                 
-                if len( query_hash_ids ) == 0:
-                    
-                    return query_hash_ids
-                    
+            elif step_type == 'files_info':
+                
+                query_hash_ids = do_files_info_domain_search( query_hash_ids )
+                
+                have_cross_referenced_file_locations = True
+                done_files_info_predicates = True
+                
+            
+            if len( query_hash_ids ) == 0:
+                
+                return set()
+                
+            
+            if job_key.IsCancelled():
+                
+                return set()
                 
             
         
@@ -3698,8 +4257,6 @@ class DB( HydrusDB.HydrusDB ):
         
         # now the simple preds and desperate last shot to populate query_hash_ids
         
-        done_files_info_predicates = False
-        
         we_need_some_results = query_hash_ids is None
         we_need_to_cross_reference = not_all_known_files and not have_cross_referenced_file_locations
         
@@ -3711,58 +4268,7 @@ class DB( HydrusDB.HydrusDB ):
                 
             else:
                 
-                if len( files_info_predicates ) == 0:
-                    
-                    files_info_predicates.insert( 0, '1=1' )
-                    include_files_info = False
-                    
-                else:
-                    
-                    include_files_info = True
-                    
-                
-                file_info_query_hash_ids = set()
-                
-                for files_table_name in db_location_context.GetMultipleFilesTableNames():
-                    
-                    if include_files_info:
-                        
-                        # if a file is missing a files_info row, we can't search it with a file system pred. it is just unknown
-                        files_table_name = '{} NATURAL JOIN files_info'.format( files_table_name )
-                        
-                    
-                    if query_hash_ids is None:
-                        
-                        loop_query_hash_ids = self._STS( self._Execute( 'SELECT hash_id FROM {} WHERE {};'.format( files_table_name, ' AND '.join( files_info_predicates ) ) ) )
-                        
-                    else:
-                        
-                        if is_inbox and len( query_hash_ids ) == len( self.modules_files_inbox.inbox_hash_ids ):
-                            
-                            loop_query_hash_ids = self._STS( self._Execute( 'SELECT hash_id FROM {} NATURAL JOIN {} WHERE {};'.format( 'file_inbox', files_table_name, ' AND '.join( files_info_predicates ) ) ) )
-                            
-                        else:
-                            
-                            with self._MakeTemporaryIntegerTable( query_hash_ids, 'hash_id' ) as temp_table_name:
-                                
-                                self._AnalyzeTempTable( temp_table_name )
-                                
-                                loop_query_hash_ids = self._STS( self._Execute( 'SELECT hash_id FROM {} NATURAL JOIN {} WHERE {};'.format( temp_table_name, files_table_name, ' AND '.join( files_info_predicates ) ) ) )
-                                
-                            
-                        
-                    
-                    if len( file_info_query_hash_ids ) == 0:
-                        
-                        file_info_query_hash_ids = loop_query_hash_ids
-                        
-                    else:
-                        
-                        file_info_query_hash_ids.update( loop_query_hash_ids )
-                        
-                    
-                
-                query_hash_ids = intersection_update_qhi( query_hash_ids, file_info_query_hash_ids )
+                query_hash_ids = do_files_info_domain_search( query_hash_ids )
                 
                 have_cross_referenced_file_locations = True
                 done_files_info_predicates = True
@@ -3921,7 +4427,7 @@ class DB( HydrusDB.HydrusDB ):
                     
                     if len( query_hash_ids ) == 0:
                         
-                        return query_hash_ids
+                        return set()
                         
                     
                     self._ExecuteMany( 'DELETE FROM {} WHERE hash_id = ?;'.format( temp_table_name ), ( ( hash_id, ) for hash_id in unwanted_hash_ids ) )
@@ -3935,7 +4441,7 @@ class DB( HydrusDB.HydrusDB ):
                     
                     if len( query_hash_ids ) == 0:
                         
-                        return query_hash_ids
+                        return set()
                         
                     
                     self._ExecuteMany( 'DELETE FROM {} WHERE hash_id = ?;'.format( temp_table_name ), ( ( hash_id, ) for hash_id in unwanted_hash_ids ) )
@@ -3949,7 +4455,7 @@ class DB( HydrusDB.HydrusDB ):
                     
                     if len( query_hash_ids ) == 0:
                         
-                        return query_hash_ids
+                        return set()
                         
                     
                     self._ExecuteMany( 'DELETE FROM {} WHERE hash_id = ?;'.format( temp_table_name ), ( ( hash_id, ) for hash_id in unwanted_hash_ids ) )
@@ -4303,48 +4809,19 @@ class DB( HydrusDB.HydrusDB ):
             query_hash_ids = intersection_update_qhi( query_hash_ids, good_hash_ids )
             
         
-        if job_key.IsCancelled():
-            
-            return set()
-            
-        
-        #
-        
-        query_hash_ids = list( query_hash_ids )
-        
-        #
-        
-        limit = system_predicates.GetLimit( apply_implicit_limit = apply_implicit_limit )
-        
-        we_are_applying_limit = limit is not None and limit < len( query_hash_ids )
-        
-        if we_are_applying_limit and limit_sort_by is not None and sort_by is None:
-            
-            sort_by = limit_sort_by
-            
-        
-        did_sort = False
-        
-        if sort_by is not None and not location_context.IsAllKnownFiles():
+        if job_key.IsCancelled():
             
-            ( did_sort, query_hash_ids ) = self._TryToSortHashIds( location_context, query_hash_ids, sort_by )
+            return set()
             
         
         #
         
-        if we_are_applying_limit:
+        if file_search_results_cache_key is not None and not job_key.IsCancelled():
             
-            if not did_sort:
-                
-                query_hash_ids = random.sample( query_hash_ids, limit )
-                
-            else:
-                
-                query_hash_ids = query_hash_ids[:limit]
-                
+            self._file_search_results_cache.SetResult( file_search_results_cache_key, query_hash_ids )
             
         
-        return query_hash_ids
+        return self._LimitAndSortQueryHashIds( location_context, system_predicates, query_hash_ids, apply_implicit_limit, sort_by, limit_sort_by )
         
     
     def _GetMaintenanceDue( self, stop_time ):
@@ -4370,10 +4847,20 @@ class DB( HydrusDB.HydrusDB ):
         return jobs_to_do
         
     
-    def _GetMediaResults( self, hash_ids: typing.Iterable[ int ], sorted = False ):
+    def _GetMediaResults( self, hash_ids: typing.Iterable[ int ], sorted = False, lazy = False ):
         
         ( cached_media_results, missing_hash_ids ) = self._weakref_media_result_cache.GetMediaResultsAndMissing( hash_ids )
         
+        if not lazy:
+            
+            unloaded_media_results = [ media_result for media_result in cached_media_results if not media_result.IsLoaded() ]
+            
+            if len( unloaded_media_results ) > 0:
+                
+                self._LoadMediaResultsLazyManagers( unloaded_media_results )
+                
+            
+        
         if len( missing_hash_ids ) > 0:
             
             # get first detailed results
@@ -4397,14 +4884,6 @@ class DB( HydrusDB.HydrusDB ):
                 
                 hash_ids_to_service_ids_and_filenames = self.modules_service_paths.GetHashIdsToServiceIdsAndFilenames( temp_table_name )
                 
-                hash_ids_to_local_ratings = HydrusData.BuildKeyToListDict( ( ( hash_id, ( service_id, rating ) ) for ( service_id, hash_id, rating ) in self._Execute( 'SELECT service_id, hash_id, rating FROM {} CROSS JOIN local_ratings USING ( hash_id );'.format( temp_table_name ) ) ) )
-                
-                hash_ids_to_names_and_notes = self.modules_notes_map.GetHashIdsToNamesAndNotes( temp_table_name )
-                
-                hash_ids_to_file_viewing_stats = HydrusData.BuildKeyToListDict( ( ( hash_id, ( canvas_type, last_viewed_timestamp, views, viewtime ) ) for ( hash_id, canvas_type, last_viewed_timestamp, views, viewtime ) in self._Execute( 'SELECT hash_id, canvas_type, last_viewed_timestamp, views, viewtime FROM {} CROSS JOIN file_viewing_stats USING ( hash_id );'.format( temp_table_name ) ) ) )
-                
-                hash_ids_to_file_viewing_stats_managers = { hash_id : ClientMediaManagers.FileViewingStatsManager( file_viewing_stats ) for ( hash_id, file_viewing_stats ) in hash_ids_to_file_viewing_stats.items() }
-                
                 hash_ids_to_file_modified_timestamps = dict( self._Execute( 'SELECT hash_id, file_modified_timestamp FROM {} CROSS JOIN file_modified_timestamps USING ( hash_id );'.format( temp_table_name ) ) )
                 
                 hash_ids_to_domain_modified_timestamps = HydrusData.BuildKeyToListDict( ( ( hash_id, ( domain, timestamp ) ) for ( hash_id, domain, timestamp ) in self._Execute( 'SELECT hash_id, domain, file_modified_timestamp FROM {} CROSS JOIN file_domain_modified_timestamps USING ( hash_id ) CROSS JOIN url_domains USING ( domain_id );'.format( temp_table_name ) ) ) )
@@ -4413,14 +4892,23 @@ class DB( HydrusDB.HydrusDB ):
                 
                 hash_ids_to_local_file_deletion_reasons = self.modules_files_storage.GetHashIdsToFileDeletionReasons( temp_table_name )
                 
-                hash_ids_to_current_file_service_ids = { hash_id : [ file_service_id for ( file_service_id, timestamp ) in file_service_ids_and_timestamps ] for ( hash_id, file_service_ids_and_timestamps ) in hash_ids_to_current_file_service_ids_and_timestamps.items() }
-                
-                hash_ids_to_tags_managers = self._GetForceRefreshTagsManagersWithTableHashIds( missing_hash_ids, temp_table_name, hash_ids_to_current_file_service_ids = hash_ids_to_current_file_service_ids )
-                
                 has_exif_hash_ids = self.modules_files_metadata_basic.GetHasEXIFHashIds( temp_table_name )
                 has_human_readable_embedded_metadata_hash_ids = self.modules_files_metadata_basic.GetHasHumanReadableEmbeddedMetadataHashIds( temp_table_name )
                 has_icc_profile_hash_ids = self.modules_files_metadata_basic.GetHasICCProfileHashIds( temp_table_name )
                 
+                if lazy:
+                    
+                    # tags, ratings, notes and viewing stats are the expensive part, so they wait until something asks for them
+                    
+                    hash_ids_to_lazy_managers = {}
+                    
+                else:
+                    
+                    hash_ids_to_current_file_service_ids = { hash_id : [ file_service_id for ( file_service_id, timestamp ) in file_service_ids_and_timestamps ] for ( hash_id, file_service_ids_and_timestamps ) in hash_ids_to_current_file_service_ids_and_timestamps.items() }
+                    
+                    hash_ids_to_lazy_managers = self._GetMediaResultsLazyManagersWithTableHashIds( missing_hash_ids, temp_table_name, hash_ids_to_current_file_service_ids = hash_ids_to_current_file_service_ids )
+                    
+                
             
             # build it
             
@@ -4428,11 +4916,9 @@ class DB( HydrusDB.HydrusDB ):
             
             missing_media_results = []
             
-            for hash_id in missing_hash_ids:
-                
-                tags_manager = hash_ids_to_tags_managers[ hash_id ]
-                
-                #
+            lazy_loader = None
+            
+            for ( i, hash_id ) in enumerate( missing_hash_ids ):
                 
                 current_file_service_keys_to_timestamps = { service_ids_to_service_keys[ service_id ] : timestamp for ( service_id, timestamp ) in hash_ids_to_current_file_service_ids_and_timestamps[ hash_id ] }
                 
@@ -4493,52 +4979,40 @@ class DB( HydrusDB.HydrusDB ):
                 
                 #
                 
-                local_ratings = { service_ids_to_service_keys[ service_id ] : rating for ( service_id, rating ) in hash_ids_to_local_ratings[ hash_id ] }
-                
-                ratings_manager = ClientMediaManagers.RatingsManager( local_ratings )
-                
-                #
-                
-                if hash_id in hash_ids_to_names_and_notes:
+                if hash_id in hash_ids_to_info:
                     
-                    names_to_notes = dict( hash_ids_to_names_and_notes[ hash_id ] )
+                    file_info_manager = hash_ids_to_info[ hash_id ]
                     
                 else:
                     
-                    names_to_notes = dict()
+                    hash = missing_hash_ids_to_hashes[ hash_id ]
+                    
+                    file_info_manager = ClientMediaManagers.FileInfoManager( hash_id, hash )
                     
                 
-                notes_manager = ClientMediaManagers.NotesManager( names_to_notes )
+                file_info_manager.has_exif = hash_id in has_exif_hash_ids
+                file_info_manager.has_human_readable_embedded_metadata = hash_id in has_human_readable_embedded_metadata_hash_ids
+                file_info_manager.has_icc_profile = hash_id in has_icc_profile_hash_ids
                 
                 #
                 
-                if hash_id in hash_ids_to_file_viewing_stats_managers:
-                    
-                    file_viewing_stats_manager = hash_ids_to_file_viewing_stats_managers[ hash_id ]
+                if lazy:
                     
-                else:
-                    
-                    file_viewing_stats_manager = ClientMediaManagers.FileViewingStatsManager.STATICGenerateEmptyManager()
-                    
-                
-                #
-                
-                if hash_id in hash_ids_to_info:
+                    if i % ClientMediaResult.LAZY_LOAD_BATCH_SIZE == 0:
+                        
+                        lazy_loader = ClientMediaResult.MediaResultLazyLoader()
+                        
                     
-                    file_info_manager = hash_ids_to_info[ hash_id ]
+                    media_result = ClientMediaResult.MediaResult( file_info_manager, None, locations_manager, None, None, None, lazy_loader = lazy_loader )
                     
                 else:
                     
-                    hash = missing_hash_ids_to_hashes[ hash_id ]
+                    ( tags_manager, ratings_manager, notes_manager, file_viewing_stats_manager ) = hash_ids_to_lazy_managers[ hash_id ]
                     
-                    file_info_manager = ClientMediaManagers.FileInfoManager( hash_id, hash )
+                    media_result = ClientMediaResult.MediaResult( file_info_manager, tags_manager, locations_manager, ratings_manager, notes_manager, file_viewing_stats_manager )
                     
                 
-                file_info_manager.has_exif = hash_id in has_exif_hash_ids
-                file_info_manager.has_human_readable_embedded_metadata = hash_id in has_human_readable_embedded_metadata_hash_ids
-                file_info_manager.has_icc_profile = hash_id in has_icc_profile_hash_ids
-                
-                missing_media_results.append( ClientMediaResult.MediaResult( file_info_manager, tags_manager, locations_manager, ratings_manager, notes_manager, file_viewing_stats_manager ) )
+                missing_media_results.append( media_result )
                 
             
             self._weakref_media_result_cache.AddMediaResults( missing_media_results )
@@ -4565,11 +5039,11 @@ class DB( HydrusDB.HydrusDB ):
         return media_results[0]
         
     
-    def _GetMediaResultsFromHashes( self, hashes: typing.Collection[ bytes ], sorted: bool = False ) -> typing.List[ ClientMediaResult.MediaResult ]:
+    def _GetMediaResultsFromHashes( self, hashes: typing.Collection[ bytes ], sorted: bool = False, lazy: bool = False ) -> typing.List[ ClientMediaResult.MediaResult ]:
         
         query_hash_ids = set( self.modules_hashes_local_cache.GetHashIds( hashes ) )
         
-        media_results = self._GetMediaResults( query_hash_ids )
+        media_results = self._GetMediaResults( query_hash_ids, lazy = lazy )
         
         if sorted:
             
@@ -4586,6 +5060,54 @@ class DB( HydrusDB.HydrusDB ):
         return media_results
         
     
+    def _GetMediaResultsLazyManagersWithTableHashIds( self, hash_ids, hash_ids_table_name, hash_ids_to_current_file_service_ids = None ):
+        
+        hash_ids_to_tags_managers = self._GetForceRefreshTagsManagersWithTableHashIds( hash_ids, hash_ids_table_name, hash_ids_to_current_file_service_ids = hash_ids_to_current_file_service_ids )
+        
+        hash_ids_to_local_ratings = HydrusData.BuildKeyToListDict( ( ( hash_id, ( service_id, rating ) ) for ( service_id, hash_id, rating ) in self._Execute( 'SELECT service_id, hash_id, rating FROM {} CROSS JOIN local_ratings USING ( hash_id );'.format( hash_ids_table_name ) ) ) )
+        
+        hash_ids_to_names_and_notes = self.modules_notes_map.GetHashIdsToNamesAndNotes( hash_ids_table_name )
+        
+        hash_ids_to_file_viewing_stats = HydrusData.BuildKeyToListDict( ( ( hash_id, ( canvas_type, last_viewed_timestamp, views, viewtime ) ) for ( hash_id, canvas_type, last_viewed_timestamp, views, viewtime ) in self._Execute( 'SELECT hash_id, canvas_type, last_viewed_timestamp, views, viewtime FROM {} CROSS JOIN file_viewing_stats USING ( hash_id );'.format( hash_ids_table_name ) ) ) )
+        
+        service_ids_to_service_keys = self.modules_services.GetServiceIdsToServiceKeys()
+        
+        hash_ids_to_lazy_managers = {}
+        
+        for hash_id in hash_ids:
+            
+            tags_manager = hash_ids_to_tags_managers[ hash_id ]
+            
+            local_ratings = { service_ids_to_service_keys[ service_id ] : rating for ( service_id, rating ) in hash_ids_to_local_ratings[ hash_id ] }
+            
+            ratings_manager = ClientMediaManagers.RatingsManager( local_ratings )
+            
+            if hash_id in hash_ids_to_names_and_notes:
+                
+                names_to_notes = dict( hash_ids_to_names_and_notes[ hash_id ] )
+                
+            else:
+                
+                names_to_notes = dict()
+                
+            
+            notes_manager = ClientMediaManagers.NotesManager( names_to_notes )
+            
+            if hash_id in hash_ids_to_file_viewing_stats:
+                
+                file_viewing_stats_manager = ClientMediaManagers.FileViewingStatsManager( hash_ids_to_file_viewing_stats[ hash_id ] )
+                
+            else:
+                
+                file_viewing_stats_manager = ClientMediaManagers.FileViewingStatsManager.STATICGenerateEmptyManager()
+                
+            
+            hash_ids_to_lazy_managers[ hash_id ] = ( tags_manager, ratings_manager, notes_manager, file_viewing_stats_manager )
+            
+        
+        return hash_ids_to_lazy_managers
+        
+    
     def _GetNumsPending( self ):
         
         services = self.modules_services.GetServices( ( HC.TAG_REPOSITORY, HC.FILE_REPOSITORY, HC.IPFS ) )
@@ -5355,6 +5877,8 @@ class DB( HydrusDB.HydrusDB ):
         
         hash_id = self.modules_hashes_local_cache.GetHashId( hash )
         
+        self._file_search_results_cache.DirtyHashIds( ( hash_id, ) )
+        
         file_import_status = self.modules_files_metadata_rich.GetHashIdStatus( hash_id, prefix = 'file recognised by database' )
         
         if not file_import_status.AlreadyInDB():
@@ -5576,6 +6100,69 @@ class DB( HydrusDB.HydrusDB ):
             
         
     
+    def _LimitAndSortQueryHashIds( self, location_context: ClientLocation.LocationContext, system_predicates: ClientSearch.FileSystemPredicates, query_hash_ids, apply_implicit_limit, sort_by, limit_sort_by ):
+        
+        query_hash_ids = list( query_hash_ids )
+        
+        #
+        
+        limit = system_predicates.GetLimit( apply_implicit_limit = apply_implicit_limit )
+        
+        we_are_applying_limit = limit is not None and limit < len( query_hash_ids )
+        
+        if we_are_applying_limit and limit_sort_by is not None and sort_by is None:
+            
+            sort_by = limit_sort_by
+            
+        
+        did_sort = False
+        
+        if sort_by is not None and not location_context.IsAllKnownFiles():
+            
+            ( did_sort, query_hash_ids ) = self._TryToSortHashIds( location_context, query_hash_ids, sort_by )
+            
+        
+        #
+        
+        if we_are_applying_limit:
+            
+            if not did_sort:
+                
+                query_hash_ids = random.sample( query_hash_ids, limit )
+                
+            else:
+                
+                query_hash_ids = query_hash_ids[:limit]
+                
+            
+        
+        return query_hash_ids
+        
+    
+    def _LoadMediaResultsLazyManagers( self, media_results: typing.Collection[ ClientMediaResult.MediaResult ] ):
+        
+        # we set these here in the db thread, rather than returning them, so no content update can be processed between the read and the set
+        
+        hash_ids_to_media_results = { media_result.GetHashId() : media_result for media_result in media_results if not media_result.IsLoaded() }
+        
+        if len( hash_ids_to_media_results ) == 0:
+            
+            return
+            
+        
+        hash_ids = list( hash_ids_to_media_results.keys() )
+        
+        with self._MakeTemporaryIntegerTable( hash_ids, 'hash_id' ) as temp_table_name:
+            
+            hash_ids_to_lazy_managers = self._GetMediaResultsLazyManagersWithTableHashIds( hash_ids, temp_table_name )
+            
+        
+        for ( hash_id, media_result ) in hash_ids_to_media_results.items():
+            
+            media_result.SetLazyManagers( *hash_ids_to_lazy_managers[ hash_id ] )
+            
+        
+    
     def _LoadModules( self ):
         
         self.modules_db_maintenance = ClientDBMaintenance.ClientDBMaintenance( self._c, self._db_dir, self._db_filenames )
@@ -5745,7 +6332,7 @@ class DB( HydrusDB.HydrusDB ):
         
         #
         
-        self.modules_files_maintenance = ClientDBFilesMaintenance.ClientDBFilesMaintenance( self._c, self.modules_files_maintenance_queue, self.modules_hashes, self.modules_hashes_local_cache, self.modules_files_metadata_basic, self.modules_similar_files, self.modules_repositories, self._weakref_media_result_cache )
+        self.modules_files_maintenance = ClientDBFilesMaintenance.ClientDBFilesMaintenance( self._c, self.modules_files_maintenance_queue, self.modules_hashes, self.modules_hashes_local_cache, self.modules_files_metadata_basic, self.modules_similar_files, self.modules_repositories, self._weakref_media_result_cache, self._file_search_results_cache )
         
         self._modules.append( self.modules_files_maintenance )
         
@@ -6050,7 +6637,35 @@ class DB( HydrusDB.HydrusDB ):
         num_done = 0
         still_work_to_do = True
         
-        group_of_hash_ids = self._STL( self._Execute( 'SELECT hash_id FROM shape_search_cache WHERE searched_distance IS NULL or searched_distance < ?;', ( search_distance, ) ).fetchmany( 10 ) )
+        # with the in-memory index, we can search a whole group of files in one vectorised pass
+        batch_mode = HG.client_controller.new_options.GetBoolean( 'similar_files_search_uses_in_memory_index' )
+        
+        # a batch scans the whole index for every file in it, so under a time limit we size each batch from how fast the last one went
+        seconds_per_file = None
+        
+        def GetGroupSize():
+            
+            if not batch_mode:
+                
+                return 10
+                
+            
+            if work_time_float is None:
+                
+                return 256
+                
+            
+            if seconds_per_file is None:
+                
+                return 16
+                
+            
+            time_left = ( time_started_float + work_time_float ) - HydrusData.GetNowFloat()
+            
+            return max( 1, min( 256, int( time_left / seconds_per_file ) ) )
+            
+        
+        group_of_hash_ids = self._STL( self._Execute( 'SELECT hash_id FROM shape_search_cache WHERE searched_distance IS NULL or searched_distance < ?;', ( search_distance, ) ).fetchmany( GetGroupSize() ) )
         
         while len( group_of_hash_ids ) > 0:
         
@@ -6058,7 +6673,16 @@ class DB( HydrusDB.HydrusDB ):
             
             HG.client_controller.frame_splash_status.SetSubtext( text )
             
-            for ( i, hash_id ) in enumerate( group_of_hash_ids ):
+            if batch_mode:
+                
+                work_groups = [ group_of_hash_ids ]
+                
+            else:
+                
+                work_groups = [ [ hash_id ] for hash_id in group_of_hash_ids ]
+                
+            
+            for work_group in work_groups:
                 
                 if work_time_float is not None and HydrusData.TimeHasPassedFloat( time_started_float + work_time_float ):
                     
@@ -6082,18 +6706,35 @@ class DB( HydrusDB.HydrusDB ):
                     return ( still_work_to_do, num_done )
                     
                 
-                media_id = self.modules_files_duplicates.DuplicatesGetMediaId( hash_id )
+                work_group_time_started_precise = HydrusData.GetNowPrecise()
+                
+                if batch_mode:
+                    
+                    hash_ids_to_similar_hash_ids_and_distances = self.modules_similar_files.SearchMany( work_group, search_distance )
+                    
+                else:
+                    
+                    hash_ids_to_similar_hash_ids_and_distances = { hash_id : self.modules_similar_files.Search( hash_id, search_distance ) for hash_id in work_group }
+                    
                 
-                potential_duplicate_media_ids_and_distances = [ ( self.modules_files_duplicates.DuplicatesGetMediaId( duplicate_hash_id ), distance ) for ( duplicate_hash_id, distance ) in self.modules_similar_files.Search( hash_id, search_distance ) if duplicate_hash_id != hash_id ]
+                for ( hash_id, similar_hash_ids_and_distances ) in hash_ids_to_similar_hash_ids_and_distances.items():
+                    
+                    media_id = self.modules_files_duplicates.DuplicatesGetMediaId( hash_id )
+                    
+                    potential_duplicate_media_ids_and_distances = [ ( self.modules_files_duplicates.DuplicatesGetMediaId( duplicate_hash_id ), distance ) for ( duplicate_hash_id, distance ) in similar_hash_ids_and_distances if duplicate_hash_id != hash_id ]
+                    
+                    self.modules_files_duplicates.DuplicatesAddPotentialDuplicates( media_id, potential_duplicate_media_ids_and_distances )
+                    
                 
-                self.modules_files_duplicates.DuplicatesAddPotentialDuplicates( media_id, potential_duplicate_media_ids_and_distances )
+                self._ExecuteMany( 'UPDATE shape_search_cache SET searched_distance = ? WHERE hash_id = ?;', ( ( search_distance, hash_id ) for hash_id in work_group ) )
                 
-                self._Execute( 'UPDATE shape_search_cache SET searched_distance = ? WHERE hash_id = ?;', ( search_distance, hash_id ) )
+                num_done += len( work_group )
                 
-                num_done += 1
+                # a quick batch can finish inside the clock resolution, so never let this hit zero
+                seconds_per_file = max( ( HydrusData.GetNowPrecise() - work_group_time_started_precise ) / len( work_group ), 0.000001 )
                 
             
-            group_of_hash_ids = self._STL( self._Execute( 'SELECT hash_id FROM shape_search_cache WHERE searched_distance IS NULL or searched_distance < ?;', ( search_distance, ) ).fetchmany( 10 ) )
+            group_of_hash_ids = self._STL( self._Execute( 'SELECT hash_id FROM shape_search_cache WHERE searched_distance IS NULL or searched_distance < ?;', ( search_distance, ) ).fetchmany( GetGroupSize() ) )
             
         
         still_work_to_do = False
@@ -6103,6 +6744,8 @@ class DB( HydrusDB.HydrusDB ):
     
     def _ProcessContentUpdates( self, service_keys_to_content_updates, publish_content_updates = True ):
         
+        self._DirtyFileSearchResultsCache( service_keys_to_content_updates )
+        
         notify_new_downloads = False
         notify_new_pending = False
         notify_new_parents = False
@@ -6882,7 +7525,7 @@ class DB( HydrusDB.HydrusDB ):
                     
                     num_rows_processed += len( files_rows )
                     
-                    if HydrusData.TimeHasPassedPrecise( precise_time_to_stop ) or job_key.IsCancelled():
+                    if HydrusData.TimeHasPassedPrecise( precise_time_to_stop ) or job_key.IsCancelled() or self._InteractiveJobsWaiting():
                         
                         return num_rows_processed
                         
@@ -6907,7 +7550,7 @@ class DB( HydrusDB.HydrusDB ):
                     
                     num_rows_processed += len( hash_ids )
                     
-                    if HydrusData.TimeHasPassedPrecise( precise_time_to_stop ) or job_key.IsCancelled():
+                    if HydrusData.TimeHasPassedPrecise( precise_time_to_stop ) or job_key.IsCancelled() or self._InteractiveJobsWaiting():
                         
                         return num_rows_processed
                         
@@ -6947,7 +7590,7 @@ class DB( HydrusDB.HydrusDB ):
                     
                     num_rows_processed += num_rows
                     
-                    if HydrusData.TimeHasPassedPrecise( precise_time_to_stop ) or job_key.IsCancelled():
+                    if HydrusData.TimeHasPassedPrecise( precise_time_to_stop ) or job_key.IsCancelled() or self._InteractiveJobsWaiting():
                         
                         return num_rows_processed
                         
@@ -6982,7 +7625,7 @@ class DB( HydrusDB.HydrusDB ):
                     
                     num_rows_processed += num_rows
                     
-                    if HydrusData.TimeHasPassedPrecise( precise_time_to_stop ) or job_key.IsCancelled():
+                    if HydrusData.TimeHasPassedPrecise( precise_time_to_stop ) or job_key.IsCancelled() or self._InteractiveJobsWaiting():
                         
                         return num_rows_processed
                         
@@ -7028,7 +7671,7 @@ class DB( HydrusDB.HydrusDB ):
                         
                         num_rows_processed += len( parent_ids )
                         
-                        if HydrusData.TimeHasPassedPrecise( precise_time_to_stop ) or job_key.IsCancelled():
+                        if HydrusData.TimeHasPassedPrecise( precise_time_to_stop ) or job_key.IsCancelled() or self._InteractiveJobsWaiting():
                             
                             return num_rows_processed
                             
@@ -7069,7 +7712,7 @@ class DB( HydrusDB.HydrusDB ):
                         
                         num_rows_processed += num_rows
                         
-                        if HydrusData.TimeHasPassedPrecise( precise_time_to_stop ) or job_key.IsCancelled():
+                        if HydrusData.TimeHasPassedPrecise( precise_time_to_stop ) or job_key.IsCancelled() or self._InteractiveJobsWaiting():
                             
                             return num_rows_processed
                             
@@ -7113,7 +7756,7 @@ class DB( HydrusDB.HydrusDB ):
                         
                         num_rows_processed += num_rows
                         
-                        if HydrusData.TimeHasPassedPrecise( precise_time_to_stop ) or job_key.IsCancelled():
+                        if HydrusData.TimeHasPassedPrecise( precise_time_to_stop ) or job_key.IsCancelled() or self._InteractiveJobsWaiting():
                             
                             return num_rows_processed
                             
@@ -7152,7 +7795,7 @@ class DB( HydrusDB.HydrusDB ):
                         
                         num_rows_processed += len( sibling_ids )
                         
-                        if HydrusData.TimeHasPassedPrecise( precise_time_to_stop ) or job_key.IsCancelled():
+                        if HydrusData.TimeHasPassedPrecise( precise_time_to_stop ) or job_key.IsCancelled() or self._InteractiveJobsWaiting():
                             
                             return num_rows_processed
                             
@@ -7209,6 +7852,7 @@ class DB( HydrusDB.HydrusDB ):
         elif action == 'file_maintenance_get_job': result = self.modules_files_maintenance_queue.GetJob( *args, **kwargs )
         elif action == 'file_maintenance_get_job_counts': result = self.modules_files_maintenance_queue.GetJobCounts( *args, **kwargs )
         elif action == 'file_query_ids': result = self._GetHashIdsFromQuery( *args, **kwargs )
+        elif action == 'file_query_plan': result = self._GetHashIdsFromQuery( *args, explain = True, **kwargs )
         elif action == 'file_system_predicates': result = self._GetFileSystemPredicates( *args, **kwargs )
         elif action == 'filter_existing_tags': result = self.modules_mappings_counts_update.FilterExistingTags( *args, **kwargs )
         elif action == 'filter_hashes': result = self.modules_files_metadata_rich.FilterHashesByService( *args, **kwargs )
@@ -7229,6 +7873,7 @@ class DB( HydrusDB.HydrusDB ):
         elif action == 'media_result': result = self._GetMediaResultFromHash( *args, **kwargs )
         elif action == 'media_results': result = self._GetMediaResultsFromHashes( *args, **kwargs )
         elif action == 'media_results_from_ids': result = self._GetMediaResults( *args, **kwargs )
+        elif action == 'media_results_lazy_load': result = self._LoadMediaResultsLazyManagers( *args, **kwargs )
         elif action == 'migration_get_mappings': result = self._MigrationGetMappings( *args, **kwargs )
         elif action == 'migration_get_pairs': result = self._MigrationGetPairs( *args, **kwargs )
         elif action == 'missing_repository_update_hashes': result = self.modules_repositories.GetRepositoryUpdateHashesIDoNotHave( *args, **kwargs )
@@ -7418,6 +8063,78 @@ class DB( HydrusDB.HydrusDB ):
             
         
     
+    def _RegenerateTagCacheReversedSubtags( self, tag_service_key = None ):
+        
+        job_key = ClientThreading.JobKey( cancellable = True )
+        
+        try:
+            
+            job_key.SetStatusTitle( 'regenerate tag fast search cache reversed subtags' )
+            
+            self._controller.pub( 'modal_message', job_key )
+            
+            if tag_service_key is None:
+                
+                tag_service_ids = self.modules_services.GetServiceIds( HC.REAL_TAG_SERVICES )
+                
+            else:
+                
+                tag_service_ids = ( self.modules_services.GetServiceId( tag_service_key ), )
+                
+            
+            file_service_ids = self.modules_services.GetServiceIds( HC.FILE_SERVICES_WITH_SPECIFIC_TAG_LOOKUP_CACHES )
+            
+            def status_hook( s ):
+                
+                job_key.SetVariable( 'popup_text_2', s )
+                
+            
+            for ( file_service_id, tag_service_id ) in itertools.product( file_service_ids, tag_service_ids ):
+                
+                if job_key.IsCancelled():
+                    
+                    break
+                    
+                
+                message = 'repopulating specific cache {}_{}'.format( file_service_id, tag_service_id )
+                
+                job_key.SetVariable( 'popup_text_1', message )
+                self._controller.frame_splash_status.SetSubtext( message )
+                
+                time.sleep( 0.01 )
+                
+                self.modules_tag_search.RegenerateReversedSubtags( file_service_id, tag_service_id, status_hook = status_hook )
+                
+            
+            for tag_service_id in tag_service_ids:
+                
+                if job_key.IsCancelled():
+                    
+                    break
+                    
+                
+                message = 'repopulating combined cache {}'.format( tag_service_id )
+                
+                job_key.SetVariable( 'popup_text_1', message )
+                self._controller.frame_splash_status.SetSubtext( message )
+                
+                time.sleep( 0.01 )
+                
+                self.modules_tag_search.RegenerateReversedSubtags( self.modules_services.combined_file_service_id, tag_service_id, status_hook = status_hook )
+                
+            
+        finally:
+            
+            job_key.DeleteVariable( 'popup_text_2' )
+            
+            job_key.SetVariable( 'popup_text_1', 'done!' )
+            
+            job_key.Finish()
+            
+            job_key.Delete( 5 )
+            
+        
+    
     def _RegenerateTagCacheSearchableSubtagMaps( self, tag_service_key = None ):
         
         job_key = ClientThreading.JobKey( cancellable = True )
@@ -11187,6 +11904,11 @@ class DB( HydrusDB.HydrusDB ):
         
         result = None
         
+        if action not in self.FILE_SEARCH_CACHE_SAFE_WRITE_ACTIONS:
+            
+            self._file_search_results_cache.Clear()
+            
+        
         if action == 'analyze': self.modules_db_maintenance.AnalyzeDueTables( *args, **kwargs )
         elif action == 'associate_repository_update_hashes': self.modules_repositories.AssociateRepositoryUpdateHashes( *args, **kwargs )
         elif action == 'backup': self._Backup( *args, **kwargs )
@@ -11230,6 +11952,7 @@ class DB( HydrusDB.HydrusDB ):
         elif action == 'regenerate_local_hash_cache': self._RegenerateLocalHashCache( *args, **kwargs )
         elif action == 'regenerate_local_tag_cache': self._RegenerateLocalTagCache( *args, **kwargs )
         elif action == 'regenerate_similar_files': self.modules_similar_files.RegenerateTree( *args, **kwargs )
+        elif action == 'regenerate_reversed_subtags': self._RegenerateTagCacheReversedSubtags( *args, **kwargs )
         elif action == 'regenerate_searchable_subtag_maps': self._RegenerateTagCacheSearchableSubtagMaps( *args, **kwargs )
         elif action == 'regenerate_tag_cache': self._RegenerateTagCache( *args, **kwargs )
         elif action == 'regenerate_tag_display_mappings_cache': self._RegenerateTagDisplayMappingsCache( *args, **kwargs )
@@ -11262,6 +11985,7 @@ class DB( HydrusDB.HydrusDB ):
         elif action == 'set_repository_update_hashes': self.modules_repositories.SetRepositoryUpdateHashes( *args, **kwargs )
         elif action == 'schedule_repository_update_file_maintenance': self.modules_repositories.ScheduleRepositoryUpdateFileMaintenance( *args, **kwargs )
         elif action == 'sync_tag_display_maintenance': result = self._CacheTagDisplaySync( *args, **kwargs )
+        elif action == 'sync_tag_display_maintenance_bulk': result = self._CacheTagDisplaySyncBulk( *args, **kwargs )
         elif action == 'tag_display_application': self.modules_tag_display.SetApplication( *args, **kwargs )
         elif action == 'update_server_services': self._UpdateServerServices( *args, **kwargs )
         elif action == 'update_services': self._UpdateServices( *args, **kwargs )
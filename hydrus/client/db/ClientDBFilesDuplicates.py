@@ -6,6 +6,7 @@ import typing
 
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusExceptions
+from hydrus.core import HydrusIntegerSets
 
 from hydrus.client import ClientConstants as CC
 from hydrus.client import ClientLocation
@@ -319,7 +320,7 @@ class ClientDBFilesDuplicates( ClientDBModule.ClientDBModule ):
         # can't just pull explicit king_hash_ids, since files that do not have a media_id are still kings
         # kings = hashes - explicitly not kings
         
-        if not isinstance( allowed_hash_ids, set ):
+        if not isinstance( allowed_hash_ids, ( set, HydrusIntegerSets.SortedIntegerSet ) ):
             
             allowed_hash_ids = set( allowed_hash_ids )
             
@@ -8,6 +8,7 @@ from hydrus.core import HydrusGlobals as HG
 from hydrus.client import ClientFiles
 from hydrus.client.db import ClientDBDefinitionsCache
 from hydrus.client.db import ClientDBFilesMaintenanceQueue
+from hydrus.client.db import ClientDBFilesSearch
 from hydrus.client.db import ClientDBFilesMetadataBasic
 from hydrus.client.db import ClientDBMaster
 from hydrus.client.db import ClientDBModule
@@ -26,7 +27,8 @@ class ClientDBFilesMaintenance( ClientDBModule.ClientDBModule ):
         modules_files_metadata_basic: ClientDBFilesMetadataBasic.ClientDBFilesMetadataBasic,
         modules_similar_files: ClientDBSimilarFiles.ClientDBSimilarFiles,
         modules_repositories: ClientDBRepositories.ClientDBRepositories,
-        weakref_media_result_cache: ClientMediaResultCache.MediaResultCache
+        weakref_media_result_cache: ClientMediaResultCache.MediaResultCache,
+        file_search_results_cache: ClientDBFilesSearch.FileSearchResultsCache
         ):
         
         ClientDBModule.ClientDBModule.__init__( self, 'client files maintenance', cursor )
@@ -38,11 +40,13 @@ class ClientDBFilesMaintenance( ClientDBModule.ClientDBModule ):
         self.modules_similar_files = modules_similar_files
         self.modules_repositories = modules_repositories
         self._weakref_media_result_cache = weakref_media_result_cache
+        self._file_search_results_cache = file_search_results_cache
         
     
     def ClearJobs( self, cleared_job_tuples ):
         
         new_file_info = set()
+        hash_ids_with_new_metadata = set()
         
         for ( hash, job_type, additional_data ) in cleared_job_tuples:
             
@@ -50,6 +54,8 @@ class ClientDBFilesMaintenance( ClientDBModule.ClientDBModule ):
             
             if additional_data is not None:
                 
+                hash_ids_with_new_metadata.add( hash_id )
+                
                 if job_type == ClientFiles.REGENERATE_FILE_DATA_JOB_FILE_METADATA:
                     
                     original_resolution = self.modules_files_metadata_basic.GetResolution( hash_id )
@@ -188,6 +194,13 @@ class ClientDBFilesMaintenance( ClientDBModule.ClientDBModule ):
             self._ExecuteMany( 'DELETE FROM file_maintenance_jobs WHERE hash_id = ? AND job_type = ?;', ( ( hash_id, job_type_to_delete ) for job_type_to_delete in job_types_to_delete ) )
             
         
+        # file info, exif/icc flags, modified times, and extra or similar-files hashes can all change what a file search returns
+        
+        if len( hash_ids_with_new_metadata ) > 0:
+            
+            self._file_search_results_cache.DirtyHashIds( hash_ids_with_new_metadata )
+            
+        
         if len( new_file_info ) > 0:
             
             hashes_that_need_refresh = set()
@@ -1,9 +1,12 @@
+import collections
+import json
 import sqlite3
 import typing
 
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
 from hydrus.core import HydrusDB
+from hydrus.core import HydrusIntegerSets
 from hydrus.core import HydrusTags
 
 from hydrus.client import ClientConstants as CC
@@ -17,6 +20,138 @@ from hydrus.client.db import ClientDBModule
 from hydrus.client.db import ClientDBServices
 from hydrus.client.db import ClientDBTagSearch
 
+# these depend on the clock or on other files, so a change to one file cannot be patched in by re-checking just that file
+NON_CACHEABLE_PREDICATE_TYPES = {
+    ClientSearch.PREDICATE_TYPE_SYSTEM_AGE,
+    ClientSearch.PREDICATE_TYPE_SYSTEM_MODIFIED_TIME,
+    ClientSearch.PREDICATE_TYPE_SYSTEM_LAST_VIEWED_TIME,
+    ClientSearch.PREDICATE_TYPE_SYSTEM_TIME,
+    ClientSearch.PREDICATE_TYPE_SYSTEM_SIMILAR_TO,
+    ClientSearch.PREDICATE_TYPE_SYSTEM_FILE_RELATIONSHIPS,
+    ClientSearch.PREDICATE_TYPE_SYSTEM_FILE_RELATIONSHIPS_COUNT,
+    ClientSearch.PREDICATE_TYPE_SYSTEM_FILE_RELATIONSHIPS_KING
+}
+
+def FileSearchContextIsCacheable( file_search_context: ClientSearch.FileSearchContext ) -> bool:
+    
+    # 'all known files' is really 'files that have tags here', which is not something we can re-check per file
+    if file_search_context.GetLocationContext().IsAllKnownFiles():
+        
+        return False
+        
+    
+    predicates = list( file_search_context.GetPredicates() )
+    
+    while len( predicates ) > 0:
+        
+        predicate = predicates.pop()
+        
+        predicate_type = predicate.GetType()
+        
+        if predicate_type == ClientSearch.PREDICATE_TYPE_OR_CONTAINER:
+            
+            predicates.extend( predicate.GetValue() )
+            
+        elif predicate_type in NON_CACHEABLE_PREDICATE_TYPES:
+            
+            return False
+            
+        
+    
+    return True
+    
+
+def GetFileSearchContextCacheKey( file_search_context: ClientSearch.FileSearchContext ) -> str:
+    
+    ( serialisable_location_context, serialisable_tag_context, search_type, serialisable_predicates, search_complete ) = file_search_context.GetSerialisableTuple()[2]
+    
+    # the same search can come in with its predicates in any order
+    sorted_serialisable_predicates = sorted( json.dumps( serialisable_predicate ) for serialisable_predicate in serialisable_predicates )
+    
+    return json.dumps( ( serialisable_location_context, serialisable_tag_context, search_type, sorted_serialisable_predicates ) )
+    
+
+class FileSearchResultsCache( object ):
+    
+    MAX_NUM_RESULTS = 32
+    MAX_TOTAL_NUM_HASH_IDS = 4 * 1048576
+    MAX_NUM_DIRTY_HASH_IDS = 4096
+    
+    def __init__( self ):
+        
+        # search key -> ( the unlimited, unsorted result, hash_ids that have changed since and need re-checking )
+        self._keys_to_results = collections.OrderedDict()
+        
+    
+    def _Cull( self ):
+        
+        total_num_hash_ids = sum( ( len( result_hash_ids ) for ( result_hash_ids, dirty_hash_ids ) in self._keys_to_results.values() ) )
+        
+        while len( self._keys_to_results ) > self.MAX_NUM_RESULTS or ( len( self._keys_to_results ) > 1 and total_num_hash_ids > self.MAX_TOTAL_NUM_HASH_IDS ):
+            
+            ( key, ( result_hash_ids, dirty_hash_ids ) ) = self._keys_to_results.popitem( last = False )
+            
+            total_num_hash_ids -= len( result_hash_ids )
+            
+        
+    
+    def Clear( self ):
+        
+        self._keys_to_results = collections.OrderedDict()
+        
+    
+    def DirtyHashIds( self, hash_ids: typing.Collection[ int ] ):
+        
+        for key in list( self._keys_to_results.keys() ):
+            
+            ( result_hash_ids, dirty_hash_ids ) = self._keys_to_results[ key ]
+            
+            dirty_hash_ids.update( hash_ids )
+            
+            # at some point it is cheaper to just run the search again
+            if len( dirty_hash_ids ) > self.MAX_NUM_DIRTY_HASH_IDS:
+                
+                del self._keys_to_results[ key ]
+                
+            
+        
+    
+    def GetResult( self, key: str ):
+        
+        if key not in self._keys_to_results:
+            
+            return None
+            
+        
+        self._keys_to_results.move_to_end( key )
+        
+        return self._keys_to_results[ key ]
+        
+    
+    def IsEmpty( self ) -> bool:
+        
+        return len( self._keys_to_results ) == 0
+        
+    
+    def SetResult( self, key: str, result_hash_ids ):
+        
+        if HydrusIntegerSets.IsCompactableSize( result_hash_ids ):
+            
+            result_hash_ids = HydrusIntegerSets.SortedIntegerSet( result_hash_ids )
+            
+        else:
+            
+            result_hash_ids = set( result_hash_ids )
+            
+        
+        self._keys_to_results[ key ] = ( result_hash_ids, set() )
+        
+        self._keys_to_results.move_to_end( key )
+        
+        self._Cull()
+        
+    
+
 class ClientDBFilesSearch( ClientDBModule.ClientDBModule ):
     
     def __init__(
@@ -583,6 +718,45 @@ class ClientDBFilesSearch( ClientDBModule.ClientDBModule ):
         return nonzero_tag_hash_ids
         
     
+    def GetTagCountEstimate( self, tag_display_type: int, location_context: ClientLocation.LocationContext, tag_context: ClientSearch.TagContext, tag ) -> int:
+        
+        # this mirrors GetHashIdsFromTag, but just sums the autocomplete counts, so the search planner can guess how big a tag search will be without doing it
+        
+        if not self.modules_tags.TagExists( tag ):
+            
+            return 0
+            
+        
+        ( file_service_keys, file_location_is_cross_referenced ) = location_context.GetCoveringCurrentFileServiceKeys()
+        
+        if tag_context.service_key == CC.COMBINED_TAG_SERVICE_KEY:
+            
+            search_tag_service_ids = self.modules_services.GetServiceIds( HC.REAL_TAG_SERVICES )
+            
+        else:
+            
+            search_tag_service_ids = ( self.modules_services.GetServiceId( tag_context.service_key ), )
+            
+        
+        tag_id = self.modules_tags.GetTagId( tag )
+        
+        file_service_ids = [ self.modules_services.GetServiceId( file_service_key ) for file_service_key in file_service_keys ]
+        
+        estimate = 0
+        
+        for search_tag_service_id in search_tag_service_ids:
+            
+            ideal_tag_id = self.modules_tag_search.modules_tag_siblings.GetIdealTagId( tag_display_type, search_tag_service_id, tag_id )
+            
+            for file_service_id in file_service_ids:
+                
+                estimate += self.modules_mappings_counts.GetAutocompleteCountEstimate( tag_display_type, search_tag_service_id, file_service_id, ( ideal_tag_id, ), tag_context.include_current_tags, tag_context.include_pending_tags )
+                
+            
+        
+        return estimate
+        
+    
     def GetTablesAndColumnsThatUseDefinitions( self, content_type: int ) -> typing.List[ typing.Tuple[ str, str ] ]:
         
         tables_and_columns = []
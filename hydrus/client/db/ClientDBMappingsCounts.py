@@ -57,6 +57,9 @@ class ClientDBMappingsCounts( ClientDBModule.ClientDBModule ):
         self._missing_storage_tag_service_pairs = set()
         self._missing_display_tag_service_pairs = set()
         
+        # bumped whenever a count changes, so anything caching counts can tell it is stale
+        self._counts_generation = 0
+        
     
     def _GetServiceTableGenerationDictSingle( self, tag_display_type, file_service_id, tag_service_id ):
         
@@ -133,6 +136,8 @@ class ClientDBMappingsCounts( ClientDBModule.ClientDBModule ):
     
     def AddCounts( self, tag_display_type, file_service_id, tag_service_id, ac_cache_changes ):
         
+        self._counts_generation += 1
+        
         counts_cache_table_name = self.GetCountsCacheTableName( tag_display_type, file_service_id, tag_service_id )
         
         new_tag_ids = set()
@@ -163,6 +168,8 @@ class ClientDBMappingsCounts( ClientDBModule.ClientDBModule ):
     
     def ClearCounts( self, tag_display_type, file_service_id, tag_service_id, keep_current = False, keep_pending = False ):
         
+        self._counts_generation += 1
+        
         table_name = self.GetCountsCacheTableName( tag_display_type, file_service_id, tag_service_id )
         
         if keep_current:
@@ -185,6 +192,8 @@ class ClientDBMappingsCounts( ClientDBModule.ClientDBModule ):
     
     def CreateTables( self, tag_display_type, file_service_id, tag_service_id, populate_from_storage = False ):
         
+        self._counts_generation += 1
+        
         table_generation_dict = self._GetServiceTableGenerationDictSingle( tag_display_type, file_service_id, tag_service_id )
         
         for ( table_name, ( create_query_without_name, version_added ) ) in table_generation_dict.items():
@@ -205,6 +214,8 @@ class ClientDBMappingsCounts( ClientDBModule.ClientDBModule ):
     
     def DropTables( self, tag_display_type, file_service_id, tag_service_id ):
         
+        self._counts_generation += 1
+        
         table_name = self.GetCountsCacheTableName( tag_display_type, file_service_id, tag_service_id )
         
         self._Execute( 'DROP TABLE IF EXISTS {};'.format( table_name ) )
@@ -466,6 +477,11 @@ class ClientDBMappingsCounts( ClientDBModule.ClientDBModule ):
         return self._Execute( 'SELECT tag_id, current_count, pending_count FROM {} CROSS JOIN {} USING ( tag_id );'.format( temp_tag_id_table_name, counts_cache_table_name ) ).fetchall()
         
     
+    def GetCountsGeneration( self ) -> int:
+        
+        return self._counts_generation
+        
+    
     def GetCurrentPendingPositiveCountsAndWeights( self, tag_display_type, file_service_id, tag_service_id, tag_ids, tag_ids_table_name = None ):
         
         include_current = True
@@ -545,6 +561,8 @@ class ClientDBMappingsCounts( ClientDBModule.ClientDBModule ):
     
     def ReduceCounts( self, tag_display_type, file_service_id, tag_service_id, ac_cache_changes ):
         
+        self._counts_generation += 1
+        
         # this takes positive counts, despite ultimately being a reduce guy
         
         counts_cache_table_name = self.GetCountsCacheTableName( tag_display_type, file_service_id, tag_service_id )
@@ -0,0 +1,56 @@
+import sqlite3
+
+from hydrus.client.db import ClientDBDefinitionsCache
+from hydrus.client.db import ClientDBFilesMetadataBasic
+from hydrus.client.db import ClientDBFilesMetadataRich
+from hydrus.client.db import ClientDBFilesStorage
+from hydrus.client.db import ClientDBMaster
+from hydrus.client.db import ClientDBServices
+from hydrus.client.db import ClientDBURLMap
+
+PARALLEL_READ_ACTIONS = {
+    'file_hashes',
+    'filter_hashes',
+    'hash_ids_to_hashes',
+    'hash_status',
+    'url_statuses'
+}
+
+class ClientDBParallelReader( object ):
+    
+    def __init__( self, cursor: sqlite3.Cursor ):
+        
+        # this is a small subset of the main db's modules, loaded on a read-only connection
+        # these reads only touch definitions and file records, and they only cache definitions, which never change, and the services, which are reset when they do
+        
+        self.modules_services = ClientDBServices.ClientDBMasterServices( cursor )
+        
+        self.modules_hashes = ClientDBMaster.ClientDBMasterHashes( cursor )
+        
+        self.modules_urls = ClientDBMaster.ClientDBMasterURLs( cursor )
+        
+        self.modules_texts = ClientDBMaster.ClientDBMasterTexts( cursor )
+        
+        self.modules_files_metadata_basic = ClientDBFilesMetadataBasic.ClientDBFilesMetadataBasic( cursor )
+        
+        self.modules_url_map = ClientDBURLMap.ClientDBURLMap( cursor, self.modules_urls )
+        
+        self.modules_files_storage = ClientDBFilesStorage.ClientDBFilesStorage( cursor, None, self.modules_services, self.modules_hashes, self.modules_texts )
+        
+        self.modules_hashes_local_cache = ClientDBDefinitionsCache.ClientDBCacheLocalHashes( cursor, self.modules_hashes, self.modules_services, self.modules_files_storage )
+        
+        self.modules_files_metadata_rich = ClientDBFilesMetadataRich.ClientDBFilesMetadataRich( cursor, self.modules_services, self.modules_hashes, self.modules_files_metadata_basic, self.modules_files_storage, self.modules_hashes_local_cache, self.modules_url_map )
+        
+    
+    def Read( self, action, *args, **kwargs ):
+        
+        if action == 'file_hashes': result = self.modules_hashes.GetFileHashes( *args, **kwargs )
+        elif action == 'filter_hashes': result = self.modules_files_metadata_rich.FilterHashesByService( *args, **kwargs )
+        elif action == 'hash_ids_to_hashes': result = self.modules_hashes_local_cache.GetHashIdsToHashes( *args, **kwargs )
+        elif action == 'hash_status': result = self.modules_files_metadata_rich.GetHashStatus( *args, **kwargs )
+        elif action == 'url_statuses': result = self.modules_files_metadata_rich.GetURLStatuses( *args, **kwargs )
+        else: raise Exception( 'db parallel reader received an unknown read command: ' + action )
+        
+        return result
+        
+    
@@ -1,4 +1,5 @@
 import collections
+import numpy
 import random
 import sqlite3
 import typing
@@ -13,6 +14,160 @@ from hydrus.client.db import ClientDBFilesStorage
 from hydrus.client.db import ClientDBModule
 from hydrus.client.db import ClientDBServices
 
+def ConvertPerceptualHashesToNumPyArray( perceptual_hashes: typing.Collection[ bytes ] ) -> numpy.ndarray:
+    
+    return numpy.frombuffer( b''.join( perceptual_hashes ), dtype = '>u8' ).astype( numpy.uint64 )
+    
+
+def GetPopCounts( values: numpy.ndarray ) -> numpy.ndarray:
+    
+    # numpy 2.0 has bitwise_count, but this SWAR popcount is only a handful of vectorised ops and works everywhere
+    
+    values = values - ( ( values >> numpy.uint64( 1 ) ) & numpy.uint64( 0x5555555555555555 ) )
+    values = ( values & numpy.uint64( 0x3333333333333333 ) ) + ( ( values >> numpy.uint64( 2 ) ) & numpy.uint64( 0x3333333333333333 ) )
+    values = ( values + ( values >> numpy.uint64( 4 ) ) ) & numpy.uint64( 0x0f0f0f0f0f0f0f0f )
+    
+    return ( ( values * numpy.uint64( 0x0101010101010101 ) ) >> numpy.uint64( 56 ) ).astype( numpy.uint8 )
+    
+
+class PerceptualHashSearchIndex( object ):
+    
+    # every perceptual hash we know, packed into a uint64 array so a search can XOR and popcount the whole lot in one go
+    # costs about 16 bytes per perceptual hash, but a search is a few ms rather than dozens of db round-trips through the vptree
+    
+    SEARCH_CHUNK_SIZE = 1048576
+    SEARCH_MANY_BLOCK_SIZE = 256
+    SEARCH_MANY_CELLS_PER_BLOCK = 4194304
+    
+    def __init__( self, rows: typing.Collection[ typing.Tuple[ int, bytes ] ] ):
+        
+        if len( rows ) == 0:
+            
+            self._perceptual_hash_ids = numpy.empty( 0, dtype = numpy.int64 )
+            self._perceptual_hashes = numpy.empty( 0, dtype = numpy.uint64 )
+            
+        else:
+            
+            ( perceptual_hash_ids, perceptual_hashes ) = zip( *rows )
+            
+            self._perceptual_hash_ids = numpy.array( perceptual_hash_ids, dtype = numpy.int64 )
+            self._perceptual_hashes = ConvertPerceptualHashesToNumPyArray( perceptual_hashes )
+            
+        
+        self._pending_additions = {}
+        self._pending_removals = set()
+        
+    
+    def _Consolidate( self ):
+        
+        if len( self._pending_additions ) == 0 and len( self._pending_removals ) == 0:
+            
+            return
+            
+        
+        removee_ids = self._pending_removals.union( self._pending_additions.keys() )
+        
+        if len( removee_ids ) > 0 and len( self._perceptual_hash_ids ) > 0:
+            
+            keep = numpy.isin( self._perceptual_hash_ids, numpy.fromiter( removee_ids, dtype = numpy.int64, count = len( removee_ids ) ), invert = True )
+            
+            self._perceptual_hash_ids = self._perceptual_hash_ids[ keep ]
+            self._perceptual_hashes = self._perceptual_hashes[ keep ]
+            
+        
+        if len( self._pending_additions ) > 0:
+            
+            ( perceptual_hash_ids, perceptual_hashes ) = zip( *self._pending_additions.items() )
+            
+            self._perceptual_hash_ids = numpy.concatenate( ( self._perceptual_hash_ids, numpy.array( perceptual_hash_ids, dtype = numpy.int64 ) ) )
+            self._perceptual_hashes = numpy.concatenate( ( self._perceptual_hashes, ConvertPerceptualHashesToNumPyArray( perceptual_hashes ) ) )
+            
+        
+        self._pending_additions = {}
+        self._pending_removals = set()
+        
+    
+    def AddPerceptualHash( self, perceptual_hash_id: int, perceptual_hash: bytes ):
+        
+        self._pending_removals.discard( perceptual_hash_id )
+        
+        self._pending_additions[ perceptual_hash_id ] = perceptual_hash
+        
+    
+    def GetNumPerceptualHashes( self ) -> int:
+        
+        self._Consolidate()
+        
+        return len( self._perceptual_hash_ids )
+        
+    
+    def RemovePerceptualHashes( self, perceptual_hash_ids: typing.Collection[ int ] ):
+        
+        for perceptual_hash_id in perceptual_hash_ids:
+            
+            self._pending_additions.pop( perceptual_hash_id, None )
+            
+            self._pending_removals.add( perceptual_hash_id )
+            
+        
+    
+    def Search( self, search_perceptual_hash: bytes, max_hamming_distance: int ) -> typing.List[ typing.Tuple[ int, int ] ]:
+        
+        self._Consolidate()
+        
+        search_value = ConvertPerceptualHashesToNumPyArray( ( search_perceptual_hash, ) )[0]
+        
+        results = []
+        
+        for i in range( 0, len( self._perceptual_hashes ), self.SEARCH_CHUNK_SIZE ):
+            
+            distances = GetPopCounts( numpy.bitwise_xor( self._perceptual_hashes[ i : i + self.SEARCH_CHUNK_SIZE ], search_value ) )
+            
+            ( indices, ) = numpy.nonzero( distances <= max_hamming_distance )
+            
+            results.extend( zip( self._perceptual_hash_ids[ indices + i ].tolist(), distances[ indices ].tolist() ) )
+            
+        
+        return results
+        
+    
+    def SearchMany( self, search_perceptual_hashes: typing.Sequence[ bytes ], max_hamming_distance: int ) -> typing.List[ typing.Tuple[ int, int, int ] ]:
+        
+        # blocked all-pairs search: XOR a block of search hashes against a chunk of the index in one broadcast
+        # returns ( search_index, perceptual_hash_id, distance ) rows
+        
+        self._Consolidate()
+        
+        results = []
+        
+        if len( search_perceptual_hashes ) == 0 or len( self._perceptual_hashes ) == 0:
+            
+            return results
+            
+        
+        search_values = ConvertPerceptualHashesToNumPyArray( search_perceptual_hashes )
+        
+        search_block_size = max( 1, min( len( search_values ), self.SEARCH_MANY_BLOCK_SIZE ) )
+        chunk_size = max( 1, self.SEARCH_MANY_CELLS_PER_BLOCK // search_block_size )
+        
+        for i in range( 0, len( search_values ), search_block_size ):
+            
+            search_block = search_values[ i : i + search_block_size ]
+            
+            for j in range( 0, len( self._perceptual_hashes ), chunk_size ):
+                
+                distances = GetPopCounts( numpy.bitwise_xor( search_block[ :, None ], self._perceptual_hashes[ None, j : j + chunk_size ] ) )
+                
+                ( search_indices, indices ) = numpy.nonzero( distances <= max_hamming_distance )
+                
+                results.extend( zip( ( search_indices + i ).tolist(), self._perceptual_hash_ids[ indices + j ].tolist(), distances[ search_indices, indices ].tolist() ) )
+                
+            
+        
+        return results
+        
+    
+
 class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
     
     def __init__( self, cursor: sqlite3.Cursor, modules_services: ClientDBServices.ClientDBMasterServices, modules_files_storage: ClientDBFilesStorage.ClientDBFilesStorage ):
@@ -20,6 +175,8 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
         self.modules_services = modules_services
         self.modules_files_storage = modules_files_storage
         
+        self._perceptual_hash_search_index = None
+        
         ClientDBModule.ClientDBModule.__init__( self, 'client similar files', cursor )
         
     
@@ -236,6 +393,11 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
             
             self._AddLeaf( perceptual_hash_id, perceptual_hash )
             
+            if self._perceptual_hash_search_index is not None:
+                
+                self._perceptual_hash_search_index.AddPerceptualHash( perceptual_hash_id, perceptual_hash )
+                
+            
         else:
             
             ( perceptual_hash_id, ) = result
@@ -244,6 +406,18 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
         return perceptual_hash_id
         
     
+    def _GetPerceptualHashSearchIndex( self ) -> PerceptualHashSearchIndex:
+        
+        if self._perceptual_hash_search_index is None:
+            
+            rows = self._Execute( 'SELECT phash_id, phash FROM shape_perceptual_hashes;' ).fetchall()
+            
+            self._perceptual_hash_search_index = PerceptualHashSearchIndex( rows )
+            
+        
+        return self._perceptual_hash_search_index
+        
+    
     def _PopBestRootNode( self, node_rows ):
         
         if len( node_rows ) == 1:
@@ -378,6 +552,11 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
         
         self._ExecuteMany( 'DELETE FROM shape_perceptual_hashes WHERE phash_id = ?;', ( ( p_id, ) for p_id in orphan_perceptual_hash_ids ) )
         
+        if self._perceptual_hash_search_index is not None:
+            
+            self._perceptual_hash_search_index.RemovePerceptualHashes( orphan_perceptual_hash_ids )
+            
+        
         useful_nodes = [ row for row in unbalanced_nodes if row[0] in useful_perceptual_hash_ids ]
         
         useful_population = len( useful_nodes )
@@ -435,6 +614,140 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
             
         
     
+    def _SearchPerceptualHashSearchIndex( self, search_perceptual_hashes, max_hamming_distance ):
+        
+        similar_perceptual_hash_ids_to_distances = {}
+        
+        perceptual_hash_search_index = self._GetPerceptualHashSearchIndex()
+        
+        for search_perceptual_hash in search_perceptual_hashes:
+            
+            for ( perceptual_hash_id, distance ) in perceptual_hash_search_index.Search( search_perceptual_hash, max_hamming_distance ):
+                
+                if perceptual_hash_id not in similar_perceptual_hash_ids_to_distances or distance < similar_perceptual_hash_ids_to_distances[ perceptual_hash_id ]:
+                    
+                    similar_perceptual_hash_ids_to_distances[ perceptual_hash_id ] = distance
+                    
+                
+            
+        
+        if HG.db_report_mode:
+            
+            HydrusData.ShowText( 'Similar file search scanned {} perceptual hashes in memory.'.format( HydrusData.ToHumanInt( perceptual_hash_search_index.GetNumPerceptualHashes() ) ) )
+            
+        
+        return similar_perceptual_hash_ids_to_distances
+        
+    
+    def _SearchVPTree( self, search_perceptual_hashes, max_hamming_distance ):
+        
+        search_radius = max_hamming_distance
+        
+        similar_perceptual_hash_ids_to_distances = {}
+        
+        top_node_result = self._Execute( 'SELECT phash_id FROM shape_vptree WHERE parent_id IS NULL;' ).fetchone()
+        
+        if top_node_result is None:
+            
+            return similar_perceptual_hash_ids_to_distances
+            
+        
+        ( root_node_perceptual_hash_id, ) = top_node_result
+        
+        num_cycles = 0
+        total_nodes_searched = 0
+        
+        for search_perceptual_hash in search_perceptual_hashes:
+            
+            next_potentials = [ root_node_perceptual_hash_id ]
+            
+            while len( next_potentials ) > 0:
+                
+                current_potentials = next_potentials
+                next_potentials = []
+                
+                num_cycles += 1
+                total_nodes_searched += len( current_potentials )
+                
+                for group_of_current_potentials in HydrusData.SplitListIntoChunks( current_potentials, 10000 ):
+                    
+                    # this is split into fixed lists of results of subgroups because as an iterable it was causing crashes on linux!!
+                    # after investigation, it seemed to be SQLite having a problem with part of Get64BitHammingDistance touching phashes it presumably was still hanging on to
+                    # the crash was in sqlite code, again presumably on subsequent fetch
+                    # adding a delay in seemed to fix it as well. guess it was some memory maintenance buffer/bytes thing
+                    # anyway, we now just get the whole lot of results first and then work on the whole lot
+                    
+                    with self._MakeTemporaryIntegerTable( group_of_current_potentials, 'phash_id' ) as temp_table_name:
+                        
+                        # temp phash_ids to actual phashes and tree info
+                        results = self._Execute( 'SELECT phash_id, phash, radius, inner_id, outer_id FROM {} CROSS JOIN shape_perceptual_hashes USING ( phash_id ) CROSS JOIN shape_vptree USING ( phash_id );'.format( temp_table_name ) ).fetchall()
+                        
+                    
+                    for ( node_perceptual_hash_id, node_perceptual_hash, node_radius, inner_perceptual_hash_id, outer_perceptual_hash_id ) in results:
+                        
+                        # first check the node itself--is it similar?
+                        
+                        node_hamming_distance = HydrusData.Get64BitHammingDistance( search_perceptual_hash, node_perceptual_hash )
+                        
+                        if node_hamming_distance <= search_radius:
+                            
+                            if node_perceptual_hash_id in similar_perceptual_hash_ids_to_distances:
+                                
+                                current_distance = similar_perceptual_hash_ids_to_distances[ node_perceptual_hash_id ]
+                                
+                                similar_perceptual_hash_ids_to_distances[ node_perceptual_hash_id ] = min( node_hamming_distance, current_distance )
+                                
+                            else:
+                                
+                                similar_perceptual_hash_ids_to_distances[ node_perceptual_hash_id ] = node_hamming_distance
+                                
+                            
+                        
+                        # now how about its children?
+                        
+                        if node_radius is not None:
+                            
+                            # we have two spheres--node and search--their centers separated by node_hamming_distance
+                            # we want to search inside/outside the node_sphere if the search_sphere intersects with those spaces
+                            # there are four possibles:
+                            # (----N----)-(--S--)    intersects with outer only - distance between N and S > their radii
+                            # (----N---(-)-S--)      intersects with both
+                            # (----N-(--S-)-)        intersects with both
+                            # (---(-N-S--)-)         intersects with inner only - distance between N and S + radius_S does not exceed radius_N
+                            
+                            if inner_perceptual_hash_id is not None:
+                                
+                                spheres_disjoint = node_hamming_distance > ( node_radius + search_radius )
+                                
+                                if not spheres_disjoint: # i.e. they intersect at some point
+                                    
+                                    next_potentials.append( inner_perceptual_hash_id )
+                                    
+                                
+                            
+                            if outer_perceptual_hash_id is not None:
+                                
+                                search_sphere_subset_of_node_sphere = ( node_hamming_distance + search_radius ) <= node_radius
+                                
+                                if not search_sphere_subset_of_node_sphere: # i.e. search sphere intersects with non-node sphere space at some point
+                                    
+                                    next_potentials.append( outer_perceptual_hash_id )
+                                    
+                                
+                            
+                        
+                    
+                
+            
+        
+        if HG.db_report_mode:
+            
+            HydrusData.ShowText( 'Similar file search touched {} nodes over {} cycles.'.format( HydrusData.ToHumanInt( total_nodes_searched ), HydrusData.ToHumanInt( num_cycles ) ) )
+            
+        
+        return similar_perceptual_hash_ids_to_distances
+        
+    
     def AssociatePerceptualHashes( self, hash_id, perceptual_hashes ):
         
         perceptual_hash_ids = set()
@@ -601,6 +914,13 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
         return False
         
     
+    def NotifyRollback( self ):
+        
+        # the index was updated alongside writes that have now been undone, so it gets reloaded from the db on next search
+        
+        self._perceptual_hash_search_index = None
+        
+    
     def RegenerateTree( self ):
         
         job_key = ClientThreading.JobKey()
@@ -670,17 +990,6 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
             
         else:
             
-            search_radius = max_hamming_distance
-            
-            top_node_result = self._Execute( 'SELECT phash_id FROM shape_vptree WHERE parent_id IS NULL;' ).fetchone()
-            
-            if top_node_result is None:
-                
-                return similar_hash_ids_and_distances
-                
-            
-            ( root_node_perceptual_hash_id, ) = top_node_result
-            
             search = self._STL( self._Execute( 'SELECT phash FROM shape_perceptual_hashes NATURAL JOIN shape_perceptual_hash_map WHERE hash_id = ?;', ( hash_id, ) ) )
             
             if len( search ) == 0:
@@ -688,97 +997,15 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
                 return similar_hash_ids_and_distances
                 
             
-            similar_perceptual_hash_ids_to_distances = {}
-            
-            num_cycles = 0
-            total_nodes_searched = 0
-            
-            for search_perceptual_hash in search:
+            if HG.client_controller.new_options.GetBoolean( 'similar_files_search_uses_in_memory_index' ):
                 
-                next_potentials = [ root_node_perceptual_hash_id ]
+                similar_perceptual_hash_ids_to_distances = self._SearchPerceptualHashSearchIndex( search, max_hamming_distance )
                 
-                while len( next_potentials ) > 0:
-                    
-                    current_potentials = next_potentials
-                    next_potentials = []
-                    
-                    num_cycles += 1
-                    total_nodes_searched += len( current_potentials )
-                    
-                    for group_of_current_potentials in HydrusData.SplitListIntoChunks( current_potentials, 10000 ):
-                        
-                        # this is split into fixed lists of results of subgroups because as an iterable it was causing crashes on linux!!
-                        # after investigation, it seemed to be SQLite having a problem with part of Get64BitHammingDistance touching phashes it presumably was still hanging on to
-                        # the crash was in sqlite code, again presumably on subsequent fetch
-                        # adding a delay in seemed to fix it as well. guess it was some memory maintenance buffer/bytes thing
-                        # anyway, we now just get the whole lot of results first and then work on the whole lot
-                        
-                        with self._MakeTemporaryIntegerTable( group_of_current_potentials, 'phash_id' ) as temp_table_name:
-                            
-                            # temp phash_ids to actual phashes and tree info
-                            results = self._Execute( 'SELECT phash_id, phash, radius, inner_id, outer_id FROM {} CROSS JOIN shape_perceptual_hashes USING ( phash_id ) CROSS JOIN shape_vptree USING ( phash_id );'.format( temp_table_name ) ).fetchall()
-                            
-                        
-                        for ( node_perceptual_hash_id, node_perceptual_hash, node_radius, inner_perceptual_hash_id, outer_perceptual_hash_id ) in results:
-                            
-                            # first check the node itself--is it similar?
-                            
-                            node_hamming_distance = HydrusData.Get64BitHammingDistance( search_perceptual_hash, node_perceptual_hash )
-                            
-                            if node_hamming_distance <= search_radius:
-                                
-                                if node_perceptual_hash_id in similar_perceptual_hash_ids_to_distances:
-                                    
-                                    current_distance = similar_perceptual_hash_ids_to_distances[ node_perceptual_hash_id ]
-                                    
-                                    similar_perceptual_hash_ids_to_distances[ node_perceptual_hash_id ] = min( node_hamming_distance, current_distance )
-                                    
-                                else:
-                                    
-                                    similar_perceptual_hash_ids_to_distances[ node_perceptual_hash_id ] = node_hamming_distance
-                                    
-                                
-                            
-                            # now how about its children?
-                            
-                            if node_radius is not None:
-                                
-                                # we have two spheres--node and search--their centers separated by node_hamming_distance
-                                # we want to search inside/outside the node_sphere if the search_sphere intersects with those spaces
-                                # there are four possibles:
-                                # (----N----)-(--S--)    intersects with outer only - distance between N and S > their radii
-                                # (----N---(-)-S--)      intersects with both
-                                # (----N-(--S-)-)        intersects with both
-                                # (---(-N-S--)-)         intersects with inner only - distance between N and S + radius_S does not exceed radius_N
-                                
-                                if inner_perceptual_hash_id is not None:
-                                    
-                                    spheres_disjoint = node_hamming_distance > ( node_radius + search_radius )
-                                    
-                                    if not spheres_disjoint: # i.e. they intersect at some point
-                                        
-                                        next_potentials.append( inner_perceptual_hash_id )
-                                        
-                                    
-                                
-                                if outer_perceptual_hash_id is not None:
-                                    
-                                    search_sphere_subset_of_node_sphere = ( node_hamming_distance + search_radius ) <= node_radius
-                                    
-                                    if not search_sphere_subset_of_node_sphere: # i.e. search sphere intersects with non-node sphere space at some point
-                                        
-                                        next_potentials.append( outer_perceptual_hash_id )
-                                        
-                                    
-                                
-                            
-                        
-                    
+            else:
                 
-            
-            if HG.db_report_mode:
+                self._perceptual_hash_search_index = None
                 
-                HydrusData.ShowText( 'Similar file search touched {} nodes over {} cycles.'.format( HydrusData.ToHumanInt( total_nodes_searched ), HydrusData.ToHumanInt( num_cycles ) ) )
+                similar_perceptual_hash_ids_to_distances = self._SearchVPTree( search, max_hamming_distance )
                 
             
             # so, now we have phash_ids and distances. let's map that to actual files.
@@ -824,6 +1051,73 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
         return similar_hash_ids_and_distances
         
     
+    def SearchMany( self, hash_ids, max_hamming_distance ):
+        
+        # the batch version of Search--one vectorised pass over the in-memory index for the whole group
+        
+        hash_ids_to_similar_hash_ids_to_distances = { hash_id : {} for hash_id in hash_ids }
+        
+        with self._MakeTemporaryIntegerTable( hash_ids, 'hash_id' ) as temp_hash_ids_table_name:
+            
+            pixel_dupe_pairs = self._Execute( 'SELECT pixel_hash_map.hash_id, other_pixel_hash_map.hash_id FROM {} CROSS JOIN pixel_hash_map USING ( hash_id ) CROSS JOIN pixel_hash_map AS other_pixel_hash_map ON ( pixel_hash_map.pixel_hash_id = other_pixel_hash_map.pixel_hash_id AND pixel_hash_map.hash_id != other_pixel_hash_map.hash_id );'.format( temp_hash_ids_table_name ) ).fetchall()
+            
+            search_rows = self._Execute( 'SELECT hash_id, phash_id, phash FROM {} CROSS JOIN shape_perceptual_hash_map USING ( hash_id ) CROSS JOIN shape_perceptual_hashes USING ( phash_id );'.format( temp_hash_ids_table_name ) ).fetchall()
+            
+        
+        for ( hash_id, pixel_dupe_hash_id ) in pixel_dupe_pairs:
+            
+            hash_ids_to_similar_hash_ids_to_distances[ hash_id ][ pixel_dupe_hash_id ] = 0
+            
+        
+        search_perceptual_hash_ids_to_hash_ids = HydrusData.BuildKeyToListDict( ( ( perceptual_hash_id, hash_id ) for ( hash_id, perceptual_hash_id, perceptual_hash ) in search_rows ) )
+        search_perceptual_hash_ids_to_perceptual_hashes = { perceptual_hash_id : perceptual_hash for ( hash_id, perceptual_hash_id, perceptual_hash ) in search_rows }
+        
+        search_perceptual_hash_ids = list( search_perceptual_hash_ids_to_perceptual_hashes.keys() )
+        
+        results = self._GetPerceptualHashSearchIndex().SearchMany( [ search_perceptual_hash_ids_to_perceptual_hashes[ perceptual_hash_id ] for perceptual_hash_id in search_perceptual_hash_ids ], max_hamming_distance )
+        
+        if HG.db_report_mode:
+            
+            HydrusData.ShowText( 'Similar file batch search found {} perceptual hash pairs for {} files.'.format( HydrusData.ToHumanInt( len( results ) ), HydrusData.ToHumanInt( len( hash_ids ) ) ) )
+            
+        
+        similar_perceptual_hash_ids = { perceptual_hash_id for ( search_index, perceptual_hash_id, distance ) in results }
+        
+        with self._MakeTemporaryIntegerTable( similar_perceptual_hash_ids, 'phash_id' ) as temp_table_name:
+            
+            # temp phashes to hash map
+            similar_perceptual_hash_ids_to_hash_ids = HydrusData.BuildKeyToListDict( self._Execute( 'SELECT phash_id, hash_id FROM {} CROSS JOIN shape_perceptual_hash_map USING ( phash_id );'.format( temp_table_name ) ) )
+            
+        
+        for ( search_index, perceptual_hash_id, distance ) in results:
+            
+            if perceptual_hash_id not in similar_perceptual_hash_ids_to_hash_ids:
+                
+                continue
+                
+            
+            for hash_id in search_perceptual_hash_ids_to_hash_ids[ search_perceptual_hash_ids[ search_index ] ]:
+                
+                similar_hash_ids_to_distances = hash_ids_to_similar_hash_ids_to_distances[ hash_id ]
+                
+                for similar_hash_id in similar_perceptual_hash_ids_to_hash_ids[ perceptual_hash_id ]:
+                    
+                    if similar_hash_id == hash_id:
+                        
+                        continue
+                        
+                    
+                    if similar_hash_id not in similar_hash_ids_to_distances or distance < similar_hash_ids_to_distances[ similar_hash_id ]:
+                        
+                        similar_hash_ids_to_distances[ similar_hash_id ] = distance
+                        
+                    
+                
+            
+        
+        return { hash_id : list( similar_hash_ids_to_distances.items() ) for ( hash_id, similar_hash_ids_to_distances ) in hash_ids_to_similar_hash_ids_to_distances.items() }
+        
+    
     def SetPixelHash( self, hash_id: int, pixel_hash_id: int ):
         
         self.ClearPixelHash( hash_id )
@@ -1,5 +1,7 @@
 import collections
+import re
 import sqlite3
+import string
 import typing
 
 from hydrus.core import HydrusConstants as HC
@@ -24,17 +26,67 @@ from hydrus.client.metadata import ClientTags
 MIN_CACHED_INTEGER = - ( 2 ** 63 )
 MAX_CACHED_INTEGER = ( 2 ** 63 ) - 1
 
+FTS4_SIMPLE_TOKEN_RE = re.compile( '[0-9A-Za-z\u0080-\U0010FFFF]+' )
+FTS4_SIMPLE_CASE_FOLD = str.maketrans( string.ascii_uppercase, string.ascii_lowercase )
+
 def CanCacheInteger( num ):
     
     return MIN_CACHED_INTEGER <= num <= MAX_CACHED_INTEGER
     
 
+def ConvertSuffixWildcardToReversedFTS4Parameter( wildcard ):
+    
+    # '*amus' is 'suma*' in the reversed cache, which fts4 can do fast
+    # the last word of an fts4 phrase is the prefix one, so we trim any trailing separator off. the LIKE does the proper check
+    
+    if wildcard.endswith( '*' ):
+        
+        return None
+        
+    
+    reversed_suffix = wildcard.split( '*' )[-1][::-1]
+    
+    while len( reversed_suffix ) > 0 and not WildcardHasFTS4SearchableCharacters( reversed_suffix[-1] ):
+        
+        reversed_suffix = reversed_suffix[:-1]
+        
+    
+    if len( reversed_suffix ) == 0:
+        
+        return None
+        
+    
+    return '"{}*"'.format( reversed_suffix )
+    
 def ConvertWildcardToSQLiteLikeParameter( wildcard ):
     
     like_param = wildcard.replace( '*', '%' )
     
     return like_param
     
+def FTS4PrefixPhraseMatches( query_tokens: typing.List[ str ], text: str ):
+    
+    # does '"samus a*"' MATCH this text? the last query token is the prefix one, and the phrase may start at any word
+    
+    text_tokens = GetFTS4SimpleTokens( text )
+    
+    num_query_tokens = len( query_tokens )
+    
+    if num_query_tokens == 0:
+        
+        return False
+        
+    
+    for i in range( len( text_tokens ) - num_query_tokens + 1 ):
+        
+        if text_tokens[ i : i + num_query_tokens - 1 ] == query_tokens[ : -1 ] and text_tokens[ i + num_query_tokens - 1 ].startswith( query_tokens[ -1 ] ):
+            
+            return True
+            
+        
+    
+    return False
+    
 def GenerateCombinedFilesIntegerSubtagsTableName( tag_service_id ):
     
     name = 'combined_files_integer_subtags_cache'
@@ -51,6 +103,14 @@ def GenerateCombinedFilesSubtagsFTS4TableName( tag_service_id ):
     
     return subtags_fts4_table_name
     
+def GenerateCombinedFilesSubtagsReversedFTS4TableName( tag_service_id ):
+    
+    name = 'combined_files_subtags_reversed_fts4_cache'
+    
+    subtags_reversed_fts4_table_name = 'external_caches.{}_{}'.format( name, tag_service_id )
+    
+    return subtags_reversed_fts4_table_name
+    
 def GenerateCombinedFilesSubtagsSearchableMapTableName( tag_service_id ):
     
     name = 'combined_files_subtags_searchable_map_cache'
@@ -95,6 +155,16 @@ def GenerateSpecificSubtagsFTS4TableName( file_service_id, tag_service_id ):
     
     return subtags_fts4_table_name
     
+def GenerateSpecificSubtagsReversedFTS4TableName( file_service_id, tag_service_id ):
+    
+    name = 'specific_subtags_reversed_fts4_cache'
+    
+    suffix = '{}_{}'.format( file_service_id, tag_service_id )
+    
+    subtags_reversed_fts4_table_name = 'external_caches.{}_{}'.format( name, suffix )
+    
+    return subtags_reversed_fts4_table_name
+    
 def GenerateSpecificSubtagsSearchableMapTableName( file_service_id, tag_service_id ):
     
     name = 'specific_subtags_searchable_map_cache'
@@ -115,6 +185,25 @@ def GenerateSpecificTagsTableName( file_service_id, tag_service_id ):
     
     return tags_table_name
     
+def GetFTS4SimpleTokens( text: str ):
+    
+    # this is what the fts4 'simple' tokenizer does: words are runs of ascii alphanumerics and anything >= 128, and only ascii is case-folded
+    
+    return FTS4_SIMPLE_TOKEN_RE.findall( text.translate( FTS4_SIMPLE_CASE_FOLD ) )
+    
+def IsNarrowableAutocompleteSubtag( subtag_wildcard: str ):
+    
+    # only the plain 'samus a*' fts4 prefix search can be answered by filtering an earlier 'samus*' result in memory
+    
+    if not subtag_wildcard.endswith( '*' ) or subtag_wildcard.count( '*' ) > 1 or '"' in subtag_wildcard:
+        
+        return False
+        
+    
+    prefix = subtag_wildcard[ : -1 ]
+    
+    return len( prefix ) > 0 and WildcardHasFTS4SearchableCharacters( prefix[ -1 ] )
+    
 def WildcardHasFTS4SearchableCharacters( wildcard: str ):
     
     # fts4 says it can do alphanumeric or unicode with a value >= 128
@@ -129,6 +218,89 @@ def WildcardHasFTS4SearchableCharacters( wildcard: str ):
     
     return False
     
+class AutocompleteResultsCache( object ):
+    
+    MAX_NUM_RESULTS = 16
+    MAX_NUM_TAG_IDS = 262144
+    MAX_TOTAL_NUM_TAG_IDS = 1048576
+    
+    def __init__( self ):
+        
+        # ( search key, subtag prefix ) -> ( tag_ids to searchable subtags, tag_ids with siblings, tag_ids to counts )
+        self._keys_to_results = collections.OrderedDict()
+        
+        self._counts_generation = None
+        
+    
+    def _Cull( self ):
+        
+        total_num_tag_ids = sum( ( len( tag_ids ) for ( tag_ids_to_searchable_subtags, tag_ids, ids_to_count ) in self._keys_to_results.values() ) )
+        
+        while len( self._keys_to_results ) > self.MAX_NUM_RESULTS or ( len( self._keys_to_results ) > 1 and total_num_tag_ids > self.MAX_TOTAL_NUM_TAG_IDS ):
+            
+            ( key, ( tag_ids_to_searchable_subtags, tag_ids, ids_to_count ) ) = self._keys_to_results.popitem( last = False )
+            
+            total_num_tag_ids -= len( tag_ids )
+            
+        
+    
+    def CheckCountsGeneration( self, counts_generation: int ):
+        
+        # any change to the tag counts tables bumps their generation, and then everything we have is stale
+        
+        if counts_generation != self._counts_generation:
+            
+            self._keys_to_results = collections.OrderedDict()
+            
+            self._counts_generation = counts_generation
+            
+        
+    
+    def GetNarrowableResult( self, search_key: tuple, subtag_prefix: str ):
+        
+        # 'samus a' can be filtered from 'samus', so we want the longest cached prefix of what we have been asked for
+        
+        best_key = None
+        
+        for key in self._keys_to_results.keys():
+            
+            ( cached_search_key, cached_subtag_prefix ) = key
+            
+            if cached_search_key == search_key and subtag_prefix.startswith( cached_subtag_prefix ):
+                
+                if best_key is None or len( cached_subtag_prefix ) > len( best_key[1] ):
+                    
+                    best_key = key
+                    
+                
+            
+        
+        if best_key is None:
+            
+            return None
+            
+        
+        self._keys_to_results.move_to_end( best_key )
+        
+        return self._keys_to_results[ best_key ]
+        
+    
+    def SetResult( self, search_key: tuple, subtag_prefix: str, tag_ids_to_searchable_subtags: typing.Dict[ int, str ], tag_ids: typing.Set[ int ], ids_to_count: dict ):
+        
+        if len( tag_ids ) > self.MAX_NUM_TAG_IDS:
+            
+            return
+            
+        
+        key = ( search_key, subtag_prefix )
+        
+        self._keys_to_results[ key ] = ( tag_ids_to_searchable_subtags, tag_ids, ids_to_count )
+        
+        self._keys_to_results.move_to_end( key )
+        
+        self._Cull()
+        
+    
 class ClientDBTagSearch( ClientDBModule.ClientDBModule ):
     
     CAN_REPOPULATE_ALL_MISSING_DATA = True
@@ -145,6 +317,226 @@ class ClientDBTagSearch( ClientDBModule.ClientDBModule ):
         
         self._missing_tag_search_service_pairs = set()
         
+        # the reversed subtag cache is optional--old clients only have it once the user regens it--so we remember which ones exist
+        self._subtags_reversed_fts4_table_names_to_exists = {}
+        
+        self._autocomplete_results_cache = AutocompleteResultsCache()
+        
+    
+    def _GetAutocompleteIdsToCount( self, tag_display_type: int, leaf: ClientDBServices.FileSearchContextLeaf, tag_ids: typing.Collection[ int ], include_current: bool, include_pending: bool, domain_is_cross_referenced: bool, zero_count_ok: bool, job_key = None ):
+        
+        ids_to_count = {}
+        
+        for group_of_tag_ids in HydrusData.SplitIteratorIntoChunks( tag_ids, 1000 ):
+            
+            if job_key is not None and job_key.IsCancelled():
+                
+                return {}
+                
+            
+            ids_to_count.update( self.modules_mappings_counts.GetCounts( tag_display_type, leaf.tag_service_id, leaf.file_service_id, group_of_tag_ids, include_current, include_pending, domain_is_cross_referenced = domain_is_cross_referenced, zero_count_ok = zero_count_ok, job_key = job_key ) )
+            
+        
+        return ids_to_count
+        
+    
+    def _GetAutocompleteIdsToCountNarrowable( self, tag_display_type: int, leaf: ClientDBServices.FileSearchContextLeaf, search_text: str, search_key: tuple, subtag_prefix: str, include_current: bool, include_pending: bool, domain_is_cross_referenced: bool, zero_count_ok: bool, job_key = None ):
+        
+        self._autocomplete_results_cache.CheckCountsGeneration( self.modules_mappings_counts.GetCountsGeneration() )
+        
+        cached_result = self._autocomplete_results_cache.GetNarrowableResult( search_key, subtag_prefix )
+        
+        if cached_result is None:
+            
+            direct_tag_ids = self._GetAutocompleteTagIdsWithoutSiblings( leaf, search_text, False, job_key = job_key )
+            
+            tag_ids_to_searchable_subtags = self._GetTagIdsToSearchableSubtags( leaf, direct_tag_ids )
+            
+            tag_ids = self._GetTagIdsWithSiblingChainMembers( leaf, direct_tag_ids, job_key = job_key )
+            
+            ids_to_count = self._GetAutocompleteIdsToCount( tag_display_type, leaf, tag_ids, include_current, include_pending, domain_is_cross_referenced, zero_count_ok, job_key = job_key )
+            
+        else:
+            
+            ( cached_tag_ids_to_searchable_subtags, cached_tag_ids, cached_ids_to_count ) = cached_result
+            
+            query_tokens = GetFTS4SimpleTokens( subtag_prefix )
+            
+            tag_ids_to_searchable_subtags = { tag_id : searchable_subtag for ( tag_id, searchable_subtag ) in cached_tag_ids_to_searchable_subtags.items() if FTS4PrefixPhraseMatches( query_tokens, searchable_subtag ) }
+            
+            # the siblings are an indexed lookup on a now-smaller set, so we do them fresh
+            tag_ids = self._GetTagIdsWithSiblingChainMembers( leaf, set( tag_ids_to_searchable_subtags.keys() ), job_key = job_key )
+            
+            ids_to_count = { tag_id : cached_ids_to_count[ tag_id ] for tag_id in tag_ids if tag_id in cached_ids_to_count }
+            
+            # a sibling change that did not touch the counts may give us a chain member we never looked up
+            uncached_tag_ids = [ tag_id for tag_id in tag_ids if tag_id not in cached_tag_ids ]
+            
+            if len( uncached_tag_ids ) > 0:
+                
+                ids_to_count.update( self._GetAutocompleteIdsToCount( tag_display_type, leaf, uncached_tag_ids, include_current, include_pending, domain_is_cross_referenced, zero_count_ok, job_key = job_key ) )
+                
+            
+        
+        if job_key is not None and job_key.IsCancelled():
+            
+            return {}
+            
+        
+        self._autocomplete_results_cache.SetResult( search_key, subtag_prefix, tag_ids_to_searchable_subtags, tag_ids, ids_to_count )
+        
+        return ids_to_count
+        
+    
+    def _GetAutocompleteTagIdsWithoutSiblings( self, leaf: ClientDBServices.FileSearchContextLeaf, search_text, exact_match, job_key = None ):
+        
+        if search_text == '':
+            
+            return set()
+            
+        
+        ( namespace, half_complete_searchable_subtag ) = HydrusTags.SplitTag( search_text )
+        
+        if half_complete_searchable_subtag == '':
+            
+            return set()
+            
+        
+        if exact_match:
+            
+            if '*' in namespace or '*' in half_complete_searchable_subtag:
+                
+                return []
+                
+            
+        
+        if '*' in namespace:
+            
+            namespace_ids = self.GetNamespaceIdsFromWildcard( namespace )
+            
+        else:
+            
+            if not self.modules_tags.NamespaceExists( namespace ):
+                
+                return set()
+                
+            
+            namespace_ids = ( self.modules_tags.GetNamespaceId( namespace ), )
+            
+        
+        if half_complete_searchable_subtag == '*':
+            
+            if namespace == '':
+                
+                # hellmode 'get all tags' search
+                
+                tag_ids = self.GetAllTagIds( leaf, job_key = job_key )
+                
+            else:
+                
+                tag_ids = self.GetTagIdsFromNamespaceIds( leaf, namespace_ids, job_key = job_key )
+                
+            
+        else:
+            
+            tag_ids = set()
+            
+            with self._MakeTemporaryIntegerTable( [], 'subtag_id' ) as temp_subtag_ids_table_name:
+                
+                self.GetSubtagIdsFromWildcardIntoTable( leaf.file_service_id, leaf.tag_service_id, half_complete_searchable_subtag, temp_subtag_ids_table_name, job_key = job_key )
+                
+                if namespace == '':
+                    
+                    loop_of_tag_ids = self.GetTagIdsFromSubtagIdsTable( leaf.file_service_id, leaf.tag_service_id, temp_subtag_ids_table_name, job_key = job_key )
+                    
+                else:
+                    
+                    with self._MakeTemporaryIntegerTable( namespace_ids, 'namespace_id' ) as temp_namespace_ids_table_name:
+                        
+                        loop_of_tag_ids = self.GetTagIdsFromNamespaceIdsSubtagIdsTables( leaf.file_service_id, leaf.tag_service_id, temp_namespace_ids_table_name, temp_subtag_ids_table_name, job_key = job_key )
+                        
+                    
+                
+                tag_ids.update( loop_of_tag_ids )
+                
+            
+        
+        if not isinstance( tag_ids, set ):
+            
+            tag_ids = set( tag_ids )
+            
+        
+        return tag_ids
+        
+    
+    def _GetSubtagIdCursorFromWildcard( self, file_service_id: int, tag_service_id: int, subtag_wildcard ):
+        
+        subtags_fts4_table_name = self.GetSubtagsFTS4TableName( file_service_id, tag_service_id )
+        
+        wildcard_has_fts4_searchable_characters = WildcardHasFTS4SearchableCharacters( subtag_wildcard )
+        
+        if subtag_wildcard == '*':
+            
+            # hellmode, but shouldn't be called normally
+            cursor = self._Execute( 'SELECT docid FROM {};'.format( subtags_fts4_table_name ) )
+            
+        elif ClientSearch.IsComplexWildcard( subtag_wildcard ) or not wildcard_has_fts4_searchable_characters:
+            
+            # FTS4 does not support complex wildcards, so instead we'll search our raw subtags
+            # however, since we want to search 'searchable' text, we use the 'searchable subtags map' to cross between real and searchable
+            
+            like_param = ConvertWildcardToSQLiteLikeParameter( subtag_wildcard )
+            
+            subtags_reversed_fts4_table_name = self.GetSubtagsReversedFTS4TableName( file_service_id, tag_service_id )
+            
+            reversed_fts4_param = ConvertSuffixWildcardToReversedFTS4Parameter( subtag_wildcard )
+            
+            if subtag_wildcard.startswith( '*' ) and reversed_fts4_param is not None and self._SubtagsReversedFTS4Exists( subtags_reversed_fts4_table_name ):
+                
+                # '*amus' or '*am*us' can search the reversed cache for 'suma*' and then LIKE the reversed wildcard to be sure
+                
+                reversed_like_param = ConvertWildcardToSQLiteLikeParameter( subtag_wildcard[::-1] )
+                
+                query = 'SELECT docid FROM {} WHERE subtag MATCH ? AND subtag LIKE ?;'.format( subtags_reversed_fts4_table_name )
+                
+                cursor = self._Execute( query, ( reversed_fts4_param, reversed_like_param ) )
+                
+            elif subtag_wildcard.startswith( '*' ) or not wildcard_has_fts4_searchable_characters:
+                
+                # this is a SCAN, but there we go
+                # the reversed cache covers '*amus', but '*amu*' still has no fixed end to hang off
+                
+                query = 'SELECT docid FROM {} WHERE subtag LIKE ?;'.format( subtags_fts4_table_name )
+                
+                cursor = self._Execute( query, ( like_param, ) )
+                
+            else:
+                
+                # we have an optimisation here--rather than searching all subtags for bl*ah, let's search all the bl* subtags for bl*ah!
+                
+                prefix_fts4_wildcard = subtag_wildcard.split( '*' )[0]
+                
+                prefix_fts4_wildcard_param = '"{}*"'.format( prefix_fts4_wildcard )
+                
+                query = 'SELECT docid FROM {} WHERE subtag MATCH ? AND subtag LIKE ?;'.format( subtags_fts4_table_name )
+                
+                cursor = self._Execute( query, ( prefix_fts4_wildcard_param, like_param ) )
+                
+            
+        else:
+            
+            # we want the " " wrapping our search text to keep whitespace words connected and in order
+            # "samus ar*" should not match "around samus"
+            
+            # simple 'sam*' style subtag, so we can search fts4 no prob
+            
+            subtags_fts4_param = '"{}"'.format( subtag_wildcard )
+            
+            cursor = self._Execute( 'SELECT docid FROM {} WHERE subtag MATCH ?;'.format( subtags_fts4_table_name ), ( subtags_fts4_param, ) )
+            
+        
+        return cursor
+        
     
     def _GetServiceIndexGenerationDictSingle( self, file_service_id, tag_service_id ) -> dict:
         
@@ -228,7 +620,55 @@ class ClientDBTagSearch( ClientDBModule.ClientDBModule ):
     
     def _GetServiceIdsWeGenerateDynamicTablesFor( self ):
         
-        return self.modules_services.GetServiceIds( HC.REAL_TAG_SERVICES )
+        return self.modules_services.GetServiceIds( HC.REAL_TAG_SERVICES )
+        
+    
+    def _GetTagIdsToSearchableSubtags( self, leaf: ClientDBServices.FileSearchContextLeaf, tag_ids: typing.Collection[ int ] ):
+        
+        tags_table_name = self.GetTagsTableName( leaf.file_service_id, leaf.tag_service_id )
+        subtags_fts4_table_name = self.GetSubtagsFTS4TableName( leaf.file_service_id, leaf.tag_service_id )
+        
+        with self._MakeTemporaryIntegerTable( tag_ids, 'tag_id' ) as temp_tag_ids_table_name:
+            
+            # the fts4 table holds the searchable subtag, which is the text we matched against
+            tag_ids_to_searchable_subtags = dict( self._Execute( 'SELECT tag_id, subtag FROM {} CROSS JOIN {} USING ( tag_id ) CROSS JOIN {} ON ( subtag_id = docid );'.format( temp_tag_ids_table_name, tags_table_name, subtags_fts4_table_name ) ) )
+            
+        
+        return tag_ids_to_searchable_subtags
+        
+    
+    def _GetTagIdsWithSiblingChainMembers( self, leaf: ClientDBServices.FileSearchContextLeaf, tag_ids: typing.Set[ int ], job_key = None ):
+        
+        tag_ids_without_siblings = list( tag_ids )
+        
+        tag_ids = set( tag_ids )
+        
+        seen_ideal_tag_ids = collections.defaultdict( set )
+        
+        for batch_of_tag_ids in HydrusData.SplitListIntoChunks( tag_ids_without_siblings, 10240 ):
+            
+            with self._MakeTemporaryIntegerTable( batch_of_tag_ids, 'tag_id' ) as temp_tag_ids_table_name:
+                
+                if job_key is not None and job_key.IsCancelled():
+                    
+                    return set()
+                    
+                
+                with self._MakeTemporaryIntegerTable( [], 'ideal_tag_id' ) as temp_ideal_tag_ids_table_name:
+                    
+                    self.modules_tag_siblings.FilterChainedIdealsIntoTable( ClientTags.TAG_DISPLAY_ACTUAL, leaf.tag_service_id, temp_tag_ids_table_name, temp_ideal_tag_ids_table_name )
+                    
+                    with self._MakeTemporaryIntegerTable( [], 'tag_id' ) as temp_chained_tag_ids_table_name:
+                        
+                        self.modules_tag_siblings.GetChainsMembersFromIdealsTables( ClientTags.TAG_DISPLAY_ACTUAL, leaf.tag_service_id, temp_ideal_tag_ids_table_name, temp_chained_tag_ids_table_name )
+                        
+                        tag_ids.update( self._STI( self._Execute( 'SELECT tag_id FROM {};'.format( temp_chained_tag_ids_table_name ) ) ) )
+                        
+                    
+                
+            
+        
+        return tag_ids
         
     
     def _RepairRepopulateTables( self, table_names, cursor_transaction_wrapper: HydrusDBBase.DBCursorTransactionWrapper ):
@@ -254,6 +694,16 @@ class ClientDBTagSearch( ClientDBModule.ClientDBModule ):
             
         
     
+    def _SubtagsReversedFTS4Exists( self, subtags_reversed_fts4_table_name ):
+        
+        if subtags_reversed_fts4_table_name not in self._subtags_reversed_fts4_table_names_to_exists:
+            
+            self._subtags_reversed_fts4_table_names_to_exists[ subtags_reversed_fts4_table_name ] = self._TableExists( subtags_reversed_fts4_table_name )
+            
+        
+        return self._subtags_reversed_fts4_table_names_to_exists[ subtags_reversed_fts4_table_name ]
+        
+    
     def AddTags( self, file_service_id, tag_service_id, tag_ids ):
         
         if len( tag_ids ) == 0:
@@ -288,9 +738,12 @@ class ClientDBTagSearch( ClientDBModule.ClientDBModule ):
                 subtag_ids_and_subtags = self._Execute( 'SELECT subtag_id, subtag FROM {} CROSS JOIN {} USING ( tag_id ) CROSS JOIN subtags USING ( subtag_id );'.format( temp_tag_ids_table_name, tags_table_name ) ).fetchall()
                 
                 subtags_fts4_table_name = self.GetSubtagsFTS4TableName( file_service_id, tag_service_id )
+                subtags_reversed_fts4_table_name = self.GetSubtagsReversedFTS4TableName( file_service_id, tag_service_id )
                 subtags_searchable_map_table_name = self.GetSubtagsSearchableMapTableName( file_service_id, tag_service_id )
                 integer_subtags_table_name = self.GetIntegerSubtagsTableName( file_service_id, tag_service_id )
                 
+                subtags_reversed_fts4_exists = self._SubtagsReversedFTS4Exists( subtags_reversed_fts4_table_name )
+                
                 for ( subtag_id, subtag ) in subtag_ids_and_subtags:
                     
                     searchable_subtag = ClientSearch.ConvertSubtagToSearchable( subtag )
@@ -306,6 +759,11 @@ class ClientDBTagSearch( ClientDBModule.ClientDBModule ):
                     
                     self._Execute( 'INSERT OR IGNORE INTO {} ( docid, subtag ) VALUES ( ?, ? );'.format( subtags_fts4_table_name ), ( subtag_id, searchable_subtag ) )
                     
+                    if subtags_reversed_fts4_exists:
+                        
+                        self._Execute( 'INSERT OR IGNORE INTO {} ( docid, subtag ) VALUES ( ?, ? );'.format( subtags_reversed_fts4_table_name ), ( subtag_id, searchable_subtag[::-1] ) )
+                        
+                    
                     if subtag.isdecimal():
                         
                         try:
@@ -350,6 +808,7 @@ class ClientDBTagSearch( ClientDBModule.ClientDBModule ):
         
         tags_table_name = self.GetTagsTableName( file_service_id, tag_service_id )
         subtags_fts4_table_name = self.GetSubtagsFTS4TableName( file_service_id, tag_service_id )
+        subtags_reversed_fts4_table_name = self.GetSubtagsReversedFTS4TableName( file_service_id, tag_service_id )
         subtags_searchable_map_table_name = self.GetSubtagsSearchableMapTableName( file_service_id, tag_service_id )
         integer_subtags_table_name = self.GetIntegerSubtagsTableName( file_service_id, tag_service_id )
         
@@ -386,6 +845,11 @@ class ClientDBTagSearch( ClientDBModule.ClientDBModule ):
                 self._ExecuteMany( 'DELETE FROM {} WHERE subtag_id = ?;'.format( subtags_searchable_map_table_name ), ( ( subtag_id, ) for subtag_id in deletee_subtag_ids ) )
                 self._ExecuteMany( 'DELETE FROM {} WHERE subtag_id = ?;'.format( integer_subtags_table_name ), ( ( subtag_id, ) for subtag_id in deletee_subtag_ids ) )
                 
+                if self._SubtagsReversedFTS4Exists( subtags_reversed_fts4_table_name ):
+                    
+                    self._ExecuteMany( 'DELETE FROM {} WHERE docid = ?;'.format( subtags_reversed_fts4_table_name ), ( ( subtag_id, ) for subtag_id in deletee_subtag_ids ) )
+                    
+                
             
         
     
@@ -399,6 +863,12 @@ class ClientDBTagSearch( ClientDBModule.ClientDBModule ):
         
         self._Execute( 'DROP TABLE IF EXISTS {};'.format( subtags_fts4_table_name ) )
         
+        subtags_reversed_fts4_table_name = self.GetSubtagsReversedFTS4TableName( file_service_id, tag_service_id )
+        
+        self._Execute( 'DROP TABLE IF EXISTS {};'.format( subtags_reversed_fts4_table_name ) )
+        
+        self._subtags_reversed_fts4_table_names_to_exists[ subtags_reversed_fts4_table_name ] = False
+        
         subtags_searchable_map_table_name = self.GetSubtagsSearchableMapTableName( file_service_id, tag_service_id )
         
         self._Execute( 'DROP TABLE IF EXISTS {};'.format( subtags_searchable_map_table_name ) )
@@ -431,6 +901,14 @@ class ClientDBTagSearch( ClientDBModule.ClientDBModule ):
             self._CreateIndex( table_name, columns, unique = unique )
             
         
+        # new caches get the reversed subtags from the start. it isn't in the generation dict, so older clients don't see it as missing
+        
+        subtags_reversed_fts4_table_name = self.GetSubtagsReversedFTS4TableName( file_service_id, tag_service_id )
+        
+        self._Execute( 'CREATE VIRTUAL TABLE IF NOT EXISTS {} USING fts4( subtag );'.format( subtags_reversed_fts4_table_name ) )
+        
+        self._subtags_reversed_fts4_table_names_to_exists[ subtags_reversed_fts4_table_name ] = True
+        
     
     def GetAllTagIds( self, leaf: ClientDBServices.FileSearchContextLeaf, job_key = None ):
         
@@ -495,43 +973,45 @@ class ClientDBTagSearch( ClientDBModule.ClientDBModule ):
         
         for leaf in file_search_context_branch.IterateLeaves():
             
-            tag_ids = self.GetAutocompleteTagIds( tag_display_type, leaf, search_text, exact_match, job_key = job_key )
+            domain_is_cross_referenced = leaf.file_service_id != self.modules_services.combined_deleted_file_service_id
+            
+            ( namespace, half_complete_searchable_subtag ) = HydrusTags.SplitTag( search_text )
+            
+            we_can_narrow = not exact_match and '*' not in namespace and IsNarrowableAutocompleteSubtag( half_complete_searchable_subtag ) and leaf.tag_service_id != self.modules_services.combined_tag_service_id
             
             if ':' not in search_text and search_namespaces_into_full_tags and not exact_match:
                 
-                # 'char' -> 'character:samus aran'
+                we_can_narrow = False
                 
-                special_search_text = '{}*:*'.format( search_text )
+            
+            if we_can_narrow:
                 
-                tag_ids.update( self.GetAutocompleteTagIds( tag_display_type, leaf, special_search_text, exact_match, job_key = job_key ) )
+                # typing 'samus a' after 'samus' is the common case, and we can filter the 'samus' result in memory rather than hitting fts4 and the counts again
                 
-            
-            if job_key is not None and job_key.IsCancelled():
+                search_key = ( tag_display_type, leaf.file_service_id, leaf.tag_service_id, namespace, include_current, include_pending, domain_is_cross_referenced, zero_count_ok )
+                subtag_prefix = half_complete_searchable_subtag[ : -1 ]
                 
-                return []
+                ids_to_count = self._GetAutocompleteIdsToCountNarrowable( tag_display_type, leaf, search_text, search_key, subtag_prefix, include_current, include_pending, domain_is_cross_referenced, zero_count_ok, job_key = job_key )
                 
-            
-            domain_is_cross_referenced = leaf.file_service_id != self.modules_services.combined_deleted_file_service_id
-            
-            for group_of_tag_ids in HydrusData.SplitIteratorIntoChunks( tag_ids, 1000 ):
+            else:
                 
-                if job_key is not None and job_key.IsCancelled():
+                tag_ids = self.GetAutocompleteTagIds( tag_display_type, leaf, search_text, exact_match, job_key = job_key )
+                
+                if ':' not in search_text and search_namespaces_into_full_tags and not exact_match:
                     
-                    return []
+                    # 'char' -> 'character:samus aran'
                     
-                
-                ids_to_count = self.modules_mappings_counts.GetCounts( tag_display_type, leaf.tag_service_id, leaf.file_service_id, group_of_tag_ids, include_current, include_pending, domain_is_cross_referenced = domain_is_cross_referenced, zero_count_ok = zero_count_ok, job_key = job_key )
-                
-                if len( ids_to_count ) == 0:
+                    special_search_text = '{}*:*'.format( search_text )
                     
-                    continue
+                    tag_ids.update( self.GetAutocompleteTagIds( tag_display_type, leaf, special_search_text, exact_match, job_key = job_key ) )
                     
                 
-                #
-                
-                predicates = self.modules_tag_display.GeneratePredicatesFromTagIdsAndCounts( tag_display_type, display_tag_service_id, ids_to_count, inclusive, job_key = job_key )
+                if job_key is not None and job_key.IsCancelled():
+                    
+                    return []
+                    
                 
-                all_predicates.extend( predicates )
+                ids_to_count = self._GetAutocompleteIdsToCount( tag_display_type, leaf, tag_ids, include_current, include_pending, domain_is_cross_referenced, zero_count_ok, job_key = job_key )
                 
             
             if job_key is not None and job_key.IsCancelled():
@@ -539,120 +1019,33 @@ class ClientDBTagSearch( ClientDBModule.ClientDBModule ):
                 return []
                 
             
-        
-        predicates = ClientSearch.MergePredicates( all_predicates )
-        
-        return predicates
-        
-    
-    def GetAutocompleteTagIds( self, tag_display_type: int, leaf: ClientDBServices.FileSearchContextLeaf, search_text, exact_match, job_key = None ):
-        
-        if search_text == '':
-            
-            return set()
-            
-        
-        ( namespace, half_complete_searchable_subtag ) = HydrusTags.SplitTag( search_text )
-        
-        if half_complete_searchable_subtag == '':
-            
-            return set()
-            
-        
-        if exact_match:
-            
-            if '*' in namespace or '*' in half_complete_searchable_subtag:
-                
-                return []
-                
-            
-        
-        if '*' in namespace:
-            
-            namespace_ids = self.GetNamespaceIdsFromWildcard( namespace )
-            
-        else:
-            
-            if not self.modules_tags.NamespaceExists( namespace ):
-                
-                return set()
-                
-            
-            namespace_ids = ( self.modules_tags.GetNamespaceId( namespace ), )
-            
-        
-        if half_complete_searchable_subtag == '*':
-            
-            if namespace == '':
-                
-                # hellmode 'get all tags' search
+            if len( ids_to_count ) == 0:
                 
-                tag_ids = self.GetAllTagIds( leaf, job_key = job_key )
-                
-            else:
-                
-                tag_ids = self.GetTagIdsFromNamespaceIds( leaf, namespace_ids, job_key = job_key )
+                continue
                 
             
-        else:
+            predicates = self.modules_tag_display.GeneratePredicatesFromTagIdsAndCounts( tag_display_type, display_tag_service_id, ids_to_count, inclusive, job_key = job_key )
             
-            tag_ids = set()
+            all_predicates.extend( predicates )
             
-            with self._MakeTemporaryIntegerTable( [], 'subtag_id' ) as temp_subtag_ids_table_name:
-                
-                self.GetSubtagIdsFromWildcardIntoTable( leaf.file_service_id, leaf.tag_service_id, half_complete_searchable_subtag, temp_subtag_ids_table_name, job_key = job_key )
-                
-                if namespace == '':
-                    
-                    loop_of_tag_ids = self.GetTagIdsFromSubtagIdsTable( leaf.file_service_id, leaf.tag_service_id, temp_subtag_ids_table_name, job_key = job_key )
-                    
-                else:
-                    
-                    with self._MakeTemporaryIntegerTable( namespace_ids, 'namespace_id' ) as temp_namespace_ids_table_name:
-                        
-                        loop_of_tag_ids = self.GetTagIdsFromNamespaceIdsSubtagIdsTables( leaf.file_service_id, leaf.tag_service_id, temp_namespace_ids_table_name, temp_subtag_ids_table_name, job_key = job_key )
-                        
-                    
+            if job_key is not None and job_key.IsCancelled():
                 
-                tag_ids.update( loop_of_tag_ids )
+                return []
                 
             
         
-        # now fetch siblings, add to set
+        predicates = ClientSearch.MergePredicates( all_predicates )
         
-        if not isinstance( tag_ids, set ):
-            
-            tag_ids = set( tag_ids )
-            
+        return predicates
         
-        tag_ids_without_siblings = list( tag_ids )
+    
+    def GetAutocompleteTagIds( self, tag_display_type: int, leaf: ClientDBServices.FileSearchContextLeaf, search_text, exact_match, job_key = None ):
         
-        seen_ideal_tag_ids = collections.defaultdict( set )
+        tag_ids = self._GetAutocompleteTagIdsWithoutSiblings( leaf, search_text, exact_match, job_key = job_key )
         
-        for batch_of_tag_ids in HydrusData.SplitListIntoChunks( tag_ids_without_siblings, 10240 ):
-            
-            with self._MakeTemporaryIntegerTable( batch_of_tag_ids, 'tag_id' ) as temp_tag_ids_table_name:
-                
-                if job_key is not None and job_key.IsCancelled():
-                    
-                    return set()
-                    
-                
-                with self._MakeTemporaryIntegerTable( [], 'ideal_tag_id' ) as temp_ideal_tag_ids_table_name:
-                    
-                    self.modules_tag_siblings.FilterChainedIdealsIntoTable( ClientTags.TAG_DISPLAY_ACTUAL, leaf.tag_service_id, temp_tag_ids_table_name, temp_ideal_tag_ids_table_name )
-                    
-                    with self._MakeTemporaryIntegerTable( [], 'tag_id' ) as temp_chained_tag_ids_table_name:
-                        
-                        self.modules_tag_siblings.GetChainsMembersFromIdealsTables( ClientTags.TAG_DISPLAY_ACTUAL, leaf.tag_service_id, temp_ideal_tag_ids_table_name, temp_chained_tag_ids_table_name )
-                        
-                        tag_ids.update( self._STI( self._Execute( 'SELECT tag_id FROM {};'.format( temp_chained_tag_ids_table_name ) ) ) )
-                        
-                    
-                
-            
+        # now fetch siblings, add to set
         
-        return tag_ids
+        return self._GetTagIdsWithSiblingChainMembers( leaf, tag_ids, job_key = job_key )
         
     
     def GetIntegerSubtagsTableName( self, file_service_id, tag_service_id ):
@@ -803,57 +1196,7 @@ class ClientDBTagSearch( ClientDBModule.ClientDBModule ):
             
             if '*' in subtag_wildcard:
                 
-                subtags_fts4_table_name = self.GetSubtagsFTS4TableName( file_service_id, search_tag_service_id )
-                
-                wildcard_has_fts4_searchable_characters = WildcardHasFTS4SearchableCharacters( subtag_wildcard )
-                
-                if subtag_wildcard == '*':
-                    
-                    # hellmode, but shouldn't be called normally
-                    cursor = self._Execute( 'SELECT docid FROM {};'.format( subtags_fts4_table_name ) )
-                    
-                elif ClientSearch.IsComplexWildcard( subtag_wildcard ) or not wildcard_has_fts4_searchable_characters:
-                    
-                    # FTS4 does not support complex wildcards, so instead we'll search our raw subtags
-                    # however, since we want to search 'searchable' text, we use the 'searchable subtags map' to cross between real and searchable
-                    
-                    like_param = ConvertWildcardToSQLiteLikeParameter( subtag_wildcard )
-                    
-                    if subtag_wildcard.startswith( '*' ) or not wildcard_has_fts4_searchable_characters:
-                        
-                        # this is a SCAN, but there we go
-                        # a potential optimisation here, in future, is to store fts4 of subtags reversed, then for '*amus', we can just search that reverse cache for 'suma*'
-                        # and this would only double the size of the fts4 cache, the largest cache in the whole db! a steal!
-                        # it also would not fix '*amu*', but with some cleverness could speed up '*amus ar*'
-                        
-                        query = 'SELECT docid FROM {} WHERE subtag LIKE ?;'.format( subtags_fts4_table_name )
-                        
-                        cursor = self._Execute( query, ( like_param, ) )
-                        
-                    else:
-                        
-                        # we have an optimisation here--rather than searching all subtags for bl*ah, let's search all the bl* subtags for bl*ah!
-                        
-                        prefix_fts4_wildcard = subtag_wildcard.split( '*' )[0]
-                        
-                        prefix_fts4_wildcard_param = '"{}*"'.format( prefix_fts4_wildcard )
-                        
-                        query = 'SELECT docid FROM {} WHERE subtag MATCH ? AND subtag LIKE ?;'.format( subtags_fts4_table_name )
-                        
-                        cursor = self._Execute( query, ( prefix_fts4_wildcard_param, like_param ) )
-                        
-                    
-                else:
-                    
-                    # we want the " " wrapping our search text to keep whitespace words connected and in order
-                    # "samus ar*" should not match "around samus"
-                    
-                    # simple 'sam*' style subtag, so we can search fts4 no prob
-                    
-                    subtags_fts4_param = '"{}"'.format( subtag_wildcard )
-                    
-                    cursor = self._Execute( 'SELECT docid FROM {} WHERE subtag MATCH ?;'.format( subtags_fts4_table_name ), ( subtags_fts4_param, ) )
-                    
+                cursor = self._GetSubtagIdCursorFromWildcard( file_service_id, search_tag_service_id, subtag_wildcard )
                 
                 cancelled_hook = None
                 
@@ -918,57 +1261,7 @@ class ClientDBTagSearch( ClientDBModule.ClientDBModule ):
             
             if '*' in subtag_wildcard:
                 
-                subtags_fts4_table_name = self.GetSubtagsFTS4TableName( file_service_id, search_tag_service_id )
-                
-                wildcard_has_fts4_searchable_characters = WildcardHasFTS4SearchableCharacters( subtag_wildcard )
-                
-                if subtag_wildcard == '*':
-                    
-                    # hellmode, but shouldn't be called normally
-                    cursor = self._Execute( 'SELECT docid FROM {};'.format( subtags_fts4_table_name ) )
-                    
-                elif ClientSearch.IsComplexWildcard( subtag_wildcard ) or not wildcard_has_fts4_searchable_characters:
-                    
-                    # FTS4 does not support complex wildcards, so instead we'll search our raw subtags
-                    # however, since we want to search 'searchable' text, we use the 'searchable subtags map' to cross between real and searchable
-                    
-                    like_param = ConvertWildcardToSQLiteLikeParameter( subtag_wildcard )
-                    
-                    if subtag_wildcard.startswith( '*' ) or not wildcard_has_fts4_searchable_characters:
-                        
-                        # this is a SCAN, but there we go
-                        # a potential optimisation here, in future, is to store fts4 of subtags reversed, then for '*amus', we can just search that reverse cache for 'suma*'
-                        # and this would only double the size of the fts4 cache, the largest cache in the whole db! a steal!
-                        # it also would not fix '*amu*', but with some cleverness could speed up '*amus ar*'
-                        
-                        query = 'SELECT docid FROM {} WHERE subtag LIKE ?;'.format( subtags_fts4_table_name )
-                        
-                        cursor = self._Execute( query, ( like_param, ) )
-                        
-                    else:
-                        
-                        # we have an optimisation here--rather than searching all subtags for bl*ah, let's search all the bl* subtags for bl*ah!
-                        
-                        prefix_fts4_wildcard = subtag_wildcard.split( '*' )[0]
-                        
-                        prefix_fts4_wildcard_param = '"{}*"'.format( prefix_fts4_wildcard )
-                        
-                        query = 'SELECT docid FROM {} WHERE subtag MATCH ? AND subtag LIKE ?;'.format( subtags_fts4_table_name )
-                        
-                        cursor = self._Execute( query, ( prefix_fts4_wildcard_param, like_param ) )
-                        
-                    
-                else:
-                    
-                    # we want the " " wrapping our search text to keep whitespace words connected and in order
-                    # "samus ar*" should not match "around samus"
-                    
-                    # simple 'sam*' style subtag, so we can search fts4 no prob
-                    
-                    subtags_fts4_param = '"{}"'.format( subtag_wildcard )
-                    
-                    cursor = self._Execute( 'SELECT docid FROM {} WHERE subtag MATCH ?;'.format( subtags_fts4_table_name ), ( subtags_fts4_param, ) )
-                    
+                cursor = self._GetSubtagIdCursorFromWildcard( file_service_id, search_tag_service_id, subtag_wildcard )
                 
                 cancelled_hook = None
                 
@@ -1033,6 +1326,25 @@ class ClientDBTagSearch( ClientDBModule.ClientDBModule ):
         return subtags_fts4_table_name
         
     
+    def GetSubtagsReversedFTS4TableName( self, file_service_id, tag_service_id ):
+        
+        if file_service_id == self.modules_services.combined_file_service_id:
+            
+            subtags_reversed_fts4_table_name = GenerateCombinedFilesSubtagsReversedFTS4TableName( tag_service_id )
+            
+        else:
+            
+            if self.modules_services.FileServiceIsCoveredByAllLocalFiles( file_service_id ):
+                
+                file_service_id = self.modules_services.combined_local_file_service_id
+                
+            
+            subtags_reversed_fts4_table_name = GenerateSpecificSubtagsReversedFTS4TableName( file_service_id, tag_service_id )
+            
+        
+        return subtags_reversed_fts4_table_name
+        
+    
     def GetSubtagsSearchableMapTableName( self, file_service_id, tag_service_id ):
         
         if file_service_id == self.modules_services.combined_file_service_id:
@@ -1075,6 +1387,13 @@ class ClientDBTagSearch( ClientDBModule.ClientDBModule ):
                     tables_and_columns.append( ( tags_table_name, 'tag_id' ) )
                     tables_and_columns.append( ( subtags_fts4_table_name, 'docid' ) )
                     
+                    subtags_reversed_fts4_table_name = self.GetSubtagsReversedFTS4TableName( file_service_id, tag_service_id )
+                    
+                    if self._SubtagsReversedFTS4Exists( subtags_reversed_fts4_table_name ):
+                        
+                        tables_and_columns.append( ( subtags_reversed_fts4_table_name, 'docid' ) )
+                        
+                    
                 
             
         
@@ -1288,6 +1607,44 @@ class ClientDBTagSearch( ClientDBModule.ClientDBModule ):
         return result is not None
         
     
+    def RegenerateReversedSubtags( self, file_service_id, tag_service_id, status_hook = None ):
+        
+        # this makes the optional reversed cache if it does not exist yet
+        
+        subtags_fts4_table_name = self.GetSubtagsFTS4TableName( file_service_id, tag_service_id )
+        subtags_reversed_fts4_table_name = self.GetSubtagsReversedFTS4TableName( file_service_id, tag_service_id )
+        
+        self._Execute( 'DROP TABLE IF EXISTS {};'.format( subtags_reversed_fts4_table_name ) )
+        
+        self._Execute( 'CREATE VIRTUAL TABLE {} USING fts4( subtag );'.format( subtags_reversed_fts4_table_name ) )
+        
+        self._subtags_reversed_fts4_table_names_to_exists[ subtags_reversed_fts4_table_name ] = True
+        
+        query = 'SELECT docid FROM {};'.format( subtags_fts4_table_name )
+        
+        BLOCK_SIZE = 10000
+        
+        for ( group_of_subtag_ids, num_done, num_to_do ) in HydrusDB.ReadLargeIdQueryInSeparateChunks( self._c, query, BLOCK_SIZE ):
+            
+            with self._MakeTemporaryIntegerTable( group_of_subtag_ids, 'docid' ) as temp_subtag_ids_table_name:
+                
+                # temp subtags to searchable subtags
+                docids_and_searchable_subtags = self._Execute( 'SELECT docid, subtag FROM {} CROSS JOIN {} USING ( docid );'.format( temp_subtag_ids_table_name, subtags_fts4_table_name ) ).fetchall()
+                
+            
+            self._ExecuteMany( 'INSERT OR IGNORE INTO {} ( docid, subtag ) VALUES ( ?, ? );'.format( subtags_reversed_fts4_table_name ), ( ( docid, searchable_subtag[::-1] ) for ( docid, searchable_subtag ) in docids_and_searchable_subtags ) )
+            
+            message = HydrusData.ConvertValueRangeToPrettyString( num_done, num_to_do )
+            
+            HG.client_controller.frame_splash_status.SetSubtext( message )
+            
+            if status_hook is not None:
+                
+                status_hook( message )
+                
+            
+        
+    
     def RegenerateSearchableSubtagMap( self, file_service_id, tag_service_id, status_hook = None ):
         
         subtags_fts4_table_name = self.GetSubtagsFTS4TableName( file_service_id, tag_service_id )
@@ -1337,9 +1694,12 @@ class ClientDBTagSearch( ClientDBModule.ClientDBModule ):
         
         tags_table_name = self.GetTagsTableName( file_service_id, tag_service_id )
         subtags_fts4_table_name = self.GetSubtagsFTS4TableName( file_service_id, tag_service_id )
+        subtags_reversed_fts4_table_name = self.GetSubtagsReversedFTS4TableName( file_service_id, tag_service_id )
         subtags_searchable_map_table_name = self.GetSubtagsSearchableMapTableName( file_service_id, tag_service_id )
         integer_subtags_table_name = self.GetIntegerSubtagsTableName( file_service_id, tag_service_id )
         
+        subtags_reversed_fts4_exists = self._SubtagsReversedFTS4Exists( subtags_reversed_fts4_table_name )
+        
         missing_subtag_ids = self._STS( self._Execute( 'SELECT subtag_id FROM {} EXCEPT SELECT docid FROM {};'.format( tags_table_name, subtags_fts4_table_name ) ) )
         
         for subtag_id in missing_subtag_ids:
@@ -1366,6 +1726,11 @@ class ClientDBTagSearch( ClientDBModule.ClientDBModule ):
             
             self._Execute( 'INSERT OR IGNORE INTO {} ( docid, subtag ) VALUES ( ?, ? );'.format( subtags_fts4_table_name ), ( subtag_id, searchable_subtag ) )
             
+            if subtags_reversed_fts4_exists:
+                
+                self._Execute( 'INSERT OR IGNORE INTO {} ( docid, subtag ) VALUES ( ?, ? );'.format( subtags_reversed_fts4_table_name ), ( subtag_id, searchable_subtag[::-1] ) )
+                
+            
             if subtag.isdecimal():
                 
                 try:
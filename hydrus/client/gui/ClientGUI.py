@@ -761,6 +761,7 @@ class FrameGUI( ClientGUITopLevelWindows.MainFrameThatResizes, CAC.ApplicationCo
         library_versions.append( ( 'db cache size per file', '{}MB'.format( HG.db_cache_size ) ) )
         library_versions.append( ( 'db journal mode', HG.db_journal_mode ) )
         library_versions.append( ( 'db synchronous mode', str( HG.db_synchronous ) ) )
+        library_versions.append( ( 'db parallel read connections', str( HG.db_num_read_connections ) ) )
         library_versions.append( ( 'db transaction commit period', '{}'.format( HydrusData.TimeDeltaToPrettyTimeDelta( HG.db_cache_size ) ) ) )
         library_versions.append( ( 'db using memory for temp?', str( HG.no_db_temp_files ) ) )
         
@@ -1673,6 +1674,28 @@ class FrameGUI( ClientGUITopLevelWindows.MainFrameThatResizes, CAC.ApplicationCo
         HydrusData.DebugPrint( 'garbage printing finished' )
         
     
+    def _DebugShowCacheStatistics( self ):
+        
+        for name in ( 'images', 'image_tiles', 'thumbnail' ):
+            
+            statistics = self._controller.GetCache( name ).GetStatistics()
+            
+            num_lookups = statistics[ 'num_hits' ] + statistics[ 'num_misses' ]
+            
+            message = '{}: {} items, {}, {} hits, {} misses ({} hit rate), {} evictions'.format(
+                statistics[ 'name' ],
+                HydrusData.ToHumanInt( statistics[ 'num_items' ] ),
+                HydrusData.ConvertValueRangeToBytes( statistics[ 'estimated_memory_footprint' ], statistics[ 'size_limit' ] ),
+                HydrusData.ToHumanInt( statistics[ 'num_hits' ] ),
+                HydrusData.ToHumanInt( statistics[ 'num_misses' ] ),
+                HydrusData.ConvertFloatToPercentage( statistics[ 'num_hits' ] / num_lookups ) if num_lookups > 0 else 'no',
+                HydrusData.ToHumanInt( statistics[ 'num_evictions' ] )
+            )
+            
+            HydrusData.ShowText( message )
+            
+        
+    
     def _DebugShowScheduledJobs( self ):
         
         self._controller.DebugShowScheduledJobs()
@@ -2929,6 +2952,8 @@ class FrameGUI( ClientGUITopLevelWindows.MainFrameThatResizes, CAC.ApplicationCo
                         
                         ClientGUIMenus.AppendMenuItem( submenu, 'change anonymisation period', 'Change the account history nullification period for this service.', self._ManageServiceOptionsNullificationPeriod, service_key )
                         
+                        ClientGUIMenus.AppendMenuItem( submenu, 'change update format', 'Change the file format of new updates for this service.', self._ManageServiceOptionsUpdateFormat, service_key )
+                        
                         if service_type == HC.TAG_REPOSITORY:
                             
                             ClientGUIMenus.AppendMenuItem( submenu, 'edit tag filter', 'Change the tag filter for this service.', self._ManageServiceOptionsTagFilter, service_key )
@@ -3088,6 +3113,7 @@ class FrameGUI( ClientGUITopLevelWindows.MainFrameThatResizes, CAC.ApplicationCo
         ClientGUIMenus.AppendSeparator( file_maintenance_menu )
         
         ClientGUIMenus.AppendMenuItem( file_maintenance_menu, 'clear orphan files', 'Clear out surplus files that have found their way into the file structure.', self._ClearOrphanFiles )
+        ClientGUIMenus.AppendMenuItem( file_maintenance_menu, 'switch thumbnail storage between folders and packs', 'Store your thumbnails in a few large pack files rather than one file per thumbnail, or switch them back.', self._MoveThumbnailStorage )
         
         ClientGUIMenus.AppendMenu( menu, file_maintenance_menu, 'file maintenance' )
         
@@ -3129,6 +3155,7 @@ class FrameGUI( ClientGUITopLevelWindows.MainFrameThatResizes, CAC.ApplicationCo
         ClientGUIMenus.AppendMenuItem( regen_submenu, 'tag text search cache', 'Delete and regenerate the cache hydrus uses for fast tag search.', self._RegenerateTagCache )
         ClientGUIMenus.AppendMenuItem( regen_submenu, 'tag text search cache (subtags repopulation)', 'Repopulate the subtags for the cache hydrus uses for fast tag search.', self._RepopulateTagCacheMissingSubtags )
         ClientGUIMenus.AppendMenuItem( regen_submenu, 'tag text search cache (searchable subtag maps)', 'Regenerate the searchable subtag maps.', self._RegenerateTagCacheSearchableSubtagsMaps )
+        ClientGUIMenus.AppendMenuItem( regen_submenu, 'tag text search cache (reversed subtags for fast \'*ending\' search)', 'Create or regenerate the reversed subtags cache.', self._RegenerateTagCacheReversedSubtags )
         
         ClientGUIMenus.AppendSeparator( regen_submenu )
         
@@ -3305,6 +3332,8 @@ class FrameGUI( ClientGUITopLevelWindows.MainFrameThatResizes, CAC.ApplicationCo
         ClientGUIMenus.AppendMenuItem( profiling, 'what is this?', 'Show profile info.', QW.QMessageBox.information, self, 'Profile modes', profile_mode_message )
         ClientGUIMenus.AppendMenuCheckItem( profiling, 'profile mode', 'Run detailed \'profiles\'.', HG.profile_mode, HG.client_controller.FlipProfileMode )
         ClientGUIMenus.AppendMenuCheckItem( profiling, 'query planner mode', 'Run detailed \'query plans\'.', HG.query_planner_mode, HG.client_controller.FlipQueryPlannerMode )
+        ClientGUIMenus.AppendSeparator( profiling )
+        ClientGUIMenus.AppendMenuItem( profiling, 'review db job statistics', 'Show how long db jobs have been waiting and running, and any slow queries.', self._ReviewDBJobStatistics )
         
         ClientGUIMenus.AppendMenu( debug, profiling, 'profiling' )
         
@@ -3383,6 +3412,7 @@ class FrameGUI( ClientGUITopLevelWindows.MainFrameThatResizes, CAC.ApplicationCo
         ClientGUIMenus.AppendMenuItem( memory_actions, 'run slow memory maintenance', 'Tell all the slow caches to maintain themselves.', self._controller.MaintainMemorySlow )
         ClientGUIMenus.AppendMenuItem( memory_actions, 'clear all rendering caches', 'Tell the image rendering system to forget all current images, tiles, and thumbs. This will often free up a bunch of memory immediately.', self._controller.ClearCaches )
         ClientGUIMenus.AppendMenuItem( memory_actions, 'clear thumbnail cache', 'Tell the thumbnail cache to forget everything and redraw all current thumbs.', self._controller.pub, 'reset_thumbnail_cache' )
+        ClientGUIMenus.AppendMenuItem( memory_actions, 'show rendering cache statistics', 'Show how full the image, tile, and thumbnail caches are and how often they are hit.', self._DebugShowCacheStatistics )
         ClientGUIMenus.AppendMenuItem( memory_actions, 'print garbage', 'Print some information about the python garbage to the log.', self._DebugPrintGarbage )
         ClientGUIMenus.AppendMenuItem( memory_actions, 'take garbage snapshot', 'Capture current garbage object counts.', self._DebugTakeGarbageSnapshot )
         ClientGUIMenus.AppendMenuItem( memory_actions, 'show garbage snapshot changes', 'Show object count differences from the last snapshot.', self._DebugShowGarbageDifferences )
@@ -3692,6 +3722,13 @@ class FrameGUI( ClientGUITopLevelWindows.MainFrameThatResizes, CAC.ApplicationCo
         
         ClientGUIMenus.AppendMenuCheckItem( tag_display_maintenance_menu, 'sync tag display during normal time', 'Control whether tag display maintenance can work during normal time.', current_value, func )
         
+        check_manager = ClientGUICommon.CheckboxManagerOptions( 'tag_display_maintenance_bulk_sync' )
+        
+        current_value = check_manager.GetCurrentValue()
+        func = check_manager.Invert
+        
+        ClientGUIMenus.AppendMenuCheckItem( tag_display_maintenance_menu, 'bulk sync during idle time and \'work hard\'', 'Control whether idle time and \'work hard now!\' sync whole sibling/parent chains at a time. This is much faster for large changes, but each job holds the database for longer.', current_value, func )
+        
         ClientGUIMenus.AppendMenu( menu, tag_display_maintenance_menu, 'sibling/parent sync' )
         
         #
@@ -4526,6 +4563,69 @@ class FrameGUI( ClientGUITopLevelWindows.MainFrameThatResizes, CAC.ApplicationCo
             
         
     
+    def _ManageServiceOptionsUpdateFormat( self, service_key ):
+        
+        service = self._controller.services_manager.GetService( service_key )
+        
+        update_format = service.GetUpdateFormat()
+        
+        text = 'New updates are currently made as {}.'.format( HydrusNetwork.update_format_string_lookup.get( update_format, 'unknown' ) )
+        text += os.linesep * 2
+        text += 'Packed binary updates are smaller and much faster to process, but clients older than this version cannot read them, and will pause their sync when they hit one. Only switch to binary once your users have updated. Old updates are not changed.'
+        
+        ( result, was_cancelled ) = ClientGUIDialogsQuick.GetYesNo( self, text, title = 'Choose the update format.', yes_label = 'packed binary', no_label = 'json', check_for_cancelled = True )
+        
+        if was_cancelled:
+            
+            return
+            
+        
+        if result == QW.QDialog.Accepted:
+            
+            update_format = HydrusNetwork.UPDATE_FORMAT_BINARY
+            
+        else:
+            
+            update_format = HydrusNetwork.UPDATE_FORMAT_JSON
+            
+        
+        job_key = ClientThreading.JobKey()
+        
+        job_key.SetStatusTitle( 'setting update format' )
+        job_key.SetVariable( 'popup_text_1', 'uploading\u2026' )
+        
+        self._controller.pub( 'message', job_key )
+        
+        def work_callable():
+            
+            service.Request( HC.POST, 'options_update_format', { 'update_format' : update_format } )
+            
+            return 1
+            
+        
+        def publish_callable( gumpf ):
+            
+            job_key.SetVariable( 'popup_text_1', 'done!' )
+            
+            job_key.Finish()
+            
+            job_key.Delete( 5 )
+            
+            service.SetAccountRefreshDueNow()
+            
+        
+        def errback_ui_cleanup_callable():
+            
+            job_key.SetVariable( 'popup_text_1', 'error!' )
+            
+            job_key.Finish()
+            
+        
+        job = ClientGUIAsync.AsyncQtJob( self, work_callable, publish_callable, errback_ui_cleanup_callable = errback_ui_cleanup_callable )
+        
+        job.start()
+        
+    
     def _ManageServiceOptionsUpdatePeriod( self, service_key ):
         
         service = self._controller.services_manager.GetService( service_key )
@@ -4967,6 +5067,39 @@ class FrameGUI( ClientGUITopLevelWindows.MainFrameThatResizes, CAC.ApplicationCo
             
         
     
+    def _MoveThumbnailStorage( self ):
+        
+        use_packs = not self._controller.client_files_manager.UsingPackedThumbnails()
+        
+        if use_packs:
+            
+            text = 'This will move all your thumbnails out of their folders and into a few large pack files in your thumbnail locations. Big clients will load cold pages of thumbnails faster and your backups will have millions fewer files to check.'
+            
+        else:
+            
+            text = 'This will move all your thumbnails out of their packs and back into one file per thumbnail in your thumbnail folders.'
+            
+        
+        text += os.linesep * 2
+        text += 'This works in small chunks, so you can keep using the client, but it is best to leave it alone until it is done.'
+        
+        result = ClientGUIDialogsQuick.GetYesNo( self, text, yes_label = 'do it', no_label = 'forget it' )
+        
+        if result == QW.QDialog.Accepted:
+            
+            client_files_manager = self._controller.client_files_manager
+            
+            if use_packs:
+                
+                self._controller.CallToThread( client_files_manager.MoveThumbnailsToPacks )
+                
+            else:
+                
+                self._controller.CallToThread( client_files_manager.MoveThumbnailsToFolders )
+                
+            
+        
+    
     def _OpenDBFolder( self ):
         
         HydrusPaths.LaunchDirectory( self._controller.GetDBDir() )
@@ -5297,6 +5430,31 @@ class FrameGUI( ClientGUITopLevelWindows.MainFrameThatResizes, CAC.ApplicationCo
             
         
     
+    def _RegenerateTagCacheReversedSubtags( self ):
+        
+        message = 'This will create or regenerate the fast search cache\'s reversed subtags, for one or all tag services.'
+        message += os.linesep * 2
+        message += 'With it, searches that start with a wildcard, like \'*_eyes\', look up an index instead of scanning every tag. It roughly doubles the size of the tag text search cache. Wildcards with no fixed end, like \'*eye*\', still scan.'
+        message += os.linesep * 2
+        message += 'If you have a lot of tags, it can take a little while, during which the gui may hang.'
+        
+        result = ClientGUIDialogsQuick.GetYesNo( self, message, yes_label = 'do it--now choose which service', no_label = 'forget it' )
+        
+        if result == QW.QDialog.Accepted:
+            
+            try:
+                
+                tag_service_key = GetTagServiceKeyForMaintenance( self )
+                
+            except HydrusExceptions.CancelledException:
+                
+                return
+                
+            
+            self._controller.Write( 'regenerate_reversed_subtags', tag_service_key = tag_service_key )
+            
+        
+    
     def _RegenerateTagCacheSearchableSubtagsMaps( self ):
         
         message = 'This will regenerate the fast search cache\'s \'unusual character logic\' lookup map, for one or all tag services.'
@@ -5542,6 +5700,15 @@ class FrameGUI( ClientGUITopLevelWindows.MainFrameThatResizes, CAC.ApplicationCo
         frame.SetPanel( panel )
         
     
+    def _ReviewDBJobStatistics( self ):
+        
+        frame = ClientGUITopLevelWindowsPanels.FrameThatTakesScrollablePanel( self, 'review db job statistics' )
+        
+        panel = ClientGUIScrolledPanelsReview.ReviewDBJobStatistics( frame, self._controller )
+        
+        frame.SetPanel( panel )
+        
+    
     def _ReviewFileMaintenance( self ):
         
         frame = ClientGUITopLevelWindowsPanels.FrameThatTakesScrollablePanel( self, 'file maintenance' )
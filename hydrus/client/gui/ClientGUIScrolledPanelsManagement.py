@@ -327,6 +327,9 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             self._max_network_jobs = ClientGUICommon.BetterSpinBox( general, min = 1, max = max_network_jobs_max )
             self._max_network_jobs_per_domain = ClientGUICommon.BetterSpinBox( general, min = 1, max = max_network_jobs_per_domain_max )
             
+            self._network_connection_pool_size = ClientGUICommon.BetterSpinBox( general, min = 1, max = 100 )
+            self._network_connection_pool_size.setToolTip( 'How many idle connections to keep open to each host for later jobs to reuse. Reusing a connection skips the connection and TLS handshake, which is slow on some sites.' )
+            
             #
             
             proxy_panel = ClientGUICommon.StaticBox( self, 'proxy settings' )
@@ -356,6 +359,7 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             
             self._max_network_jobs.setValue( self._new_options.GetInteger( 'max_network_jobs' ) )
             self._max_network_jobs_per_domain.setValue( self._new_options.GetInteger( 'max_network_jobs_per_domain' ) )
+            self._network_connection_pool_size.setValue( self._new_options.GetInteger( 'network_connection_pool_size' ) )
             
             #
             
@@ -381,6 +385,7 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             rows.append( ( 'Halt new jobs as long as this many network infrastructure errors on their domain (0 for never wait): ', self._domain_network_infrastructure_error_velocity ) )
             rows.append( ( 'max number of simultaneous active network jobs: ', self._max_network_jobs ) )
             rows.append( ( 'max number of simultaneous active network jobs per domain: ', self._max_network_jobs_per_domain ) )
+            rows.append( ( 'max number of idle connections kept open per host: ', self._network_connection_pool_size ) )
             rows.append( ( 'BUGFIX: verify regular https traffic:', self._verify_regular_https ) )
             
             gridbox = ClientGUICommon.WrapInGrid( general, rows )
@@ -444,6 +449,7 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             self._new_options.SetInteger( 'serverside_bandwidth_wait_time', self._serverside_bandwidth_wait_time.value() )
             self._new_options.SetInteger( 'max_network_jobs', self._max_network_jobs.value() )
             self._new_options.SetInteger( 'max_network_jobs_per_domain', self._max_network_jobs_per_domain.value() )
+            self._new_options.SetInteger( 'network_connection_pool_size', self._network_connection_pool_size.value() )
             
             ( number, time_delta ) = self._domain_network_infrastructure_error_velocity.GetValue()
             
@@ -1710,6 +1716,18 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             
             #
             
+            local_imports = ClientGUICommon.StaticBox( self, 'local file imports' )
+            
+            self._file_import_num_workers = ClientGUICommon.BetterSpinBox( local_imports, min = 1, max = 64 )
+            
+            tt = 'Local file import pages and import folders can hash, decode, and thumbnail several files at once while the database imports them one by one, in order. If you import big folders of files from a fast drive, setting this to your number of cores will get through them much faster, but the client will be doing a lot more work at once.'
+            
+            self._file_import_num_workers.setToolTip( tt )
+            
+            self._file_import_num_workers.setValue( self._new_options.GetInteger( 'file_import_num_workers' ) )
+            
+            #
+            
             rows = []
             
             rows.append( ( 'For \'quiet\' import contexts: import folders, subscriptions, Client API:', self._quiet_fios ) )
@@ -1719,11 +1737,20 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             
             default_fios.Add( gridbox, CC.FLAGS_EXPAND_SIZER_PERPENDICULAR )
             
+            rows = []
+            
+            rows.append( ( 'Number of files to prepare at once: ', self._file_import_num_workers ) )
+            
+            gridbox = ClientGUICommon.WrapInGrid( local_imports, rows )
+            
+            local_imports.Add( gridbox, CC.FLAGS_EXPAND_SIZER_PERPENDICULAR )
+            
             #
             
             vbox = QP.VBoxLayout()
             
             QP.AddToLayout( vbox, default_fios, CC.FLAGS_EXPAND_PERPENDICULAR )
+            QP.AddToLayout( vbox, local_imports, CC.FLAGS_EXPAND_PERPENDICULAR )
             vbox.addStretch( 1 )
             
             self.setLayout( vbox )
@@ -1734,6 +1761,8 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             self._new_options.SetDefaultFileImportOptions( FileImportOptions.IMPORT_TYPE_QUIET, self._quiet_fios.GetFileImportOptions() )
             self._new_options.SetDefaultFileImportOptions( FileImportOptions.IMPORT_TYPE_LOUD, self._loud_fios.GetFileImportOptions() )
             
+            self._new_options.SetInteger( 'file_import_num_workers', self._file_import_num_workers.value() )
+            
         
     
     class _MaintenanceAndProcessingPanel( QW.QWidget ):
@@ -1796,6 +1825,12 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             self._file_maintenance_idle_throttle_velocity.setToolTip( tt )
             self._file_maintenance_active_throttle_velocity.setToolTip( tt )
             
+            self._file_maintenance_num_workers = ClientGUICommon.BetterSpinBox( self._file_maintenance_panel, min = 1, max = 64 )
+            
+            tt = 'Jobs like regenerating thumbnails, similar files data, or checking file integrity can work on several files at once. If you have a lot of maintenance to catch up on, setting this to your number of cores will get through it much faster, but the client will be doing a lot more work at once.'
+            
+            self._file_maintenance_num_workers.setToolTip( tt )
+            
             #
             
             self._idle_normal.setChecked( HC.options[ 'idle_normal' ] )
@@ -1827,6 +1862,8 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             
             self._file_maintenance_active_throttle_velocity.SetValue( file_maintenance_active_throttle_velocity )
             
+            self._file_maintenance_num_workers.setValue( self._new_options.GetInteger( 'file_maintenance_num_workers' ) )
+            
             #
             
             rows = []
@@ -1901,6 +1938,7 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             rows.append( ( 'Idle throttle: ', self._file_maintenance_idle_throttle_velocity ) )
             rows.append( ( 'Run file maintenance during normal time: ', self._file_maintenance_during_active ) )
             rows.append( ( 'Normal throttle: ', self._file_maintenance_active_throttle_velocity ) )
+            rows.append( ( 'Number of files to work on at once: ', self._file_maintenance_num_workers ) )
             
             gridbox = ClientGUICommon.WrapInGrid( self._file_maintenance_panel, rows )
             
@@ -1983,6 +2021,8 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             self._new_options.SetInteger( 'file_maintenance_active_throttle_files', file_maintenance_active_throttle_files )
             self._new_options.SetInteger( 'file_maintenance_active_throttle_time_delta', file_maintenance_active_throttle_time_delta )
             
+            self._new_options.SetInteger( 'file_maintenance_num_workers', self._file_maintenance_num_workers.value() )
+            
         
     
     class _MediaPanel( QW.QWidget ):
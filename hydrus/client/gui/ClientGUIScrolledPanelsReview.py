@@ -16,6 +16,7 @@ from qtpy import QtGui as QG
 from hydrus.core import HydrusCompression
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
+from hydrus.core import HydrusDBBase
 from hydrus.core import HydrusExceptions
 from hydrus.core import HydrusFileHandling
 from hydrus.core import HydrusGlobals as HG
@@ -63,6 +64,33 @@ from hydrus.client.networking import ClientNetworkingGUG
 from hydrus.client.networking import ClientNetworkingLogin
 from hydrus.client.networking import ClientNetworkingURLClass
 
+def ConvertJobTimeHistogramToPrettyString( histogram ):
+    
+    bucket_texts = []
+    
+    for ( upper_bound, count ) in histogram:
+        
+        if count == 0:
+            
+            continue
+            
+        
+        if upper_bound is None:
+            
+            bucket_texts.append( 'slower: {}'.format( HydrusData.ToHumanInt( count ) ) )
+            
+        else:
+            
+            bucket_texts.append( '<{}ms: {}'.format( upper_bound, HydrusData.ToHumanInt( count ) ) )
+            
+        
+    
+    return ', '.join( bucket_texts )
+    
+def ConvertSecondsToPrettyMS( seconds ):
+    
+    return '{:.1f}ms'.format( seconds * 1000 )
+    
 class MigrateDatabasePanel( ClientGUIScrolledPanels.ReviewPanel ):
     
     def __init__( self, parent, controller ):
@@ -1770,6 +1798,188 @@ class MigrateTagsPanel( ClientGUIScrolledPanels.ReviewPanel ):
         self._UpdateMigrationControlsNewDestination()
         
     
+class DBJobStatisticsPanel( QW.QWidget ):
+    
+    def __init__( self, parent, controller ):
+        
+        self._controller = controller
+        
+        QW.QWidget.__init__( self, parent )
+        
+        self._job_names_to_job_statistics = {}
+        
+        self._lanes_summary = ClientGUICommon.BetterStaticText( self )
+        self._lanes_summary.setWordWrap( True )
+        
+        self._list_ctrl_panel = ClientGUIListCtrl.BetterListCtrlPanel( self )
+        
+        self._list_ctrl = ClientGUIListCtrl.BetterListCtrl( self._list_ctrl_panel, CGLC.COLUMN_LIST_DB_JOB_STATISTICS.ID, 20, self._ConvertDataToListCtrlTuples )
+        
+        self._list_ctrl_panel.SetListCtrl( self._list_ctrl )
+        
+        self._list_ctrl_panel.AddButton( 'refresh snapshot', self._RefreshSnapshot )
+        
+        #
+        
+        self._list_ctrl.Sort()
+        
+        self._RefreshSnapshot()
+        
+        #
+        
+        vbox = QP.VBoxLayout()
+        
+        QP.AddToLayout( vbox, self._lanes_summary, CC.FLAGS_EXPAND_PERPENDICULAR )
+        QP.AddToLayout( vbox, self._list_ctrl_panel, CC.FLAGS_EXPAND_BOTH_WAYS )
+        
+        self.setLayout( vbox )
+        
+    
+    def _ConvertDataToListCtrlTuples( self, job_name ):
+        
+        job_statistics = self._job_names_to_job_statistics[ job_name ]
+        
+        num_jobs = job_statistics[ 'num_jobs' ]
+        average_wait = job_statistics[ 'total_wait_time' ] / max( num_jobs, 1 )
+        max_wait = job_statistics[ 'max_wait_time' ]
+        average_time = job_statistics[ 'total_execution_time' ] / max( num_jobs, 1 )
+        max_time = job_statistics[ 'max_execution_time' ]
+        histogram = job_statistics[ 'execution_time_histogram' ]
+        
+        if job_statistics[ 'num_jobs_with_rows' ] > 0:
+            
+            average_rows = job_statistics[ 'total_rows' ] / job_statistics[ 'num_jobs_with_rows' ]
+            
+            pretty_average_rows = HydrusData.ToHumanInt( int( average_rows ) )
+            
+        else:
+            
+            average_rows = -1
+            
+            pretty_average_rows = ''
+            
+        
+        pretty_job_name = job_name
+        pretty_num_jobs = HydrusData.ToHumanInt( num_jobs )
+        pretty_average_wait = ConvertSecondsToPrettyMS( average_wait )
+        pretty_max_wait = ConvertSecondsToPrettyMS( max_wait )
+        pretty_average_time = ConvertSecondsToPrettyMS( average_time )
+        pretty_max_time = ConvertSecondsToPrettyMS( max_time )
+        pretty_histogram = ConvertJobTimeHistogramToPrettyString( histogram )
+        
+        sort_histogram = tuple( reversed( [ count for ( upper_bound, count ) in histogram ] ) )
+        
+        display_tuple = ( pretty_job_name, pretty_num_jobs, pretty_average_wait, pretty_max_wait, pretty_average_time, pretty_max_time, pretty_histogram, pretty_average_rows )
+        sort_tuple = ( job_name, num_jobs, average_wait, max_wait, average_time, max_time, sort_histogram, average_rows )
+        
+        return ( display_tuple, sort_tuple )
+        
+    
+    def _RefreshSnapshot( self ):
+        
+        job_statistics = self._controller.GetDBJobStatistics()
+        
+        lane_texts = []
+        
+        for ( lane_name, lane_statistics ) in job_statistics[ 'lanes' ].items():
+            
+            lane_texts.append( '{}: {} waiting, {} done, average wait {}'.format( lane_name, HydrusData.ToHumanInt( lane_statistics[ 'num_jobs_waiting' ] ), HydrusData.ToHumanInt( lane_statistics[ 'num_jobs' ] ), ConvertSecondsToPrettyMS( lane_statistics[ 'total_wait_time' ] / max( lane_statistics[ 'num_jobs' ], 1 ) ) ) )
+            
+        
+        self._lanes_summary.setText( os.linesep.join( lane_texts ) )
+        
+        self._job_names_to_job_statistics = job_statistics[ 'jobs' ]
+        
+        self._list_ctrl.SetData( list( self._job_names_to_job_statistics.keys() ) )
+        
+    
+class DBSlowQueriesPanel( QW.QWidget ):
+    
+    def __init__( self, parent, controller ):
+        
+        self._controller = controller
+        
+        QW.QWidget.__init__( self, parent )
+        
+        self._list_ctrl_panel = ClientGUIListCtrl.BetterListCtrlPanel( self )
+        
+        self._list_ctrl = ClientGUIListCtrl.BetterListCtrl( self._list_ctrl_panel, CGLC.COLUMN_LIST_DB_SLOW_QUERIES.ID, 20, self._ConvertDataToListCtrlTuples )
+        
+        self._list_ctrl_panel.SetListCtrl( self._list_ctrl )
+        
+        self._list_ctrl_panel.AddButton( 'refresh snapshot', self._RefreshSnapshot )
+        self._list_ctrl_panel.AddButton( 'copy queries', self._CopyQueries, enabled_only_on_selection = True )
+        
+        #
+        
+        self._list_ctrl.Sort()
+        
+        self._RefreshSnapshot()
+        
+        #
+        
+        vbox = QP.VBoxLayout()
+        
+        QP.AddToLayout( vbox, self._list_ctrl_panel, CC.FLAGS_EXPAND_BOTH_WAYS )
+        
+        self.setLayout( vbox )
+        
+    
+    def _ConvertDataToListCtrlTuples( self, slow_query ):
+        
+        ( timestamp, duration, job_name, query ) = slow_query
+        
+        pretty_timestamp = HydrusData.ConvertTimestampToPrettyTime( timestamp )
+        pretty_duration = ConvertSecondsToPrettyMS( duration )
+        pretty_job_name = job_name
+        pretty_query = query
+        
+        display_tuple = ( pretty_timestamp, pretty_duration, pretty_job_name, pretty_query )
+        sort_tuple = ( timestamp, duration, job_name, query )
+        
+        return ( display_tuple, sort_tuple )
+        
+    
+    def _CopyQueries( self ):
+        
+        lines = [ '{}\t{}\t{}'.format( ConvertSecondsToPrettyMS( duration ), job_name, query ) for ( timestamp, duration, job_name, query ) in self._list_ctrl.GetData( only_selected = True ) ]
+        
+        HG.client_controller.pub( 'clipboard', 'text', os.linesep.join( lines ) )
+        
+    
+    def _RefreshSnapshot( self ):
+        
+        slow_queries = self._controller.GetDBSlowQueries()
+        
+        self._list_ctrl.SetData( slow_queries )
+        
+    
+class ReviewDBJobStatistics( ClientGUIScrolledPanels.ReviewPanel ):
+    
+    def __init__( self, parent, controller ):
+        
+        ClientGUIScrolledPanels.ReviewPanel.__init__( self, parent )
+        
+        self._notebook = ClientGUICommon.BetterNotebook( self )
+        
+        self._job_statistics_panel = DBJobStatisticsPanel( self._notebook, controller )
+        
+        self._slow_queries_panel = DBSlowQueriesPanel( self._notebook, controller )
+        
+        self._notebook.addTab( self._job_statistics_panel, 'jobs' )
+        self._notebook.addTab( self._slow_queries_panel, 'slow queries' )
+        
+        vbox = QP.VBoxLayout()
+        
+        st = ClientGUICommon.BetterStaticText( self, label = 'These are timings for every db job since the client booted. \'wait\' is time spent in the queue, \'time\' is time spent running. Slow queries are individual statements that took longer than {}.'.format( ConvertSecondsToPrettyMS( HydrusDBBase.slow_query_log.GetThreshold() ) ) )
+        st.setWordWrap( True )
+        
+        QP.AddToLayout( vbox, st, CC.FLAGS_EXPAND_PERPENDICULAR )
+        QP.AddToLayout( vbox, self._notebook, CC.FLAGS_EXPAND_BOTH_WAYS )
+        
+        self.widget().setLayout( vbox )
+        
+    
 class ReviewDownloaderImport( ClientGUIScrolledPanels.ReviewPanel ):
     
     def __init__( self, parent, network_engine ):
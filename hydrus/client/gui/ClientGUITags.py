@@ -5247,6 +5247,13 @@ class ReviewTagDisplayMaintenancePanel( ClientGUIScrolledPanels.ReviewPanel ):
                             
                         
                     
+                    bulk_sync_rows_per_second = HG.client_controller.tag_display_maintenance_manager.GetBulkSyncRowsPerSecond( self._service_key )
+                    
+                    if bulk_sync_rows_per_second is not None:
+                        
+                        message += ' Last bulk sync ran at {} rules/s.'.format( HydrusData.ToHumanInt( int( bulk_sync_rows_per_second ) ) )
+                        
+                    
                     sync_work_to_do = True
                     
                 
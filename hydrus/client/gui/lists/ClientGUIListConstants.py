@@ -1481,3 +1481,53 @@ register_column_type( COLUMN_LIST_EXIF_DATA.ID, COLUMN_LIST_EXIF_DATA.EXIF_LABEL
 register_column_type( COLUMN_LIST_EXIF_DATA.ID, COLUMN_LIST_EXIF_DATA.VALUE, 'value', False, 20, True )
 
 default_column_list_sort_lookup[ COLUMN_LIST_EXIF_DATA.ID ] = ( COLUMN_LIST_EXIF_DATA.EXIF_ID, True )
+
+#
+
+class COLUMN_LIST_DB_JOB_STATISTICS( COLUMN_LIST_DEFINITION ):
+    
+    ID = 68
+    
+    JOB = 0
+    NUM_JOBS = 1
+    AVERAGE_WAIT = 2
+    MAX_WAIT = 3
+    AVERAGE_TIME = 4
+    MAX_TIME = 5
+    TIME_HISTOGRAM = 6
+    AVERAGE_ROWS = 7
+    
+
+column_list_type_name_lookup[ COLUMN_LIST_DB_JOB_STATISTICS.ID ] = 'db job statistics'
+
+register_column_type( COLUMN_LIST_DB_JOB_STATISTICS.ID, COLUMN_LIST_DB_JOB_STATISTICS.JOB, 'job', False, 36, True )
+register_column_type( COLUMN_LIST_DB_JOB_STATISTICS.ID, COLUMN_LIST_DB_JOB_STATISTICS.NUM_JOBS, 'count', False, 8, True )
+register_column_type( COLUMN_LIST_DB_JOB_STATISTICS.ID, COLUMN_LIST_DB_JOB_STATISTICS.AVERAGE_WAIT, 'avg wait', False, 10, True )
+register_column_type( COLUMN_LIST_DB_JOB_STATISTICS.ID, COLUMN_LIST_DB_JOB_STATISTICS.MAX_WAIT, 'max wait', False, 10, True )
+register_column_type( COLUMN_LIST_DB_JOB_STATISTICS.ID, COLUMN_LIST_DB_JOB_STATISTICS.AVERAGE_TIME, 'avg time', False, 10, True )
+register_column_type( COLUMN_LIST_DB_JOB_STATISTICS.ID, COLUMN_LIST_DB_JOB_STATISTICS.MAX_TIME, 'max time', False, 10, True )
+register_column_type( COLUMN_LIST_DB_JOB_STATISTICS.ID, COLUMN_LIST_DB_JOB_STATISTICS.TIME_HISTOGRAM, 'time histogram', False, 48, True )
+register_column_type( COLUMN_LIST_DB_JOB_STATISTICS.ID, COLUMN_LIST_DB_JOB_STATISTICS.AVERAGE_ROWS, 'avg rows', False, 10, True )
+
+default_column_list_sort_lookup[ COLUMN_LIST_DB_JOB_STATISTICS.ID ] = ( COLUMN_LIST_DB_JOB_STATISTICS.MAX_TIME, False )
+
+#
+
+class COLUMN_LIST_DB_SLOW_QUERIES( COLUMN_LIST_DEFINITION ):
+    
+    ID = 69
+    
+    TIME = 0
+    DURATION = 1
+    JOB = 2
+    QUERY = 3
+    
+
+column_list_type_name_lookup[ COLUMN_LIST_DB_SLOW_QUERIES.ID ] = 'db slow queries'
+
+register_column_type( COLUMN_LIST_DB_SLOW_QUERIES.ID, COLUMN_LIST_DB_SLOW_QUERIES.TIME, 'time', False, 20, True )
+register_column_type( COLUMN_LIST_DB_SLOW_QUERIES.ID, COLUMN_LIST_DB_SLOW_QUERIES.DURATION, 'duration', False, 10, True )
+register_column_type( COLUMN_LIST_DB_SLOW_QUERIES.ID, COLUMN_LIST_DB_SLOW_QUERIES.JOB, 'job', False, 24, True )
+register_column_type( COLUMN_LIST_DB_SLOW_QUERIES.ID, COLUMN_LIST_DB_SLOW_QUERIES.QUERY, 'query', False, 72, True )
+
+default_column_list_sort_lookup[ COLUMN_LIST_DB_SLOW_QUERIES.ID ] = ( COLUMN_LIST_DB_SLOW_QUERIES.TIME, False )
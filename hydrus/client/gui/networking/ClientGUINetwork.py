@@ -1109,6 +1109,10 @@ class ReviewNetworkJobs( ClientGUIScrolledPanels.ReviewPanel ):
         
         self._list_ctrl_panel.AddButton( 'refresh snapshot', self._RefreshSnapshot )
         
+        self._connection_pool_summary = ClientGUICommon.BetterStaticText( self )
+        
+        self._connection_pool_summary.setWordWrap( True )
+        
         #
         
         self._list_ctrl.Sort()
@@ -1120,6 +1124,7 @@ class ReviewNetworkJobs( ClientGUIScrolledPanels.ReviewPanel ):
         vbox = QP.VBoxLayout()
         
         QP.AddToLayout( vbox, self._list_ctrl_panel, CC.FLAGS_EXPAND_BOTH_WAYS )
+        QP.AddToLayout( vbox, self._connection_pool_summary, CC.FLAGS_EXPAND_PERPENDICULAR )
         
         self.widget().setLayout( vbox )
         
@@ -1145,12 +1150,49 @@ class ReviewNetworkJobs( ClientGUIScrolledPanels.ReviewPanel ):
         return ( display_tuple, sort_tuple )
         
     
+    def _RefreshConnectionPoolSummary( self ):
+        
+        pool_rows = self._controller.network_engine.session_manager.GetConnectionPoolStats()
+        
+        if len( pool_rows ) == 0:
+            
+            self._connection_pool_summary.setText( 'No requests have gone through the connection pools yet.' )
+            self._connection_pool_summary.setToolTip( '' )
+            
+            return
+            
+        
+        def ConvertToReusePercentage( num_requests, num_connections_opened ):
+            
+            return HydrusData.ConvertFloatToPercentage( max( num_requests - num_connections_opened, 0 ) / num_requests )
+            
+        
+        total_num_requests = sum( ( num_requests for ( network_context, pool_size, num_requests, num_connections_opened ) in pool_rows ) )
+        total_num_connections_opened = sum( ( num_connections_opened for ( network_context, pool_size, num_requests, num_connections_opened ) in pool_rows ) )
+        
+        text = 'Since boot, {} requests have opened {} new connections. {} of requests reused a kept-alive connection. Hover for each domain.'.format( HydrusData.ToHumanInt( total_num_requests ), HydrusData.ToHumanInt( total_num_connections_opened ), ConvertToReusePercentage( total_num_requests, total_num_connections_opened ) )
+        
+        pool_rows.sort( key = lambda row: row[2], reverse = True )
+        
+        tooltip_lines = []
+        
+        for ( network_context, pool_size, num_requests, num_connections_opened ) in pool_rows:
+            
+            tooltip_lines.append( '{}: {} requests, {} new connections, {} reused, pool size {}'.format( network_context.ToString(), HydrusData.ToHumanInt( num_requests ), HydrusData.ToHumanInt( num_connections_opened ), ConvertToReusePercentage( num_requests, num_connections_opened ), HydrusData.ToHumanInt( pool_size ) ) )
+            
+        
+        self._connection_pool_summary.setText( text )
+        self._connection_pool_summary.setToolTip( os.linesep.join( tooltip_lines ) )
+        
+    
     def _RefreshSnapshot( self ):
         
         job_rows = self._controller.network_engine.GetJobsSnapshot()
         
         self._list_ctrl.SetData( job_rows )
         
+        self._RefreshConnectionPoolSummary()
+        
     
 class ReviewNetworkSessionsPanel( ClientGUIScrolledPanels.ReviewPanel ):
     
@@ -1147,6 +1147,10 @@ class ManagementPanelDuplicateFilter( ManagementPanel ):
         
         menu_items.append( ( 'check', 'search for duplicate pairs at the current distance during normal db maintenance', 'Tell the client to find duplicate pairs in its normal db maintenance cycles, whether you have that set to idle or shutdown time.', check_manager ) )
         
+        check_manager = ClientGUICommon.CheckboxManagerOptions( 'similar_files_search_uses_in_memory_index' )
+        
+        menu_items.append( ( 'check', 'keep all perceptual hashes in memory for faster searching', 'Tell the client to load all its perceptual hashes into memory and search them directly rather than walking the search tree in the database. This is much faster for large searches, and lets the potential duplicates search work through files in large batches, but uses about 16 bytes per perceptual hash.', check_manager ) )
+        
         self._cog_button = ClientGUIMenuButton.MenuBitmapButton( self._main_left_panel, CC.global_pixmaps().cog, menu_items )
         
         menu_items = []
@@ -3039,6 +3039,8 @@ class ReviewServiceRepositorySubPanel( QW.QWidget ):
             repo_options_text_components.append( 'Unknown anonymisation period.' )
             
         
+        repo_options_text_components.append( 'update format: {}'.format( HydrusNetwork.update_format_string_lookup.get( self._service.GetUpdateFormat(), 'unknown' ) ) )
+        
         self._repo_options_st.setText( ', '.join( repo_options_text_components ) )
         
         if self._service.GetServiceType() == HC.TAG_REPOSITORY:
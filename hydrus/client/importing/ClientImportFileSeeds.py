@@ -895,45 +895,29 @@ class FileSeed( HydrusSerialisable.SerialisableBase ):
         self.SetHash( file_import_status.hash )
         
     
-    def ImportPath( self, file_seed_cache: "FileSeedCache", file_import_options: FileImportOptions.FileImportOptions, loud_or_quiet: int, status_hook = None ):
+    def ImportPath( self, file_seed_cache: "FileSeedCache", file_import_options: FileImportOptions.FileImportOptions, loud_or_quiet: int, status_hook = None, prepared_path_import: typing.Optional[ "PreparedPathImport" ] = None ):
         
-        try:
+        if prepared_path_import is None:
             
-            file_import_options = FileImportOptions.GetRealFileImportOptions( file_import_options, loud_or_quiet )
+            prepared_path_import = self.PreparePathImport( file_import_options, loud_or_quiet, status_hook = status_hook )
             
-            if self.file_seed_type != FILE_SEED_TYPE_HDD:
-                
-                raise HydrusExceptions.VetoException( 'Attempted to import as a path, but I do not think I am a path!' )
-                
-            
-            path = self.file_seed_data
-            
-            if not os.path.exists( path ):
-                
-                raise HydrusExceptions.VetoException( 'Source file does not exist!' )
-                
+        
+        try:
             
-            ( os_file_handle, temp_path ) = HydrusTemp.GetTempPath()
+            file_import_options = prepared_path_import.GetFileImportOptions()
             
             try:
                 
-                if status_hook is not None:
-                    
-                    status_hook( 'copying file to temp location' )
-                    
+                file_import_job = prepared_path_import.GetFileImportJob()
                 
-                copied = HydrusPaths.MirrorFile( path, temp_path )
+                file_import_status = file_import_job.FinishImport( status_hook = status_hook )
                 
-                if not copied:
-                    
-                    raise Exception( 'File failed to copy to temp path--see log for error.' )
-                    
-                
-                self.Import( temp_path, file_import_options, status_hook = status_hook )
+                self.SetStatus( file_import_status.status, note = file_import_status.note )
+                self.SetHash( file_import_status.hash )
                 
             finally:
                 
-                HydrusTemp.CleanUpTempPath( os_file_handle, temp_path )
+                prepared_path_import.CleanUp()
                 
             
             self.WriteContentUpdates( file_import_options = file_import_options )
@@ -1111,6 +1095,17 @@ class FileSeed( HydrusSerialisable.SerialisableBase ):
         return ( should_download_metadata, should_download_file )
         
     
+    def PreparePathImport( self, file_import_options: FileImportOptions.FileImportOptions, loud_or_quiet: int, status_hook = None ) -> "PreparedPathImport":
+        
+        file_import_options = FileImportOptions.GetRealFileImportOptions( file_import_options, loud_or_quiet )
+        
+        prepared_path_import = PreparedPathImport( self, file_import_options )
+        
+        prepared_path_import.Prepare( status_hook = status_hook )
+        
+        return prepared_path_import
+        
+    
     def PresentToPage( self, page_key: bytes ):
         
         hash = self.GetHash()
@@ -1689,6 +1684,149 @@ class FileSeed( HydrusSerialisable.SerialisableBase ):
     
 HydrusSerialisable.SERIALISABLE_TYPES_TO_OBJECT_TYPES[ HydrusSerialisable.SERIALISABLE_TYPE_FILE_SEED ] = FileSeed
 
+class PreparedPathImport( object ):
+    
+    # a local file that has been copied to temp and hashed, decoded and thumbnailed, waiting for its turn at the db
+    # the copy and the heavy work can happen on a worker thread. the file seed does the actual import, in order, in ImportPath
+    
+    def __init__( self, file_seed: FileSeed, file_import_options: FileImportOptions.FileImportOptions ):
+        
+        self._file_seed = file_seed
+        self._file_import_options = file_import_options
+        
+        self._lock = threading.Lock()
+        self._done_event = threading.Event()
+        
+        self._os_file_handle = None
+        self._temp_path = None
+        
+        self._file_import_job = None
+        self._exception = None
+        
+        self._discarded = False
+        
+    
+    def _CleanUp( self ):
+        
+        if self._temp_path is not None:
+            
+            HydrusTemp.CleanUpTempPath( self._os_file_handle, self._temp_path )
+            
+            self._os_file_handle = None
+            self._temp_path = None
+            
+        
+    
+    def CleanUp( self ):
+        
+        with self._lock:
+            
+            self._CleanUp()
+            
+        
+    
+    def Discard( self ):
+        
+        # we no longer want this one. if a worker is still on it, it'll clean up after itself when done
+        
+        with self._lock:
+            
+            self._discarded = True
+            
+            if self._done_event.is_set():
+                
+                self._CleanUp()
+                
+            
+        
+    
+    def GetFileImportJob( self ) -> ClientImportFiles.FileImportJob:
+        
+        self._done_event.wait()
+        
+        if self._exception is not None:
+            
+            raise self._exception
+            
+        
+        return self._file_import_job
+        
+    
+    def GetFileImportOptions( self ) -> FileImportOptions.FileImportOptions:
+        
+        return self._file_import_options
+        
+    
+    def GetFileSeed( self ) -> FileSeed:
+        
+        return self._file_seed
+        
+    
+    def IsDone( self ) -> bool:
+        
+        return self._done_event.is_set()
+        
+    
+    def Prepare( self, status_hook = None ):
+        
+        try:
+            
+            if self._file_seed.file_seed_type != FILE_SEED_TYPE_HDD:
+                
+                raise HydrusExceptions.VetoException( 'Attempted to import as a path, but I do not think I am a path!' )
+                
+            
+            path = self._file_seed.file_seed_data
+            
+            if not os.path.exists( path ):
+                
+                raise HydrusExceptions.VetoException( 'Source file does not exist!' )
+                
+            
+            with self._lock:
+                
+                ( self._os_file_handle, self._temp_path ) = HydrusTemp.GetTempPath()
+                
+            
+            if status_hook is not None:
+                
+                status_hook( 'copying file to temp location' )
+                
+            
+            copied = HydrusPaths.MirrorFile( path, self._temp_path )
+            
+            if not copied:
+                
+                raise Exception( 'File failed to copy to temp path--see log for error.' )
+                
+            
+            file_import_job = ClientImportFiles.FileImportJob( self._temp_path, self._file_import_options )
+            
+            file_import_job.PrepareImport( status_hook = status_hook )
+            
+            self._file_import_job = file_import_job
+            
+        except Exception as e:
+            
+            self._exception = e
+            
+            self.CleanUp()
+            
+        finally:
+            
+            with self._lock:
+                
+                self._done_event.set()
+                
+                if self._discarded:
+                    
+                    self._CleanUp()
+                    
+                
+            
+        
+    
+
 class FileSeedCacheStatus( HydrusSerialisable.SerialisableBase ):
     
     SERIALISABLE_TYPE = HydrusSerialisable.SERIALISABLE_TYPE_FILE_SEED_CACHE_STATUS
@@ -2706,6 +2844,35 @@ class FileSeedCache( HydrusSerialisable.SerialisableBase ):
             
         
     
+    def GetNextFileSeeds( self, status: int, num_file_seeds: int ) -> typing.List[ FileSeed ]:
+        
+        with self._lock:
+            
+            # this tidies up the head of the list for us
+            if self._GetNextFileSeed( status ) is None:
+                
+                return []
+                
+            
+            file_seeds = []
+            
+            for ( index, file_seed ) in self._statuses_to_indexed_file_seeds[ status ]:
+                
+                if file_seed.status == status:
+                    
+                    file_seeds.append( file_seed )
+                    
+                    if len( file_seeds ) >= num_file_seeds:
+                        
+                        break
+                        
+                    
+                
+            
+            return file_seeds
+            
+        
+    
     def GetNumNewFilesSince( self, since: int ):
         
         num_files = 0
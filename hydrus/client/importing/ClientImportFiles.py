@@ -123,6 +123,8 @@ class FileImportJob( object ):
         self._pixel_hash = None
         self._file_modified_timestamp = None
         
+        self._not_ok_file_import_status = None
+        
     
     def CheckIsGoodToImport( self ):
         
@@ -143,29 +145,16 @@ class FileImportJob( object ):
             HydrusData.ShowText( 'File import job starting work.' )
             
         
-        self.GeneratePreImportHashAndStatus( status_hook = status_hook )
+        self.PrepareImport( status_hook = status_hook )
+        
+        return self.FinishImport( status_hook = status_hook )
+        
+    
+    def FinishImport( self, status_hook = None ) -> FileImportStatus:
         
         if self._pre_import_file_status.ShouldImport( self._file_import_options ):
             
-            self.GenerateInfo( status_hook = status_hook )
-            
-            try:
-                
-                self.CheckIsGoodToImport()
-                
-                ok_to_go = True
-                
-            except HydrusExceptions.FileImportRulesException as e:
-                
-                ok_to_go = False
-                
-                not_ok_file_import_status = self._pre_import_file_status.Duplicate()
-                
-                not_ok_file_import_status.status = CC.STATUS_VETOED
-                not_ok_file_import_status.note = str( e )
-                
-            
-            if ok_to_go:
+            if self._not_ok_file_import_status is None:
                 
                 hash = self._pre_import_file_status.hash
                 mime = self._pre_import_file_status.mime
@@ -188,7 +177,7 @@ class FileImportJob( object ):
                 
             else:
                 
-                self._post_import_file_status = not_ok_file_import_status
+                self._post_import_file_status = self._not_ok_file_import_status
                 
             
         else:
@@ -243,7 +232,10 @@ class FileImportJob( object ):
             status_hook( 'calculating hash' )
             
         
-        hash = HydrusFileHandling.GetHashFromPath( self._temp_path )
+        # we get the extra hashes on the same read. they are cheap next to the disk, and we need them anyway if this is a new file
+        ( hash, md5, sha1, sha512 ) = HydrusFileHandling.GetAllHashesFromPath( self._temp_path )
+        
+        self._extra_hashes = ( md5, sha1, sha512 )
         
         if HG.file_import_report_mode:
             
@@ -311,12 +303,34 @@ class FileImportJob( object ):
                 
             
         
+        numpy_image = None
+        
+        if HydrusImageHandling.CanShareNumPyImage( mime ):
+            
+            # decode the image once and share it with the file info, thumbnail, perceptual hash and pixel hash
+            
+            if status_hook is not None:
+                
+                status_hook( 'loading image' )
+                
+            
+            try:
+                
+                numpy_image = HydrusImageHandling.GenerateNumPyImage( self._temp_path, mime )
+                
+            except:
+                
+                # leave it to the individual steps below to fail with their usual errors
+                numpy_image = None
+                
+            
+        
         if status_hook is not None:
             
             status_hook( 'generating file metadata' )
             
         
-        self._file_info = HydrusFileHandling.GetFileInfo( self._temp_path, mime = mime )
+        self._file_info = HydrusFileHandling.GetFileInfo( self._temp_path, mime = mime, numpy_image = numpy_image )
         
         ( size, mime, width, height, duration, num_frames, has_audio, num_words ) = self._file_info
         
@@ -346,7 +360,7 @@ class FileImportJob( object ):
             
             try:
                 
-                self._thumbnail_bytes = HydrusFileHandling.GenerateThumbnailBytes( self._temp_path, target_resolution, mime, duration, num_frames, clip_rect = clip_rect, percentage_in = percentage_in )
+                self._thumbnail_bytes = HydrusFileHandling.GenerateThumbnailBytes( self._temp_path, target_resolution, mime, duration, num_frames, clip_rect = clip_rect, percentage_in = percentage_in, numpy_image = numpy_image )
                 
             except Exception as e:
                 
@@ -366,7 +380,17 @@ class FileImportJob( object ):
                 HydrusData.ShowText( 'File import job generating perceptual_hashes' )
                 
             
-            self._perceptual_hashes = ClientImageHandling.GenerateShapePerceptualHashes( self._temp_path, mime )
+            # the user can ask for the similar files system to load with PIL, which may give a slightly different image
+            if new_options.GetBoolean( 'load_images_with_pil' ):
+                
+                perceptual_hash_numpy_image = None
+                
+            else:
+                
+                perceptual_hash_numpy_image = numpy_image
+                
+            
+            self._perceptual_hashes = ClientImageHandling.GenerateShapePerceptualHashes( self._temp_path, mime, numpy_image = perceptual_hash_numpy_image )
             
             if HG.file_import_report_mode:
                 
@@ -374,27 +398,46 @@ class FileImportJob( object ):
                 
             
         
-        if HG.file_import_report_mode:
+        if self._extra_hashes is None:
             
-            HydrusData.ShowText( 'File import job generating other hashes' )
+            if HG.file_import_report_mode:
+                
+                HydrusData.ShowText( 'File import job generating other hashes' )
+                
             
-        
-        if status_hook is not None:
+            if status_hook is not None:
+                
+                status_hook( 'generating additional hashes' )
+                
             
-            status_hook( 'generating additional hashes' )
+            self._extra_hashes = HydrusFileHandling.GetExtraHashesFromPath( self._temp_path )
             
         
-        self._extra_hashes = HydrusFileHandling.GetExtraHashesFromPath( self._temp_path )
-        
         #
         
+        # opening with PIL only reads the header, so one open does for all the embedded metadata checks
+        
+        pil_image = None
+        
+        if mime in HC.FILES_THAT_CAN_HAVE_EXIF or mime in HC.FILES_THAT_CAN_HAVE_HUMAN_READABLE_EMBEDDED_METADATA or mime in HC.FILES_THAT_CAN_HAVE_ICC_PROFILE:
+            
+            try:
+                
+                pil_image = HydrusImageHandling.RawOpenPILImage( self._temp_path )
+                
+            except:
+                
+                pass
+                
+            
+        
         has_exif = False
         
-        if mime in HC.FILES_THAT_CAN_HAVE_EXIF:
+        if mime in HC.FILES_THAT_CAN_HAVE_EXIF and pil_image is not None:
             
             try:
                 
-                has_exif = HydrusImageHandling.HasEXIF( self._temp_path )
+                has_exif = HydrusImageHandling.GetEXIFDict( pil_image ) is not None
                 
             except:
                 
@@ -406,11 +449,11 @@ class FileImportJob( object ):
         
         has_human_readable_embedded_metadata = False
         
-        if mime in HC.FILES_THAT_CAN_HAVE_HUMAN_READABLE_EMBEDDED_METADATA:
+        if mime in HC.FILES_THAT_CAN_HAVE_HUMAN_READABLE_EMBEDDED_METADATA and pil_image is not None:
             
             try:
                 
-                has_human_readable_embedded_metadata = HydrusImageHandling.HasHumanReadableEmbeddedMetadata( self._temp_path )
+                has_human_readable_embedded_metadata = HydrusImageHandling.GetEmbeddedFileText( pil_image ) is not None
                 
             except:
                 
@@ -422,12 +465,10 @@ class FileImportJob( object ):
         
         has_icc_profile = False
         
-        if mime in HC.FILES_THAT_CAN_HAVE_ICC_PROFILE:
+        if mime in HC.FILES_THAT_CAN_HAVE_ICC_PROFILE and pil_image is not None:
             
             try:
                 
-                pil_image = HydrusImageHandling.RawOpenPILImage( self._temp_path )
-                
                 has_icc_profile = HydrusImageHandling.HasICCProfile( pil_image )
                 
             except:
@@ -438,13 +479,18 @@ class FileImportJob( object ):
         
         self._has_icc_profile = has_icc_profile
         
+        if pil_image is not None:
+            
+            pil_image.close()
+            
+        
         #
         
         if mime in HC.FILES_THAT_CAN_HAVE_PIXEL_HASH and duration is None:
             
             try:
                 
-                self._pixel_hash = HydrusImageHandling.GetImagePixelHash( self._temp_path, mime )
+                self._pixel_hash = HydrusImageHandling.GetImagePixelHash( self._temp_path, mime, numpy_image = numpy_image )
                 
             except:
                 
@@ -510,6 +556,30 @@ class FileImportJob( object ):
         return self._has_icc_profile
         
     
+    def PrepareImport( self, status_hook = None ):
+        
+        # this is all the hashing, decoding and thumbnailing. it only reads from the db, so it is safe to do ahead of time on a worker thread
+        
+        self.GeneratePreImportHashAndStatus( status_hook = status_hook )
+        
+        if self._pre_import_file_status.ShouldImport( self._file_import_options ):
+            
+            self.GenerateInfo( status_hook = status_hook )
+            
+            try:
+                
+                self.CheckIsGoodToImport()
+                
+            except HydrusExceptions.FileImportRulesException as e:
+                
+                self._not_ok_file_import_status = self._pre_import_file_status.Duplicate()
+                
+                self._not_ok_file_import_status.status = CC.STATUS_VETOED
+                self._not_ok_file_import_status.note = str( e )
+                
+            
+        
+    
     def PubsubContentUpdates( self ):
         
         if self._post_import_file_status.AlreadyInDB() and self._file_import_options.AutomaticallyArchives():
@@ -29,6 +29,94 @@ from hydrus.client.metadata import ClientMetadataMigrationExporters
 from hydrus.client.metadata import ClientMetadataMigrationImporters
 from hydrus.client.metadata import ClientTags
 
+class ParallelPathImporter( object ):
+    
+    # hashing, decoding and thumbnailing a local file is mostly disk work and library code that releases the GIL
+    # so, if the user allows it, we prepare the next few file seeds on worker threads while the importer thread does the db commits one at a time, in file seed order
+    
+    def __init__( self ):
+        
+        self._lock = threading.Lock()
+        
+        self._file_import_options = None
+        self._loud_or_quiet = None
+        
+        self._file_seeds_to_prepared_path_imports = {}
+        
+    
+    def _Clear( self ):
+        
+        for prepared_path_import in self._file_seeds_to_prepared_path_imports.values():
+            
+            prepared_path_import.Discard()
+            
+        
+        self._file_seeds_to_prepared_path_imports = {}
+        
+    
+    def Clear( self ):
+        
+        with self._lock:
+            
+            self._Clear()
+            
+        
+    
+    def GetPreparedPathImport( self, file_seed_cache: ClientImportFileSeeds.FileSeedCache, file_seed: ClientImportFileSeeds.FileSeed, file_import_options: FileImportOptions.FileImportOptions, loud_or_quiet: int ) -> typing.Optional[ ClientImportFileSeeds.PreparedPathImport ]:
+        
+        num_workers = HG.client_controller.new_options.GetInteger( 'file_import_num_workers' )
+        
+        with self._lock:
+            
+            if num_workers <= 1:
+                
+                self._Clear()
+                
+                return None
+                
+            
+            if file_import_options is not self._file_import_options or loud_or_quiet != self._loud_or_quiet:
+                
+                self._Clear()
+                
+                self._file_import_options = file_import_options
+                self._loud_or_quiet = loud_or_quiet
+                
+            
+            prepared_path_import = self._file_seeds_to_prepared_path_imports.pop( file_seed, None )
+            
+            # the file seed we are about to commit is in here, so this is it plus the next num_workers - 1
+            upcoming_file_seeds = [ upcoming_file_seed for upcoming_file_seed in file_seed_cache.GetNextFileSeeds( CC.STATUS_UNKNOWN, num_workers + 1 ) if upcoming_file_seed != file_seed ][ : num_workers - 1 ]
+            
+            upcoming_file_seeds_fast = set( upcoming_file_seeds )
+            
+            for stale_file_seed in [ stale_file_seed for stale_file_seed in self._file_seeds_to_prepared_path_imports.keys() if stale_file_seed not in upcoming_file_seeds_fast ]:
+                
+                self._file_seeds_to_prepared_path_imports[ stale_file_seed ].Discard()
+                
+                del self._file_seeds_to_prepared_path_imports[ stale_file_seed ]
+                
+            
+            real_file_import_options = FileImportOptions.GetRealFileImportOptions( file_import_options, loud_or_quiet )
+            
+            for upcoming_file_seed in upcoming_file_seeds:
+                
+                if upcoming_file_seed not in self._file_seeds_to_prepared_path_imports and upcoming_file_seed.IsLocalFileImport():
+                    
+                    upcoming_prepared_path_import = ClientImportFileSeeds.PreparedPathImport( upcoming_file_seed, real_file_import_options )
+                    
+                    self._file_seeds_to_prepared_path_imports[ upcoming_file_seed ] = upcoming_prepared_path_import
+                    
+                    HG.client_controller.CallToThread( upcoming_prepared_path_import.Prepare )
+                    
+                
+            
+        
+        # if this is None, we were not ahead of the importer, so the file seed will do it itself on this thread
+        return prepared_path_import
+        
+    
+
 class HDDImport( HydrusSerialisable.SerialisableBase ):
     
     SERIALISABLE_TYPE = HydrusSerialisable.SERIALISABLE_TYPE_HDD_IMPORT
@@ -104,6 +192,8 @@ class HDDImport( HydrusSerialisable.SerialisableBase ):
         
         self._files_repeating_job = None
         
+        self._parallel_path_importer = ParallelPathImporter()
+        
         self._last_serialisable_change_timestamp = 0
         
         HG.client_controller.sub( self, 'NotifyFileSeedsUpdated', 'file_seed_cache_file_seeds_updated' )
@@ -197,7 +287,9 @@ class HDDImport( HydrusSerialisable.SerialisableBase ):
                 
             
         
-        file_seed.ImportPath( self._file_seed_cache, self._file_import_options, FileImportOptions.IMPORT_TYPE_LOUD, status_hook = status_hook )
+        prepared_path_import = self._parallel_path_importer.GetPreparedPathImport( self._file_seed_cache, file_seed, self._file_import_options, FileImportOptions.IMPORT_TYPE_LOUD )
+        
+        file_seed.ImportPath( self._file_seed_cache, self._file_import_options, FileImportOptions.IMPORT_TYPE_LOUD, status_hook = status_hook, prepared_path_import = prepared_path_import )
         
         if file_seed.status in CC.SUCCESSFUL_IMPORT_STATES:
             
@@ -425,6 +517,8 @@ class HDDImport( HydrusSerialisable.SerialisableBase ):
                         self._files_status = str( e )
                         
                     
+                    self._parallel_path_importer.Clear()
+                    
                     break
                     
                 
@@ -441,6 +535,8 @@ class HDDImport( HydrusSerialisable.SerialisableBase ):
                     self._files_status = 'stopping work: {}'.format( str( e ) )
                     
                 
+                self._parallel_path_importer.Clear()
+                
                 HydrusData.ShowException( e )
                 
                 return
@@ -730,135 +826,146 @@ class ImportFolder( HydrusSerialisable.SerialisableBaseNamed ):
         # num_to_do is num currently unknown
         num_total = self._file_seed_cache.GetFileSeedCount( CC.STATUS_UNKNOWN )
         
-        while True:
-            
-            file_seed = self._file_seed_cache.GetNextFileSeed( CC.STATUS_UNKNOWN )
-            
-            p1 = HG.client_controller.new_options.GetBoolean( 'pause_import_folders_sync' ) or self._paused
-            p2 = HydrusThreading.IsThreadShuttingDown()
-            p3 = job_key.IsCancelled()
+        parallel_path_importer = ParallelPathImporter()
+        
+        try:
             
-            if file_seed is None or p1 or p2 or p3:
+            while True:
                 
-                break
+                file_seed = self._file_seed_cache.GetNextFileSeed( CC.STATUS_UNKNOWN )
                 
-            
-            did_work = True
-            
-            if HydrusData.TimeHasPassed( time_to_save ):
+                p1 = HG.client_controller.new_options.GetBoolean( 'pause_import_folders_sync' ) or self._paused
+                p2 = HydrusThreading.IsThreadShuttingDown()
+                p3 = job_key.IsCancelled()
                 
-                HG.client_controller.WriteSynchronous( 'serialisable', self )
+                if file_seed is None or p1 or p2 or p3:
+                    
+                    break
+                    
                 
-                time_to_save = HydrusData.GetNow() + 600
+                did_work = True
                 
-            
-            gauge_num_done = num_files_imported + 1
-            
-            job_key.SetVariable( 'popup_text_1', 'importing file ' + HydrusData.ConvertValueRangeToPrettyString( gauge_num_done, num_total ) )
-            job_key.SetVariable( 'popup_gauge_1', ( gauge_num_done, num_total ) )
-            
-            path = file_seed.file_seed_data
-            
-            file_seed.ImportPath( self._file_seed_cache, self._file_import_options, FileImportOptions.IMPORT_TYPE_QUIET )
-            
-            if file_seed.status in CC.SUCCESSFUL_IMPORT_STATES:
+                if HydrusData.TimeHasPassed( time_to_save ):
+                    
+                    HG.client_controller.WriteSynchronous( 'serialisable', self )
+                    
+                    time_to_save = HydrusData.GetNow() + 600
+                    
+                
+                gauge_num_done = num_files_imported + 1
+                
+                job_key.SetVariable( 'popup_text_1', 'importing file ' + HydrusData.ConvertValueRangeToPrettyString( gauge_num_done, num_total ) )
+                job_key.SetVariable( 'popup_gauge_1', ( gauge_num_done, num_total ) )
+                
+                path = file_seed.file_seed_data
                 
-                hash = None
+                prepared_path_import = parallel_path_importer.GetPreparedPathImport( self._file_seed_cache, file_seed, self._file_import_options, FileImportOptions.IMPORT_TYPE_QUIET )
                 
-                if file_seed.HasHash():
+                file_seed.ImportPath( self._file_seed_cache, self._file_import_options, FileImportOptions.IMPORT_TYPE_QUIET, prepared_path_import = prepared_path_import )
+                
+                if file_seed.status in CC.SUCCESSFUL_IMPORT_STATES:
                     
-                    hash = file_seed.GetHash()
+                    hash = None
                     
-                    if self._tag_import_options.HasAdditionalTags() or len( self._metadata_routers ) > 0:
+                    if file_seed.HasHash():
                         
-                        media_result = HG.client_controller.Read( 'media_result', hash )
+                        hash = file_seed.GetHash()
                         
-                        if self._tag_import_options.HasAdditionalTags():
+                        if self._tag_import_options.HasAdditionalTags() or len( self._metadata_routers ) > 0:
                             
-                            downloaded_tags = []
+                            media_result = HG.client_controller.Read( 'media_result', hash )
                             
-                            service_keys_to_content_updates = self._tag_import_options.GetServiceKeysToContentUpdates( file_seed.status, media_result, downloaded_tags ) # additional tags
+                            if self._tag_import_options.HasAdditionalTags():
+                                
+                                downloaded_tags = []
+                                
+                                service_keys_to_content_updates = self._tag_import_options.GetServiceKeysToContentUpdates( file_seed.status, media_result, downloaded_tags ) # additional tags
+                                
+                                if len( service_keys_to_content_updates ) > 0:
+                                    
+                                    HG.client_controller.WriteSynchronous( 'content_updates', service_keys_to_content_updates )
+                                    
+                                
                             
-                            if len( service_keys_to_content_updates ) > 0:
+                            for metadata_router in self._metadata_routers:
                                 
-                                HG.client_controller.WriteSynchronous( 'content_updates', service_keys_to_content_updates )
+                                try:
+                                    
+                                    metadata_router.Work( media_result, path )
+                                    
+                                except Exception as e:
+                                    
+                                    HydrusData.ShowText( 'Trying to run metadata routing in the import folder "' + self._name + '" threw an error!' )
+                                    
+                                    HydrusData.ShowException( e )
+                                    
                                 
                             
                         
-                        for metadata_router in self._metadata_routers:
+                        service_keys_to_tags = ClientTags.ServiceKeysToTags()
+                        
+                        for ( tag_service_key, filename_tagging_options ) in self._tag_service_keys_to_filename_tagging_options.items():
+                            
+                            if not HG.client_controller.services_manager.ServiceExists( tag_service_key ):
+                                
+                                continue
+                                
                             
                             try:
                                 
-                                metadata_router.Work( media_result, path )
+                                tags = filename_tagging_options.GetTags( tag_service_key, path )
+                                
+                                if len( tags ) > 0:
+                                    
+                                    service_keys_to_tags[ tag_service_key ] = tags
+                                    
                                 
                             except Exception as e:
                                 
-                                HydrusData.ShowText( 'Trying to run metadata routing in the import folder "' + self._name + '" threw an error!' )
+                                HydrusData.ShowText( 'Trying to parse filename tags in the import folder "' + self._name + '" threw an error!' )
                                 
                                 HydrusData.ShowException( e )
                                 
                             
                         
+                        if len( service_keys_to_tags ) > 0:
+                            
+                            service_keys_to_content_updates = ClientData.ConvertServiceKeysToTagsToServiceKeysToContentUpdates( { hash }, service_keys_to_tags )
+                            
+                            HG.client_controller.WriteSynchronous( 'content_updates', service_keys_to_content_updates )
+                            
+                        
                     
-                    service_keys_to_tags = ClientTags.ServiceKeysToTags()
+                    num_files_imported += 1
                     
-                    for ( tag_service_key, filename_tagging_options ) in self._tag_service_keys_to_filename_tagging_options.items():
+                    if hash not in presentation_hashes_fast:
                         
-                        if not HG.client_controller.services_manager.ServiceExists( tag_service_key ):
-                            
-                            continue
-                            
+                        real_presentation_import_options = FileImportOptions.GetRealPresentationImportOptions( self._file_import_options, FileImportOptions.IMPORT_TYPE_LOUD )
                         
-                        try:
+                        if file_seed.ShouldPresent( real_presentation_import_options ):
                             
-                            tags = filename_tagging_options.GetTags( tag_service_key, path )
-                            
-                            if len( tags ) > 0:
-                                
-                                service_keys_to_tags[ tag_service_key ] = tags
-                                
-                            
-                        except Exception as e:
+                            presentation_hashes.append( hash )
                             
-                            HydrusData.ShowText( 'Trying to parse filename tags in the import folder "' + self._name + '" threw an error!' )
-                            
-                            HydrusData.ShowException( e )
+                            presentation_hashes_fast.add( hash )
                             
                         
                     
-                    if len( service_keys_to_tags ) > 0:
-                        
-                        service_keys_to_content_updates = ClientData.ConvertServiceKeysToTagsToServiceKeysToContentUpdates( { hash }, service_keys_to_tags )
-                        
-                        HG.client_controller.WriteSynchronous( 'content_updates', service_keys_to_content_updates )
-                        
+                elif file_seed.status == CC.STATUS_ERROR:
+                    
+                    HydrusData.Print( 'A file failed to import from import folder ' + self._name + ':' + path )
                     
                 
-                num_files_imported += 1
+                i += 1
                 
-                if hash not in presentation_hashes_fast:
-                    
-                    real_presentation_import_options = FileImportOptions.GetRealPresentationImportOptions( self._file_import_options, FileImportOptions.IMPORT_TYPE_LOUD )
+                if i % 10 == 0:
                     
-                    if file_seed.ShouldPresent( real_presentation_import_options ):
-                        
-                        presentation_hashes.append( hash )
-                        
-                        presentation_hashes_fast.add( hash )
-                        
+                    self._ActionPaths()
                     
                 
-            elif file_seed.status == CC.STATUS_ERROR:
-                
-                HydrusData.Print( 'A file failed to import from import folder ' + self._name + ':' + path )
-                
             
-            i += 1
+        finally:
             
-            if i % 10 == 0:
-                
-                self._ActionPaths()
-                
+            parallel_path_importer.Clear()
             
         
         if num_files_imported > 0:
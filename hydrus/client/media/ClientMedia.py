@@ -3601,16 +3601,23 @@ class SortedList( object ):
         self._items_to_indices = {}
         
     
-    def _RecalcIndices( self ):
+    def _RecalcIndices( self, start_index = 0 ):
         
-        self._items_to_indices = { item : index for ( index, item ) in enumerate( self._sorted_list ) }
+        if start_index == 0:
+            
+            self._items_to_indices = { item : index for ( index, item ) in enumerate( self._sorted_list ) }
+            
+        else:
+            
+            self._items_to_indices.update( ( ( item, index ) for ( index, item ) in enumerate( self._sorted_list[ start_index : ], start = start_index ) ) )
+            
         
         self._indices_dirty = False
         
     
     def append_items( self, items ):
         
-        if self._indices_dirty is None:
+        if self._indices_dirty:
             
             self._RecalcIndices()
             
@@ -3651,8 +3658,15 @@ class SortedList( object ):
     
     def remove_items( self, items ):
         
+        items = list( items )
+        
         deletee_indices = [ self.index( item ) for item in items ]
         
+        if len( deletee_indices ) == 0:
+            
+            return
+            
+        
         deletee_indices.sort( reverse = True )
         
         for index in deletee_indices:
@@ -3660,7 +3674,14 @@ class SortedList( object ):
             del self._sorted_list[ index ]
             
         
-        self._DirtyIndices()
+        # everything before the first removal keeps its index, so we only rewrite the map from there
+        
+        for item in items:
+            
+            del self._items_to_indices[ item ]
+            
+        
+        self._RecalcIndices( start_index = deletee_indices[-1] )
         
     
     def random_sort( self ):
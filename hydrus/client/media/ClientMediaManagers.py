@@ -15,8 +15,12 @@ from hydrus.client import ClientSearch
 from hydrus.client import ClientTime
 from hydrus.client.metadata import ClientTags
 
+# there can be a million of these alive in a big client, so they are all slotted to save the per-object dict
+
 class FileDuplicatesManager( object ):
     
+    __slots__ = ( 'media_group_king_hash', 'alternates_group_id', 'dupe_statuses_to_count' )
+    
     def __init__( self, media_group_king_hash, alternates_group_id, dupe_statuses_to_counts ):
         
         self.media_group_king_hash = media_group_king_hash
@@ -43,6 +47,8 @@ class FileDuplicatesManager( object ):
     
 class FileInfoManager( object ):
     
+    __slots__ = ( 'hash_id', 'hash', 'size', 'mime', 'width', 'height', 'duration', 'num_frames', 'has_audio', 'num_words', 'has_exif', 'has_human_readable_embedded_metadata', 'has_icc_profile' )
+    
     def __init__(
         self,
         hash_id: int,
@@ -102,6 +108,8 @@ class FileInfoManager( object ):
     
 class FileViewingStatsManager( object ):
     
+    __slots__ = ( 'last_viewed_timestamps', 'views', 'viewtimes' )
+    
     def __init__(
         self,
         view_rows: typing.Collection
@@ -288,6 +296,8 @@ class TimestampManager( object ):
     DOMAIN_ARCHIVED = 1
     DOMAIN_AGGREGATE_MODIFIED = 2
     
+    __slots__ = ( '_domains_to_timestamps', '_aggregate_modified_is_generated' )
+    
     def __init__( self ):
         
         self._domains_to_timestamps = dict()
@@ -418,6 +428,8 @@ class TimestampManager( object ):
     
 class LocationsManager( object ):
     
+    __slots__ = ( '_current_to_timestamps', '_deleted_to_timestamps', '_current', '_deleted', '_pending', '_petitioned', 'inbox', '_urls', '_service_keys_to_filenames', '_timestamp_manager', '_local_file_deletion_reason' )
+    
     def __init__(
         self,
         current_to_timestamps: typing.Dict[ bytes, typing.Optional[ int ] ],
@@ -968,6 +980,8 @@ class LocationsManager( object ):
     
 class NotesManager( object ):
     
+    __slots__ = ( '_names_to_notes', )
+    
     def __init__( self, names_to_notes: typing.Dict[ str, str ] ):
         
         self._names_to_notes = names_to_notes
@@ -1050,6 +1064,8 @@ class NotesManager( object ):
     
 class RatingsManager( object ):
     
+    __slots__ = ( '_service_keys_to_ratings', )
+    
     def __init__( self, service_keys_to_ratings: typing.Dict[ bytes, typing.Union[ None, float ] ] ):
         
         self._service_keys_to_ratings = service_keys_to_ratings
@@ -1096,6 +1112,8 @@ class RatingsManager( object ):
     
 class TagsManager( object ):
     
+    __slots__ = ( '_tag_display_types_to_service_keys_to_statuses_to_tags', '_storage_cache_is_dirty', '_display_cache_is_dirty', '_single_media_cache_is_dirty', '_selection_list_cache_is_dirty', '_lock' )
+    
     def __init__(
         self,
         service_keys_to_statuses_to_storage_tags: typing.Dict[ bytes, typing.Dict[ int, typing.Set[ str ] ] ],
@@ -1114,6 +1132,8 @@ class TagsManager( object ):
         
         self._lock = threading.Lock()
         
+        self._ShareIdenticalTagSets()
+        
     
     def _GetServiceKeysToStatusesToTags( self, tag_display_type ):
         
@@ -1291,6 +1311,33 @@ class TagsManager( object ):
             
         
     
+    def _ShareIdenticalTagSets( self ):
+        
+        # most files have no siblings or parents, so their display tags are the same as their storage tags. we only need to hold them once
+        # content updates alter current and pending the same way on both sides, so it is safe to share those
+        
+        storage_service_keys_to_statuses_to_tags = self._tag_display_types_to_service_keys_to_statuses_to_tags[ ClientTags.TAG_DISPLAY_STORAGE ]
+        display_service_keys_to_statuses_to_tags = self._tag_display_types_to_service_keys_to_statuses_to_tags[ ClientTags.TAG_DISPLAY_ACTUAL ]
+        
+        for ( service_key, display_statuses_to_tags ) in display_service_keys_to_statuses_to_tags.items():
+            
+            if service_key not in storage_service_keys_to_statuses_to_tags:
+                
+                continue
+                
+            
+            storage_statuses_to_tags = storage_service_keys_to_statuses_to_tags[ service_key ]
+            
+            for status in ( HC.CONTENT_STATUS_CURRENT, HC.CONTENT_STATUS_PENDING ):
+                
+                if status in display_statuses_to_tags and status in storage_statuses_to_tags and display_statuses_to_tags[ status ] == storage_statuses_to_tags[ status ]:
+                    
+                    display_statuses_to_tags[ status ] = storage_statuses_to_tags[ status ]
+                    
+                
+            
+        
+    
     def _SetDirty( self ):
         
         self._storage_cache_is_dirty = True
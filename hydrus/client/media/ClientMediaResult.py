@@ -1,4 +1,6 @@
+import threading
 import typing
+import weakref
 
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusExceptions
@@ -6,16 +8,60 @@ from hydrus.core import HydrusGlobals as HG
 
 from hydrus.client.media import ClientMediaManagers
 
+LAZY_LOAD_BATCH_SIZE = 256
+
+class MediaResultLazyLoader( object ):
+    
+    # a lazy media result starts with only its file info and locations. the first time anything asks it for tags, ratings, notes or viewing stats, we load them for every unloaded result in its batch in one db job
+    # the db does the actual setting, so a content update can never slip in between our read and our set
+    
+    def __init__( self ):
+        
+        self._lock = threading.Lock()
+        
+        self._hash_ids_to_media_results = weakref.WeakValueDictionary()
+        
+    
+    def AddMediaResult( self, media_result: "MediaResult" ):
+        
+        with self._lock:
+            
+            self._hash_ids_to_media_results[ media_result.GetHashId() ] = media_result
+            
+        
+    
+    def Load( self, media_result: "MediaResult" ):
+        
+        with self._lock:
+            
+            # the caller may have missed an earlier load that failed, so make sure it is in
+            self._hash_ids_to_media_results[ media_result.GetHashId() ] = media_result
+            
+            media_results = [ media_result for media_result in self._hash_ids_to_media_results.values() if not media_result.IsLoaded() ]
+            
+            self._hash_ids_to_media_results = weakref.WeakValueDictionary()
+            
+            if len( media_results ) > 0:
+                
+                HG.client_controller.Read( 'media_results_lazy_load', media_results )
+                
+            
+        
+    
+
 class MediaResult( object ):
     
+    __slots__ = ( '_file_info_manager', '_tags_manager', '_locations_manager', '_ratings_manager', '_notes_manager', '_file_viewing_stats_manager', '_lazy_loader', '__weakref__' )
+    
     def __init__(
         self,
         file_info_manager: ClientMediaManagers.FileInfoManager,
-        tags_manager: ClientMediaManagers.TagsManager,
+        tags_manager: typing.Optional[ ClientMediaManagers.TagsManager ],
         locations_manager: ClientMediaManagers.LocationsManager,
-        ratings_manager: ClientMediaManagers.RatingsManager,
-        notes_manager: ClientMediaManagers.NotesManager,
-        file_viewing_stats_manager: ClientMediaManagers.FileViewingStatsManager
+        ratings_manager: typing.Optional[ ClientMediaManagers.RatingsManager ],
+        notes_manager: typing.Optional[ ClientMediaManagers.NotesManager ],
+        file_viewing_stats_manager: typing.Optional[ ClientMediaManagers.FileViewingStatsManager ],
+        lazy_loader: typing.Optional[ MediaResultLazyLoader ] = None
     ):
         
         self._file_info_manager = file_info_manager
@@ -25,6 +71,23 @@ class MediaResult( object ):
         self._notes_manager = notes_manager
         self._file_viewing_stats_manager = file_viewing_stats_manager
         
+        self._lazy_loader = lazy_loader
+        
+        if self._lazy_loader is not None:
+            
+            self._lazy_loader.AddMediaResult( self )
+            
+        
+    
+    def _LoadLazyManagers( self ):
+        
+        lazy_loader = self._lazy_loader
+        
+        if lazy_loader is not None:
+            
+            lazy_loader.Load( self )
+            
+        
     
     def DeletePending( self, service_key: bytes ):
         
@@ -41,7 +104,10 @@ class MediaResult( object ):
         
         if service_type in HC.REAL_TAG_SERVICES:
             
-            self._tags_manager.DeletePending( service_key )
+            if self._tags_manager is not None:
+                
+                self._tags_manager.DeletePending( service_key )
+                
             
         elif service_type in HC.FILE_SERVICES:
             
@@ -51,6 +117,8 @@ class MediaResult( object ):
     
     def Duplicate( self ):
         
+        self._LoadLazyManagers()
+        
         file_info_manager = self._file_info_manager.Duplicate()
         tags_manager = self._tags_manager.Duplicate()
         locations_manager = self._locations_manager.Duplicate()
@@ -73,6 +141,11 @@ class MediaResult( object ):
     
     def GetFileViewingStatsManager( self ) -> ClientMediaManagers.FileViewingStatsManager:
         
+        if self._file_viewing_stats_manager is None:
+            
+            self._LoadLazyManagers()
+            
+        
         return self._file_viewing_stats_manager
         
     
@@ -103,6 +176,11 @@ class MediaResult( object ):
     
     def GetNotesManager( self ) -> ClientMediaManagers.NotesManager:
         
+        if self._notes_manager is None:
+            
+            self._LoadLazyManagers()
+            
+        
         return self._notes_manager
         
     
@@ -118,6 +196,11 @@ class MediaResult( object ):
     
     def GetRatingsManager( self ):
         
+        if self._ratings_manager is None:
+            
+            self._LoadLazyManagers()
+            
+        
         return self._ratings_manager
         
     
@@ -133,6 +216,11 @@ class MediaResult( object ):
     
     def GetTagsManager( self ) -> ClientMediaManagers.TagsManager:
         
+        if self._tags_manager is None:
+            
+            self._LoadLazyManagers()
+            
+        
         return self._tags_manager
         
     
@@ -143,7 +231,7 @@ class MediaResult( object ):
     
     def HasNotes( self ):
         
-        return self._notes_manager.GetNumNotes() > 0
+        return self.GetNotesManager().GetNumNotes() > 0
         
     
     def IsDeleteLocked( self ):
@@ -163,6 +251,11 @@ class MediaResult( object ):
         return False
         
     
+    def IsLoaded( self ):
+        
+        return self._lazy_loader is None
+        
+    
     def IsStaticImage( self ):
         
         image = self._file_info_manager.mime in HC.IMAGES
@@ -171,6 +264,11 @@ class MediaResult( object ):
         return image or static_animation
         
     
+    def IsTagsManagerLoaded( self ):
+        
+        return self._tags_manager is not None
+        
+    
     def ProcessContentUpdate( self, service_key, content_update ):
         
         try:
@@ -184,15 +282,23 @@ class MediaResult( object ):
         
         service_type = service.GetServiceType()
         
+        # a manager that is not loaded yet is skipped. the db has already saved this update, so it will be in there when we load
+        
         if service_type in HC.REAL_TAG_SERVICES:
             
-            self._tags_manager.ProcessContentUpdate( service_key, content_update )
+            if self._tags_manager is not None:
+                
+                self._tags_manager.ProcessContentUpdate( service_key, content_update )
+                
             
         elif service_type in HC.FILE_SERVICES:
             
             if content_update.GetDataType() == HC.CONTENT_TYPE_FILE_VIEWING_STATS:
                 
-                self._file_viewing_stats_manager.ProcessContentUpdate( content_update )
+                if self._file_viewing_stats_manager is not None:
+                    
+                    self._file_viewing_stats_manager.ProcessContentUpdate( content_update )
+                    
                 
             else:
                 
@@ -201,20 +307,63 @@ class MediaResult( object ):
             
         elif service_type in HC.RATINGS_SERVICES:
             
-            self._ratings_manager.ProcessContentUpdate( service_key, content_update )
+            if self._ratings_manager is not None:
+                
+                self._ratings_manager.ProcessContentUpdate( service_key, content_update )
+                
             
         elif service_type == HC.LOCAL_NOTES:
             
-            self._notes_manager.ProcessContentUpdate( content_update )
+            if self._notes_manager is not None:
+                
+                self._notes_manager.ProcessContentUpdate( content_update )
+                
             
         
     
     def ResetService( self, service_key ):
         
-        self._tags_manager.ResetService( service_key )
+        if self._tags_manager is not None:
+            
+            self._tags_manager.ResetService( service_key )
+            
+        
         self._locations_manager.ResetService( service_key )
         
     
+    def SetLazyManagers(
+        self,
+        tags_manager: ClientMediaManagers.TagsManager,
+        ratings_manager: ClientMediaManagers.RatingsManager,
+        notes_manager: ClientMediaManagers.NotesManager,
+        file_viewing_stats_manager: ClientMediaManagers.FileViewingStatsManager
+    ):
+        
+        # anything set since we were created, like a force-refreshed tags manager, is already up to date, so we keep it
+        
+        if self._tags_manager is None:
+            
+            self._tags_manager = tags_manager
+            
+        
+        if self._ratings_manager is None:
+            
+            self._ratings_manager = ratings_manager
+            
+        
+        if self._notes_manager is None:
+            
+            self._notes_manager = notes_manager
+            
+        
+        if self._file_viewing_stats_manager is None:
+            
+            self._file_viewing_stats_manager = file_viewing_stats_manager
+            
+        
+        self._lazy_loader = None
+        
+    
     def SetTagsManager( self, tags_manager ):
         
         self._tags_manager = tags_manager
@@ -222,6 +371,8 @@ class MediaResult( object ):
     
     def ToTuple( self ):
         
+        self._LoadLazyManagers()
+        
         return ( self._file_info_manager, self._tags_manager, self._locations_manager, self._ratings_manager )
         
     
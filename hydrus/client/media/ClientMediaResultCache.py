@@ -72,7 +72,9 @@ class MediaResultCache( object ):
         
         with self._lock:
             
-            return { hash_id for ( hash_id, media_result ) in self._hash_ids_to_media_results.items() if media_result.GetTagsManager().HasAnyOfTheseTags( tags, ClientTags.TAG_DISPLAY_STORAGE ) }
+            # this is called from the db thread, so we must not ask a lazy media result to load itself here
+            
+            return { hash_id for ( hash_id, media_result ) in self._hash_ids_to_media_results.items() if media_result.IsTagsManagerLoaded() and media_result.GetTagsManager().HasAnyOfTheseTags( tags, ClientTags.TAG_DISPLAY_STORAGE ) }
             
         
     
@@ -155,7 +157,10 @@ class MediaResultCache( object ):
             
             for media_result in self._hash_ids_to_media_results.values():
                 
-                media_result.GetTagsManager().NewTagDisplayRules()
+                if media_result.IsTagsManagerLoaded():
+                    
+                    media_result.GetTagsManager().NewTagDisplayRules()
+                    
                 
             
         
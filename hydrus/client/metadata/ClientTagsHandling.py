@@ -308,6 +308,8 @@ class TagDisplayMaintenanceManager( object ):
         
         self._go_faster = set()
         
+        self._service_keys_to_bulk_sync_rows_per_second = {}
+        
         self._last_loop_work_time = 0.5
         
         self._shutdown = False
@@ -407,6 +409,26 @@ class TagDisplayMaintenanceManager( object ):
             
         
     
+    def _ShouldSyncBulk( self, service_key ):
+        
+        # the bulk sync can hold the db for a good while, so it is only for when the user is away or has asked for it
+        
+        if not self._controller.new_options.GetBoolean( 'tag_display_maintenance_bulk_sync' ):
+            
+            return False
+            
+        
+        with self._lock:
+            
+            if service_key in self._go_faster:
+                
+                return True
+                
+            
+        
+        return self._controller.CurrentlyIdle()
+        
+    
     def _WorkPermitted( self ):
         
         if len( self._go_faster ) > 0:
@@ -492,6 +514,14 @@ class TagDisplayMaintenanceManager( object ):
         self.Wake()
         
     
+    def GetBulkSyncRowsPerSecond( self, service_key ):
+        
+        with self._lock:
+            
+            return self._service_keys_to_bulk_sync_rows_per_second.get( service_key, None )
+            
+        
+    
     def GetName( self ):
         
         return 'tag display maintenance'
@@ -531,12 +561,38 @@ class TagDisplayMaintenanceManager( object ):
                     
                     start_time = HydrusData.GetNowPrecise()
                     
-                    still_needs_work = self._controller.WriteSynchronous( 'sync_tag_display_maintenance', service_key, work_time )
+                    if self._ShouldSyncBulk( service_key ):
+                        
+                        with self._lock:
+                            
+                            maintenance_mode = HC.MAINTENANCE_FORCED if service_key in self._go_faster else HC.MAINTENANCE_IDLE
+                            
+                        
+                        ( still_needs_work, num_rows_synced ) = self._controller.WriteSynchronous( 'sync_tag_display_maintenance_bulk', service_key, work_time, maintenance_mode = maintenance_mode )
+                        
+                    else:
+                        
+                        num_rows_synced = None
+                        
+                        still_needs_work = self._controller.WriteSynchronous( 'sync_tag_display_maintenance', service_key, work_time )
+                        
                     
                     finish_time = HydrusData.GetNowPrecise()
                     
                     total_time_took = finish_time - start_time
                     
+                    if num_rows_synced is not None and num_rows_synced > 0:
+                        
+                        rows_per_second = num_rows_synced / max( total_time_took, 0.001 )
+                        
+                        with self._lock:
+                            
+                            self._service_keys_to_bulk_sync_rows_per_second[ service_key ] = rows_per_second
+                            
+                        
+                        HydrusData.Print( 'Bulk tag sibling/parent sync did {} rows at {} rows/s.'.format( HydrusData.ToHumanInt( num_rows_synced ), HydrusData.ToHumanInt( int( rows_per_second ) ) ) )
+                        
+                    
                     self._service_keys_to_needs_work[ service_key ] = still_needs_work
                     
                     wait_time = self._GetAfterWorkWaitTime( service_key, work_time, total_time_took )
@@ -118,6 +118,8 @@ class HydrusServiceClientAPI( HydrusClientService ):
         
         root.putChild( b'manage_database', manage_database )
         
+        manage_database.putChild( b'get_job_statistics', ClientLocalServerResources.HydrusResourceClientAPIRestrictedManageDatabaseGetJobStatistics( self._service, self._client_requests_domain ) )
+        manage_database.putChild( b'get_slow_queries', ClientLocalServerResources.HydrusResourceClientAPIRestrictedManageDatabaseGetSlowQueries( self._service, self._client_requests_domain ) )
         manage_database.putChild( b'mr_bones', ClientLocalServerResources.HydrusResourceClientAPIRestrictedManageDatabaseMrBones( self._service, self._client_requests_domain ) )
         manage_database.putChild( b'lock_on', ClientLocalServerResources.HydrusResourceClientAPIRestrictedManageDatabaseLockOn( self._service, self._client_requests_domain ) )
         manage_database.putChild( b'lock_off', ClientLocalServerResources.HydrusResourceClientAPIRestrictedManageDatabaseLockOff( self._service, self._client_requests_domain ) )
@@ -55,10 +55,10 @@ LOCAL_BOORU_STRING_PARAMS = set()
 LOCAL_BOORU_JSON_PARAMS = set()
 LOCAL_BOORU_JSON_BYTE_LIST_PARAMS = set()
 
-CLIENT_API_INT_PARAMS = { 'file_id', 'file_sort_type' }
-CLIENT_API_BYTE_PARAMS = { 'hash', 'destination_page_key', 'page_key', 'Hydrus-Client-API-Access-Key', 'Hydrus-Client-API-Session-Key', 'tag_service_key', 'file_service_key' }
+CLIENT_API_INT_PARAMS = { 'file_id', 'file_sort_type', 'limit', 'offset' }
+CLIENT_API_BYTE_PARAMS = { 'hash', 'destination_page_key', 'page_key', 'Hydrus-Client-API-Access-Key', 'Hydrus-Client-API-Session-Key', 'tag_service_key', 'file_service_key', 'cursor' }
 CLIENT_API_STRING_PARAMS = { 'name', 'url', 'domain', 'search', 'file_service_name', 'tag_service_name', 'reason', 'tag_display_type', 'source_hash_type', 'desired_hash_type' }
-CLIENT_API_JSON_PARAMS = { 'basic_permissions', 'system_inbox', 'system_archive', 'tags', 'file_ids', 'only_return_identifiers', 'only_return_basic_information', 'create_new_file_ids', 'detailed_url_information', 'hide_service_names_tags', 'hide_service_keys_tags', 'simple', 'file_sort_asc', 'return_hashes', 'return_file_ids', 'include_notes', 'notes', 'note_names', 'doublecheck_file_system' }
+CLIENT_API_JSON_PARAMS = { 'basic_permissions', 'system_inbox', 'system_archive', 'tags', 'file_ids', 'only_return_identifiers', 'only_return_basic_information', 'create_new_file_ids', 'detailed_url_information', 'hide_service_names_tags', 'hide_service_keys_tags', 'simple', 'file_sort_asc', 'return_hashes', 'return_file_ids', 'include_notes', 'notes', 'note_names', 'doublecheck_file_system', 'stream' }
 CLIENT_API_JSON_BYTE_LIST_PARAMS = { 'hashes' }
 CLIENT_API_JSON_BYTE_DICT_PARAMS = { 'service_keys_to_tags', 'service_keys_to_actions_to_tags', 'service_keys_to_additional_tags' }
 
@@ -928,27 +928,25 @@ class HydrusResourceBooruThumbnail( HydrusResourceBooru ):
         
         mime = media_result.GetMime()
         
-        response_context_mime = HC.IMAGE_PNG
-        
         if mime in HC.MIMES_WITH_THUMBNAILS:
             
             client_files_manager = HG.client_controller.client_files_manager
             
-            path = client_files_manager.GetThumbnailPath( media_result )
-            
-            response_context_mime = HC.APPLICATION_UNKNOWN
-            
-            if not os.path.exists( path ):
+            try:
                 
-                path = HydrusPaths.mimes_to_default_thumbnail_paths[ mime ]
+                thumbnail_bytes = client_files_manager.GetThumbnailBytes( media_result )
+                
+                return HydrusServerResources.ResponseContext( 200, mime = HC.APPLICATION_UNKNOWN, body = thumbnail_bytes )
+                
+            except HydrusExceptions.FileMissingException:
+                
+                pass
                 
             
-        else:
-            
-            path = HydrusPaths.mimes_to_default_thumbnail_paths[ mime ]
-            
         
-        response_context = HydrusServerResources.ResponseContext( 200, mime = response_context_mime, path = path )
+        path = HydrusPaths.mimes_to_default_thumbnail_paths[ mime ]
+        
+        response_context = HydrusServerResources.ResponseContext( 200, mime = HC.IMAGE_PNG, path = path )
         
         return response_context
         
@@ -2173,7 +2171,67 @@ class HydrusResourceClientAPIRestrictedGetFiles( HydrusResourceClientAPIRestrict
     
 class HydrusResourceClientAPIRestrictedGetFilesSearchFiles( HydrusResourceClientAPIRestrictedGetFiles ):
     
-    def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
+    STREAM_BLOCK_SIZE = 4096
+    
+    def _GenerateStreamedJSONBody( self, body_dict, hash_ids, return_hashes, return_file_ids ):
+        
+        # the small stuff goes first, then the big lists a block at a time, so neither end has to hold the whole response in memory
+        
+        key_texts = [ '{}: {}'.format( json.dumps( key ), json.dumps( value ) ) for ( key, value ) in body_dict.items() ]
+        
+        if return_hashes:
+            
+            key_texts.append( '"hashes": [' )
+            
+        
+        yield bytes( '{' + ', '.join( key_texts ), 'utf-8' )
+        
+        need_comma = len( body_dict ) > 0
+        
+        if return_hashes:
+            
+            for ( i, block_of_hash_ids ) in enumerate( HydrusData.SplitListIntoChunks( hash_ids, self.STREAM_BLOCK_SIZE ) ):
+                
+                hash_ids_to_hashes = HG.client_controller.Read( 'hash_ids_to_hashes', hash_ids = block_of_hash_ids )
+                
+                text = ', '.join( ( '"{}"'.format( hash_ids_to_hashes[ hash_id ].hex() ) for hash_id in block_of_hash_ids ) )
+                
+                if i > 0:
+                    
+                    text = ', ' + text
+                    
+                
+                yield bytes( text, 'utf-8' )
+                
+            
+            yield b']'
+            
+            need_comma = True
+            
+        
+        if return_file_ids:
+            
+            yield b', "file_ids": [' if need_comma else b'"file_ids": ['
+            
+            for ( i, block_of_hash_ids ) in enumerate( HydrusData.SplitListIntoChunks( hash_ids, self.STREAM_BLOCK_SIZE ) ):
+                
+                text = ', '.join( ( str( hash_id ) for hash_id in block_of_hash_ids ) )
+                
+                if i > 0:
+                    
+                    text = ', ' + text
+                    
+                
+                yield bytes( text, 'utf-8' )
+                
+            
+            yield b']'
+            
+        
+        yield b'}'
+        
+    
+    def _GetSearchHashIds( self, request: HydrusServerRequest.HydrusRequest ):
         
         location_context = ParseLocationContext( request, ClientLocation.LocationContext.STATICCreateSimple( CC.COMBINED_LOCAL_MEDIA_SERVICE_KEY ) )
         
@@ -2224,9 +2282,6 @@ class HydrusResourceClientAPIRestrictedGetFilesSearchFiles( HydrusResourceClient
         tag_context = ClientSearch.TagContext( service_key = tag_service_key )
         predicates = ParseClientAPISearchPredicates( request )
         
-        return_hashes = False
-        return_file_ids = True
-        
         if len( predicates ) == 0:
             
             hash_ids = []
@@ -2259,26 +2314,88 @@ class HydrusResourceClientAPIRestrictedGetFilesSearchFiles( HydrusResourceClient
             # newest first
             sort_by = ClientMedia.MediaSort( sort_type = ( 'system', file_sort_type ), sort_order = sort_order )
             
-            if 'return_hashes' in request.parsed_request_args:
+            job_key = ClientThreading.JobKey( cancellable = True )
+            
+            request.disconnect_callables.append( job_key.Cancel )
+            
+            hash_ids = HG.client_controller.Read( 'file_query_ids', file_search_context, job_key = job_key, sort_by = sort_by, apply_implicit_limit = False )
+            
+        
+        return hash_ids
+        
+    
+    def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
+        
+        return_hashes = False
+        return_file_ids = True
+        
+        if 'return_hashes' in request.parsed_request_args:
+            
+            return_hashes = request.parsed_request_args.GetValue( 'return_hashes', bool )
+            
+        
+        if 'return_file_ids' in request.parsed_request_args:
+            
+            return_file_ids = request.parsed_request_args.GetValue( 'return_file_ids', bool )
+            
+        
+        body_dict = {}
+        
+        if 'cursor' in request.parsed_request_args:
+            
+            cursor = request.parsed_request_args.GetValue( 'cursor', bytes )
+            
+            hash_ids = request.client_api_permissions.GetSearchCursorResults( cursor )
+            
+        else:
+            
+            cursor = None
+            
+            hash_ids = list( self._GetSearchHashIds( request ) )
+            
+            request.client_api_permissions.SetLastSearchResults( hash_ids )
+            
+        
+        if cursor is not None or 'limit' in request.parsed_request_args or 'offset' in request.parsed_request_args:
+            
+            # the full result set stays here, and the caller can walk it with offset/limit
+            
+            if cursor is None:
                 
-                return_hashes = request.parsed_request_args.GetValue( 'return_hashes', bool )
+                cursor = request.client_api_permissions.CreateSearchCursor( hash_ids )
                 
             
-            if 'return_file_ids' in request.parsed_request_args:
+            offset = request.parsed_request_args.GetValue( 'offset', int, default_value = 0 )
+            limit = request.parsed_request_args.GetValue( 'limit', int, none_on_missing = True )
+            
+            if offset < 0 or ( limit is not None and limit < 0 ):
                 
-                return_file_ids = request.parsed_request_args.GetValue( 'return_file_ids', bool )
+                raise HydrusExceptions.BadRequestException( 'Sorry, offset and limit cannot be negative!' )
                 
             
-            job_key = ClientThreading.JobKey( cancellable = True )
-            
-            request.disconnect_callables.append( job_key.Cancel )
+            body_dict[ 'cursor' ] = cursor.hex()
+            body_dict[ 'num_results' ] = len( hash_ids )
             
-            hash_ids = HG.client_controller.Read( 'file_query_ids', file_search_context, job_key = job_key, sort_by = sort_by, apply_implicit_limit = False )
+            if limit is None:
+                
+                hash_ids = hash_ids[ offset : ]
+                
+            else:
+                
+                hash_ids = hash_ids[ offset : offset + limit ]
+                
             
         
-        request.client_api_permissions.SetLastSearchResults( hash_ids )
+        stream = request.parsed_request_args.GetValue( 'stream', bool, default_value = False )
         
-        body_dict = {}
+        if stream and request.preferred_mime == HC.APPLICATION_JSON:
+            
+            body_chunks = self._GenerateStreamedJSONBody( body_dict, hash_ids, return_hashes, return_file_ids )
+            
+            response_context = HydrusServerResources.ResponseContext( 200, mime = HC.APPLICATION_JSON, body_chunks = body_chunks )
+            
+            return response_context
+            
         
         if return_hashes:
             
@@ -2824,13 +2941,11 @@ class HydrusResourceClientAPIRestrictedGetFilesGetThumbnail( HydrusResourceClien
         
         try:
             
-            path = HG.client_controller.client_files_manager.GetThumbnailPath( media_result )
+            thumbnail_bytes = HG.client_controller.client_files_manager.GetThumbnailBytes( media_result )
             
-            if not os.path.exists( path ):
-                
-                # not _supposed_ to happen, but it seems in odd situations it can
-                raise HydrusExceptions.FileMissingException()
-                
+            mime = HydrusFileHandling.GetThumbnailMimeFromBytes( thumbnail_bytes[:256] )
+            
+            return HydrusServerResources.ResponseContext( 200, mime = mime, body = thumbnail_bytes )
             
         except HydrusExceptions.FileMissingException:
             
@@ -2995,6 +3110,44 @@ class HydrusResourceClientAPIRestrictedManageDatabase( HydrusResourceClientAPIRe
         request.client_api_permissions.CheckPermission( ClientAPI.CLIENT_API_PERMISSION_MANAGE_DATABASE )
         
     
+class HydrusResourceClientAPIRestrictedManageDatabaseGetJobStatistics( HydrusResourceClientAPIRestrictedManageDatabase ):
+    
+    BLOCKED_WHEN_BUSY = False
+    
+    def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
+        
+        job_statistics = HG.client_controller.GetDBJobStatistics()
+        
+        body_dict = { 'job_statistics' : job_statistics }
+        
+        mime = request.preferred_mime
+        body = Dumps( body_dict, mime )
+        
+        response_context = HydrusServerResources.ResponseContext( 200, mime = mime, body = body )
+        
+        return response_context
+        
+    
+class HydrusResourceClientAPIRestrictedManageDatabaseGetSlowQueries( HydrusResourceClientAPIRestrictedManageDatabase ):
+    
+    BLOCKED_WHEN_BUSY = False
+    
+    def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
+        
+        slow_queries = HG.client_controller.GetDBSlowQueries()
+        
+        body_dict = {
+            'slow_queries' : [ { 'timestamp' : timestamp, 'duration' : duration, 'job' : job_name, 'query' : query } for ( timestamp, duration, job_name, query ) in slow_queries ]
+        }
+        
+        mime = request.preferred_mime
+        body = Dumps( body_dict, mime )
+        
+        response_context = HydrusServerResources.ResponseContext( 200, mime = mime, body = body )
+        
+        return response_context
+        
+    
 class HydrusResourceClientAPIRestrictedManageDatabaseLockOff( HydrusResourceClientAPIRestrictedManageDatabase ):
     
     BLOCKED_WHEN_BUSY = False
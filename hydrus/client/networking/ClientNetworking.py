@@ -1,6 +1,7 @@
 import collections
+import heapq
+import itertools
 import threading
-import time
 import typing
 
 from hydrus.core import HydrusData
@@ -52,21 +53,35 @@ class NetworkEngine( object ):
         self.MAX_JOBS = 1
         self.MAX_JOBS_PER_DOMAIN = 1
         
-        self.RefreshOptions()
-        
         self._new_work_to_do = threading.Event()
         
+        self.RefreshOptions()
+        
         self._domains_to_login = []
         
         self._active_domains_counter = collections.Counter()
         
-        self._jobs_awaiting_validity = []
+        # every job we own and what stage it is at. the stage containers below only hold jobs that are worth looking at right now
+        self._jobs_to_status = {}
+        
+        self._jobs_awaiting_validity = collections.deque()
         self._current_validation_process = None
-        self._jobs_awaiting_bandwidth = []
-        self._jobs_awaiting_login = []
+        self._jobs_awaiting_bandwidth = collections.deque()
+        self._jobs_awaiting_login = collections.deque()
+        self._jobs_awaiting_login_process = []
         self._current_login_process = None
-        self._jobs_awaiting_slot = []
-        self._jobs_running = []
+        self._jobs_awaiting_slot = collections.OrderedDict() # second level domain -> deque of jobs
+        self._jobs_paused = []
+        self._jobs_running = set()
+        
+        # sleeping and bandwidth-blocked jobs sit in here, keyed on when they next want looking at
+        self._sleeping_jobs_heap = []
+        self._sleeping_jobs_to_wake_times = {}
+        self._sleeping_jobs_counter = itertools.count()
+        
+        # these are appended to from other threads without our lock
+        self._finished_jobs = collections.deque()
+        self._woken_jobs = collections.deque()
         
         self._pause_all_new_network_traffic = self.controller.new_options.GetBoolean( 'pause_all_new_network_traffic' )
         
@@ -77,6 +92,183 @@ class NetworkEngine( object ):
         self.controller.sub( self, 'RefreshOptions', 'notify_new_options' )
         
     
+    def _ForgetJob( self, job: ClientNetworkingJobs.NetworkJob ):
+        
+        status = self._jobs_to_status.pop( job, None )
+        
+        if status is None:
+            
+            return
+            
+        
+        if job in self._sleeping_jobs_to_wake_times:
+            
+            # the heap entry is left behind and skipped when it comes up
+            
+            del self._sleeping_jobs_to_wake_times[ job ]
+            
+            return
+            
+        
+        if status == JOB_STATUS_AWAITING_SLOT:
+            
+            second_level_domain = job.GetSecondLevelDomain()
+            
+            if second_level_domain in self._jobs_awaiting_slot:
+                
+                queue = self._jobs_awaiting_slot[ second_level_domain ]
+                
+                if job in queue:
+                    
+                    queue.remove( job )
+                    
+                
+                if len( queue ) == 0:
+                    
+                    del self._jobs_awaiting_slot[ second_level_domain ]
+                    
+                
+            
+        
+        for container in ( self._jobs_awaiting_validity, self._jobs_awaiting_bandwidth, self._jobs_awaiting_login, self._jobs_awaiting_login_process, self._jobs_paused ):
+            
+            if job in container:
+                
+                container.remove( job )
+                
+                return
+                
+            
+        
+    
+    def _GetTimeUntilNextWake( self ):
+        
+        # we poll the validation and login processes, and we always want to notice a model shutdown, so never wait too long
+        
+        time_until_next_wake = 1.0
+        
+        while len( self._sleeping_jobs_heap ) > 0:
+            
+            ( wake_time, sleep_index, job ) = self._sleeping_jobs_heap[0]
+            
+            if self._sleeping_jobs_to_wake_times.get( job, None ) != wake_time:
+                
+                heapq.heappop( self._sleeping_jobs_heap )
+                
+                continue
+                
+            
+            time_until_next_wake = min( time_until_next_wake, wake_time - HydrusData.GetNowFloat() )
+            
+            break
+            
+        
+        return max( time_until_next_wake, 0.0 )
+        
+    
+    def _QueueJob( self, job: ClientNetworkingJobs.NetworkJob, status: int ):
+        
+        self._jobs_to_status[ job ] = status
+        
+        if status == JOB_STATUS_AWAITING_VALIDITY:
+            
+            self._jobs_awaiting_validity.append( job )
+            
+        elif status == JOB_STATUS_AWAITING_BANDWIDTH:
+            
+            self._jobs_awaiting_bandwidth.append( job )
+            
+        elif status == JOB_STATUS_AWAITING_LOGIN:
+            
+            self._jobs_awaiting_login.append( job )
+            
+        elif status == JOB_STATUS_AWAITING_SLOT:
+            
+            second_level_domain = job.GetSecondLevelDomain()
+            
+            if second_level_domain not in self._jobs_awaiting_slot:
+                
+                self._jobs_awaiting_slot[ second_level_domain ] = collections.deque()
+                
+            
+            self._jobs_awaiting_slot[ second_level_domain ].append( job )
+            
+            # the job sits untouched until a slot frees up, so it is told why once, here
+            
+            if self._active_domains_counter[ second_level_domain ] >= self.MAX_JOBS_PER_DOMAIN:
+                
+                job.SetStatus( 'waiting for other jobs on this domain to finish' )
+                
+            else:
+                
+                job.SetStatus( 'waiting for other jobs to finish\u2026' )
+                
+            
+        
+    
+    def _SleepJob( self, job: ClientNetworkingJobs.NetworkJob, status: int ):
+        
+        wake_time = job.GetWakeTime()
+        
+        now = HydrusData.GetNowFloat()
+        
+        if wake_time <= now:
+            
+            # blocked but not asleep, which for bandwidth means it comes back on the rollover of the second
+            
+            wake_time = now + ( 1.0 - ( now % 1 ) )
+            
+        
+        self._jobs_to_status[ job ] = status
+        
+        self._sleeping_jobs_to_wake_times[ job ] = wake_time
+        
+        heapq.heappush( self._sleeping_jobs_heap, ( wake_time, next( self._sleeping_jobs_counter ), job ) )
+        
+    
+    def _WakeDueJobs( self ):
+        
+        now = HydrusData.GetNowFloat()
+        
+        while len( self._sleeping_jobs_heap ) > 0 and self._sleeping_jobs_heap[0][0] <= now:
+            
+            ( wake_time, sleep_index, job ) = heapq.heappop( self._sleeping_jobs_heap )
+            
+            if self._sleeping_jobs_to_wake_times.get( job, None ) != wake_time:
+                
+                continue
+                
+            
+            del self._sleeping_jobs_to_wake_times[ job ]
+            
+            self._QueueJob( job, self._jobs_to_status[ job ] )
+            
+        
+        while len( self._woken_jobs ) > 0:
+            
+            job = self._woken_jobs.popleft()
+            
+            if job not in self._jobs_to_status:
+                
+                continue
+                
+            
+            if job.IsDone():
+                
+                if job not in self._jobs_running:
+                    
+                    self._ForgetJob( job )
+                    
+                
+            elif job in self._sleeping_jobs_to_wake_times:
+                
+                del self._sleeping_jobs_to_wake_times[ job ]
+                
+                self._QueueJob( job, self._jobs_to_status[ job ] )
+                
+            
+        
+    
     def AddJob( self, job: ClientNetworkingJobs.NetworkJob ):
         
         if HG.network_report_mode:
@@ -88,7 +280,7 @@ class NetworkEngine( object ):
             
             job.engine = self
             
-            self._jobs_awaiting_validity.append( job )
+            self._QueueJob( job, JOB_STATUS_AWAITING_VALIDITY )
             
         
         self._new_work_to_do.set()
@@ -103,18 +295,16 @@ class NetworkEngine( object ):
             self._domains_to_login = HydrusData.DedupeList( self._domains_to_login )
             
         
+        self._new_work_to_do.set()
+        
     
     def GetJobsSnapshot( self ):
         
         with self._lock:
             
-            jobs = []
+            jobs = [ ( status, job ) for ( job, status ) in self._jobs_to_status.items() ]
             
-            jobs.extend( ( ( JOB_STATUS_AWAITING_VALIDITY, j ) for j in self._jobs_awaiting_validity ) )
-            jobs.extend( ( ( JOB_STATUS_AWAITING_BANDWIDTH, j ) for j in self._jobs_awaiting_bandwidth ) )
-            jobs.extend( ( ( JOB_STATUS_AWAITING_LOGIN, j ) for j in self._jobs_awaiting_login ) )
-            jobs.extend( ( ( JOB_STATUS_AWAITING_SLOT, j ) for j in self._jobs_awaiting_slot ) )
-            jobs.extend( ( ( JOB_STATUS_RUNNING, j ) for j in self._jobs_running ) )
+            jobs.sort( key = lambda status_and_job: status_and_job[0] )
             
             return jobs
             
@@ -124,7 +314,7 @@ class NetworkEngine( object ):
         
         with self._lock:
             
-            return len( self._jobs_awaiting_validity ) + len( self._jobs_awaiting_bandwidth ) + len( self._jobs_awaiting_login ) + len( self._jobs_awaiting_slot ) + len( self._jobs_running ) > 50
+            return len( self._jobs_to_status ) > 50
             
         
     
@@ -146,15 +336,20 @@ class NetworkEngine( object ):
     
     def MainLoop( self ):
         
+        def DropJob( job: ClientNetworkingJobs.NetworkJob ):
+            
+            del self._jobs_to_status[ job ]
+            
+        
         def ProcessValidationJob( job: ClientNetworkingJobs.NetworkJob ):
             
             if job.IsDone():
                 
-                return False
+                DropJob( job )
                 
             elif job.IsAsleep():
                 
-                return True
+                self._SleepJob( job, JOB_STATUS_AWAITING_VALIDITY )
                 
             elif not job.IsValid():
                 
@@ -170,14 +365,16 @@ class NetworkEngine( object ):
                         
                         job.SetStatus( 'validation presented to user\u2026' )
                         
+                        self._SleepJob( job, JOB_STATUS_AWAITING_VALIDITY )
+                        
                     else:
                         
                         job.SetStatus( 'waiting in user validation queue\u2026' )
                         
                         job.Sleep( 5 )
                         
-                    
-                    return True
+                        self._SleepJob( job, JOB_STATUS_AWAITING_VALIDITY )
+                        
                     
                 else:
                     
@@ -185,14 +382,12 @@ class NetworkEngine( object ):
                     
                     job.SetError( HydrusExceptions.ValidationException( error_text ), error_text )
                     
-                    return False
+                    DropJob( job )
                     
                 
             else:
                 
-                self._jobs_awaiting_bandwidth.append( job )
-                
-                return False
+                self._QueueJob( job, JOB_STATUS_AWAITING_BANDWIDTH )
                 
             
         
@@ -211,30 +406,25 @@ class NetworkEngine( object ):
             
             if job.IsDone():
                 
-                return False
+                DropJob( job )
                 
             elif job.IsAsleep():
                 
-                return True
+                self._SleepJob( job, JOB_STATUS_AWAITING_BANDWIDTH )
                 
-            
             elif self._pause_all_new_network_traffic:
                 
                 job.SetStatus( 'all new network traffic is paused\u2026' )
                 
-                job.Sleep( 2 )
-                
-                return True
+                self._jobs_paused.append( job )
                 
             elif not job.TryToStartBandwidth():
                 
-                return True
+                self._SleepJob( job, JOB_STATUS_AWAITING_BANDWIDTH )
                 
             else:
                 
-                self._jobs_awaiting_login.append( job )
-                
-                return False
+                self._QueueJob( job, JOB_STATUS_AWAITING_LOGIN )
                 
             
         
@@ -265,11 +455,11 @@ class NetworkEngine( object ):
             
             if job.IsDone():
                 
-                return False
+                DropJob( job )
                 
             elif job.IsAsleep():
                 
-                return True
+                self._SleepJob( job, JOB_STATUS_AWAITING_LOGIN )
                 
             elif job.NeedsLogin():
                 
@@ -285,7 +475,7 @@ class NetworkEngine( object ):
                         
                         job.Sleep( 60 )
                         
-                        return True
+                        self._SleepJob( job, JOB_STATUS_AWAITING_LOGIN )
                         
                     else:
                         
@@ -300,9 +490,11 @@ class NetworkEngine( object ):
                         
                         job.Cancel( message )
                         
-                        return False
+                        DropJob( job )
                         
                     
+                    return
+                    
                 
                 if self._current_login_process is None:
                     
@@ -318,7 +510,9 @@ class NetworkEngine( object ):
                         
                         job.Sleep( 60 )
                         
-                        return True
+                        self._SleepJob( job, JOB_STATUS_AWAITING_LOGIN )
+                        
+                        return
                         
                     
                     self.controller.CallToThread( login_process.Start )
@@ -332,13 +526,13 @@ class NetworkEngine( object ):
                     job.SetStatus( 'waiting in login queue\u2026' )
                     
                 
-                return True
+                # nothing changes for this job until the login process is done
                 
-            else:
+                self._jobs_awaiting_login_process.append( job )
                 
-                self._jobs_awaiting_slot.append( job )
+            else:
                 
-                return False
+                self._QueueJob( job, JOB_STATUS_AWAITING_SLOT )
                 
             
         
@@ -350,6 +544,39 @@ class NetworkEngine( object ):
                     
                     self._current_login_process = None
                     
+                    self._jobs_awaiting_login.extend( self._jobs_awaiting_login_process )
+                    
+                    self._jobs_awaiting_login_process = []
+                    
+                
+            
+        
+        def ProcessPausedJobs():
+            
+            if self._pause_all_new_network_traffic:
+                
+                # slot jobs are only looked at when a slot frees up, so sweep them out now to tell them what is going on
+                
+                for queue in self._jobs_awaiting_slot.values():
+                    
+                    for job in queue:
+                        
+                        job.SetStatus( 'all new network traffic is paused\u2026' )
+                        
+                    
+                    self._jobs_paused.extend( queue )
+                    
+                
+                self._jobs_awaiting_slot = collections.OrderedDict()
+                
+            elif len( self._jobs_paused ) > 0:
+                
+                for job in self._jobs_paused:
+                    
+                    self._QueueJob( job, self._jobs_to_status[ job ] )
+                    
+                
+                self._jobs_paused = []
                 
             
         
@@ -357,93 +584,115 @@ class NetworkEngine( object ):
             
             if job.IsDone():
                 
-                return False
+                DropJob( job )
                 
             elif job.IsAsleep():
                 
-                return True
+                self._SleepJob( job, JOB_STATUS_AWAITING_SLOT )
                 
-            elif len( self._jobs_running ) < self.MAX_JOBS:
+            elif self.controller.JustWokeFromSleep():
                 
-                if self._pause_all_new_network_traffic:
-                    
-                    job.SetStatus( 'all new network traffic is paused\u2026' )
-                    
-                    job.Sleep( 2 )
-                    
-                    return True
-                    
-                elif self.controller.JustWokeFromSleep():
-                    
-                    job.SetStatus( 'looks like computer just woke up, waiting a bit' )
-                    
-                    job.Sleep( 5 )
-                    
-                    return True
-                    
-                elif self._active_domains_counter[ job.GetSecondLevelDomain() ] >= self.MAX_JOBS_PER_DOMAIN:
-                    
-                    job.SetStatus( 'waiting for other jobs on this domain to finish' )
-                    
-                    job.Sleep( 2 )
+                job.SetStatus( 'looks like computer just woke up, waiting a bit' )
+                
+                job.Sleep( 5 )
+                
+                self._SleepJob( job, JOB_STATUS_AWAITING_SLOT )
+                
+            elif not job.TokensOK() or not job.DomainOK():
+                
+                self._SleepJob( job, JOB_STATUS_AWAITING_SLOT )
+                
+            else:
+                
+                if HG.network_report_mode:
                     
-                    return True
+                    HydrusData.ShowText( 'Network Job Starting: ' + job._method + ' ' + job._url )
                     
-                elif not job.TokensOK():
+                
+                self._active_domains_counter[ job.GetSecondLevelDomain() ] += 1
+                
+                self._jobs_to_status[ job ] = JOB_STATUS_RUNNING
+                
+                self._jobs_running.add( job )
+                
+                self.controller.CallToThread( RunJob, job )
+                
+            
+        
+        def ProcessReadyJobs():
+            
+            # each domain has its own queue, so a domain that is full or a full engine costs nothing until a running job finishes
+            
+            if self._pause_all_new_network_traffic:
+                
+                return
+                
+            
+            for second_level_domain in list( self._jobs_awaiting_slot.keys() ):
+                
+                queue = self._jobs_awaiting_slot[ second_level_domain ]
+                
+                while len( queue ) > 0 and len( self._jobs_running ) < self.MAX_JOBS and self._active_domains_counter[ second_level_domain ] < self.MAX_JOBS_PER_DOMAIN:
                     
-                    return True
+                    ProcessReadyJob( queue.popleft() )
                     
-                elif not job.DomainOK():
+                    # round-robin, so one busy domain does not hog the free slots
                     
-                    return True
+                    self._jobs_awaiting_slot.move_to_end( second_level_domain )
                     
-                else:
+                
+                if len( queue ) == 0:
                     
-                    if HG.network_report_mode:
+                    if second_level_domain in self._jobs_awaiting_slot:
                         
-                        HydrusData.ShowText( 'Network Job Starting: ' + job._method + ' ' + job._url )
+                        del self._jobs_awaiting_slot[ second_level_domain ]
                         
                     
-                    self._active_domains_counter[ job.GetSecondLevelDomain() ] += 1
-                    
-                    self.controller.CallToThread( job.Start )
-                    
-                    self._jobs_running.append( job )
-                    
-                    return False
-                    
                 
-            else:
+            
+        
+        def ProcessRunningJob( job: ClientNetworkingJobs.NetworkJob ):
+            
+            if HG.network_report_mode:
                 
-                job.SetStatus( 'waiting for other jobs to finish\u2026' )
+                HydrusData.ShowText( 'Network Job Done: ' + job._method + ' ' + job._url )
+                
+            
+            second_level_domain = job.GetSecondLevelDomain()
+            
+            self._active_domains_counter[ second_level_domain ] -= 1
+            
+            if self._active_domains_counter[ second_level_domain ] == 0:
                 
-                return True
+                del self._active_domains_counter[ second_level_domain ]
                 
             
+            self._jobs_running.discard( job )
+            
+            del self._jobs_to_status[ job ]
+            
         
-        def ProcessRunningJob( job: ClientNetworkingJobs.NetworkJob ):
+        def RunJob( job: ClientNetworkingJobs.NetworkJob ):
             
-            if job.IsDone():
-                
-                if HG.network_report_mode:
-                    
-                    HydrusData.ShowText( 'Network Job Done: ' + job._method + ' ' + job._url )
-                    
+            try:
                 
-                second_level_domain = job.GetSecondLevelDomain()
+                job.Start()
                 
-                self._active_domains_counter[ second_level_domain ] -= 1
+            finally:
                 
-                if self._active_domains_counter[ second_level_domain ] == 0:
-                    
-                    del self._active_domains_counter[ second_level_domain ]
-                    
+                self._finished_jobs.append( job )
                 
-                return False
+                self._new_work_to_do.set()
                 
-            else:
+            
+        
+        def ProcessQueue( queue, process_func ):
+            
+            # jobs may be queued back onto this while we work, so only do what was there when we started
+            
+            for i in range( len( queue ) ):
                 
-                return True
+                process_func( queue.popleft() )
                 
             
         
@@ -453,31 +702,33 @@ class NetworkEngine( object ):
             
             with self._lock:
                 
-                self._jobs_awaiting_validity = list( filter( ProcessValidationJob, self._jobs_awaiting_validity ) )
+                while len( self._finished_jobs ) > 0:
+                    
+                    ProcessRunningJob( self._finished_jobs.popleft() )
+                    
+                
+                self._WakeDueJobs()
+                
+                ProcessQueue( self._jobs_awaiting_validity, ProcessValidationJob )
                 
                 ProcessCurrentValidationJob()
                 
-                self._jobs_awaiting_bandwidth = list( filter( ProcessBandwidthJob, self._jobs_awaiting_bandwidth ) )
+                ProcessQueue( self._jobs_awaiting_bandwidth, ProcessBandwidthJob )
+                
+                ProcessCurrentLoginJob()
                 
                 ProcessForceLogins()
                 
-                self._jobs_awaiting_login = list( filter( ProcessLoginJob, self._jobs_awaiting_login ) )
+                ProcessQueue( self._jobs_awaiting_login, ProcessLoginJob )
                 
-                ProcessCurrentLoginJob()
+                ProcessPausedJobs()
                 
-                self._jobs_awaiting_slot = list( filter( ProcessReadyJob, self._jobs_awaiting_slot ) )
+                ProcessReadyJobs()
                 
-                self._jobs_running = list( filter( ProcessRunningJob, self._jobs_running ) )
+                time_until_next_wake = self._GetTimeUntilNextWake()
                 
             
-            # we want to catch the rollover of the second for bandwidth jobs
-            
-            now_with_subsecond = time.time()
-            subsecond_part = now_with_subsecond % 1
-            
-            time_until_next_second = 1.0 - subsecond_part
-            
-            self._new_work_to_do.wait( time_until_next_second )
+            self._new_work_to_do.wait( time_until_next_wake )
             
             self._new_work_to_do.clear()
             
@@ -498,6 +749,8 @@ class NetworkEngine( object ):
             self.controller.pub( 'notify_network_traffic_unpaused' )
             
         
+        self._new_work_to_do.set()
+        
     
     def RefreshOptions( self ):
         
@@ -507,6 +760,8 @@ class NetworkEngine( object ):
             self.MAX_JOBS_PER_DOMAIN = self.controller.new_options.GetInteger( 'max_network_jobs_per_domain' )
             
         
+        self._new_work_to_do.set()
+        
     
     def Shutdown( self ):
         
@@ -515,3 +770,13 @@ class NetworkEngine( object ):
         self._new_work_to_do.set()
         
     
+    def WakeJob( self, job: ClientNetworkingJobs.NetworkJob ):
+        
+        # called by jobs when something outside the engine (e.g. a user override or a cancel) changes when they can go
+        # no lock here, since the job may be holding its own
+        
+        self._woken_jobs.append( job )
+        
+        self._new_work_to_do.set()
+        
+    
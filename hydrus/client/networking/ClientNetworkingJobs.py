@@ -1077,6 +1077,16 @@ class NetworkJob( object ):
         self._WaitOnNetworkTrafficPaused( status_text )
         
     
+    def _WakeEngine( self ):
+        
+        # don't call this while holding the lock--the engine may be asking us things under its own
+        
+        if self.engine is not None:
+            
+            self.engine.WakeJob( self )
+            
+        
+    
     def AddAdditionalHeader( self, key, value ):
         
         with self._lock:
@@ -1114,6 +1124,8 @@ class NetworkJob( object ):
             self._SetCancelled()
             
         
+        self._WakeEngine()
+        
     
     def CanValidateInPopup( self ):
         
@@ -1334,6 +1346,14 @@ class NetworkJob( object ):
             
         
     
+    def GetWakeTime( self ) -> float:
+        
+        with self._lock:
+            
+            return self._wake_time_float
+            
+        
+    
     def HasError( self ):
         
         with self._lock:
@@ -1437,6 +1457,8 @@ class NetworkJob( object ):
                 
             
         
+        self._WakeEngine()
+        
     
     def OverrideConnectionErrorWait( self ):
         
@@ -1463,6 +1485,8 @@ class NetworkJob( object ):
             self._wake_time_float = 0.0
             
         
+        self._WakeEngine()
+        
     
     def ScrubDomainErrors( self ):
         
@@ -1473,6 +1497,8 @@ class NetworkJob( object ):
             self._wake_time_float = 0.0
             
         
+        self._WakeEngine()
+        
     
     def SetError( self, e: Exception, error: str ):
         
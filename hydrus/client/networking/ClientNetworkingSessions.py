@@ -2,6 +2,7 @@ import pickle
 import requests
 import threading
 import typing
+import urllib3
 
 from hydrus.core import HydrusData
 from hydrus.core import HydrusSerialisable
@@ -22,6 +23,109 @@ except:
     
     SOCKS_PROXY_OK = False
     
+# urllib3 makes the pools and connections, not us, so they report what they did on the current thread and the adapter picks it up after each request
+
+connection_pool_thread_counts = threading.local()
+
+class CountingHTTPConnection( urllib3.connection.HTTPConnection ):
+    
+    def connect( self ):
+        
+        connection_pool_thread_counts.num_connections_opened = getattr( connection_pool_thread_counts, 'num_connections_opened', 0 ) + 1
+        
+        return urllib3.connection.HTTPConnection.connect( self )
+        
+    
+class CountingHTTPSConnection( urllib3.connection.HTTPSConnection ):
+    
+    def connect( self ):
+        
+        connection_pool_thread_counts.num_connections_opened = getattr( connection_pool_thread_counts, 'num_connections_opened', 0 ) + 1
+        
+        return urllib3.connection.HTTPSConnection.connect( self )
+        
+    
+class CountingHTTPConnectionPool( urllib3.HTTPConnectionPool ):
+    
+    ConnectionCls = CountingHTTPConnection
+    
+    def urlopen( self, *args, **kwargs ):
+        
+        connection_pool_thread_counts.used_counting_pool = True
+        
+        return urllib3.HTTPConnectionPool.urlopen( self, *args, **kwargs )
+        
+    
+class CountingHTTPSConnectionPool( urllib3.HTTPSConnectionPool ):
+    
+    ConnectionCls = CountingHTTPSConnection
+    
+    def urlopen( self, *args, **kwargs ):
+        
+        connection_pool_thread_counts.used_counting_pool = True
+        
+        return urllib3.HTTPSConnectionPool.urlopen( self, *args, **kwargs )
+        
+    
+class NetworkConnectionPoolAdapter( requests.adapters.HTTPAdapter ):
+    
+    def __init__( self, pool_size: int, num_requests = 0, num_connections_opened = 0 ):
+        
+        self._stats_lock = threading.Lock()
+        
+        self._pool_size = pool_size
+        self._num_requests = num_requests
+        self._num_connections_opened = num_connections_opened
+        
+        # pool_connections is how many hosts we remember, pool_maxsize is how many idle keep-alive connections we hold to each
+        
+        requests.adapters.HTTPAdapter.__init__( self, pool_connections = requests.adapters.DEFAULT_POOLSIZE, pool_maxsize = pool_size )
+        
+    
+    def GetPoolSize( self ) -> int:
+        
+        return self._pool_size
+        
+    
+    def GetStats( self ):
+        
+        with self._stats_lock:
+            
+            return ( self._num_requests, self._num_connections_opened )
+            
+        
+    
+    def init_poolmanager( self, *args, **kwargs ):
+        
+        requests.adapters.HTTPAdapter.init_poolmanager( self, *args, **kwargs )
+        
+        # proxy managers keep their own pool classes, so proxied traffic is not counted
+        
+        self.poolmanager.pool_classes_by_scheme = { 'http' : CountingHTTPConnectionPool, 'https' : CountingHTTPSConnectionPool }
+        
+    
+    def send( self, *args, **kwargs ):
+        
+        connection_pool_thread_counts.num_connections_opened = 0
+        connection_pool_thread_counts.used_counting_pool = False
+        
+        try:
+            
+            return requests.adapters.HTTPAdapter.send( self, *args, **kwargs )
+            
+        finally:
+            
+            if connection_pool_thread_counts.used_counting_pool:
+                
+                with self._stats_lock:
+                    
+                    self._num_requests += 1
+                    self._num_connections_opened += connection_pool_thread_counts.num_connections_opened
+                    
+                
+            
+        
+    
 class NetworkSessionManagerSessionContainer( HydrusSerialisable.SerialisableBaseNamed ):
     
     SERIALISABLE_TYPE = HydrusSerialisable.SERIALISABLE_TYPE_NETWORK_SESSION_MANAGER_SESSION_CONTAINER
@@ -203,6 +307,43 @@ class NetworkSessionManager( HydrusSerialisable.SerialisableBase ):
         self._SetDirty()
         
     
+    def _MountConnectionPools( self, session ):
+        
+        pool_size = HG.client_controller.new_options.GetInteger( 'network_connection_pool_size' )
+        
+        adapter = session.adapters.get( 'https://', None )
+        
+        if isinstance( adapter, NetworkConnectionPoolAdapter ):
+            
+            if adapter.GetPoolSize() == pool_size:
+                
+                return
+                
+            
+            ( num_requests, num_connections_opened ) = adapter.GetStats()
+            
+        else:
+            
+            ( num_requests, num_connections_opened ) = ( 0, 0 )
+            
+        
+        old_adapters = { session.adapters[ prefix ] for prefix in ( 'http://', 'https://' ) if prefix in session.adapters }
+        
+        # one adapter for both schemes, so all the jobs on this session share its keep-alive connections and stats
+        
+        adapter = NetworkConnectionPoolAdapter( pool_size, num_requests = num_requests, num_connections_opened = num_connections_opened )
+        
+        session.mount( 'http://', adapter )
+        session.mount( 'https://', adapter )
+        
+        # the old pools' idle keep-alive connections would otherwise hang around until garbage collection
+        
+        for old_adapter in old_adapters:
+            
+            old_adapter.close()
+            
+        
+    
     def _ReinitialiseProxies( self ):
         
         self._proxies_dict = {}
@@ -265,6 +406,31 @@ class NetworkSessionManager( HydrusSerialisable.SerialisableBase ):
             
         
     
+    def GetConnectionPoolStats( self ):
+        
+        with self._lock:
+            
+            rows = []
+            
+            for ( network_context, session_container ) in self._network_contexts_to_session_containers.items():
+                
+                adapter = session_container.session.adapters.get( 'https://', None )
+                
+                if isinstance( adapter, NetworkConnectionPoolAdapter ):
+                    
+                    ( num_requests, num_connections_opened ) = adapter.GetStats()
+                    
+                    if num_requests > 0:
+                        
+                        rows.append( ( network_context, adapter.GetPoolSize(), num_requests, num_connections_opened ) )
+                        
+                    
+                
+            
+            return rows
+            
+        
+    
     def GetDeleteeSessionNames( self ):
         
         with self._lock:
@@ -307,6 +473,8 @@ class NetworkSessionManager( HydrusSerialisable.SerialisableBase ):
                 session.proxies = dict( self._proxies_dict )
                 
             
+            self._MountConnectionPools( session )
+            
             #
             
             self._CleanSessionCookies( network_context, session )
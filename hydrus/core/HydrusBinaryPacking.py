@@ -0,0 +1,257 @@
+import numpy
+
+from hydrus.core import HydrusExceptions
+
+# unsigned LEB128 varints, packed and unpacked a whole column at a time
+# decoding millions of small ints one by one in the interpreter is slower than json, so everything here is vectorised
+
+MAX_VARINT_GROUPS = 10
+
+def _GetUnsignedArray( values ) -> numpy.ndarray:
+    
+    if isinstance( values, numpy.ndarray ):
+        
+        array = values
+        
+    else:
+        
+        try:
+            
+            array = numpy.fromiter( values, dtype = numpy.int64 )
+            
+        except ( TypeError, ValueError, OverflowError ) as e:
+            
+            raise HydrusExceptions.SerialisationException( 'Could not pack a column of integers: {}'.format( e ) )
+            
+        
+    
+    if len( array ) > 0 and array.min() < 0:
+        
+        raise HydrusExceptions.SerialisationException( 'Could not pack a column of integers: it had a negative value!' )
+        
+    
+    return array.astype( numpy.uint64, copy = False )
+    
+
+def PackDeltaUVarInts( sorted_values ) -> bytes:
+    
+    array = _GetUnsignedArray( sorted_values )
+    
+    return PackUVarInts( numpy.diff( array, prepend = numpy.uint64( 0 ) ) )
+    
+
+def PackNullableUVarInts( values ) -> bytes:
+    
+    # None is 0, everything else is shifted up one
+    
+    return PackUVarInts( [ 0 if value is None else value + 1 for value in values ] )
+    
+
+def PackRowDeltaUVarInts( rows_of_sorted_values ) -> bytes:
+    
+    # many sorted runs in one column, each delta-encoded from zero, so the unpacker can do one big cumsum
+    
+    deltas = []
+    
+    for row in rows_of_sorted_values:
+        
+        previous = 0
+        
+        for value in row:
+            
+            deltas.append( value - previous )
+            
+            previous = value
+            
+        
+    
+    return PackUVarInts( deltas )
+    
+
+def PackSection( section_bytes: bytes ) -> bytes:
+    
+    return PackUVarInt( len( section_bytes ) ) + section_bytes
+    
+
+def PackUVarInt( value: int ) -> bytes:
+    
+    if value < 0:
+        
+        raise HydrusExceptions.SerialisationException( 'Could not pack a negative integer!' )
+        
+    
+    result = bytearray()
+    
+    while value >= 0x80:
+        
+        result.append( ( value & 0x7f ) | 0x80 )
+        
+        value >>= 7
+        
+    
+    result.append( value )
+    
+    return bytes( result )
+    
+
+def PackUVarInts( values ) -> bytes:
+    
+    array = _GetUnsignedArray( values )
+    
+    if len( array ) == 0:
+        
+        return b''
+        
+    
+    num_groups = numpy.ones( len( array ), dtype = numpy.int64 )
+    
+    remainder = array >> numpy.uint64( 7 )
+    
+    while remainder.any():
+        
+        num_groups += remainder > 0
+        
+        remainder >>= numpy.uint64( 7 )
+        
+    
+    group_indices = numpy.arange( num_groups.max(), dtype = numpy.uint64 )
+    
+    groups = ( ( array[ :, None ] >> ( group_indices * numpy.uint64( 7 ) ) ) & numpy.uint64( 0x7f ) ).astype( numpy.uint8 )
+    
+    groups[ group_indices[ None, : ] < ( num_groups[ :, None ] - 1 ).astype( numpy.uint64 ) ] |= 0x80
+    
+    # boolean indexing walks row by row, so this comes out in value order
+    
+    return groups[ group_indices[ None, : ] < num_groups[ :, None ].astype( numpy.uint64 ) ].tobytes()
+    
+
+def UnpackDeltaUVarInts( section ) -> numpy.ndarray:
+    
+    return numpy.cumsum( UnpackUVarInts( section ), dtype = numpy.uint64 )
+    
+
+def UnpackNullableUVarInts( section ) -> list:
+    
+    return [ None if value == 0 else value - 1 for value in UnpackUVarInts( section ).tolist() ]
+    
+
+def UnpackRowDeltaUVarInts( section, counts: numpy.ndarray ) -> numpy.ndarray:
+    
+    totals = numpy.cumsum( UnpackUVarInts( section ), dtype = numpy.uint64 )
+    
+    if len( totals ) != int( counts.sum() ):
+        
+        raise HydrusExceptions.SerialisationException( 'A packed column did not have as many values as it was supposed to!' )
+        
+    
+    # each row restarted its deltas at zero, so take off the running total from before it
+    
+    row_starts = numpy.cumsum( counts ) - counts
+    
+    bases = numpy.zeros( len( counts ), dtype = numpy.uint64 )
+    
+    has_base = row_starts > 0
+    
+    bases[ has_base ] = totals[ row_starts[ has_base ] - 1 ]
+    
+    return totals - numpy.repeat( bases, counts )
+    
+
+def UnpackUVarInts( section ) -> numpy.ndarray:
+    
+    array = numpy.frombuffer( section, dtype = numpy.uint8 )
+    
+    if len( array ) == 0:
+        
+        return numpy.empty( 0, dtype = numpy.uint64 )
+        
+    
+    if array[ -1 ] >= 0x80:
+        
+        raise HydrusExceptions.SerialisationException( 'A packed column was truncated!' )
+        
+    
+    ends = numpy.flatnonzero( array < 0x80 )
+    
+    starts = numpy.empty( len( ends ), dtype = numpy.int64 )
+    
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    
+    lengths = ends - starts + 1
+    
+    if lengths.max() > MAX_VARINT_GROUPS:
+        
+        raise HydrusExceptions.SerialisationException( 'A packed column had an integer that was too long!' )
+        
+    
+    positions = numpy.arange( len( array ), dtype = numpy.int64 ) - numpy.repeat( starts, lengths )
+    
+    values = ( array & 0x7f ).astype( numpy.uint64 ) << ( positions.astype( numpy.uint64 ) * numpy.uint64( 7 ) )
+    
+    return numpy.add.reduceat( values, starts )
+    
+
+class BinaryReader( object ):
+    
+    def __init__( self, data ):
+        
+        self._data = memoryview( data )
+        self._position = 0
+        
+    
+    def IsDone( self ) -> bool:
+        
+        return self._position >= len( self._data )
+        
+    
+    def ReadSection( self ) -> memoryview:
+        
+        length = self.ReadUVarInt()
+        
+        end = self._position + length
+        
+        if end > len( self._data ):
+            
+            raise HydrusExceptions.SerialisationException( 'A packed section was truncated!' )
+            
+        
+        section = self._data[ self._position : end ]
+        
+        self._position = end
+        
+        return section
+        
+    
+    def ReadUVarInt( self ) -> int:
+        
+        value = 0
+        shift = 0
+        
+        while True:
+            
+            if self._position >= len( self._data ):
+                
+                raise HydrusExceptions.SerialisationException( 'A packed integer was truncated!' )
+                
+            
+            byte = self._data[ self._position ]
+            
+            self._position += 1
+            
+            value |= ( byte & 0x7f ) << shift
+            
+            if byte < 0x80:
+                
+                return value
+                
+            
+            shift += 7
+            
+            if shift >= 7 * MAX_VARINT_GROUPS:
+                
+                raise HydrusExceptions.SerialisationException( 'A packed integer was too long!' )
+                
+            
+        
+    
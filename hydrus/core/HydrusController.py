@@ -426,6 +426,16 @@ class HydrusController( object ):
         return self.db_dir
         
     
+    def GetDBJobStatistics( self ):
+        
+        return self.db.GetJobStatistics()
+        
+    
+    def GetDBSlowQueries( self ):
+        
+        return self.db.GetSlowQueries()
+        
+    
     def GetDBStatus( self ):
         
         return self.db.GetStatus()
@@ -1,8 +1,13 @@
+import bisect
 import collections
 import distutils.version
+import heapq
+import itertools
 import os
+import pathlib
 import queue
 import sqlite3
+import threading
 import traceback
 import time
 
@@ -14,6 +19,21 @@ from hydrus.core import HydrusExceptions
 from hydrus.core import HydrusGlobals as HG
 from hydrus.core import HydrusPaths
 
+JOB_LANE_INTERACTIVE_READ = 0
+JOB_LANE_INTERACTIVE_WRITE = 1
+JOB_LANE_BACKGROUND = 2
+
+job_lane_str_lookup = {
+    JOB_LANE_INTERACTIVE_READ : 'interactive read',
+    JOB_LANE_INTERACTIVE_WRITE : 'interactive write',
+    JOB_LANE_BACKGROUND : 'background'
+}
+
+MAX_COALESCED_WRITE_JOBS = 100
+
+# upper bounds, in ms, of the latency histogram buckets. the last bucket catches everything slower
+JOB_TIME_HISTOGRAM_BUCKETS_MS = ( 1, 5, 10, 50, 100, 500, 1000, 5000, 10000 )
+
 def CheckCanVacuum( db_path, stop_time = None ):
     
     db = sqlite3.connect( db_path, isolation_level = None, detect_types = sqlite3.PARSE_DECLTYPES )
@@ -60,6 +80,17 @@ def GetApproxVacuumDuration( db_size ):
     
     return approx_vacuum_duration
     
+def GetResultNumRows( result ):
+    
+    # tuples are usually a handful of different return values, not rows, so we only count obvious collections
+    
+    if isinstance( result, ( list, set, frozenset, dict ) ):
+        
+        return len( result )
+        
+    
+    return None
+    
 def ReadFromCancellableCursor( cursor, largest_group_size, cancelled_hook = None ):
     
     if cancelled_hook is None:
@@ -156,9 +187,79 @@ def VacuumDB( db_path ):
     
     c.execute( 'PRAGMA journal_mode = {};'.format( HG.db_journal_mode ) )
     
+class DBJobStatistics( object ):
+    
+    def __init__( self ):
+        
+        self._num_jobs = 0
+        
+        self._total_wait_time = 0.0
+        self._max_wait_time = 0.0
+        self._wait_time_histogram = [ 0 ] * ( len( JOB_TIME_HISTOGRAM_BUCKETS_MS ) + 1 )
+        
+        self._total_execution_time = 0.0
+        self._max_execution_time = 0.0
+        self._execution_time_histogram = [ 0 ] * ( len( JOB_TIME_HISTOGRAM_BUCKETS_MS ) + 1 )
+        
+        self._num_jobs_with_rows = 0
+        self._total_rows = 0
+        self._max_rows = 0
+        
+    
+    def _GetHistogramList( self, histogram ):
+        
+        upper_bounds = list( JOB_TIME_HISTOGRAM_BUCKETS_MS ) + [ None ]
+        
+        return [ [ upper_bound, count ] for ( upper_bound, count ) in zip( upper_bounds, histogram ) ]
+        
+    
+    def AddJob( self, wait_time: float, execution_time: float, num_rows = None ):
+        
+        self._num_jobs += 1
+        
+        self._total_wait_time += wait_time
+        self._max_wait_time = max( self._max_wait_time, wait_time )
+        self._wait_time_histogram[ bisect.bisect_left( JOB_TIME_HISTOGRAM_BUCKETS_MS, wait_time * 1000 ) ] += 1
+        
+        self._total_execution_time += execution_time
+        self._max_execution_time = max( self._max_execution_time, execution_time )
+        self._execution_time_histogram[ bisect.bisect_left( JOB_TIME_HISTOGRAM_BUCKETS_MS, execution_time * 1000 ) ] += 1
+        
+        if num_rows is not None:
+            
+            self._num_jobs_with_rows += 1
+            self._total_rows += num_rows
+            self._max_rows = max( self._max_rows, num_rows )
+            
+        
+    
+    def GetNumJobs( self ):
+        
+        return self._num_jobs
+        
+    
+    def ToDict( self ):
+        
+        return {
+            'num_jobs' : self._num_jobs,
+            'total_wait_time' : self._total_wait_time,
+            'max_wait_time' : self._max_wait_time,
+            'wait_time_histogram' : self._GetHistogramList( self._wait_time_histogram ),
+            'total_execution_time' : self._total_execution_time,
+            'max_execution_time' : self._max_execution_time,
+            'execution_time_histogram' : self._GetHistogramList( self._execution_time_histogram ),
+            'num_jobs_with_rows' : self._num_jobs_with_rows,
+            'total_rows' : self._total_rows,
+            'max_rows' : self._max_rows
+        }
+        
+    
 class HydrusDB( HydrusDBBase.DBBase ):
     
     READ_WRITE_ACTIONS = []
+    PARALLEL_READ_ACTIONS = set()
+    BACKGROUND_ACTIONS = set()
+    COALESCABLE_WRITE_ACTIONS = set()
     UPDATE_WAIT = 2
     
     def __init__( self, controller, db_dir, db_name ):
@@ -230,11 +331,27 @@ class HydrusDB( HydrusDBBase.DBBase ):
         self._ready_to_serve_requests = False
         self._could_not_initialise = False
         
-        self._jobs = queue.Queue()
+        # jobs are ( lane, job_number, job ), so the main loop always does the highest lane first and each lane is fifo
+        self._jobs = queue.PriorityQueue()
+        self._job_numbers = itertools.count()
+        
+        self._job_lanes_lock = threading.Lock()
+        self._lanes_to_num_jobs_waiting = collections.Counter()
+        self._lanes_to_job_statistics = collections.defaultdict( DBJobStatistics )
+        self._job_names_to_job_statistics = collections.defaultdict( DBJobStatistics )
+        
+        self._parallel_read_jobs = queue.Queue()
+        self._parallel_read_generation = 0
+        self._parallel_read_connections_lock = threading.Lock()
+        self._num_parallel_read_connections = 0
+        
+        self._pending_write_jobs_lock = threading.Lock()
+        self._num_pending_write_jobs = 0
         
         self._currently_doing_job = False
         self._current_status = ''
         self._current_job_name = ''
+        self._current_job_num_rows = None
         
         self._db = None
         self._is_connected = False
@@ -326,6 +443,14 @@ class HydrusDB( HydrusDBBase.DBBase ):
                 
             
         
+        if self._CanDoParallelReads():
+            
+            for i in range( HG.db_num_read_connections ):
+                
+                self._controller.CallToThreadLongRunning( self.ParallelReadLoop )
+                
+            
+        
     
     def _AnalyzeTempTable( self, temp_table_name ):
         
@@ -359,6 +484,47 @@ class HydrusDB( HydrusDBBase.DBBase ):
         self._Execute( 'ATTACH ? AS durable_temp;', ( db_path, ) )
         
     
+    def _CanDoParallelReads( self ):
+        
+        # other journal modes block readers while the main job thread has a write transaction open, so there is no point
+        
+        return HG.db_journal_mode == 'WAL' and HG.db_num_read_connections > 0 and len( self.PARALLEL_READ_ACTIONS ) > 0
+        
+    
+    def _CanSendToParallelReaders( self, action ):
+        
+        if action not in self.PARALLEL_READ_ACTIONS or self._num_parallel_read_connections == 0 or self._pause_and_disconnect:
+            
+            return False
+            
+        
+        # the read connections only see what has been committed, so if a write is waiting or not yet committed, the main job thread has to do it
+        
+        with self._pending_write_jobs_lock:
+            
+            if self._num_pending_write_jobs > 0:
+                
+                return False
+                
+            
+        
+        cursor_transaction_wrapper = self._cursor_transaction_wrapper
+        
+        if cursor_transaction_wrapper is None or cursor_transaction_wrapper.TransactionContainsWrites():
+            
+            return False
+            
+        
+        return True
+        
+    
+    def _CanCoalesceJob( self, job: HydrusData.JobDatabase ):
+        
+        ( action, args, kwargs ) = job.GetCallableTuple()
+        
+        return job.GetType() == 'write' and action in self.COALESCABLE_WRITE_ACTIONS
+        
+    
     def _CleanAfterJobWork( self ):
         
         self._cursor_transaction_wrapper.CleanPubSubs()
@@ -410,11 +576,84 @@ class HydrusDB( HydrusDBBase.DBBase ):
         self._cursor_transaction_wrapper.DoPubSubs()
         
     
+    def _DoAfterRollbackWork( self ):
+        
+        # anything held in memory that was updated alongside the rolled back writes needs to be thrown away here
+        
+        pass
+        
+    
     def _GenerateDBJob( self, job_type, synchronous, action, *args, **kwargs ):
         
         return HydrusData.JobDatabase( job_type, synchronous, action, *args, **kwargs )
         
     
+    def _GenerateParallelReader( self, cursor: sqlite3.Cursor ):
+        
+        # return an object with a Read( action, *args, **kwargs ) method that can do PARALLEL_READ_ACTIONS using this cursor
+        
+        raise NotImplementedError()
+        
+    
+    def _GetCoalescableJobs( self, lane, first_job: HydrusData.JobDatabase ):
+        
+        ( first_action, first_args, first_kwargs ) = first_job.GetCallableTuple()
+        
+        coalesced_jobs = []
+        
+        # PriorityQueue has no peek, so we look at its heap under its own lock. the main loop is the only consumer, so nothing else can pop under us
+        
+        with self._jobs.mutex:
+            
+            heap = self._jobs.queue
+            
+            while len( heap ) > 0 and len( coalesced_jobs ) < MAX_COALESCED_WRITE_JOBS - 1:
+                
+                ( next_lane, next_job_number, next_job ) = heap[0]
+                
+                if next_lane != lane or not self._CanCoalesceJob( next_job ):
+                    
+                    break
+                    
+                
+                ( next_action, next_args, next_kwargs ) = next_job.GetCallableTuple()
+                
+                if next_action != first_action:
+                    
+                    break
+                    
+                
+                heapq.heappop( heap )
+                
+                coalesced_jobs.append( next_job )
+                
+            
+        
+        return coalesced_jobs
+        
+    
+    def _GetJobLane( self, job: HydrusData.JobDatabase ):
+        
+        ( action, args, kwargs ) = job.GetCallableTuple()
+        
+        if action in self.BACKGROUND_ACTIONS:
+            
+            return JOB_LANE_BACKGROUND
+            
+        
+        if job.GetType() == 'read':
+            
+            # a read must not jump ahead of an interactive write that was queued before it, or a caller may not see its own change
+            
+            if self._lanes_to_num_jobs_waiting[ JOB_LANE_INTERACTIVE_WRITE ] == 0:
+                
+                return JOB_LANE_INTERACTIVE_READ
+                
+            
+        
+        return JOB_LANE_INTERACTIVE_WRITE
+        
+    
     def _GetPossibleAdditionalDBFilenames( self ):
         
         return [ self._ssl_cert_filename, self._ssl_key_filename ]
@@ -574,6 +813,56 @@ class HydrusDB( HydrusDBBase.DBBase ):
         pass
         
     
+    def _InitParallelReadConnection( self ):
+        
+        def get_read_only_uri( filename ):
+            
+            path = os.path.join( self._db_dir, filename )
+            
+            return '{}?mode=ro'.format( pathlib.Path( path ).as_uri() )
+            
+        
+        db = sqlite3.connect( get_read_only_uri( self._db_filenames[ 'main' ] ), uri = True, isolation_level = None, detect_types = sqlite3.PARSE_DECLTYPES )
+        
+        c = db.cursor()
+        
+        if HG.no_db_temp_files:
+            
+            c.execute( 'PRAGMA temp_store = 2;' )
+            
+        
+        for ( name, filename ) in self._db_filenames.items():
+            
+            if name == 'main':
+                
+                continue
+                
+            
+            c.execute( 'ATTACH ? AS ' + name + ';', ( get_read_only_uri( filename ), ) )
+            
+        
+        c.execute( 'ATTACH ":memory:" AS mem;' )
+        
+        db_names = [ name for ( index, name, path ) in c.execute( 'PRAGMA database_list;' ) if name not in ( 'mem', 'temp' ) ]
+        
+        for db_name in db_names:
+            
+            c.execute( 'PRAGMA {}.cache_size = -{};'.format( db_name, HG.db_cache_size * 1024 ) )
+            
+        
+        return ( db, c )
+        
+    
+    def _InteractiveJobsWaiting( self ):
+        
+        # long background jobs can check this between chunks of work and bail out early so the gui does not wait on them
+        
+        with self._job_lanes_lock:
+            
+            return self._lanes_to_num_jobs_waiting[ JOB_LANE_INTERACTIVE_READ ] + self._lanes_to_num_jobs_waiting[ JOB_LANE_INTERACTIVE_WRITE ] > 0
+            
+        
+    
     def _LoadModules( self ):
         
         pass
@@ -584,6 +873,114 @@ class HydrusDB( HydrusDBBase.DBBase ):
         raise NotImplementedError()
         
     
+    def _ProcessCoalescedWriteJobs( self, lane, jobs ):
+        
+        # a run of small writes of the same action, queued back to back. we do them under one savepoint and one round of after-job work
+        
+        try:
+            
+            self._current_status = 'db write locked'
+            
+            self._cursor_transaction_wrapper.NotifyWriteOccuring()
+            
+            self.publish_status_update()
+            
+            jobs_and_results = []
+            
+            try:
+                
+                for job in jobs:
+                    
+                    time_started = HydrusData.GetNowPrecise()
+                    
+                    ( action, args, kwargs ) = job.GetCallableTuple()
+                    
+                    result = self._Write( action, *args, **kwargs )
+                    
+                    jobs_and_results.append( ( job, result, time_started, HydrusData.GetNowPrecise() ) )
+                    
+                
+                self._cursor_transaction_wrapper.Save()
+                
+            except Exception:
+                
+                # something in the batch failed before anyone got a result. roll the whole lot back and do them one at a time, so only the bad job gets the error
+                
+                self._RollbackAfterJobError()
+                
+                self._CleanAfterJobWork()
+                
+                for job in jobs:
+                    
+                    # _ProcessJob reports its own write job done
+                    self._ReportWriteJobQueued()
+                    
+                    time_started = HydrusData.GetNowPrecise()
+                    
+                    self._ProcessJob( job )
+                    
+                    self._RecordJobStatistics( lane, job, time_started, HydrusData.GetNowPrecise(), num_rows = self._current_job_num_rows )
+                    
+                
+                return
+                
+            
+            for ( job, result, time_started, time_finished ) in jobs_and_results:
+                
+                if job.IsSynchronous():
+                    
+                    job.PutResult( result )
+                    
+                
+                self._RecordJobStatistics( lane, job, time_started, time_finished, num_rows = GetResultNumRows( result ) )
+                
+            
+            if self._cursor_transaction_wrapper.TimeToCommit():
+                
+                self._current_status = 'db committing'
+                
+                self.publish_status_update()
+                
+                self._cursor_transaction_wrapper.CommitAndBegin()
+                
+            
+            self._DoAfterJobWork()
+            
+        except Exception as e:
+            
+            # the writes are done and their results are out, so we do not run them again. just like a single job, report it and roll back
+            
+            synchronous_jobs = [ job for job in jobs if job.IsSynchronous() ]
+            
+            if len( synchronous_jobs ) == 0:
+                
+                self._ManageDBError( jobs[0], e )
+                
+            else:
+                
+                for job in synchronous_jobs:
+                    
+                    self._ManageDBError( job, e )
+                    
+                
+            
+            self._RollbackAfterJobError()
+            
+        finally:
+            
+            self._CleanAfterJobWork()
+            
+            for job in jobs:
+                
+                self._ReportWriteJobDone()
+                
+            
+            self._current_status = ''
+            
+            self.publish_status_update()
+            
+        
+    
     def _ProcessJob( self, job ):
         
         job_type = job.GetType()
@@ -614,6 +1011,8 @@ class HydrusDB( HydrusDBBase.DBBase ):
                 result = self._Write( action, *args, **kwargs )
                 
             
+            self._current_job_num_rows = GetResultNumRows( result )
+            
             if job.IsSynchronous():
                 
                 job.PutResult( result )
@@ -636,36 +1035,52 @@ class HydrusDB( HydrusDBBase.DBBase ):
             
             self._ManageDBError( job, e )
             
-            try:
-                
-                self._cursor_transaction_wrapper.Rollback()
-                
-            except Exception as rollback_e:
-                
-                HydrusData.Print( 'When the transaction failed, attempting to rollback the database failed. Please restart the client as soon as is convenient.' )
-                
-                self._CloseDBConnection()
-                
-                self._InitDBConnection()
-                
-                HydrusData.PrintException( rollback_e )
-                
+            self._RollbackAfterJobError()
             
         finally:
             
             self._CleanAfterJobWork()
             
+            if job_type in ( 'read_write', 'write' ):
+                
+                self._ReportWriteJobDone()
+                
+            
             self._current_status = ''
             
             self.publish_status_update()
             
         
     
+    def _PutJob( self, job: HydrusData.JobDatabase ):
+        
+        with self._job_lanes_lock:
+            
+            lane = self._GetJobLane( job )
+            
+            self._lanes_to_num_jobs_waiting[ lane ] += 1
+            
+            self._jobs.put( ( lane, next( self._job_numbers ), job ) )
+            
+        
+    
     def _Read( self, action, *args, **kwargs ):
         
         raise NotImplementedError()
         
     
+    def _RecordJobStatistics( self, lane, job: HydrusData.JobDatabase, time_started: float, time_finished: float, num_rows = None ):
+        
+        wait_time = time_started - job.GetCreationTime()
+        execution_time = time_finished - time_started
+        
+        with self._job_lanes_lock:
+            
+            self._lanes_to_job_statistics[ lane ].AddJob( wait_time, execution_time, num_rows = num_rows )
+            self._job_names_to_job_statistics[ job.ToString() ].AddJob( wait_time, execution_time, num_rows = num_rows )
+            
+        
+    
     def _RepairDB( self, version ):
         
         for module in self._modules:
@@ -689,6 +1104,49 @@ class HydrusDB( HydrusDBBase.DBBase ):
         HydrusData.Print( text )
         
     
+    def _ReportWriteJobDone( self ):
+        
+        with self._pending_write_jobs_lock:
+            
+            self._num_pending_write_jobs = max( 0, self._num_pending_write_jobs - 1 )
+            
+        
+    
+    def _ReportWriteJobQueued( self ):
+        
+        with self._pending_write_jobs_lock:
+            
+            self._num_pending_write_jobs += 1
+            
+        
+    
+    def _ResetParallelReaders( self ):
+        
+        # call this when a write changes something a parallel reader's modules cache in memory, like the services
+        
+        self._parallel_read_generation += 1
+        
+    
+    def _RollbackAfterJobError( self ):
+        
+        try:
+            
+            self._cursor_transaction_wrapper.Rollback()
+            
+        except Exception as rollback_e:
+            
+            HydrusData.Print( 'When the transaction failed, attempting to rollback the database failed. Please restart the client as soon as is convenient.' )
+            
+            self._CloseDBConnection()
+            
+            self._InitDBConnection()
+            
+            HydrusData.PrintException( rollback_e )
+            
+        
+        self._DoAfterRollbackWork()
+        
+    
     def _ShrinkMemory( self ):
         
         self._Execute( 'PRAGMA shrink_memory;' )
@@ -733,6 +1191,32 @@ class HydrusDB( HydrusDBBase.DBBase ):
         return total
         
     
+    def GetJobStatistics( self ):
+        
+        with self._job_lanes_lock:
+            
+            lanes = {}
+            
+            for ( lane, lane_str ) in job_lane_str_lookup.items():
+                
+                lane_dict = self._lanes_to_job_statistics[ lane ].ToDict()
+                
+                lane_dict[ 'num_jobs_waiting' ] = self._lanes_to_num_jobs_waiting[ lane ]
+                
+                lanes[ lane_str ] = lane_dict
+                
+            
+            jobs = { job_name : job_statistics.ToDict() for ( job_name, job_statistics ) in self._job_names_to_job_statistics.items() }
+            
+            return { 'lanes' : lanes, 'jobs' : jobs }
+            
+        
+    
+    def GetSlowQueries( self ):
+        
+        return HydrusDBBase.slow_query_log.GetSlowQueries()
+        
+    
     def GetSSLPaths( self ):
         
         # create ssl keys
@@ -814,10 +1298,25 @@ class HydrusDB( HydrusDBBase.DBBase ):
             
             try:
                 
-                job = self._jobs.get( timeout = 1 )
+                ( lane, job_number, job ) = self._jobs.get( timeout = 1 )
+                
+                jobs = [ job ]
+                
+                if self._CanCoalesceJob( job ):
+                    
+                    jobs.extend( self._GetCoalescableJobs( lane, job ) )
+                    
+                
+                with self._job_lanes_lock:
+                    
+                    self._lanes_to_num_jobs_waiting[ lane ] -= len( jobs )
+                    
                 
                 self._currently_doing_job = True
                 self._current_job_name = job.ToString()
+                self._current_job_num_rows = None
+                
+                HydrusDBBase.slow_query_log.SetCurrentJobName( self._current_job_name )
                 
                 self.publish_status_update()
                 
@@ -827,18 +1326,44 @@ class HydrusDB( HydrusDBBase.DBBase ):
                         
                         summary = 'Running db job: ' + job.ToString()
                         
+                        if len( jobs ) > 1:
+                            
+                            summary += ' (coalesced with {} more)'.format( HydrusData.ToHumanInt( len( jobs ) - 1 ) )
+                            
+                        
                         HydrusData.ShowText( summary )
                         
                     
-                    if HG.profile_mode:
+                    time_started = HydrusData.GetNowPrecise()
+                    
+                    if len( jobs ) == 1:
                         
-                        summary = 'Profiling db job: ' + job.ToString()
+                        if HG.profile_mode:
+                            
+                            summary = 'Profiling db job: ' + job.ToString()
+                            
+                            HydrusData.Profile( summary, 'self._ProcessJob( job )', globals(), locals(), min_duration_ms = HG.db_profile_min_job_time_ms )
+                            
+                        else:
+                            
+                            self._ProcessJob( job )
+                            
                         
-                        HydrusData.Profile( summary, 'self._ProcessJob( job )', globals(), locals(), min_duration_ms = HG.db_profile_min_job_time_ms )
+                        self._RecordJobStatistics( lane, job, time_started, HydrusData.GetNowPrecise(), num_rows = self._current_job_num_rows )
                         
                     else:
                         
-                        self._ProcessJob( job )
+                        if HG.profile_mode:
+                            
+                            summary = 'Profiling coalesced db jobs: {} x{}'.format( job.ToString(), len( jobs ) )
+                            
+                            HydrusData.Profile( summary, 'self._ProcessCoalescedWriteJobs( lane, jobs )', globals(), locals(), min_duration_ms = HG.db_profile_min_job_time_ms )
+                            
+                        else:
+                            
+                            # this records its own per-job statistics
+                            self._ProcessCoalescedWriteJobs( lane, jobs )
+                            
                         
                     
                     error_count = 0
@@ -852,7 +1377,15 @@ class HydrusDB( HydrusDBBase.DBBase ):
                         raise
                         
                     
-                    self._jobs.put( job ) # couldn't lock db; put job back on queue
+                    for failed_job in jobs:
+                        
+                        if failed_job.GetType() in ( 'read_write', 'write' ):
+                            
+                            self._ReportWriteJobQueued()
+                            
+                        
+                        self._PutJob( failed_job ) # couldn't lock db; put job back on queue
+                        
                     
                     time.sleep( 5 )
                     
@@ -860,6 +1393,8 @@ class HydrusDB( HydrusDBBase.DBBase ):
                 self._currently_doing_job = False
                 self._current_job_name = ''
                 
+                HydrusDBBase.slow_query_log.SetCurrentJobName( '' )
+                
                 self.publish_status_update()
                 
             except queue.Empty:
@@ -897,6 +1432,125 @@ class HydrusDB( HydrusDBBase.DBBase ):
         self._loop_finished = True
         
     
+    def ParallelReadLoop( self ):
+        
+        HydrusDBBase.TemporaryIntegerTableNameCache( for_this_thread_only = True )
+        
+        db = None
+        c = None
+        reader = None
+        reader_generation = None
+        
+        with self._parallel_read_connections_lock:
+            
+            self._num_parallel_read_connections += 1
+            
+        
+        try:
+            
+            while not ( self._local_shutdown or HG.model_shutdown ):
+                
+                if self._pause_and_disconnect and db is not None:
+                    
+                    reader = None
+                    
+                    c.close()
+                    db.close()
+                    
+                    db = None
+                    c = None
+                    
+                
+                try:
+                    
+                    job = self._parallel_read_jobs.get( timeout = 1 )
+                    
+                except queue.Empty:
+                    
+                    continue
+                    
+                
+                if self._pause_and_disconnect:
+                    
+                    self._PutJob( job )
+                    
+                    continue
+                    
+                
+                ( action, args, kwargs ) = job.GetCallableTuple()
+                
+                try:
+                    
+                    if db is None:
+                        
+                        ( db, c ) = self._InitParallelReadConnection()
+                        
+                        HydrusDBBase.TemporaryIntegerTableNameCache.instance().Clear()
+                        
+                    
+                    if reader is None or reader_generation != self._parallel_read_generation:
+                        
+                        reader_generation = self._parallel_read_generation
+                        
+                        reader = self._GenerateParallelReader( c )
+                        
+                    
+                    if HG.db_report_mode:
+                        
+                        HydrusData.ShowText( 'Running parallel db job: ' + job.ToString() )
+                        
+                    
+                    HydrusDBBase.slow_query_log.SetCurrentJobName( job.ToString() )
+                    
+                    time_started = HydrusData.GetNowPrecise()
+                    
+                    result = reader.Read( action, *args, **kwargs )
+                    
+                    self._RecordJobStatistics( JOB_LANE_INTERACTIVE_READ, job, time_started, HydrusData.GetNowPrecise(), num_rows = GetResultNumRows( result ) )
+                    
+                    job.PutResult( result )
+                    
+                except sqlite3.OperationalError as e:
+                    
+                    if 'readonly' in str( e ):
+                        
+                        # the job wanted to write something after all, so the main job thread will have to do it
+                        
+                        self._PutJob( job )
+                        
+                    else:
+                        
+                        self._ManageDBError( job, e )
+                        
+                    
+                except Exception as e:
+                    
+                    self._ManageDBError( job, e )
+                    
+                
+            
+        finally:
+            
+            with self._parallel_read_connections_lock:
+                
+                self._num_parallel_read_connections -= 1
+                
+            
+            if db is not None:
+                
+                c.close()
+                db.close()
+                
+            
+            # anything left over goes to the main thread to be cleared out
+            
+            while not self._parallel_read_jobs.empty():
+                
+                self._PutJob( self._parallel_read_jobs.get() )
+                
+            
+        
+    
     def PauseAndDisconnect( self, pause_and_disconnect ):
         
         self._pause_and_disconnect = pause_and_disconnect
@@ -922,7 +1576,19 @@ class HydrusDB( HydrusDBBase.DBBase ):
             raise HydrusExceptions.ShutdownException( 'Application has shut down!' )
             
         
-        self._jobs.put( job )
+        if job_type == 'read' and self._CanSendToParallelReaders( action ):
+            
+            self._parallel_read_jobs.put( job )
+            
+        else:
+            
+            if job_type == 'read_write':
+                
+                self._ReportWriteJobQueued()
+                
+            
+            self._PutJob( job )
+            
         
         return job.GetResult()
         
@@ -948,7 +1614,9 @@ class HydrusDB( HydrusDBBase.DBBase ):
             raise HydrusExceptions.ShutdownException( 'Application has shut down!' )
             
         
-        self._jobs.put( job )
+        self._ReportWriteJobQueued()
+        
+        self._PutJob( job )
         
         if synchronous: return job.GetResult()
         
@@ -1,12 +1,16 @@
 import collections
 import psutil
 import sqlite3
+import threading
 
 from hydrus.core import HydrusData
+from hydrus.core import HydrusIntegerSets
 from hydrus.core import HydrusPaths
 from hydrus.core import HydrusGlobals as HG
 from hydrus.core import HydrusTemp
 
+SLOW_QUERY_LOG_SIZE = 256
+
 def CheckHasSpaceForDBTransaction( db_dir, num_bytes ):
     
     space_needed = int( num_bytes * 1.1 )
@@ -71,13 +75,87 @@ def CheckHasSpaceForDBTransaction( db_dir, num_bytes ):
             
         
     
+class SlowQueryLog( object ):
+    
+    # a small ring buffer of the slowest-running individual statements, always on, so we can spot regressions without profile mode
+    # the timing is just the execute call, so for a big SELECT it is the time to the first row, not to read everything
+    
+    def __init__( self, threshold = 0.05 ):
+        
+        self._lock = threading.Lock()
+        
+        self._threshold = threshold
+        
+        self._slow_queries = collections.deque( maxlen = SLOW_QUERY_LOG_SIZE )
+        
+        self._thread_job_names = threading.local()
+        
+    
+    def Clear( self ):
+        
+        with self._lock:
+            
+            self._slow_queries.clear()
+            
+        
+    
+    def GetSlowQueries( self ):
+        
+        with self._lock:
+            
+            return list( self._slow_queries )
+            
+        
+    
+    def GetThreshold( self ):
+        
+        return self._threshold
+        
+    
+    def ReportQuery( self, query, duration ):
+        
+        if duration < self._threshold:
+            
+            return
+            
+        
+        job_name = getattr( self._thread_job_names, 'job_name', '' )
+        
+        with self._lock:
+            
+            self._slow_queries.append( ( HydrusData.GetNow(), duration, job_name, query ) )
+            
+        
+    
+    def SetCurrentJobName( self, job_name ):
+        
+        self._thread_job_names.job_name = job_name
+        
+    
+    def SetThreshold( self, threshold ):
+        
+        self._threshold = threshold
+        
+    
+slow_query_log = SlowQueryLog()
+
 class TemporaryIntegerTableNameCache( object ):
     
     my_instance = None
+    my_thread_instances = threading.local()
     
-    def __init__( self ):
+    def __init__( self, for_this_thread_only = False ):
+        
+        # parallel read connections have their own 'mem' db, so they need their own names
         
-        TemporaryIntegerTableNameCache.my_instance = self
+        if for_this_thread_only:
+            
+            TemporaryIntegerTableNameCache.my_thread_instances.instance = self
+            
+        else:
+            
+            TemporaryIntegerTableNameCache.my_instance = self
+            
         
         self._column_names_to_table_names = collections.defaultdict( collections.deque )
         self._column_names_counter = collections.Counter()
@@ -86,6 +164,13 @@ class TemporaryIntegerTableNameCache( object ):
     @staticmethod
     def instance() -> 'TemporaryIntegerTableNameCache':
         
+        thread_instance = getattr( TemporaryIntegerTableNameCache.my_thread_instances, 'instance', None )
+        
+        if thread_instance is not None:
+            
+            return thread_instance
+            
+        
         if TemporaryIntegerTableNameCache.my_instance is None:
             
             raise Exception( 'TemporaryIntegerTableNameCache is not yet initialised!' )
@@ -135,7 +220,8 @@ class TemporaryIntegerTable( object ):
     
     def __init__( self, cursor: sqlite3.Cursor, integer_iterable, column_name ):
         
-        if not isinstance( integer_iterable, set ):
+        # a sorted integer set is already unique, and inserting in order is kinder to the primary key
+        if not isinstance( integer_iterable, ( set, HydrusIntegerSets.SortedIntegerSet ) ):
             
             integer_iterable = set( integer_iterable )
             
@@ -225,7 +311,13 @@ class DBBase( object ):
             HG.controller.PrintQueryPlan( query, plan_lines )
             
         
-        return self._c.execute( query, *args )
+        time_started = HydrusData.GetNowPrecise()
+        
+        cursor = self._c.execute( query, *args )
+        
+        slow_query_log.ReportQuery( query, HydrusData.GetNowPrecise() - time_started )
+        
+        return cursor
         
     
     def _ExecuteMany( self, query, args_iterator ):
@@ -244,8 +336,12 @@ class DBBase( object ):
                 
             
         
+        time_started = HydrusData.GetNowPrecise()
+        
         self._c.executemany( query, args_iterator )
         
+        slow_query_log.ReportQuery( query, HydrusData.GetNowPrecise() - time_started )
+        
     
     def _GenerateIndexName( self, table_name, columns ):
         
@@ -325,6 +421,13 @@ class DBBase( object ):
         return { item for ( item, ) in iterable_cursor }
         
     
+    def _STSIS( self, iterable_cursor ) -> HydrusIntegerSets.SortedIntegerSet:
+        
+        # strip singleton tuples to a compact sorted integer set, for big id results
+        
+        return HydrusIntegerSets.GenerateSortedIntegerSetFromCursor( iterable_cursor )
+        
+    
     def _TableExists( self, table_name ):
         
         return self._TableOrIndexExists( table_name, 'table' )
@@ -560,6 +663,11 @@ class DBCursorTransactionWrapper( DBBase ):
             
         
     
+    def TransactionContainsWrites( self ):
+        
+        return self._in_transaction and self._transaction_contains_writes
+        
+    
     def TimeToCommit( self ):
         
         return self._in_transaction and self._transaction_contains_writes and HydrusData.TimeHasPassed( self._transaction_start_time + self._transaction_commit_period )
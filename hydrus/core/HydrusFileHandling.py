@@ -67,7 +67,7 @@ headers_and_mime.extend( [
     ( ( ( 0, b'\x4D\x5A\x90\x00\x03', ), ), HC.APPLICATION_WINDOWS_EXE )
 ] )
 
-def GenerateThumbnailBytes( path, target_resolution, mime, duration, num_frames, clip_rect = None, percentage_in = 35 ):
+def GenerateThumbnailBytes( path, target_resolution, mime, duration, num_frames, clip_rect = None, percentage_in = 35, numpy_image = None ):
     
     if target_resolution == ( 0, 0 ):
         
@@ -76,7 +76,7 @@ def GenerateThumbnailBytes( path, target_resolution, mime, duration, num_frames,
     
     if mime in ( HC.IMAGE_JPEG, HC.IMAGE_PNG, HC.IMAGE_GIF, HC.IMAGE_WEBP, HC.IMAGE_TIFF, HC.IMAGE_ICON ): # not apng atm
         
-        thumbnail_bytes = HydrusImageHandling.GenerateThumbnailBytesFromStaticImagePath( path, target_resolution, mime, clip_rect = clip_rect )
+        thumbnail_bytes = HydrusImageHandling.GenerateThumbnailBytesFromStaticImagePath( path, target_resolution, mime, clip_rect = clip_rect, numpy_image = numpy_image )
         
     elif mime == HC.APPLICATION_PSD:
         
@@ -169,6 +169,33 @@ def GenerateThumbnailBytes( path, target_resolution, mime, duration, num_frames,
     
     return thumbnail_bytes
     
+def GetAllHashesFromPath( path ):
+    
+    # one pass over the file for everything, rather than reading it once for sha256 and again for the rest
+    
+    h_sha256 = hashlib.sha256()
+    h_md5 = hashlib.md5()
+    h_sha1 = hashlib.sha1()
+    h_sha512 = hashlib.sha512()
+    
+    with open( path, 'rb' ) as f:
+        
+        for block in HydrusPaths.ReadFileLikeAsBlocks( f ):
+            
+            h_sha256.update( block )
+            h_md5.update( block )
+            h_sha1.update( block )
+            h_sha512.update( block )
+            
+        
+    
+    sha256 = h_sha256.digest()
+    md5 = h_md5.digest()
+    sha1 = h_sha1.digest()
+    sha512 = h_sha512.digest()
+    
+    return ( sha256, md5, sha1, sha512 )
+    
 def GetExtraHashesFromPath( path ):
     
     h_md5 = hashlib.md5()
@@ -191,7 +218,7 @@ def GetExtraHashesFromPath( path ):
     
     return ( md5, sha1, sha512 )
     
-def GetFileInfo( path, mime = None, ok_to_look_for_hydrus_updates = False ):
+def GetFileInfo( path, mime = None, ok_to_look_for_hydrus_updates = False, numpy_image = None ):
     
     size = os.path.getsize( path )
     
@@ -238,7 +265,7 @@ def GetFileInfo( path, mime = None, ok_to_look_for_hydrus_updates = False ):
     
     if mime in ( HC.IMAGE_JPEG, HC.IMAGE_PNG, HC.IMAGE_GIF, HC.IMAGE_WEBP, HC.IMAGE_TIFF, HC.IMAGE_ICON ):
         
-        ( ( width, height ), duration, num_frames ) = HydrusImageHandling.GetImageProperties( path, mime )
+        ( ( width, height ), duration, num_frames ) = HydrusImageHandling.GetImageProperties( path, mime, numpy_image = numpy_image )
         
     elif mime == HC.APPLICATION_CLIP:
         
@@ -421,6 +448,10 @@ def GetThumbnailMime( path ):
         bit_to_check = f.read( 256 )
         
     
+    return GetThumbnailMimeFromBytes( bit_to_check )
+    
+def GetThumbnailMimeFromBytes( bit_to_check ):
+    
     for ( offsets_and_headers, mime ) in headers_and_mime_thumbnails:
         
         it_passes = False not in ( bit_to_check[ offset: ].startswith( header ) for ( offset, header ) in offsets_and_headers )
@@ -80,6 +80,10 @@ PILImage.MAX_IMAGE_PIXELS = None # this turns off decomp check entirely, wew
 
 PIL_ONLY_MIMETYPES = { HC.IMAGE_GIF, HC.IMAGE_ICON }
 
+# jpeg can do its scaling in the DCT step, so a 1/8 decode is far cheaper than a full decode and resize. the other formats have to decode every pixel anyway
+REDUCED_DECODE_MIMETYPES = { HC.IMAGE_JPEG }
+DECODE_REDUCTION_FACTORS = ( 8, 4, 2 )
+
 try:
     
     import cv2
@@ -93,6 +97,8 @@ try:
         CV_JPEG_THUMBNAIL_ENCODE_PARAMS = []
         CV_PNG_THUMBNAIL_ENCODE_PARAMS = []
         
+        CV_IMREAD_REDUCED_FLAGS = {}
+        
     else:
         
         # allows alpha channel
@@ -105,6 +111,13 @@ try:
         CV_JPEG_THUMBNAIL_ENCODE_PARAMS = [ cv2.IMWRITE_JPEG_QUALITY, 92 ]
         CV_PNG_THUMBNAIL_ENCODE_PARAMS = [ cv2.IMWRITE_PNG_COMPRESSION, 9 ]
         
+        # the 'grayscale' reduced flags are just the bare scale bits, so we can OR them onto the flags above and keep the colour behaviour
+        CV_IMREAD_REDUCED_FLAGS = {
+            2 : cv2.IMREAD_REDUCED_GRAYSCALE_2,
+            4 : cv2.IMREAD_REDUCED_GRAYSCALE_4,
+            8 : cv2.IMREAD_REDUCED_GRAYSCALE_8
+        }
+        
     
     OPENCV_OK = True
     
@@ -135,6 +148,12 @@ def MakeClipRectFit( image_resolution, clip_rect ):
     
     return ( x, y, clip_width, clip_height )
     
+def CanShareNumPyImage( mime ) -> bool:
+    
+    # for these, the properties, thumbnail and pixel hash all come from the same GenerateNumPyImage call, so an importer can decode once and hand the array around
+    
+    return OPENCV_OK and mime in ( HC.IMAGE_JPEG, HC.IMAGE_PNG, HC.IMAGE_WEBP, HC.IMAGE_TIFF )
+    
 def ClipNumPyImage( numpy_image: numpy.array, clip_rect ):
     
     if len( numpy_image.shape ) == 3:
@@ -242,7 +261,7 @@ def DequantizePILImage( pil_image: PILImage.Image ) -> PILImage.Image:
     
     return pil_image
     
-def GenerateNumPyImage( path, mime, force_pil = False ) -> numpy.array:
+def GenerateNumPyImage( path, mime, force_pil = False, reduction_factor = 1 ) -> numpy.array:
     
     if HG.media_load_report_mode:
         
@@ -302,7 +321,7 @@ def GenerateNumPyImage( path, mime, force_pil = False ) -> numpy.array:
             HydrusData.ShowText( 'Loading with PIL' )
             
         
-        pil_image = GeneratePILImage( path )
+        pil_image = GeneratePILImage( path, reduction_factor = reduction_factor )
         
         numpy_image = GenerateNumPyImageFromPILImage( pil_image )
         
@@ -326,6 +345,11 @@ def GenerateNumPyImage( path, mime, force_pil = False ) -> numpy.array:
             flags = CV_IMREAD_FLAGS_WEIRD
             
         
+        if mime in REDUCED_DECODE_MIMETYPES and reduction_factor in CV_IMREAD_REDUCED_FLAGS:
+            
+            flags |= CV_IMREAD_REDUCED_FLAGS[ reduction_factor ]
+            
+        
         numpy_image = cv2.imread( path, flags = flags )
         
         if numpy_image is None: # doesn't support some random stuff
@@ -335,7 +359,7 @@ def GenerateNumPyImage( path, mime, force_pil = False ) -> numpy.array:
                 HydrusData.ShowText( 'OpenCV Failed, loading with PIL' )
                 
             
-            pil_image = GeneratePILImage( path )
+            pil_image = GeneratePILImage( path, reduction_factor = reduction_factor )
             
             numpy_image = GenerateNumPyImageFromPILImage( pil_image )
             
@@ -345,6 +369,85 @@ def GenerateNumPyImage( path, mime, force_pil = False ) -> numpy.array:
             
         
     
+    if NumPyImageHasOpaqueAlphaChannel( numpy_image ):
+        
+        convert = cv2.COLOR_RGBA2RGB
+        
+        numpy_image = cv2.cvtColor( numpy_image, convert )
+        
+    
+    return numpy_image
+    
+def GenerateNumPyImageFromBytes( image_bytes: bytes, mime, force_pil = False ) -> numpy.array:
+    
+    # same as GenerateNumPyImage, but for an image we already have in memory, like a thumbnail out of a pack
+    
+    if not OPENCV_OK:
+        
+        force_pil = True
+        
+    
+    if not force_pil:
+        
+        try:
+            
+            pil_image = RawOpenPILImage( io.BytesIO( image_bytes ) )
+            
+            try:
+                
+                pil_image.verify()
+                
+            except:
+                
+                raise HydrusExceptions.UnsupportedFileException()
+                
+            
+            if pil_image.mode not in ( 'I', 'F' ):
+                
+                if pil_image.mode == 'LAB' or HasICCProfile( pil_image ):
+                    
+                    force_pil = True
+                    
+                
+            
+        except HydrusExceptions.UnsupportedFileException:
+            
+            pass
+            
+        
+    
+    numpy_image = None
+    
+    if mime not in PIL_ONLY_MIMETYPES and not force_pil:
+        
+        if mime in ( HC.IMAGE_JPEG, HC.IMAGE_TIFF ):
+            
+            flags = CV_IMREAD_FLAGS_JPEG
+            
+        elif mime == HC.IMAGE_PNG:
+            
+            flags = CV_IMREAD_FLAGS_PNG
+            
+        else:
+            
+            flags = CV_IMREAD_FLAGS_WEIRD
+            
+        
+        numpy_image = cv2.imdecode( numpy.frombuffer( image_bytes, dtype = 'uint8' ), flags )
+        
+        if numpy_image is not None:
+            
+            numpy_image = DequantizeNumPyImage( numpy_image )
+            
+        
+    
+    if numpy_image is None:
+        
+        pil_image = GeneratePILImage( io.BytesIO( image_bytes ) )
+        
+        numpy_image = GenerateNumPyImageFromPILImage( pil_image )
+        
+    
     if NumPyImageHasOpaqueAlphaChannel( numpy_image ):
         
         convert = cv2.COLOR_RGBA2RGB
@@ -371,7 +474,7 @@ def GenerateNumPyImageFromPILImage( pil_image: PILImage.Image ) -> numpy.array:
     
     return numpy.fromstring( s, dtype = 'uint8' ).reshape( ( h, w, depth ) )
     
-def GeneratePILImage( path, dequantize = True ) -> PILImage.Image:
+def GeneratePILImage( path, dequantize = True, reduction_factor = 1 ) -> PILImage.Image:
     
     pil_image = RawOpenPILImage( path )
     
@@ -380,6 +483,14 @@ def GeneratePILImage( path, dequantize = True ) -> PILImage.Image:
         raise Exception( 'The file at {} could not be rendered!'.format( path ) )
         
     
+    if reduction_factor > 1 and pil_image.format == 'JPEG':
+        
+        ( width, height ) = pil_image.size
+        
+        # draft picks the biggest DCT scale that fits into the requested size, so we ask for the rounded-down 1/reduction_factor size
+        pil_image.draft( None, ( max( 1, width // reduction_factor ), max( 1, height // reduction_factor ) ) )
+        
+    
     pil_image = RotateEXIFPILImage( pil_image )
     
     if dequantize:
@@ -426,11 +537,31 @@ def GeneratePILImageFromNumPyImage( numpy_image: numpy.array ) -> PILImage.Image
     
     return pil_image
     
-def GenerateThumbnailBytesFromStaticImagePath( path, target_resolution, mime, clip_rect = None ) -> bytes:
+def GenerateThumbnailBytesFromStaticImagePath( path, target_resolution, mime, clip_rect = None, numpy_image = None ) -> bytes:
+    
+    reduction_factor = 1
+    
+    if numpy_image is None:
+        
+        ( target_width, target_height ) = target_resolution
+        
+        # we keep at least twice the thumbnail size so the final resize still has some pixels to average
+        reduction_factor = GetDecodeReductionFactor( path, mime, ( target_width * 2, target_height * 2 ), clip_rect = clip_rect )
+        
+        if clip_rect is not None and reduction_factor > 1:
+            
+            ( x, y, clip_width, clip_height ) = clip_rect
+            
+            clip_rect = ( x // reduction_factor, y // reduction_factor, max( 1, clip_width // reduction_factor ), max( 1, clip_height // reduction_factor ) )
+            
+        
     
     if OPENCV_OK:
         
-        numpy_image = GenerateNumPyImage( path, mime )
+        if numpy_image is None:
+            
+            numpy_image = GenerateNumPyImage( path, mime, reduction_factor = reduction_factor )
+            
         
         if clip_rect is not None:
             
@@ -451,7 +582,7 @@ def GenerateThumbnailBytesFromStaticImagePath( path, target_resolution, mime, cl
             
         
     
-    pil_image = GeneratePILImage( path )
+    pil_image = GeneratePILImage( path, reduction_factor = reduction_factor )
     
     if clip_rect is not None:
         
@@ -460,7 +591,7 @@ def GenerateThumbnailBytesFromStaticImagePath( path, target_resolution, mime, cl
     
     thumbnail_pil_image = pil_image.resize( target_resolution, PILImage.ANTIALIAS )
     
-    thumbnail_bytes = GenerateThumbnailBytesPIL( pil_image, mime )
+    thumbnail_bytes = GenerateThumbnailBytesPIL( thumbnail_pil_image, mime )
     
     return thumbnail_bytes
     
@@ -536,6 +667,55 @@ def GenerateThumbnailBytesPIL( pil_image: PILImage.Image, mime ) -> bytes:
     return thumbnail_bytes
     
 
+def GetDecodeReductionFactor( path, mime, minimum_resolution, clip_rect = None ) -> int:
+    
+    # the biggest 1/n scale we can decode at and still have at least minimum_resolution, either of the whole image or of the clip region
+    
+    if mime not in REDUCED_DECODE_MIMETYPES:
+        
+        return 1
+        
+    
+    if clip_rect is None:
+        
+        try:
+            
+            pil_image = RawOpenPILImage( path )
+            
+        except HydrusExceptions.DamagedOrUnusualFileException:
+            
+            return 1
+            
+        
+        ( width, height ) = pil_image.size
+        
+        # the header resolution is before any EXIF rotation
+        exif_dict = GetEXIFDict( pil_image )
+        
+        if exif_dict is not None and exif_dict.get( 274, 1 ) in ( 5, 6, 7, 8 ):
+            
+            ( width, height ) = ( height, width )
+            
+        
+        pil_image.close()
+        
+    else:
+        
+        ( x, y, width, height ) = clip_rect
+        
+    
+    ( minimum_width, minimum_height ) = minimum_resolution
+    
+    for reduction_factor in DECODE_REDUCTION_FACTORS:
+        
+        if width // reduction_factor >= minimum_width and height // reduction_factor >= minimum_height:
+            
+            return reduction_factor
+            
+        
+    
+    return 1
+    
 def GetEXIFDict( pil_image: PILImage.Image ) -> typing.Optional[ dict ]:
     
     if pil_image.format in ( 'JPEG', 'TIFF' ) and hasattr( pil_image, '_getexif' ):
@@ -610,17 +790,23 @@ def GetICCProfileBytes( pil_image: PILImage.Image ) -> bytes:
     
     raise HydrusExceptions.DataMissing( 'This image has no ICC profile!' )
     
-def GetImagePixelHash( path, mime ) -> bytes:
+def GetImagePixelHash( path, mime, numpy_image = None ) -> bytes:
     
-    numpy_image = GenerateNumPyImage( path, mime )
+    if numpy_image is None:
+        
+        numpy_image = GenerateNumPyImage( path, mime )
+        
     
     return hashlib.sha256( numpy_image.data.tobytes() ).digest()
     
-def GetImageProperties( path, mime ):
+def GetImageProperties( path, mime, numpy_image = None ):
     
     if OPENCV_OK and mime not in PIL_ONLY_MIMETYPES: # webp here too maybe eventually, or offload it all to ffmpeg
         
-        numpy_image = GenerateNumPyImage( path, mime )
+        if numpy_image is None:
+            
+            numpy_image = GenerateNumPyImage( path, mime )
+            
         
         ( width, height ) = GetResolutionNumPy( numpy_image )
         
@@ -0,0 +1,274 @@
+import numpy
+
+# a python set of a few million ints is a few hundred MB, and intersecting two of them is a slow walk in the interpreter
+# this is a sorted, unique numpy array with enough of the set interface that the file search code can use it instead, at eight bytes per item
+# below this many items, a normal set is fast and small enough that converting is not worth it
+
+COMPACT_SET_THRESHOLD = 65536
+
+INTEGER_DTYPE = numpy.int64
+
+def _GetSortedUniqueArray( integer_iterable ) -> numpy.ndarray:
+    
+    if isinstance( integer_iterable, SortedIntegerSet ):
+        
+        return integer_iterable.GetArray()
+        
+    
+    if isinstance( integer_iterable, numpy.ndarray ):
+        
+        array = integer_iterable.astype( INTEGER_DTYPE, copy = False )
+        
+    elif isinstance( integer_iterable, ( set, frozenset, list, tuple ) ):
+        
+        array = numpy.fromiter( integer_iterable, dtype = INTEGER_DTYPE, count = len( integer_iterable ) )
+        
+    else:
+        
+        array = numpy.fromiter( integer_iterable, dtype = INTEGER_DTYPE )
+        
+    
+    # a set is already unique, so a plain sort will do
+    if isinstance( integer_iterable, ( set, frozenset ) ):
+        
+        array.sort()
+        
+        return array
+        
+    
+    return numpy.unique( array )
+    
+
+def GenerateSortedIntegerSetFromCursor( iterable_cursor ) -> "SortedIntegerSet":
+    
+    # strip singleton tuples straight into the array, so we never hold the whole result as python objects
+    
+    array = numpy.fromiter( ( item for ( item, ) in iterable_cursor ), dtype = INTEGER_DTYPE )
+    
+    return SortedIntegerSet( numpy.unique( array ), _already_sorted_and_unique = True )
+    
+
+def IsCompactableSize( integer_collection ) -> bool:
+    
+    return len( integer_collection ) >= COMPACT_SET_THRESHOLD
+    
+
+class SortedIntegerSet( object ):
+    
+    def __init__( self, integer_iterable = None, _already_sorted_and_unique = False ):
+        
+        if integer_iterable is None:
+            
+            self._array = numpy.empty( 0, dtype = INTEGER_DTYPE )
+            
+        elif _already_sorted_and_unique:
+            
+            self._array = integer_iterable
+            
+        else:
+            
+            self._array = _GetSortedUniqueArray( integer_iterable )
+            
+        
+    
+    def __and__( self, other ):
+        
+        return self.intersection( other )
+        
+    
+    def __bool__( self ):
+        
+        return len( self._array ) > 0
+        
+    
+    def __contains__( self, item ):
+        
+        index = numpy.searchsorted( self._array, item )
+        
+        return index < len( self._array ) and self._array[ index ] == item
+        
+    
+    def __eq__( self, other ):
+        
+        if isinstance( other, SortedIntegerSet ):
+            
+            return numpy.array_equal( self._array, other._array )
+            
+        elif isinstance( other, ( set, frozenset ) ):
+            
+            return len( self._array ) == len( other ) and numpy.array_equal( self._array, _GetSortedUniqueArray( other ) )
+            
+        
+        return NotImplemented
+        
+    
+    def __iter__( self ):
+        
+        # tolist gives python ints, which is what sqlite and everything else wants
+        
+        return iter( self._array.tolist() )
+        
+    
+    def __len__( self ):
+        
+        return len( self._array )
+        
+    
+    def __or__( self, other ):
+        
+        return self.union( other )
+        
+    
+    def __rand__( self, other ):
+        
+        return self.intersection( other )
+        
+    
+    def __repr__( self ):
+        
+        return 'SortedIntegerSet: {} items'.format( len( self._array ) )
+        
+    
+    def __ror__( self, other ):
+        
+        return self.union( other )
+        
+    
+    def __sub__( self, other ):
+        
+        return self.difference( other )
+        
+    
+    def _Intersect( self, other_array: numpy.ndarray ) -> numpy.ndarray:
+        
+        if len( self._array ) == 0 or len( other_array ) == 0:
+            
+            return numpy.empty( 0, dtype = INTEGER_DTYPE )
+            
+        
+        ( small, big ) = ( self._array, other_array ) if len( self._array ) <= len( other_array ) else ( other_array, self._array )
+        
+        if len( small ) * 16 < len( big ):
+            
+            # binary search the few into the many
+            
+            indices = numpy.searchsorted( big, small )
+            
+            indices[ indices == len( big ) ] = 0
+            
+            return small[ big[ indices ] == small ]
+            
+        
+        return numpy.intersect1d( self._array, other_array, assume_unique = True )
+        
+    
+    def add( self, item ):
+        
+        if item not in self:
+            
+            index = numpy.searchsorted( self._array, item )
+            
+            self._array = numpy.insert( self._array, index, item )
+            
+        
+    
+    def copy( self ) -> "SortedIntegerSet":
+        
+        return SortedIntegerSet( self._array.copy(), _already_sorted_and_unique = True )
+        
+    
+    def difference( self, *others ) -> "SortedIntegerSet":
+        
+        result = self.copy()
+        
+        result.difference_update( *others )
+        
+        return result
+        
+    
+    def difference_update( self, *others ):
+        
+        for other in others:
+            
+            if len( self._array ) == 0:
+                
+                return
+                
+            
+            other_array = _GetSortedUniqueArray( other )
+            
+            if len( other_array ) == 0:
+                
+                continue
+                
+            
+            self._array = self._array[ ~ numpy.isin( self._array, other_array, assume_unique = True ) ]
+            
+        
+    
+    def discard( self, item ):
+        
+        index = numpy.searchsorted( self._array, item )
+        
+        if index < len( self._array ) and self._array[ index ] == item:
+            
+            self._array = numpy.delete( self._array, index )
+            
+        
+    
+    def GetArray( self ) -> numpy.ndarray:
+        
+        return self._array
+        
+    
+    def intersection( self, *others ) -> "SortedIntegerSet":
+        
+        result = self.copy()
+        
+        result.intersection_update( *others )
+        
+        return result
+        
+    
+    def intersection_update( self, *others ):
+        
+        for other in others:
+            
+            self._array = self._Intersect( _GetSortedUniqueArray( other ) )
+            
+        
+    
+    def isdisjoint( self, other ) -> bool:
+        
+        return len( self._Intersect( _GetSortedUniqueArray( other ) ) ) == 0
+        
+    
+    def issubset( self, other ) -> bool:
+        
+        return len( self._Intersect( _GetSortedUniqueArray( other ) ) ) == len( self._array )
+        
+    
+    def union( self, *others ) -> "SortedIntegerSet":
+        
+        result = self.copy()
+        
+        result.update( *others )
+        
+        return result
+        
+    
+    def update( self, *others ):
+        
+        for other in others:
+            
+            other_array = _GetSortedUniqueArray( other )
+            
+            if len( other_array ) == 0:
+                
+                continue
+                
+            
+            self._array = numpy.union1d( self._array, other_array )
+            
+        
+    
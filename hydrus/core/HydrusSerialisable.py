@@ -1,6 +1,7 @@
 import hashlib
 import json
 import os
+import struct
 
 from hydrus.core import HydrusCompression
 from hydrus.core import HydrusData
@@ -128,8 +129,38 @@ SERIALISABLE_TYPE_METADATA_SINGLE_FILE_IMPORTER_MEDIA_URLS = 118
 
 SERIALISABLE_TYPES_TO_OBJECT_TYPES = {}
 
+# a zlib stream never starts with a null byte, so network bytes with this prefix are the packed binary form
+# only a few big objects (repository updates) have one. it is ( prefix, type, binary version ) and then the compressed body
+BINARY_NETWORK_BYTES_PREFIX = b'\x00hyb'
+BINARY_NETWORK_BYTES_HEADER_STRUCT = struct.Struct( '>HH' )
+
+def CreateFromBinaryNetworkBytes( network_bytes: bytes ):
+    
+    header_start = len( BINARY_NETWORK_BYTES_PREFIX )
+    body_start = header_start + BINARY_NETWORK_BYTES_HEADER_STRUCT.size
+    
+    ( serialisable_type, binary_version ) = BINARY_NETWORK_BYTES_HEADER_STRUCT.unpack( network_bytes[ header_start : body_start ] )
+    
+    if serialisable_type not in SERIALISABLE_TYPES_TO_OBJECT_TYPES:
+        
+        raise HydrusExceptions.SerialisationException( 'Could not load a binary object of unknown type {}!'.format( serialisable_type ) )
+        
+    
+    obj = SERIALISABLE_TYPES_TO_OBJECT_TYPES[ serialisable_type ]()
+    
+    body = HydrusCompression.DecompressBytesToBytes( network_bytes[ body_start : ] )
+    
+    obj.InitialiseFromSerialisableBinary( binary_version, body )
+    
+    return obj
+    
 def CreateFromNetworkBytes( network_bytes: bytes, raise_error_on_future_version = False ):
     
+    if network_bytes.startswith( BINARY_NETWORK_BYTES_PREFIX ):
+        
+        return CreateFromBinaryNetworkBytes( network_bytes )
+        
+    
     obj_string = HydrusCompression.DecompressBytesToString( network_bytes )
     
     return CreateFromString( obj_string, raise_error_on_future_version = raise_error_on_future_version )
@@ -205,12 +236,23 @@ class SerialisableBase( object ):
     SERIALISABLE_TYPE = SERIALISABLE_TYPE_BASE
     SERIALISABLE_NAME = 'Base Serialisable Object'
     SERIALISABLE_VERSION = 1
+    SERIALISABLE_BINARY_VERSION = None
+    
+    def _GetSerialisableBinary( self ) -> bytes:
+        
+        raise NotImplementedError()
+        
     
     def _GetSerialisableInfo( self ):
         
         raise NotImplementedError()
         
     
+    def _InitialiseFromSerialisableBinary( self, serialisable_binary ):
+        
+        raise NotImplementedError()
+        
+    
     def _InitialiseFromSerialisableInfo( self, serialisable_info ):
         
         raise NotImplementedError()
@@ -221,6 +263,29 @@ class SerialisableBase( object ):
         return old_serialisable_info
         
     
+    def DumpToBinaryNetworkBytes( self ):
+        
+        # if this object has no binary form, or its contents won't pack, the normal json is always fine
+        
+        if self.SERIALISABLE_BINARY_VERSION is None:
+            
+            return self.DumpToNetworkBytes()
+            
+        
+        try:
+            
+            serialisable_binary = self._GetSerialisableBinary()
+            
+        except HydrusExceptions.SerialisationException:
+            
+            return self.DumpToNetworkBytes()
+            
+        
+        header = BINARY_NETWORK_BYTES_PREFIX + BINARY_NETWORK_BYTES_HEADER_STRUCT.pack( self.SERIALISABLE_TYPE, self.SERIALISABLE_BINARY_VERSION )
+        
+        return header + HydrusCompression.CompressBytesToBytes( serialisable_binary )
+        
+    
     def DumpToNetworkBytes( self ):
         
         obj_string = self.DumpToString()
@@ -263,6 +328,20 @@ class SerialisableBase( object ):
         return ( self.SERIALISABLE_TYPE, self.SERIALISABLE_VERSION, serialisable_info )
         
     
+    def InitialiseFromSerialisableBinary( self, binary_version, serialisable_binary ):
+        
+        # unlike the json, there is no updating or limping along here. a different binary layout is simply unreadable
+        
+        if self.SERIALISABLE_BINARY_VERSION is None or binary_version != self.SERIALISABLE_BINARY_VERSION:
+            
+            message = 'Unfortunately, an object of type {} could not be loaded because its binary format, version {}, is not supported by this program! Please update to import this object.'.format( self.SERIALISABLE_NAME, binary_version )
+            
+            raise HydrusExceptions.SerialisationException( message )
+            
+        
+        self._InitialiseFromSerialisableBinary( serialisable_binary )
+        
+    
     def InitialiseFromSerialisableInfo( self, version, serialisable_info, raise_error_on_future_version = False ):
         
         if version > self.SERIALISABLE_VERSION:
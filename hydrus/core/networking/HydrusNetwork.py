@@ -3,6 +3,9 @@ import threading
 import time
 import typing
 
+import numpy
+
+from hydrus.core import HydrusBinaryPacking
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
 from hydrus.core import HydrusExceptions
@@ -18,6 +21,28 @@ MAX_UPDATE_PERIOD = 100000 * 100 # three months or so jej
 MIN_NULLIFICATION_PERIOD = 86400
 MAX_NULLIFICATION_PERIOD = 86400 * 365
 
+# updates are addressed by the hash of their bytes, so the server picks one format for everyone when it makes them
+# clients that cannot read binary updates will fail to process them, so the admin switches it on once the users have caught up
+UPDATE_FORMAT_JSON = 0
+UPDATE_FORMAT_BINARY = 1
+
+update_format_string_lookup = {
+    UPDATE_FORMAT_JSON : 'json',
+    UPDATE_FORMAT_BINARY : 'packed binary'
+}
+
+# the content types and actions that have a packed binary layout. anything else means the update goes as json
+BINARY_PACKABLE_CONTENT = {
+    ( HC.CONTENT_TYPE_FILES, HC.CONTENT_UPDATE_ADD ),
+    ( HC.CONTENT_TYPE_FILES, HC.CONTENT_UPDATE_DELETE ),
+    ( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD ),
+    ( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_DELETE ),
+    ( HC.CONTENT_TYPE_TAG_PARENTS, HC.CONTENT_UPDATE_ADD ),
+    ( HC.CONTENT_TYPE_TAG_PARENTS, HC.CONTENT_UPDATE_DELETE ),
+    ( HC.CONTENT_TYPE_TAG_SIBLINGS, HC.CONTENT_UPDATE_ADD ),
+    ( HC.CONTENT_TYPE_TAG_SIBLINGS, HC.CONTENT_UPDATE_DELETE )
+}
+
 def GenerateDefaultServiceDictionary( service_type ):
     
     dictionary = HydrusSerialisable.SerialisableDictionary()
@@ -1513,6 +1538,7 @@ class ContentUpdate( HydrusSerialisable.SerialisableBase ):
     SERIALISABLE_TYPE = HydrusSerialisable.SERIALISABLE_TYPE_CONTENT_UPDATE
     SERIALISABLE_NAME = 'Content Update'
     SERIALISABLE_VERSION = 1
+    SERIALISABLE_BINARY_VERSION = 1
     
     def __init__( self ):
         
@@ -1520,9 +1546,19 @@ class ContentUpdate( HydrusSerialisable.SerialisableBase ):
         
         self._content_data = {}
         
+        # a binary update keeps its packed columns until something asks for the rows
+        self._binary_blocks = {}
+        
     
     def _GetContent( self, content_type, action ):
         
+        if ( content_type, action ) in self._binary_blocks:
+            
+            ( num_rows, columns ) = self._binary_blocks[ ( content_type, action ) ]
+            
+            return self._IterateBinaryBlock( content_type, action, num_rows, columns )
+            
+        
         if content_type in self._content_data:
             
             if action in self._content_data[ content_type ]:
@@ -1534,8 +1570,38 @@ class ContentUpdate( HydrusSerialisable.SerialisableBase ):
         return []
         
     
+    def _GetSerialisableBinary( self ):
+        
+        self._UnpackBinaryBlocks()
+        
+        blocks = []
+        
+        for ( content_type, actions_to_datas ) in self._content_data.items():
+            
+            for ( action, data ) in actions_to_datas.items():
+                
+                if ( content_type, action ) not in BINARY_PACKABLE_CONTENT:
+                    
+                    raise HydrusExceptions.SerialisationException( 'No binary layout for content type {} and action {}!'.format( content_type, action ) )
+                    
+                
+                columns = self._PackBinaryColumns( content_type, action, data )
+                
+                block = HydrusBinaryPacking.PackUVarInt( content_type ) + HydrusBinaryPacking.PackUVarInt( action ) + HydrusBinaryPacking.PackUVarInt( len( data ) ) + HydrusBinaryPacking.PackUVarInt( len( columns ) )
+                
+                block += b''.join( ( HydrusBinaryPacking.PackSection( column ) for column in columns ) )
+                
+                blocks.append( block )
+                
+            
+        
+        return HydrusBinaryPacking.PackUVarInt( len( blocks ) ) + b''.join( blocks )
+        
+    
     def _GetSerialisableInfo( self ):
         
+        self._UnpackBinaryBlocks()
+        
         serialisable_info = []
         
         for ( content_type, actions_to_datas ) in list(self._content_data.items()):
@@ -1548,6 +1614,30 @@ class ContentUpdate( HydrusSerialisable.SerialisableBase ):
         return serialisable_info
         
     
+    def _InitialiseFromSerialisableBinary( self, serialisable_binary ):
+        
+        reader = HydrusBinaryPacking.BinaryReader( serialisable_binary )
+        
+        num_blocks = reader.ReadUVarInt()
+        
+        for i in range( num_blocks ):
+            
+            content_type = reader.ReadUVarInt()
+            action = reader.ReadUVarInt()
+            num_rows = reader.ReadUVarInt()
+            num_columns = reader.ReadUVarInt()
+            
+            columns = [ reader.ReadSection() for j in range( num_columns ) ]
+            
+            if ( content_type, action ) not in BINARY_PACKABLE_CONTENT:
+                
+                raise HydrusExceptions.SerialisationException( 'Did not understand the binary layout for content type {} and action {}!'.format( content_type, action ) )
+                
+            
+            self._binary_blocks[ ( content_type, action ) ] = ( num_rows, columns )
+            
+        
+    
     def _InitialiseFromSerialisableInfo( self, serialisable_info ):
         
         for ( content_type, serialisable_actions_to_datas ) in serialisable_info:
@@ -1558,8 +1648,126 @@ class ContentUpdate( HydrusSerialisable.SerialisableBase ):
             
         
     
+    def _IterateBinaryBlock( self, content_type, action, num_rows, columns ):
+        
+        # each column unpacks in one go, and then the rows stream out, so a big update never sits in memory as a huge list
+        
+        if content_type == HC.CONTENT_TYPE_FILES and action == HC.CONTENT_UPDATE_ADD:
+            
+            service_hash_ids = HydrusBinaryPacking.UnpackDeltaUVarInts( columns[0] ).tolist()
+            
+            file_info_columns = [ HydrusBinaryPacking.UnpackNullableUVarInts( column ) for column in columns[1:] ]
+            
+            rows = zip( service_hash_ids, *file_info_columns )
+            
+        elif content_type == HC.CONTENT_TYPE_FILES:
+            
+            rows = HydrusBinaryPacking.UnpackDeltaUVarInts( columns[0] ).tolist()
+            
+        elif content_type == HC.CONTENT_TYPE_MAPPINGS:
+            
+            service_tag_ids = HydrusBinaryPacking.UnpackDeltaUVarInts( columns[0] ).tolist()
+            counts = HydrusBinaryPacking.UnpackUVarInts( columns[1] ).astype( numpy.int64 )
+            service_hash_ids = HydrusBinaryPacking.UnpackRowDeltaUVarInts( columns[2], counts ).tolist()
+            
+            rows = self._IterateMappingRows( service_tag_ids, counts.tolist(), service_hash_ids )
+            
+        else:
+            
+            rows = zip( HydrusBinaryPacking.UnpackUVarInts( columns[0] ).tolist(), HydrusBinaryPacking.UnpackUVarInts( columns[1] ).tolist() )
+            
+        
+        num_rows_done = 0
+        
+        for row in rows:
+            
+            yield row
+            
+            num_rows_done += 1
+            
+        
+        if num_rows_done != num_rows:
+            
+            raise HydrusExceptions.SerialisationException( 'A binary content update block had {} rows, but was supposed to have {}!'.format( num_rows_done, num_rows ) )
+            
+        
+    
+    def _IterateMappingRows( self, service_tag_ids, counts, service_hash_ids ):
+        
+        start = 0
+        
+        for ( service_tag_id, count ) in zip( service_tag_ids, counts ):
+            
+            yield ( service_tag_id, service_hash_ids[ start : start + count ] )
+            
+            start += count
+            
+        
+    
+    def _PackBinaryColumns( self, content_type, action, data ):
+        
+        # ids are sorted and delta-encoded so they pack to a byte or two each. row order in an update does not matter
+        
+        if content_type == HC.CONTENT_TYPE_FILES and action == HC.CONTENT_UPDATE_ADD:
+            
+            rows = sorted( data, key = lambda row: row[0] )
+            
+            columns = [ HydrusBinaryPacking.PackDeltaUVarInts( [ row[0] for row in rows ] ) ]
+            
+            columns.extend( ( HydrusBinaryPacking.PackNullableUVarInts( column ) for column in list( zip( *rows ) )[1:] ) )
+            
+            if len( rows ) > 0 and len( columns ) != 9:
+                
+                raise HydrusExceptions.SerialisationException( 'Unexpected file row length in a content update!' )
+                
+            
+            # an empty block still needs the same number of columns
+            columns.extend( ( b'' for i in range( 9 - len( columns ) ) ) )
+            
+        elif content_type == HC.CONTENT_TYPE_FILES:
+            
+            columns = [ HydrusBinaryPacking.PackDeltaUVarInts( sorted( data ) ) ]
+            
+        elif content_type == HC.CONTENT_TYPE_MAPPINGS:
+            
+            rows = sorted( ( ( service_tag_id, sorted( service_hash_ids ) ) for ( service_tag_id, service_hash_ids ) in data ), key = lambda row: row[0] )
+            
+            columns = [
+                HydrusBinaryPacking.PackDeltaUVarInts( [ service_tag_id for ( service_tag_id, service_hash_ids ) in rows ] ),
+                HydrusBinaryPacking.PackUVarInts( [ len( service_hash_ids ) for ( service_tag_id, service_hash_ids ) in rows ] ),
+                HydrusBinaryPacking.PackRowDeltaUVarInts( ( service_hash_ids for ( service_tag_id, service_hash_ids ) in rows ) )
+            ]
+            
+        else:
+            
+            columns = [
+                HydrusBinaryPacking.PackUVarInts( [ a for ( a, b ) in data ] ),
+                HydrusBinaryPacking.PackUVarInts( [ b for ( a, b ) in data ] )
+            ]
+            
+        
+        return columns
+        
+    
+    def _UnpackBinaryBlocks( self ):
+        
+        for ( ( content_type, action ), ( num_rows, columns ) ) in self._binary_blocks.items():
+            
+            if content_type not in self._content_data:
+                
+                self._content_data[ content_type ] = {}
+                
+            
+            self._content_data[ content_type ][ action ] = list( self._IterateBinaryBlock( content_type, action, num_rows, columns ) )
+            
+        
+        self._binary_blocks = {}
+        
+    
     def AddRow( self, row ):
         
+        self._UnpackBinaryBlocks()
+        
         ( content_type, action, data ) = row
         
         if content_type not in self._content_data:
@@ -1619,6 +1827,21 @@ class ContentUpdate( HydrusSerialisable.SerialisableBase ):
         
         num = 0
         
+        for ( ( content_type, action ), ( num_rows, columns ) ) in self._binary_blocks.items():
+            
+            if content_types_to_count is not None and content_type not in content_types_to_count:
+                
+                continue
+                
+            
+            if content_type == HC.CONTENT_TYPE_MAPPINGS:
+                
+                num_rows = int( HydrusBinaryPacking.UnpackUVarInts( columns[1] ).sum() )
+                
+            
+            num += num_rows
+            
+        
         for content_type in self._content_data:
             
             if content_types_to_count is not None and content_type not in content_types_to_count:
@@ -1863,6 +2086,7 @@ class DefinitionsUpdate( HydrusSerialisable.SerialisableBase ):
     SERIALISABLE_TYPE = HydrusSerialisable.SERIALISABLE_TYPE_DEFINITIONS_UPDATE
     SERIALISABLE_NAME = 'Definitions Update'
     SERIALISABLE_VERSION = 1
+    SERIALISABLE_BINARY_VERSION = 1
     
     def __init__( self ):
         
@@ -1872,6 +2096,43 @@ class DefinitionsUpdate( HydrusSerialisable.SerialisableBase ):
         self._tag_ids_to_tags = {}
         
     
+    def _GetSerialisableBinary( self ):
+        
+        # each definition type is sorted ids, blob lengths, and then all the blobs back to back
+        
+        try:
+            
+            tag_ids_to_tag_bytes = { tag_id : tag.encode( 'utf-8' ) for ( tag_id, tag ) in self._tag_ids_to_tags.items() }
+            
+        except UnicodeEncodeError as e:
+            
+            raise HydrusExceptions.SerialisationException( 'Could not pack a tag: {}'.format( e ) )
+            
+        
+        blocks = []
+        
+        for ( definitions_type, ids_to_blobs ) in ( ( HC.DEFINITIONS_TYPE_HASHES, self._hash_ids_to_hashes ), ( HC.DEFINITIONS_TYPE_TAGS, tag_ids_to_tag_bytes ) ):
+            
+            if len( ids_to_blobs ) == 0:
+                
+                continue
+                
+            
+            ids = sorted( ids_to_blobs.keys() )
+            blobs = [ ids_to_blobs[ i ] for i in ids ]
+            
+            block = HydrusBinaryPacking.PackUVarInt( definitions_type ) + HydrusBinaryPacking.PackUVarInt( len( ids ) )
+            
+            block += HydrusBinaryPacking.PackSection( HydrusBinaryPacking.PackDeltaUVarInts( ids ) )
+            block += HydrusBinaryPacking.PackSection( HydrusBinaryPacking.PackUVarInts( [ len( blob ) for blob in blobs ] ) )
+            block += HydrusBinaryPacking.PackSection( b''.join( blobs ) )
+            
+            blocks.append( block )
+            
+        
+        return HydrusBinaryPacking.PackUVarInt( len( blocks ) ) + b''.join( blocks )
+        
+    
     def _GetSerialisableInfo( self ):
         
         serialisable_info = []
@@ -1889,6 +2150,47 @@ class DefinitionsUpdate( HydrusSerialisable.SerialisableBase ):
         return serialisable_info
         
     
+    def _InitialiseFromSerialisableBinary( self, serialisable_binary ):
+        
+        reader = HydrusBinaryPacking.BinaryReader( serialisable_binary )
+        
+        num_blocks = reader.ReadUVarInt()
+        
+        for i in range( num_blocks ):
+            
+            definitions_type = reader.ReadUVarInt()
+            num_rows = reader.ReadUVarInt()
+            
+            ids = HydrusBinaryPacking.UnpackDeltaUVarInts( reader.ReadSection() ).tolist()
+            lengths = HydrusBinaryPacking.UnpackUVarInts( reader.ReadSection() ).tolist()
+            blob_bytes = bytes( reader.ReadSection() )
+            
+            if not len( ids ) == len( lengths ) == num_rows or sum( lengths ) != len( blob_bytes ):
+                
+                raise HydrusExceptions.SerialisationException( 'A binary definitions update block did not add up!' )
+                
+            
+            blobs = []
+            start = 0
+            
+            for length in lengths:
+                
+                blobs.append( blob_bytes[ start : start + length ] )
+                
+                start += length
+                
+            
+            if definitions_type == HC.DEFINITIONS_TYPE_HASHES:
+                
+                self._hash_ids_to_hashes = dict( zip( ids, blobs ) )
+                
+            elif definitions_type == HC.DEFINITIONS_TYPE_TAGS:
+                
+                self._tag_ids_to_tags = { tag_id : str( blob, 'utf-8' ) for ( tag_id, blob ) in zip( ids, blobs ) }
+                
+            
+        
+    
     def _InitialiseFromSerialisableInfo( self, serialisable_info ):
         
         for ( definition_type, definitions ) in serialisable_info:
@@ -2739,6 +3041,11 @@ class ServerServiceRepository( ServerServiceRestricted ):
             self._service_options[ 'nullification_period' ] = default_nullification_period
             
         
+        if 'update_format' not in self._service_options:
+            
+            self._service_options[ 'update_format' ] = UPDATE_FORMAT_JSON
+            
+        
         if 'next_nullification_update_index' not in dictionary:
             
             dictionary[ 'next_nullification_update_index' ] = 0
@@ -2781,6 +3088,14 @@ class ServerServiceRepository( ServerServiceRestricted ):
             
         
     
+    def GetUpdateFormat( self ) -> int:
+        
+        with self._lock:
+            
+            return self._service_options[ 'update_format' ]
+            
+        
+    
     def HasUpdateHash( self, update_hash ):
         
         with self._lock:
@@ -2899,6 +3214,16 @@ class ServerServiceRepository( ServerServiceRestricted ):
         HG.server_controller.pub( 'notify_new_nullification' )
         
     
+    def SetUpdateFormat( self, update_format: int ):
+        
+        with self._lock:
+            
+            self._service_options[ 'update_format' ] = update_format
+            
+            self._SetDirty()
+            
+        
+    
     def SetUpdatePeriod( self, update_period: int ):
         
         with self._lock:
@@ -2943,10 +3268,11 @@ class ServerServiceRepository( ServerServiceRestricted ):
                         
                     
                     update_period = self._service_options[ 'update_period' ]
+                    update_format = self._service_options[ 'update_format' ]
                     
                     end = begin + update_period
                     
-                    update_hashes = HG.server_controller.WriteSynchronous( 'create_update', service_key, begin, end )
+                    update_hashes = HG.server_controller.WriteSynchronous( 'create_update', service_key, begin, end, update_format )
                     
                     update_created = True
                     
@@ -372,6 +372,112 @@ def GenerateNormieEris( service ):
 
 hydrus_favicon = FileResource( os.path.join( HC.STATIC_DIR, 'hydrus.ico' ), defaultType = 'image/x-icon' )
 
+class BodyChunksProducer( object ):
+    
+    # writes a response body a chunk at a time. each chunk is generated in a thread, so db work stays off the reactor
+    # with no Content-Length set, twisted sends this as Transfer-Encoding: chunked
+    
+    def __init__( self, request: HydrusServerRequest.HydrusRequest, body_chunks, finished_callable ):
+        
+        self._request = request
+        self._body_chunks = body_chunks
+        self._finished_callable = finished_callable
+        
+        self._num_bytes_written = 0
+        
+        self._paused = False
+        self._stopped = False
+        self._working = False
+        
+    
+    def _callbackWriteChunk( self, chunk ):
+        
+        self._working = False
+        
+        if self._stopped:
+            
+            return
+            
+        
+        if chunk is None:
+            
+            self._stopped = True
+            
+            self._request.unregisterProducer()
+            
+            self._request.finish()
+            
+            self._finished_callable( self._num_bytes_written )
+            
+            return
+            
+        
+        self._request.write( chunk )
+        
+        self._num_bytes_written += len( chunk )
+        
+        self._ProduceNextChunk()
+        
+    
+    def _errbackChunk( self, failure ):
+        
+        self._working = False
+        
+        HydrusData.DebugPrint( failure.getTraceback() )
+        
+        if self._stopped:
+            
+            return
+            
+        
+        self._stopped = True
+        
+        # we have already sent a 200, so all we can do is cut the response short
+        
+        self._request.unregisterProducer()
+        
+        self._request.loseConnection()
+        
+    
+    def _ProduceNextChunk( self ):
+        
+        if self._paused or self._stopped or self._working:
+            
+            return
+            
+        
+        self._working = True
+        
+        d = deferToThread( next, self._body_chunks, None )
+        
+        d.addCallbacks( self._callbackWriteChunk, self._errbackChunk )
+        
+    
+    def pauseProducing( self ):
+        
+        self._paused = True
+        
+    
+    def resumeProducing( self ):
+        
+        self._paused = False
+        
+        self._ProduceNextChunk()
+        
+    
+    def start( self ):
+        
+        self._request.registerProducer( self, True )
+        
+        self._ProduceNextChunk()
+        
+    
+    def stopProducing( self ):
+        
+        self._stopped = True
+        
+    
+
 class HydrusDomain( object ):
     
     def __init__( self, local_only ):
@@ -656,6 +762,25 @@ class HydrusResource( Resource ):
             
             do_finish = False
             
+        elif response_context.HasBodyChunks():
+            
+            mime = response_context.GetMime()
+            
+            content_type = HC.mime_mimetype_string_lookup[ mime ]
+            
+            request.setHeader( 'Content-Type', content_type )
+            request.setHeader( 'Content-Disposition', 'inline' )
+            request.setHeader( 'Cache-Control', 'max-age={}'.format( 4 ) )
+            
+            # we report the data when the producer is done, since we don't know it yet
+            content_length = 0
+            
+            producer = BodyChunksProducer( request, response_context.GetBodyChunks(), lambda num_bytes: self._reportDataUsed( request, num_bytes ) )
+            
+            producer.start()
+            
+            do_finish = False
+            
         elif response_context.HasBody():
             
             mime = response_context.GetMime()
@@ -1201,7 +1326,7 @@ class HydrusResourceWelcome( HydrusResource ):
     
 class ResponseContext( object ):
     
-    def __init__( self, status_code, mime = HC.APPLICATION_JSON, body = None, path = None, cookies = None ):
+    def __init__( self, status_code, mime = HC.APPLICATION_JSON, body = None, path = None, cookies = None, body_chunks = None ):
         
         if body is None:
             
@@ -1235,6 +1360,7 @@ class ResponseContext( object ):
         self._body_bytes = body_bytes
         self._path = path
         self._cookies = cookies
+        self._body_chunks = body_chunks
         
     
     def GetBodyBytes( self ):
@@ -1242,6 +1368,11 @@ class ResponseContext( object ):
         return self._body_bytes
         
     
+    def GetBodyChunks( self ):
+        
+        return self._body_chunks
+        
+    
     def GetCookies( self ): return self._cookies
     
     def GetMime( self ): return self._mime
@@ -1252,5 +1383,7 @@ class ResponseContext( object ):
     
     def HasBody( self ): return self._body_bytes is not None
     
+    def HasBodyChunks( self ): return self._body_chunks is not None
+    
     def HasPath( self ): return self._path is not None
     
@@ -1981,7 +1981,7 @@ class DB( HydrusDB.HydrusDB ):
         self._RepositoryRegenerateServiceInfo( service_id = service_id )
         
     
-    def _RepositoryCreateUpdate( self, service_key, begin, end ):
+    def _RepositoryCreateUpdate( self, service_key, begin, end, update_format = HydrusNetwork.UPDATE_FORMAT_JSON ):
         
         service_id = self._GetServiceId( service_key )
         
@@ -2011,7 +2011,14 @@ class DB( HydrusDB.HydrusDB ):
                     total_content_rows += num_rows
                     
                 
-                update_bytes = update.DumpToNetworkBytes()
+                if update_format == HydrusNetwork.UPDATE_FORMAT_BINARY:
+                    
+                    update_bytes = update.DumpToBinaryNetworkBytes()
+                    
+                else:
+                    
+                    update_bytes = update.DumpToNetworkBytes()
+                    
                 
                 update_hash = hashlib.sha256( update_bytes ).digest()
                 
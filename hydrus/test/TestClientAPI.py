@@ -2292,6 +2292,46 @@ class TestClientAPI( unittest.TestCase ):
         
         self.assertEqual( boned_stats, dict( expected_data ) )
         
+        #
+        
+        path = '/manage_database/get_job_statistics'
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        text = str( data, 'utf-8' )
+        
+        self.assertEqual( response.status, 200 )
+        
+        d = json.loads( text )
+        
+        job_statistics = d[ 'job_statistics' ]
+        
+        self.assertEqual( job_statistics, HG.test_controller.GetDBJobStatistics() )
+        
+        #
+        
+        path = '/manage_database/get_slow_queries'
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        text = str( data, 'utf-8' )
+        
+        self.assertEqual( response.status, 200 )
+        
+        d = json.loads( text )
+        
+        expected_slow_queries = [ { 'timestamp' : timestamp, 'duration' : duration, 'job' : job_name, 'query' : query } for ( timestamp, duration, job_name, query ) in HG.test_controller.GetDBSlowQueries() ]
+        
+        self.assertEqual( d[ 'slow_queries' ], expected_slow_queries )
+        
     
     def _test_manage_pages( self, connection, set_up_permissions ):
         
@@ -2775,6 +2815,131 @@ class TestClientAPI( unittest.TestCase ):
         
         self.assertEqual( response.status, 200 )
         
+        # paged search with a cursor
+        
+        HG.test_controller.ClearReads( 'file_query_ids' )
+        
+        sample_hash_ids = [ 1, 2, 3, 4, 5, 12, 15 ]
+        
+        HG.test_controller.SetRead( 'file_query_ids', list( sample_hash_ids ) )
+        
+        tags = [ 'kino', 'green' ]
+        
+        path = '/get_files/search_files?tags={}&limit=3'.format( urllib.parse.quote( json.dumps( tags ) ) )
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        text = str( data, 'utf-8' )
+        
+        self.assertEqual( response.status, 200 )
+        
+        d = json.loads( text )
+        
+        self.assertEqual( d[ 'file_ids' ], [ 1, 2, 3 ] )
+        self.assertEqual( d[ 'num_results' ], 7 )
+        
+        cursor_hex = d[ 'cursor' ]
+        
+        self.assertEqual( len( HG.test_controller.GetRead( 'file_query_ids' ) ), 1 )
+        
+        path = '/get_files/search_files?cursor={}&offset=3&limit=3'.format( cursor_hex )
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        text = str( data, 'utf-8' )
+        
+        self.assertEqual( response.status, 200 )
+        
+        d = json.loads( text )
+        
+        self.assertEqual( d[ 'file_ids' ], [ 4, 5, 12 ] )
+        self.assertEqual( d[ 'num_results' ], 7 )
+        self.assertEqual( d[ 'cursor' ], cursor_hex )
+        
+        self.assertEqual( HG.test_controller.GetRead( 'file_query_ids' ), [] )
+        
+        # streamed
+        
+        hash_ids_to_hashes = { hash_id : os.urandom( 32 ) for hash_id in sample_hash_ids }
+        
+        HG.test_controller.SetRead( 'hash_ids_to_hashes', hash_ids_to_hashes )
+        
+        path = '/get_files/search_files?cursor={}&offset=3&stream=true&return_hashes=true'.format( cursor_hex )
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        text = str( data, 'utf-8' )
+        
+        self.assertEqual( response.status, 200 )
+        
+        self.assertEqual( response.getheader( 'Transfer-Encoding' ), 'chunked' )
+        
+        d = json.loads( text )
+        
+        self.assertEqual( d[ 'file_ids' ], [ 4, 5, 12, 15 ] )
+        self.assertEqual( d[ 'hashes' ], [ hash_ids_to_hashes[ hash_id ].hex() for hash_id in [ 4, 5, 12, 15 ] ] )
+        self.assertEqual( d[ 'num_results' ], 7 )
+        
+        # another search replaces the last search results, but files from the live cursor are still ok
+        
+        HG.test_controller.SetRead( 'file_query_ids', [ 100, 101 ] )
+        
+        tags = [ 'green' ]
+        
+        path = '/get_files/search_files?tags={}'.format( urllib.parse.quote( json.dumps( tags ) ) )
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        self.assertEqual( response.status, 200 )
+        
+        path = '/get_files/file_metadata?file_ids={}&only_return_identifiers=true'.format( urllib.parse.quote( json.dumps( [ 4, 12 ] ) ) )
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        self.assertEqual( response.status, 200 )
+        
+        path = '/get_files/file_metadata?file_ids={}&only_return_identifiers=true'.format( urllib.parse.quote( json.dumps( [ 4, 7 ] ) ) )
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        self.assertEqual( response.status, 403 )
+        
+        # bad cursor
+        
+        path = '/get_files/search_files?cursor={}'.format( os.urandom( 32 ).hex() )
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        self.assertEqual( response.status, 400 )
+        
     
     def _test_search_files_predicate_parsing( self, connection, set_up_permissions ):
         
@@ -4,16 +4,19 @@ import unittest
 
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
+from hydrus.core import HydrusDBBase
 from hydrus.core import HydrusGlobals as HG
 from hydrus.core import HydrusSerialisable
 from hydrus.core.networking import HydrusNetwork
 
 from hydrus.client import ClientConstants as CC
 from hydrus.client import ClientDefaults
+from hydrus.client import ClientFiles
 from hydrus.client import ClientLocation
 from hydrus.client import ClientSearch
 from hydrus.client import ClientServices
 from hydrus.client.db import ClientDB
+from hydrus.client.db import ClientDBFilesSearch
 from hydrus.client.exporting import ClientExportingFiles
 from hydrus.client.gui.pages import ClientGUIManagement
 from hydrus.client.gui.pages import ClientGUISession
@@ -226,6 +229,134 @@ class TestClientDB( unittest.TestCase ):
         
         self.assertEqual( set( result ), preds )
         
+        # leading wildcards, which go through the reversed subtags cache
+        
+        car_pred = ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_TAG, 'car', count = ClientSearch.PredicateCount.STATICCreateCurrentCount( 1 ) )
+        cars_pred = ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_TAG, 'series:cars', count = ClientSearch.PredicateCount.STATICCreateCurrentCount( 1 ) )
+        ford_pred = ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_TAG, 'maker:ford', count = ClientSearch.PredicateCount.STATICCreateCurrentCount( 1 ) )
+        
+        for i in range( 2 ):
+            
+            result = self._read( 'autocomplete_predicates', ClientTags.TAG_DISPLAY_STORAGE, file_search_context, search_text = '*rs' )
+            
+            self.assertEqual( set( result ), { cars_pred } )
+            
+            result = self._read( 'autocomplete_predicates', ClientTags.TAG_DISPLAY_STORAGE, file_search_context, search_text = '*r' )
+            
+            self.assertEqual( set( result ), { car_pred } )
+            
+            result = self._read( 'autocomplete_predicates', ClientTags.TAG_DISPLAY_STORAGE, file_search_context, search_text = '*a*s' )
+            
+            self.assertEqual( set( result ), { cars_pred } )
+            
+            result = self._read( 'autocomplete_predicates', ClientTags.TAG_DISPLAY_STORAGE, file_search_context, search_text = '*o*' )
+            
+            self.assertEqual( set( result ), { ford_pred } )
+            
+            self._write( 'regenerate_reversed_subtags' )
+            
+        
+        # typing more of a prefix, which filters the cached shorter result
+        
+        def make_pred( tag ):
+            
+            return ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_TAG, tag, count = ClientSearch.PredicateCount.STATICCreateCurrentCount( 1 ) )
+            
+        
+        content_updates = [ HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( tag, ( hash, ) ) ) for tag in ( 'samus aran', 'super samus aran', 'character:samus', 'samurai' ) ]
+        
+        self._write( 'content_updates', { CC.DEFAULT_LOCAL_TAG_SERVICE_KEY : content_updates } )
+        
+        result = self._read( 'autocomplete_predicates', ClientTags.TAG_DISPLAY_STORAGE, file_search_context, search_text = 'sam*' )
+        
+        self.assertEqual( set( result ), { make_pred( 'samus aran' ), make_pred( 'super samus aran' ), make_pred( 'character:samus' ), make_pred( 'samurai' ) } )
+        
+        result = self._read( 'autocomplete_predicates', ClientTags.TAG_DISPLAY_STORAGE, file_search_context, search_text = 'samus*' )
+        
+        self.assertEqual( set( result ), { make_pred( 'samus aran' ), make_pred( 'super samus aran' ), make_pred( 'character:samus' ) } )
+        
+        result = self._read( 'autocomplete_predicates', ClientTags.TAG_DISPLAY_STORAGE, file_search_context, search_text = 'samus a*' )
+        
+        self.assertEqual( set( result ), { make_pred( 'samus aran' ), make_pred( 'super samus aran' ) } )
+        
+        result = self._read( 'autocomplete_predicates', ClientTags.TAG_DISPLAY_STORAGE, file_search_context, search_text = 'samus ax*' )
+        
+        self.assertEqual( result, [] )
+        
+        # a count change means the cached results are stale
+        
+        content_updates = [ HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'samus armour', ( hash, ) ) ) ]
+        content_updates.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_DELETE, ( 'super samus aran', ( hash, ) ) ) )
+        
+        self._write( 'content_updates', { CC.DEFAULT_LOCAL_TAG_SERVICE_KEY : content_updates } )
+        
+        result = self._read( 'autocomplete_predicates', ClientTags.TAG_DISPLAY_STORAGE, file_search_context, search_text = 'samus ar*' )
+        
+        self.assertEqual( set( result ), { make_pred( 'samus aran' ), make_pred( 'samus armour' ) } )
+        
+    
+    def test_coalesced_writes( self ):
+        
+        TestClientDB._clear_db()
+        
+        hash = b'\xadm5\x99\xa6\xc4\x89\xa5u\xeb\x19\xc0&\xfa\xce\x97\xa9\xcdey\xe7G(\xb0\xce\x94\xa6\x01\xd22\xf3\xc3'
+        
+        tags = { 'coalesce test:{}'.format( i ) for i in range( 20 ) }
+        
+        batch_sizes = []
+        
+        original_process_coalesced_write_jobs = TestClientDB._db._ProcessCoalescedWriteJobs
+        
+        def process_coalesced_write_jobs( lane, jobs ):
+            
+            batch_sizes.append( len( jobs ) )
+            
+            original_process_coalesced_write_jobs( lane, jobs )
+            
+        
+        TestClientDB._db._ProcessCoalescedWriteJobs = process_coalesced_write_jobs
+        
+        num_jobs_before = TestClientDB._db.GetJobStatistics()[ 'jobs' ].get( 'write content_updates', { 'num_jobs' : 0 } )[ 'num_jobs' ]
+        
+        try:
+            
+            # hold the db so the writes all queue up behind each other
+            
+            TestClientDB._db.PauseAndDisconnect( True )
+            
+            while TestClientDB._db.IsConnected():
+                
+                time.sleep( 0.1 )
+                
+            
+            for tag in tags:
+                
+                service_keys_to_content_updates = { CC.DEFAULT_LOCAL_TAG_SERVICE_KEY : [ HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( tag, ( hash, ) ) ) ] }
+                
+                TestClientDB._db.Write( 'content_updates', False, service_keys_to_content_updates )
+                
+            
+            TestClientDB._db.PauseAndDisconnect( False )
+            
+            result = self._read( 'filter_existing_tags', CC.DEFAULT_LOCAL_TAG_SERVICE_KEY, tags )
+            
+        finally:
+            
+            TestClientDB._db.PauseAndDisconnect( False )
+            
+            del TestClientDB._db._ProcessCoalescedWriteJobs
+            
+        
+        self.assertEqual( result, tags )
+        
+        self.assertEqual( batch_sizes, [ len( tags ) ] )
+        
+        # each job in the batch gets its own statistics
+        
+        num_jobs_after = TestClientDB._db.GetJobStatistics()[ 'jobs' ][ 'write content_updates' ][ 'num_jobs' ]
+        
+        self.assertEqual( num_jobs_after - num_jobs_before, len( tags ) )
+        
     
     def test_export_folders( self ):
         
@@ -244,6 +375,94 @@ class TestClientDB( unittest.TestCase ):
         self.assertEqual( result.GetName(), export_folder.GetName() )
         
     
+    def test_file_query_cache( self ):
+        
+        TestClientDB._clear_db()
+        
+        hash = b'\xadm5\x99\xa6\xc4\x89\xa5u\xeb\x19\xc0&\xfa\xce\x97\xa9\xcdey\xe7G(\xb0\xce\x94\xa6\x01\xd22\xf3\xc3'
+        
+        location_context = ClientLocation.LocationContext.STATICCreateSimple( CC.LOCAL_FILE_SERVICE_KEY )
+        
+        inbox_search_context = ClientSearch.FileSearchContext( location_context = location_context, predicates = [ ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_SYSTEM_INBOX ) ] )
+        tag_search_context = ClientSearch.FileSearchContext( location_context = location_context, predicates = [ ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_TAG, 'car' ), ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_SYSTEM_LIMIT, 10 ) ] )
+        
+        self.assertEqual( len( self._read( 'file_query_ids', inbox_search_context ) ), 0 )
+        self.assertEqual( len( self._read( 'file_query_ids', tag_search_context ) ), 0 )
+        
+        # the empty results are not kept, so make something to find
+        
+        path = os.path.join( HC.STATIC_DIR, 'hydrus.png' )
+        
+        file_import_options = FileImportOptions.FileImportOptions()
+        file_import_options.SetIsDefault( True )
+        
+        file_import_job = ClientImportFiles.FileImportJob( path, file_import_options )
+        
+        file_import_job.GeneratePreImportHashAndStatus()
+        
+        file_import_job.GenerateInfo()
+        
+        self._write( 'import_file', file_import_job )
+        
+        self.assertEqual( len( self._read( 'file_query_ids', inbox_search_context ) ), 1 )
+        
+        cache_key = ClientDBFilesSearch.GetFileSearchContextCacheKey( inbox_search_context )
+        
+        self.assertIsNotNone( TestClientDB._db._file_search_results_cache.GetResult( cache_key ) )
+        
+        # predicate order does not matter
+        
+        self.assertEqual( ClientDBFilesSearch.GetFileSearchContextCacheKey( tag_search_context ), ClientDBFilesSearch.GetFileSearchContextCacheKey( ClientSearch.FileSearchContext( location_context = location_context, predicates = list( reversed( tag_search_context.GetPredicates() ) ) ) ) )
+        
+        # content updates patch what is cached
+        
+        service_keys_to_content_updates = { CC.DEFAULT_LOCAL_TAG_SERVICE_KEY : ( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'car', ( hash, ) ) ), ) }
+        
+        self._write( 'content_updates', service_keys_to_content_updates )
+        
+        self.assertEqual( len( self._read( 'file_query_ids', tag_search_context ) ), 1 )
+        
+        service_keys_to_content_updates = { CC.COMBINED_LOCAL_FILE_SERVICE_KEY : ( HydrusData.ContentUpdate( HC.CONTENT_TYPE_FILES, HC.CONTENT_UPDATE_ARCHIVE, ( hash, ) ), ) }
+        
+        self._write( 'content_updates', service_keys_to_content_updates )
+        
+        self.assertIsNotNone( TestClientDB._db._file_search_results_cache.GetResult( cache_key ) )
+        
+        self.assertEqual( len( self._read( 'file_query_ids', inbox_search_context ) ), 0 )
+        
+        service_keys_to_content_updates = { CC.COMBINED_LOCAL_FILE_SERVICE_KEY : ( HydrusData.ContentUpdate( HC.CONTENT_TYPE_FILES, HC.CONTENT_UPDATE_INBOX, ( hash, ) ), ) }
+        
+        self._write( 'content_updates', service_keys_to_content_updates )
+        
+        self.assertEqual( len( self._read( 'file_query_ids', inbox_search_context ) ), 1 )
+        
+        service_keys_to_content_updates = { CC.DEFAULT_LOCAL_TAG_SERVICE_KEY : ( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_DELETE, ( 'car', ( hash, ) ) ), ) }
+        
+        self._write( 'content_updates', service_keys_to_content_updates )
+        
+        self.assertEqual( len( self._read( 'file_query_ids', tag_search_context ) ), 0 )
+        
+        # file maintenance results patch it too
+        
+        no_exif_search_context = ClientSearch.FileSearchContext( location_context = location_context, predicates = [ ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_SYSTEM_HAS_EXIF, False ) ] )
+        
+        self.assertEqual( len( self._read( 'file_query_ids', no_exif_search_context ) ), 1 )
+        
+        self._write( 'file_maintenance_clear_jobs', [ ( hash, ClientFiles.REGENERATE_FILE_DATA_JOB_FILE_HAS_EXIF, True ) ] )
+        
+        self.assertIsNotNone( TestClientDB._db._file_search_results_cache.GetResult( cache_key ) )
+        
+        self.assertEqual( len( self._read( 'file_query_ids', no_exif_search_context ) ), 0 )
+        
+        # anything we do not understand clears it
+        
+        self._write( 'regenerate_local_tag_cache' )
+        
+        self.assertIsNone( TestClientDB._db._file_search_results_cache.GetResult( cache_key ) )
+        
+        self.assertEqual( len( self._read( 'file_query_ids', inbox_search_context ) ), 1 )
+        
+    
     def test_file_query_ids( self ):
         
         TestClientDB._clear_db()
@@ -738,6 +957,75 @@ class TestClientDB( unittest.TestCase ):
         run_system_predicate_tests( tests )
         
     
+    def test_file_query_plan( self ):
+        
+        TestClientDB._clear_db()
+        
+        hash = b'\xadm5\x99\xa6\xc4\x89\xa5u\xeb\x19\xc0&\xfa\xce\x97\xa9\xcdey\xe7G(\xb0\xce\x94\xa6\x01\xd22\xf3\xc3'
+        
+        path = os.path.join( HC.STATIC_DIR, 'hydrus.png' )
+        
+        file_import_options = FileImportOptions.FileImportOptions()
+        file_import_options.SetIsDefault( True )
+        
+        file_import_job = ClientImportFiles.FileImportJob( path, file_import_options )
+        
+        file_import_job.GeneratePreImportHashAndStatus()
+        
+        file_import_job.GenerateInfo()
+        
+        self._write( 'import_file', file_import_job )
+        
+        service_keys_to_content_updates = { CC.DEFAULT_LOCAL_TAG_SERVICE_KEY : ( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'car', ( hash, ) ) ), ) }
+        
+        self._write( 'content_updates', service_keys_to_content_updates )
+        
+        location_context = ClientLocation.LocationContext.STATICCreateSimple( CC.LOCAL_FILE_SERVICE_KEY )
+        
+        #
+        
+        predicates = []
+        
+        predicates.append( ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_SYSTEM_MIME, ( HC.IMAGE_PNG, ) ) )
+        predicates.append( ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_SYSTEM_INBOX ) )
+        predicates.append( ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_TAG, 'car' ) )
+        
+        search_context = ClientSearch.FileSearchContext( location_context = location_context, predicates = predicates )
+        
+        search_plan = self._read( 'file_query_plan', search_context )
+        
+        self.assertEqual( [ ( step_type, estimate ) for ( step_type, step_value, estimate ) in search_plan ], [ ( 'inbox', 1 ), ( 'tag', 1 ), ( 'files_info', None ) ] )
+        
+        self.assertEqual( len( self._read( 'file_query_ids', search_context ) ), 1 )
+        
+        # a tag nothing has goes first, and ends the search
+        
+        predicates.append( ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_TAG, 'lorry' ) )
+        
+        search_context = ClientSearch.FileSearchContext( location_context = location_context, predicates = predicates )
+        
+        search_plan = self._read( 'file_query_plan', search_context )
+        
+        self.assertEqual( search_plan[0], ( 'tag', 'lorry', 0 ) )
+        
+        self.assertEqual( len( self._read( 'file_query_ids', search_context ) ), 0 )
+        
+        # the file info preds are probed against the best of the rest
+        
+        predicates = []
+        
+        predicates.append( ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_SYSTEM_MIME, ( HC.IMAGE_JPEG, ) ) )
+        predicates.append( ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_SYSTEM_INBOX ) )
+        
+        search_context = ClientSearch.FileSearchContext( location_context = location_context, predicates = predicates )
+        
+        search_plan = self._read( 'file_query_plan', search_context )
+        
+        self.assertEqual( [ ( step_type, estimate ) for ( step_type, step_value, estimate ) in search_plan ], [ ( 'files_info', 0 ), ( 'inbox', 1 ) ] )
+        
+        self.assertEqual( len( self._read( 'file_query_ids', search_context ) ), 0 )
+        
+    
     def test_file_system_predicates( self ):
         
         TestClientDB._clear_db()
@@ -1340,6 +1628,71 @@ class TestClientDB( unittest.TestCase ):
             
         
     
+    def test_job_statistics( self ):
+        
+        # a job hands back its result before its stats are recorded, so the last job here is just to make sure the others are done
+        
+        self._write( 'content_updates', {} )
+        self._read( 'options' )
+        self._read( 'options' )
+        
+        job_statistics = TestClientDB._db.GetJobStatistics()
+        
+        lanes = job_statistics[ 'lanes' ]
+        jobs = job_statistics[ 'jobs' ]
+        
+        self.assertEqual( set( lanes.keys() ), { 'interactive read', 'interactive write', 'background' } )
+        
+        for lane_dict in lanes.values():
+            
+            self.assertEqual( lane_dict[ 'num_jobs_waiting' ], 0 )
+            
+        
+        self.assertGreater( lanes[ 'interactive read' ][ 'num_jobs' ], 0 )
+        self.assertGreater( lanes[ 'interactive write' ][ 'num_jobs' ], 0 )
+        
+        self.assertIn( 'read options', jobs )
+        self.assertIn( 'write content_updates', jobs )
+        
+        self.assertGreaterEqual( jobs[ 'read options' ][ 'max_wait_time' ], 0.0 )
+        self.assertGreaterEqual( jobs[ 'read options' ][ 'total_execution_time' ], jobs[ 'read options' ][ 'max_execution_time' ] )
+        
+        for job_dict in jobs.values():
+            
+            self.assertEqual( sum( ( count for ( upper_bound, count ) in job_dict[ 'execution_time_histogram' ] ) ), job_dict[ 'num_jobs' ] )
+            self.assertEqual( sum( ( count for ( upper_bound, count ) in job_dict[ 'wait_time_histogram' ] ) ), job_dict[ 'num_jobs' ] )
+            
+        
+        #
+        
+        old_threshold = HydrusDBBase.slow_query_log.GetThreshold()
+        
+        try:
+            
+            HydrusDBBase.slow_query_log.Clear()
+            HydrusDBBase.slow_query_log.SetThreshold( 0.0 )
+            
+            file_search_context = ClientSearch.FileSearchContext( location_context = ClientLocation.LocationContext.STATICCreateSimple( CC.LOCAL_FILE_SERVICE_KEY ), tag_context = ClientSearch.TagContext() )
+            
+            self._read( 'file_system_predicates', file_search_context )
+            
+            slow_queries = HydrusDBBase.slow_query_log.GetSlowQueries()
+            
+        finally:
+            
+            HydrusDBBase.slow_query_log.SetThreshold( old_threshold )
+            
+        
+        self.assertGreater( len( slow_queries ), 0 )
+        
+        for ( timestamp, duration, job_name, query ) in slow_queries:
+            
+            self.assertGreaterEqual( duration, 0.0 )
+            
+        
+        self.assertIn( 'read file_system_predicates', { job_name for ( timestamp, duration, job_name, query ) in slow_queries } )
+        
+    
     def test_hash_status( self ):
         
         TestClientDB._clear_db()
@@ -1545,6 +1898,73 @@ class TestClientDB( unittest.TestCase ):
         self.assertEqual( mr_num_words, None )
         
     
+    def test_media_results_lazy( self ):
+        
+        TestClientDB._clear_db()
+        
+        path = os.path.join( HC.STATIC_DIR, 'hydrus.png' )
+        
+        file_import_options = FileImportOptions.FileImportOptions()
+        file_import_options.SetIsDefault( True )
+        
+        file_import_job = ClientImportFiles.FileImportJob( path, file_import_options )
+        
+        file_import_job.GeneratePreImportHashAndStatus()
+        
+        file_import_job.GenerateInfo()
+        
+        self._write( 'import_file', file_import_job )
+        
+        hash = file_import_job.GetHash()
+        
+        #
+        
+        ( media_result, ) = self._read( 'media_results', ( hash, ), lazy = True )
+        
+        self.assertFalse( media_result.IsLoaded() )
+        
+        self.assertEqual( media_result.GetSize(), 5270 )
+        self.assertEqual( media_result.GetMime(), HC.IMAGE_PNG )
+        self.assertEqual( media_result.GetInbox(), True )
+        
+        self.assertFalse( media_result.IsLoaded() )
+        
+        # an update to something we have not loaded yet is picked up when we do load it
+        
+        service_keys_to_content_updates = { CC.DEFAULT_LOCAL_TAG_SERVICE_KEY : ( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'lazy', ( hash, ) ) ), ) }
+        
+        self._write( 'content_updates', service_keys_to_content_updates )
+        
+        self.assertEqual( media_result.GetTagsManager().GetCurrent( CC.DEFAULT_LOCAL_TAG_SERVICE_KEY, ClientTags.TAG_DISPLAY_STORAGE ), { 'lazy' } )
+        
+        self.assertTrue( media_result.IsLoaded() )
+        
+        self.assertEqual( media_result.GetNotesManager().GetNumNotes(), 0 )
+        
+        # a normal read of a cached lazy result fills it in first
+        
+        path = os.path.join( HC.STATIC_DIR, 'boned.jpg' )
+        
+        file_import_job = ClientImportFiles.FileImportJob( path, file_import_options )
+        
+        file_import_job.GeneratePreImportHashAndStatus()
+        
+        file_import_job.GenerateInfo()
+        
+        self._write( 'import_file', file_import_job )
+        
+        hash = file_import_job.GetHash()
+        
+        ( lazy_media_result, ) = self._read( 'media_results', ( hash, ), lazy = True )
+        
+        self.assertFalse( lazy_media_result.IsLoaded() )
+        
+        ( media_result, ) = self._read( 'media_results', ( hash, ) )
+        
+        self.assertIs( media_result, lazy_media_result )
+        self.assertTrue( media_result.IsLoaded() )
+        
+    
     def test_nums_pending( self ):
         
         TestClientDB._clear_db()
@@ -10,6 +10,7 @@ from hydrus.client import ClientConstants as CC
 from hydrus.client import ClientLocation
 from hydrus.client import ClientSearch
 from hydrus.client.db import ClientDB
+from hydrus.client.db import ClientDBSimilarFiles
 from hydrus.client.importing import ClientImportFiles
 from hydrus.client.importing.options import FileImportOptions
 
@@ -1087,3 +1088,52 @@ class TestClientDBDuplicates( unittest.TestCase ):
         self._test_dissolve()
         
     
+
+class TestPerceptualHashSearchIndex( unittest.TestCase ):
+    
+    def test_search( self ):
+        
+        perceptual_hash_ids_to_perceptual_hashes = { i : os.urandom( 8 ) for i in range( 1, 501 ) }
+        
+        index = ClientDBSimilarFiles.PerceptualHashSearchIndex( list( perceptual_hash_ids_to_perceptual_hashes.items() ) )
+        
+        # some pending changes on top of the consolidated array
+        
+        perceptual_hash_ids_to_perceptual_hashes[ 501 ] = os.urandom( 8 )
+        perceptual_hash_ids_to_perceptual_hashes[ 3 ] = os.urandom( 8 )
+        
+        index.AddPerceptualHash( 501, perceptual_hash_ids_to_perceptual_hashes[ 501 ] )
+        index.AddPerceptualHash( 3, perceptual_hash_ids_to_perceptual_hashes[ 3 ] )
+        
+        del perceptual_hash_ids_to_perceptual_hashes[ 7 ]
+        
+        index.RemovePerceptualHashes( [ 7 ] )
+        
+        self.assertEqual( index.GetNumPerceptualHashes(), 500 )
+        
+        for search_perceptual_hash in [ perceptual_hash_ids_to_perceptual_hashes[ 1 ], perceptual_hash_ids_to_perceptual_hashes[ 3 ], os.urandom( 8 ) ]:
+            
+            for max_hamming_distance in ( 0, 8, 24, 64 ):
+                
+                expected = { ( perceptual_hash_id, HydrusData.Get64BitHammingDistance( search_perceptual_hash, perceptual_hash ) ) for ( perceptual_hash_id, perceptual_hash ) in perceptual_hash_ids_to_perceptual_hashes.items() }
+                
+                expected = { ( perceptual_hash_id, distance ) for ( perceptual_hash_id, distance ) in expected if distance <= max_hamming_distance }
+                
+                self.assertEqual( set( index.Search( search_perceptual_hash, max_hamming_distance ) ), expected )
+                
+            
+        
+        search_perceptual_hashes = [ perceptual_hash_ids_to_perceptual_hashes[ 1 ], perceptual_hash_ids_to_perceptual_hashes[ 3 ], os.urandom( 8 ) ]
+        
+        for max_hamming_distance in ( 0, 8, 24, 64 ):
+            
+            expected = { ( search_index, perceptual_hash_id, distance ) for ( search_index, search_perceptual_hash ) in enumerate( search_perceptual_hashes ) for ( perceptual_hash_id, distance ) in index.Search( search_perceptual_hash, max_hamming_distance ) }
+            
+            self.assertEqual( set( index.SearchMany( search_perceptual_hashes, max_hamming_distance ) ), expected )
+            
+        
+        empty_index = ClientDBSimilarFiles.PerceptualHashSearchIndex( [] )
+        
+        self.assertEqual( empty_index.Search( os.urandom( 8 ), 64 ), [] )
+        
+    
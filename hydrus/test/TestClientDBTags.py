@@ -873,14 +873,15 @@ class TestClientDBTags( unittest.TestCase ):
         
         # let's do it a bunch of times in different orders with different structures
         
-        for other_service_key in other_service_keys:
+        for ( i, other_service_key ) in enumerate( other_service_keys ):
             
             self._write( 'content_updates', { other_service_key : get_pre_mapping_content_updates() } )
             
             content_updates = get_display_content_updates_in_random_order()
             
-            # let's test a mix of atomic and complete sync
+            # let's test a mix of atomic and complete sync, and every other service gets the bulk sync
             block_size = random.choice( [ 1, 3, 5 ] )
+            bulk_sync = i % 2 == 1
             
             for block_of_content_updates in HydrusData.SplitListIntoChunks( content_updates, block_size ):
                 
@@ -890,7 +891,14 @@ class TestClientDBTags( unittest.TestCase ):
                 
                 while still_work_to_do:
                     
-                    still_work_to_do = self._write( 'sync_tag_display_maintenance', other_service_key, 1 )
+                    if bulk_sync:
+                        
+                        ( still_work_to_do, num_rows_synced ) = self._write( 'sync_tag_display_maintenance_bulk', other_service_key, 1 )
+                        
+                    else:
+                        
+                        still_work_to_do = self._write( 'sync_tag_display_maintenance', other_service_key, 1 )
+                        
                     
                 
             
@@ -939,6 +947,136 @@ class TestClientDBTags( unittest.TestCase ):
             
         
     
+    def test_display_pairs_sync_bulk( self ):
+        
+        # the bulk sync splits the diff into chains and splits big chains into blocks, so let's check several chains and split chains end up where the normal sync does
+        
+        self._clear_db()
+        
+        tags_to_hashes = {}
+        
+        tags = [ 'a1', 'a2', 'b1', 'b' ] + [ 'c {}'.format( i ) for i in range( 10 ) ]
+        
+        for tag in tags:
+            
+            tags_to_hashes[ tag ] = os.urandom( 32 )
+            
+        
+        mapping_content_updates = [ HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( tag, ( hash, ) ) ) for ( tag, hash ) in tags_to_hashes.items() ]
+        
+        content_updates_1 = []
+        
+        content_updates_1.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_TAG_SIBLINGS, HC.CONTENT_UPDATE_ADD, ( 'a1', 'a' ) ) )
+        content_updates_1.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_TAG_SIBLINGS, HC.CONTENT_UPDATE_ADD, ( 'a2', 'a' ) ) )
+        content_updates_1.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_TAG_PARENTS, HC.CONTENT_UPDATE_ADD, ( 'a', 'a parent' ) ) )
+        content_updates_1.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_TAG_SIBLINGS, HC.CONTENT_UPDATE_ADD, ( 'b1', 'b' ) ) )
+        content_updates_1.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_TAG_PARENTS, HC.CONTENT_UPDATE_ADD, ( 'b', 'b parent 1' ) ) )
+        content_updates_1.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_TAG_PARENTS, HC.CONTENT_UPDATE_ADD, ( 'b', 'b parent 2' ) ) )
+        content_updates_1.extend( ( HydrusData.ContentUpdate( HC.CONTENT_TYPE_TAG_SIBLINGS, HC.CONTENT_UPDATE_ADD, ( 'c {}'.format( i ), 'c' ) ) for i in range( 10 ) ) )
+        content_updates_1.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_TAG_PARENTS, HC.CONTENT_UPDATE_ADD, ( 'c', 'c parent' ) ) )
+        
+        # this removes a sibling from one chain and merges two others
+        
+        content_updates_2 = []
+        
+        content_updates_2.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_TAG_SIBLINGS, HC.CONTENT_UPDATE_DELETE, ( 'a2', 'a' ) ) )
+        content_updates_2.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_TAG_PARENTS, HC.CONTENT_UPDATE_ADD, ( 'b parent 1', 'top' ) ) )
+        content_updates_2.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_TAG_PARENTS, HC.CONTENT_UPDATE_ADD, ( 'c', 'b' ) ) )
+        
+        def get_display_tags( service_key ):
+            
+            media_results = self._read( 'media_results', list( tags_to_hashes.values() ) )
+            
+            hashes_to_media_results = { media_result.GetHash() : media_result for media_result in media_results }
+            
+            return { tag : hashes_to_media_results[ hash ].GetTagsManager().GetCurrent( service_key, ClientTags.TAG_DISPLAY_ACTUAL ) for ( tag, hash ) in tags_to_hashes.items() }
+            
+        
+        def sync_bulk( service_key ):
+            
+            num_jobs = 0
+            
+            still_work_to_do = True
+            
+            while still_work_to_do:
+                
+                # no work time, so each call does one block
+                ( still_work_to_do, num_rows_synced ) = self._write( 'sync_tag_display_maintenance_bulk', service_key, 0 )
+                
+                self.assertLessEqual( num_rows_synced, TestClientDBTags._db.TAG_DISPLAY_BULK_SYNC_MAX_ROWS_PER_JOB )
+                
+                num_jobs += 1
+                
+            
+            self.assertFalse( self._write( 'sync_tag_display_maintenance', service_key, 1 ) )
+            
+            return num_jobs
+            
+        
+        for service_key in ( self._my_service_key, self._processing_service_key ):
+            
+            self._write( 'content_updates', { service_key : mapping_content_updates } )
+            self._write( 'content_updates', { service_key : content_updates_1 } )
+            
+        
+        try:
+            
+            # first by row count, the c chain has eleven rows
+            
+            TestClientDBTags._db.TAG_DISPLAY_BULK_SYNC_MAX_ROWS_PER_JOB = 3
+            
+            num_jobs = sync_bulk( self._my_service_key )
+            
+            self.assertEqual( num_jobs, 1 + 1 + 4 )
+            
+            self._sync_display()
+            
+            display_tags = get_display_tags( self._my_service_key )
+            
+            self.assertEqual( display_tags, get_display_tags( self._processing_service_key ) )
+            
+            self.assertEqual( display_tags[ 'a2' ], { 'a', 'a parent' } )
+            self.assertEqual( display_tags[ 'b1' ], { 'b', 'b parent 1', 'b parent 2' } )
+            self.assertEqual( display_tags[ 'c 7' ], { 'c', 'c parent' } )
+            
+            for service_key in ( self._my_service_key, self._processing_service_key ):
+                
+                self._write( 'content_updates', { service_key : content_updates_2 } )
+                
+            
+            # and now by weight, so every row is a block of its own
+            
+            del TestClientDBTags._db.TAG_DISPLAY_BULK_SYNC_MAX_ROWS_PER_JOB
+            
+            TestClientDBTags._db.TAG_DISPLAY_BULK_SYNC_MAX_WEIGHT_PER_JOB = 1
+            
+            num_jobs = sync_bulk( self._my_service_key )
+            
+            self.assertGreater( num_jobs, 3 )
+            
+            self._sync_display()
+            
+            display_tags = get_display_tags( self._my_service_key )
+            
+            self.assertEqual( display_tags, get_display_tags( self._processing_service_key ) )
+            
+            self.assertEqual( display_tags[ 'a1' ], { 'a', 'a parent' } )
+            self.assertEqual( display_tags[ 'a2' ], { 'a2' } )
+            self.assertEqual( display_tags[ 'b' ], { 'b', 'b parent 1', 'b parent 2', 'top' } )
+            self.assertEqual( display_tags[ 'c 7' ], { 'c', 'c parent', 'b', 'b parent 1', 'b parent 2', 'top' } )
+            
+        finally:
+            
+            for name in ( 'TAG_DISPLAY_BULK_SYNC_MAX_ROWS_PER_JOB', 'TAG_DISPLAY_BULK_SYNC_MAX_WEIGHT_PER_JOB' ):
+                
+                if name in TestClientDBTags._db.__dict__:
+                    
+                    delattr( TestClientDBTags._db, name )
+                    
+                
+            
+        
+    
     def test_display_pairs_lookup_bonkers( self ):
         
         self._clear_db()
@@ -3,6 +3,7 @@ import shutil
 import unittest
 
 from hydrus.core import HydrusConstants as HC
+from hydrus.core import HydrusFileHandling
 from hydrus.core import HydrusGlobals as HG
 from hydrus.core import HydrusPaths
 from hydrus.core import HydrusTemp
@@ -78,3 +79,92 @@ class TestDaemons( unittest.TestCase ):
             
         
     
+    def test_import_folders_daemon_parallel( self ):
+        
+        test_dir = HydrusTemp.GetTempDir()
+        
+        num_workers = HG.test_controller.new_options.GetInteger( 'file_import_num_workers' )
+        
+        try:
+            
+            HG.test_controller.new_options.SetInteger( 'file_import_num_workers', 3 )
+            
+            HG.test_controller.SetRead( 'hash_status', ClientImportFiles.FileImportStatus.STATICGetUnknownStatus() )
+            
+            HydrusPaths.MakeSureDirectoryExists( test_dir )
+            
+            paths_to_hashes = {}
+            
+            for filename in ( 'muh_apng.png', 'muh_gif.gif', 'muh_jpg.jpg', 'muh_png.png' ):
+                
+                path = os.path.join( test_dir, filename )
+                
+                HydrusPaths.MirrorFile( os.path.join( HC.STATIC_DIR, 'testing', filename ), path )
+                
+                hash = HydrusFileHandling.GetHashFromPath( path )
+                
+                paths_to_hashes[ path ] = hash
+                
+                # each job gets its own status object, like the real db gives
+                HG.test_controller.SetParamRead( 'hash_status', ( 'sha256', hash ), ClientImportFiles.FileImportStatus.STATICGetUnknownStatus() )
+                
+            
+            with open( os.path.join( test_dir, 'broken' ), 'wb' ) as f: f.write( b'blarg' )
+            
+            #
+            
+            actions = {}
+            
+            actions[ CC.STATUS_SUCCESSFUL_AND_NEW ] = CC.IMPORT_FOLDER_IGNORE
+            actions[ CC.STATUS_SUCCESSFUL_BUT_REDUNDANT ] = CC.IMPORT_FOLDER_IGNORE
+            actions[ CC.STATUS_DELETED ] = CC.IMPORT_FOLDER_IGNORE
+            actions[ CC.STATUS_ERROR ] = CC.IMPORT_FOLDER_IGNORE
+            
+            import_folder = ClientImportLocal.ImportFolder( 'imp', path = test_dir, actions = actions )
+            
+            HG.test_controller.SetRead( 'serialisable_names', [ 'imp' ] )
+            HG.test_controller.SetRead( 'serialisable_named', import_folder )
+            
+            HG.test_controller.ClearWrites( 'import_file' )
+            HG.test_controller.ClearWrites( 'serialisable' )
+            
+            ClientDaemons.DAEMONCheckImportFolders()
+            
+            import_file = HG.test_controller.GetWrite( 'import_file' )
+            
+            [ ( ( updated_import_folder, ), empty_dict ) ] = HG.test_controller.GetWrite( 'serialisable' )
+            
+            file_seeds = updated_import_folder.GetFileSeedCache().GetFileSeeds()
+            
+            # the files were prepared on several threads, but they hit the db in file seed order
+            
+            expected_hashes = [ paths_to_hashes[ file_seed.file_seed_data ] for file_seed in file_seeds if file_seed.file_seed_data in paths_to_hashes ]
+            written_hashes = [ file_import_job.GetHash() for ( ( file_import_job, ), kwargs ) in import_file ]
+            
+            self.assertEqual( len( written_hashes ), 4 )
+            self.assertEqual( written_hashes, expected_hashes )
+            
+            for file_seed in file_seeds:
+                
+                if file_seed.file_seed_data in paths_to_hashes:
+                    
+                    self.assertEqual( file_seed.status, CC.STATUS_SUCCESSFUL_AND_NEW )
+                    self.assertEqual( file_seed.GetHash(), paths_to_hashes[ file_seed.file_seed_data ] )
+                    
+                else:
+                    
+                    self.assertEqual( file_seed.status, CC.STATUS_ERROR )
+                    
+                
+            
+            
+        finally:
+            
+            HG.test_controller.new_options.SetInteger( 'file_import_num_workers', num_workers )
+            
+            HG.test_controller.ClearParamReads( 'hash_status' )
+            
+            shutil.rmtree( test_dir )
+            
+        
+    
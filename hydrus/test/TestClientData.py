@@ -1,6 +1,225 @@
+import os
 import unittest
 
 from hydrus.core import HydrusConstants as HC
+from hydrus.core import HydrusData
 from hydrus.core import HydrusExceptions
+from hydrus.core import HydrusGlobals as HG
+from hydrus.core import HydrusPaths
+from hydrus.core import HydrusTemp
 
+from hydrus.client import ClientCaches
 from hydrus.client import ClientConstants as CC
+from hydrus.client import ClientThumbnailPacks
+from hydrus.client.media import ClientMedia
+
+class FakeCacheData( object ):
+    
+    def __init__( self, num_bytes ):
+        
+        self._num_bytes = num_bytes
+        
+    
+    def GetEstimatedMemoryFootprint( self ):
+        
+        return self._num_bytes
+        
+    
+
+class TestDataCache( unittest.TestCase ):
+    
+    def test_data_cache( self ):
+        
+        data_cache = ClientCaches.DataCache( HG.test_controller, 'test cache', 100 )
+        
+        data_cache.AddData( 'a', FakeCacheData( 40 ) )
+        data_cache.AddData( 'b', FakeCacheData( 40 ) )
+        
+        self.assertEqual( data_cache.GetStatistics()[ 'estimated_memory_footprint' ], 80 )
+        
+        # touching 'a' makes 'b' the least recently used
+        
+        self.assertIsNotNone( data_cache.GetIfHasData( 'a' ) )
+        
+        data_cache.AddData( 'c', FakeCacheData( 40 ) )
+        
+        self.assertTrue( data_cache.HasData( 'a' ) )
+        self.assertFalse( data_cache.HasData( 'b' ) )
+        self.assertTrue( data_cache.HasData( 'c' ) )
+        
+        self.assertIsNone( data_cache.GetIfHasData( 'b' ) )
+        
+        data_cache.DeleteData( 'a' )
+        
+        statistics = data_cache.GetStatistics()
+        
+        self.assertEqual( statistics[ 'num_items' ], 1 )
+        self.assertEqual( statistics[ 'estimated_memory_footprint' ], 40 )
+        self.assertEqual( statistics[ 'num_hits' ], 1 )
+        self.assertEqual( statistics[ 'num_misses' ], 1 )
+        self.assertEqual( statistics[ 'num_evictions' ], 1 )
+        
+        # an item bigger than the whole cache still goes in, but only once everything else is gone
+        
+        data_cache.AddData( 'd', FakeCacheData( 150 ) )
+        
+        self.assertFalse( data_cache.HasData( 'c' ) )
+        self.assertTrue( data_cache.HasData( 'd' ) )
+        
+        data_cache.SetCacheSizeAndTimeout( 50, 1200 )
+        
+        self.assertEqual( data_cache.GetStatistics()[ 'num_items' ], 0 )
+        self.assertEqual( data_cache.GetStatistics()[ 'estimated_memory_footprint' ], 0 )
+        
+    
+
+class TestPackedThumbnailStore( unittest.TestCase ):
+    
+    def test_packed_thumbnail_store( self ):
+        
+        test_dir = HydrusTemp.GetTempDir()
+        backup_dir = HydrusTemp.GetTempDir()
+        
+        try:
+            
+            self.assertFalse( ClientThumbnailPacks.PackedThumbnailStoreExists( test_dir ) )
+            
+            store = ClientThumbnailPacks.PackedThumbnailStore( test_dir )
+            
+            self.assertTrue( ClientThumbnailPacks.PackedThumbnailStoreExists( test_dir ) )
+            
+            hashes_to_thumbnail_bytes = { HydrusData.GenerateKey() : os.urandom( 1000 + i ) for i in range( 50 ) }
+            
+            store.AddThumbnails( list( hashes_to_thumbnail_bytes.items() ) )
+            
+            ( hash, ) = list( hashes_to_thumbnail_bytes.keys() )[ : 1 ]
+            
+            self.assertTrue( store.HasThumbnail( hash ) )
+            self.assertEqual( store.GetThumbnailBytes( hash ), hashes_to_thumbnail_bytes[ hash ] )
+            
+            # overwriting appends and repoints the index
+            
+            hashes_to_thumbnail_bytes[ hash ] = os.urandom( 500 )
+            
+            store.AddThumbnail( hash, hashes_to_thumbnail_bytes[ hash ] )
+            
+            self.assertEqual( store.GetManyThumbnailBytes( list( hashes_to_thumbnail_bytes.keys() ) ), hashes_to_thumbnail_bytes )
+            
+            self.assertTrue( store.DeleteThumbnail( hash ) )
+            self.assertFalse( store.DeleteThumbnail( hash ) )
+            
+            self.assertIsNone( store.GetThumbnailBytes( hash ) )
+            self.assertEqual( store.GetNumThumbnails(), 49 )
+            
+            store.Close()
+            
+            # and it all comes back after a reload
+            
+            store = ClientThumbnailPacks.PackedThumbnailStore( test_dir )
+            
+            del hashes_to_thumbnail_bytes[ hash ]
+            
+            self.assertEqual( set( store.GetHashes() ), set( hashes_to_thumbnail_bytes.keys() ) )
+            self.assertEqual( store.GetManyThumbnailBytes( list( hashes_to_thumbnail_bytes.keys() ) ), hashes_to_thumbnail_bytes )
+            
+            # single adds wait for a batch commit, but are readable straight away
+            
+            ( pending_hash, pending_thumbnail_bytes ) = ( HydrusData.GenerateKey(), os.urandom( 800 ) )
+            
+            store.AddThumbnail( pending_hash, pending_thumbnail_bytes )
+            
+            self.assertTrue( store.HasThumbnail( pending_hash ) )
+            self.assertEqual( store.GetThumbnailBytes( pending_hash ), pending_thumbnail_bytes )
+            
+            hashes_to_thumbnail_bytes[ pending_hash ] = pending_thumbnail_bytes
+            
+            # a backup is a consistent copy, even with a write pending
+            
+            ( replaced_hash, ) = list( hashes_to_thumbnail_bytes.keys() )[ : 1 ]
+            
+            hashes_to_thumbnail_bytes[ replaced_hash ] = os.urandom( 600 )
+            
+            store.AddThumbnail( replaced_hash, hashes_to_thumbnail_bytes[ replaced_hash ] )
+            
+            store.Backup( backup_dir )
+            
+            store.Close()
+            
+            backup_store = ClientThumbnailPacks.PackedThumbnailStore( backup_dir )
+            
+            self.assertEqual( backup_store.GetManyThumbnailBytes( list( hashes_to_thumbnail_bytes.keys() ) ), hashes_to_thumbnail_bytes )
+            self.assertEqual( backup_store.GetNumThumbnails(), len( hashes_to_thumbnail_bytes ) )
+            
+            backup_store.DeleteThumbnails( [ pending_hash, replaced_hash ] )
+            
+            self.assertEqual( backup_store.GetNumThumbnails(), len( hashes_to_thumbnail_bytes ) - 2 )
+            
+            backup_store.Close()
+            
+        finally:
+            
+            HydrusPaths.DeletePath( test_dir )
+            HydrusPaths.DeletePath( backup_dir )
+            
+        
+    
+class TestSortedList( unittest.TestCase ):
+    
+    def _CheckList( self, sorted_list, expected ):
+        
+        self.assertEqual( list( sorted_list ), expected )
+        
+        for ( i, item ) in enumerate( expected ):
+            
+            self.assertEqual( sorted_list.index( item ), i )
+            
+        
+    
+    def test_sorted_list( self ):
+        
+        sort_key = lambda s: len( s )
+        
+        sorted_list = ClientMedia.SortedList( [ 'ccc', 'a', 'bb', 'eeeee' ] )
+        
+        sorted_list.sort( sort_key )
+        
+        self._CheckList( sorted_list, [ 'a', 'bb', 'ccc', 'eeeee' ] )
+        
+        # equal keys go after what is already there
+        
+        sorted_list.insert_items( [ 'dd', 'ffffff', '' ] )
+        
+        self._CheckList( sorted_list, [ '', 'a', 'bb', 'dd', 'ccc', 'eeeee', 'ffffff' ] )
+        
+        sorted_list.remove_items( [ 'bb', 'eeeee' ] )
+        
+        self._CheckList( sorted_list, [ '', 'a', 'dd', 'ccc', 'ffffff' ] )
+        
+        self.assertNotIn( 'bb', sorted_list )
+        
+        with self.assertRaises( HydrusExceptions.DataMissing ):
+            
+            sorted_list.index( 'eeeee' )
+            
+        
+        sorted_list.sort( sort_key, reverse = True )
+        
+        self._CheckList( sorted_list, [ 'ffffff', 'ccc', 'dd', 'a', '' ] )
+        
+        sorted_list.insert_items( [ 'gg', 'hhhhhhh' ] )
+        
+        self._CheckList( sorted_list, [ 'hhhhhhh', 'ffffff', 'ccc', 'dd', 'gg', 'a', '' ] )
+        
+        # a sort leaves the index map dirty, so the append has to rebuild it before adding to it
+        
+        sorted_list.sort()
+        
+        sorted_list.append_items( [ 'iiii' ] )
+        
+        self._CheckList( sorted_list, [ 'hhhhhhh', 'ffffff', 'ccc', 'dd', 'gg', 'a', '', 'iiii' ] )
+        
+        sorted_list.insert_items( [ 'jjjjj' ] )
+        
+        self._CheckList( sorted_list, [ 'hhhhhhh', 'ffffff', 'jjjjj', 'iiii', 'ccc', 'dd', 'gg', 'a', '' ] )
+        
+    
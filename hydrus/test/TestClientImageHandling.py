@@ -1,7 +1,13 @@
 import os
 import unittest
 
+import cv2
+
 from hydrus.core import HydrusConstants as HC
+from hydrus.core import HydrusData
+from hydrus.core import HydrusFileHandling
+from hydrus.core import HydrusImageHandling
+from hydrus.core import HydrusTemp
 
 from hydrus.client import ClientConstants as CC
 from hydrus.client import ClientImageHandling
@@ -22,3 +28,89 @@ class TestImageHandling( unittest.TestCase ):
         
         self.assertEqual( perceptual_hashes, set( [ b'\xb4M\xc7\xb2M\xcb8\x1c' ] ) )
         
+    
+    def test_reduced_decode( self ):
+        
+        path = os.path.join( HC.STATIC_DIR, 'testing', 'muh_jpg.jpg' )
+        mime = HC.IMAGE_JPEG
+        
+        # 392x498
+        
+        self.assertEqual( HydrusImageHandling.GetDecodeReductionFactor( path, mime, ( 40, 40 ) ), 8 )
+        self.assertEqual( HydrusImageHandling.GetDecodeReductionFactor( path, mime, ( 100, 100 ) ), 2 )
+        self.assertEqual( HydrusImageHandling.GetDecodeReductionFactor( path, mime, ( 256, 256 ) ), 1 )
+        self.assertEqual( HydrusImageHandling.GetDecodeReductionFactor( path, mime, ( 40, 40 ), clip_rect = ( 0, 0, 100, 100 ) ), 2 )
+        self.assertEqual( HydrusImageHandling.GetDecodeReductionFactor( os.path.join( HC.STATIC_DIR, 'hydrus.png' ), HC.IMAGE_PNG, ( 1, 1 ) ), 1 )
+        
+        for force_pil in ( False, True ):
+            
+            self.assertEqual( HydrusImageHandling.GenerateNumPyImage( path, mime, force_pil = force_pil, reduction_factor = 4 ).shape, ( 125, 98, 3 ) )
+            
+        
+        ( clip_rect, target_resolution ) = HydrusImageHandling.GetThumbnailResolutionAndClipRegion( ( 392, 498 ), ( 50, 50 ), HydrusImageHandling.THUMBNAIL_SCALE_TO_FILL )
+        
+        thumbnail_bytes = HydrusFileHandling.GenerateThumbnailBytes( path, target_resolution, mime, None, None, clip_rect = clip_rect )
+        
+        self.assertEqual( HydrusImageHandling.GenerateNumPyImageFromBytes( thumbnail_bytes, HC.IMAGE_JPEG ).shape, ( 50, 50, 3 ) )
+        
+        # muh_jpg is too small to be reduced for phash generation, so blow it up to 2352x2988
+        
+        big_numpy_image = cv2.resize( cv2.imread( path ), ( 392 * 6, 498 * 6 ), interpolation = cv2.INTER_CUBIC )
+        
+        ( os_file_handle, big_path ) = HydrusTemp.GetTempPath( suffix = '.jpg' )
+        
+        try:
+            
+            cv2.imwrite( big_path, big_numpy_image, [ cv2.IMWRITE_JPEG_QUALITY, 95 ] )
+            
+            self.assertEqual( HydrusImageHandling.GetDecodeReductionFactor( big_path, mime, ( 256, 256 ) ), 8 )
+            
+            full_numpy_image = HydrusImageHandling.GenerateNumPyImage( big_path, mime )
+            
+            reduced_perceptual_hashes = ClientImageHandling.GenerateShapePerceptualHashes( big_path, mime )
+            full_perceptual_hashes = ClientImageHandling.GenerateShapePerceptualHashes( big_path, mime, numpy_image = full_numpy_image )
+            
+            self.assertEqual( len( reduced_perceptual_hashes ), len( full_perceptual_hashes ) )
+            
+            for reduced_perceptual_hash in reduced_perceptual_hashes:
+                
+                self.assertLessEqual( min( ( HydrusData.Get64BitHammingDistance( reduced_perceptual_hash, full_perceptual_hash ) for full_perceptual_hash in full_perceptual_hashes ) ), 4 )
+                
+            
+        finally:
+            
+            HydrusTemp.CleanUpTempPath( os_file_handle, big_path )
+            
+        
+    
+    def test_shared_numpy_image( self ):
+        
+        path = os.path.join( HC.STATIC_DIR, 'hydrus.png' )
+        mime = HC.IMAGE_PNG
+        
+        self.assertTrue( HydrusImageHandling.CanShareNumPyImage( mime ) )
+        
+        numpy_image = HydrusImageHandling.GenerateNumPyImage( path, mime )
+        
+        file_info = HydrusFileHandling.GetFileInfo( path, mime = mime, numpy_image = numpy_image )
+        
+        self.assertEqual( file_info, HydrusFileHandling.GetFileInfo( path, mime = mime ) )
+        
+        ( size, mime, width, height, duration, num_frames, has_audio, num_words ) = file_info
+        
+        ( clip_rect, target_resolution ) = HydrusImageHandling.GetThumbnailResolutionAndClipRegion( ( width, height ), ( 150, 125 ), HydrusImageHandling.THUMBNAIL_SCALE_TO_FILL )
+        
+        shared_thumbnail_bytes = HydrusFileHandling.GenerateThumbnailBytes( path, target_resolution, mime, None, None, clip_rect = clip_rect, numpy_image = numpy_image )
+        thumbnail_bytes = HydrusFileHandling.GenerateThumbnailBytes( path, target_resolution, mime, None, None, clip_rect = clip_rect )
+        
+        self.assertEqual( shared_thumbnail_bytes, thumbnail_bytes )
+        
+        self.assertEqual( ClientImageHandling.GenerateShapePerceptualHashes( path, mime, numpy_image = numpy_image ), set( [ b'\xb4M\xc7\xb2M\xcb8\x1c' ] ) )
+        
+        self.assertEqual( HydrusImageHandling.GetImagePixelHash( path, mime, numpy_image = numpy_image ), HydrusImageHandling.GetImagePixelHash( path, mime ) )
+        
+        ( sha256, md5, sha1, sha512 ) = HydrusFileHandling.GetAllHashesFromPath( path )
+        
+        self.assertEqual( sha256, HydrusFileHandling.GetHashFromPath( path ) )
+        self.assertEqual( ( md5, sha1, sha512 ), HydrusFileHandling.GetExtraHashesFromPath( path ) )
+        
@@ -1,5 +1,8 @@
+import http.server
+import threading
 import time
 import unittest
+import urllib.parse
 
 from httmock import all_requests, urlmatch, HTTMock, response
 from mock import patch
@@ -48,6 +51,25 @@ MOCK_HYDRUS_ADDRESS = '123.45.67.89'
 MOCK_HYDRUS_DOMAIN = '123.45.67.89:45871'
 MOCK_HYDRUS_URL = 'https://123.45.67.89:45871/muh_hydrus_command'
 
+class LocalKeepAliveHandler( http.server.BaseHTTPRequestHandler ):
+    
+    protocol_version = 'HTTP/1.1'
+    
+    def do_GET( self ):
+        
+        self.send_response( 200 )
+        self.send_header( 'Content-Type', 'application/octet-stream' )
+        self.send_header( 'Content-Length', str( len( GOOD_RESPONSE ) ) )
+        self.end_headers()
+        
+        self.wfile.write( GOOD_RESPONSE )
+        
+    
+    def log_message( self, *args ):
+        
+        pass
+        
+    
 @urlmatch( netloc = 'wew.lad' )
 def catch_wew_error( url, request ):
     
@@ -550,6 +572,129 @@ class TestNetworkingEngine( unittest.TestCase ):
         engine.Shutdown()
         
     
+    def test_engine_connection_reuse( self ):
+        
+        server = http.server.ThreadingHTTPServer( ( '127.0.0.1', 0 ), LocalKeepAliveHandler )
+        
+        threading.Thread( target = server.serve_forever, daemon = True ).start()
+        
+        try:
+            
+            mock_controller = TestController.MockController()
+            bandwidth_manager = ClientNetworkingBandwidth.NetworkBandwidthManager()
+            session_manager = ClientNetworkingSessions.NetworkSessionManager()
+            domain_manager = ClientNetworkingDomain.NetworkDomainManager()
+            login_manager = ClientNetworkingLogin.NetworkLoginManager()
+            
+            engine = ClientNetworking.NetworkEngine( mock_controller, bandwidth_manager, session_manager, domain_manager, login_manager )
+            
+            mock_controller.CallToThread( engine.MainLoop )
+            
+            url = 'http://127.0.0.1:{}/file'.format( server.server_port )
+            
+            for i in range( 3 ):
+                
+                job = ClientNetworkingJobs.NetworkJob( 'GET', url )
+                
+                engine.AddJob( job )
+                
+                job.WaitUntilDone()
+                
+                self.assertEqual( job.GetContentBytes(), GOOD_RESPONSE )
+                
+            
+            # three jobs on the same domain, one handshake
+            
+            [ ( network_context, pool_size, num_requests, num_connections_opened ) ] = session_manager.GetConnectionPoolStats()
+            
+            self.assertEqual( pool_size, HG.client_controller.new_options.GetInteger( 'network_connection_pool_size' ) )
+            self.assertEqual( num_requests, 3 )
+            self.assertEqual( num_connections_opened, 1 )
+            
+            engine.Shutdown()
+            
+        finally:
+            
+            server.shutdown()
+            server.server_close()
+            
+        
+    
+    def test_engine_domain_queue( self ):
+        
+        mock_controller = TestController.MockController()
+        bandwidth_manager = ClientNetworkingBandwidth.NetworkBandwidthManager()
+        session_manager = ClientNetworkingSessions.NetworkSessionManager()
+        domain_manager = ClientNetworkingDomain.NetworkDomainManager()
+        login_manager = ClientNetworkingLogin.NetworkLoginManager()
+        
+        mock_controller.new_options.SetInteger( 'max_network_jobs_per_domain', 1 )
+        
+        engine = ClientNetworking.NetworkEngine( mock_controller, bandwidth_manager, session_manager, domain_manager, login_manager )
+        
+        mock_controller.CallToThread( engine.MainLoop )
+        
+        #
+        
+        request_log = []
+        
+        @urlmatch( netloc = 'wew.lad' )
+        def catch_wew_ok_slowly( url, request ):
+            
+            request_log.append( ( 'start', url.path ) )
+            
+            time.sleep( 0.05 )
+            
+            request_log.append( ( 'end', url.path ) )
+            
+            return GOOD_RESPONSE
+            
+        
+        with HTTMock( catch_all ):
+            
+            with HTTMock( catch_wew_ok_slowly ):
+                
+                jobs = [ ClientNetworkingJobs.NetworkJob( 'GET', MOCK_URL + '&job={}'.format( i ) ) for i in range( 4 ) ]
+                
+                for job in jobs:
+                    
+                    engine.AddJob( job )
+                    
+                
+                # one at a time on the domain, and each job gets the slot in the order it was added
+                
+                for job in jobs:
+                    
+                    job.WaitUntilDone()
+                    
+                
+                self.assertTrue( all( ( job.IsDone() and not job.HasError() for job in jobs ) ) )
+                
+                expected_request_log = []
+                
+                for i in range( 4 ):
+                    
+                    path = urllib.parse.urlsplit( MOCK_URL + '&job={}'.format( i ) ).path
+                    
+                    expected_request_log.append( ( 'start', path ) )
+                    expected_request_log.append( ( 'end', path ) )
+                    
+                
+                self.assertEqual( request_log, expected_request_log )
+                
+                time.sleep( 0.25 )
+                
+                self.assertEqual( engine.GetJobsSnapshot(), [] )
+                self.assertEqual( len( engine._jobs_awaiting_slot ), 0 )
+                self.assertEqual( len( engine._jobs_running ), 0 )
+                
+            
+        
+        #
+        
+        engine.Shutdown()
+        
+    
 class TestNetworkingJob( unittest.TestCase ):
     
     def _GetJob( self, for_login = False ):
@@ -419,6 +419,42 @@ class TestTagsManager( unittest.TestCase ):
         self.assertEqual( self._other_tags_manager.GetPetitioned( self._reset_service_key, ClientTags.TAG_DISPLAY_STORAGE ), set() )
         
     
+    def test_shared_tag_sets( self ):
+        
+        service_key = HydrusData.GenerateKey()
+        
+        service_keys_to_statuses_to_tags = collections.defaultdict( HydrusData.default_dict_set )
+        
+        service_keys_to_statuses_to_tags[ service_key ][ HC.CONTENT_STATUS_CURRENT ] = { 'samus aran', 'character:samus aran' }
+        service_keys_to_statuses_to_tags[ service_key ][ HC.CONTENT_STATUS_PENDING ] = { 'metroid' }
+        
+        service_keys_to_statuses_to_display_tags = collections.defaultdict( HydrusData.default_dict_set )
+        
+        service_keys_to_statuses_to_display_tags[ service_key ][ HC.CONTENT_STATUS_CURRENT ] = { 'samus aran', 'character:samus aran' }
+        service_keys_to_statuses_to_display_tags[ service_key ][ HC.CONTENT_STATUS_PENDING ] = { 'series:metroid' }
+        
+        tags_manager = ClientMediaManagers.TagsManager( service_keys_to_statuses_to_tags, service_keys_to_statuses_to_display_tags )
+        
+        self.assertFalse( hasattr( tags_manager, '__dict__' ) )
+        
+        self.assertIs( tags_manager.GetCurrent( service_key, ClientTags.TAG_DISPLAY_STORAGE ), tags_manager.GetCurrent( service_key, ClientTags.TAG_DISPLAY_ACTUAL ) )
+        self.assertIsNot( tags_manager.GetPending( service_key, ClientTags.TAG_DISPLAY_STORAGE ), tags_manager.GetPending( service_key, ClientTags.TAG_DISPLAY_ACTUAL ) )
+        
+        content_update = HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'bounty hunter', { HydrusData.GenerateKey() } ) )
+        
+        tags_manager.ProcessContentUpdate( service_key, content_update )
+        
+        self.assertEqual( tags_manager.GetCurrent( service_key, ClientTags.TAG_DISPLAY_STORAGE ), { 'samus aran', 'character:samus aran', 'bounty hunter' } )
+        self.assertEqual( tags_manager.GetCurrent( service_key, ClientTags.TAG_DISPLAY_ACTUAL ), { 'samus aran', 'character:samus aran', 'bounty hunter' } )
+        
+        content_update = HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_PETITION, ( 'samus aran', { HydrusData.GenerateKey() } ) )
+        
+        tags_manager.ProcessContentUpdate( service_key, content_update )
+        
+        self.assertEqual( tags_manager.GetPetitioned( service_key, ClientTags.TAG_DISPLAY_STORAGE ), { 'samus aran' } )
+        self.assertEqual( tags_manager.GetCurrent( service_key, ClientTags.TAG_DISPLAY_ACTUAL ), { 'samus aran', 'character:samus aran', 'bounty hunter' } )
+        
+    
 class TestTagDisplayManager( unittest.TestCase ):
     
     def test_tag_filtering( self ):
@@ -13,6 +13,7 @@ from qtpy import QtGui as QG
 
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
+from hydrus.core import HydrusDB
 from hydrus.core import HydrusExceptions
 from hydrus.core import HydrusGlobals as HG
 from hydrus.core import HydrusPaths
@@ -497,6 +498,14 @@ class Controller( object ):
         return job
         
     
+    def ClearParamReads( self, name ):
+        
+        for key in [ key for key in self._param_read_responses.keys() if key[0] == name ]:
+            
+            del self._param_read_responses[ key ]
+            
+        
+    
     def ClearReads( self, name ):
         
         if name in self._read_call_args:
@@ -577,6 +586,44 @@ class Controller( object ):
         }
         
     
+    def GetDBDir( self ):
+        
+        return self.db_dir
+        
+    
+    def GetDBJobStatistics( self ):
+        
+        read_statistics = HydrusDB.DBJobStatistics()
+        
+        read_statistics.AddJob( 0.001, 0.02, num_rows = 50 )
+        read_statistics.AddJob( 0.004, 0.1, num_rows = 200 )
+        
+        write_statistics = HydrusDB.DBJobStatistics()
+        
+        write_statistics.AddJob( 0.015, 0.3 )
+        
+        lanes = {
+            'interactive read' : dict( read_statistics.ToDict(), num_jobs_waiting = 0 ),
+            'interactive write' : dict( write_statistics.ToDict(), num_jobs_waiting = 1 ),
+            'background' : dict( HydrusDB.DBJobStatistics().ToDict(), num_jobs_waiting = 0 )
+        }
+        
+        jobs = {
+            'read media_results' : read_statistics.ToDict(),
+            'write content_updates' : write_statistics.ToDict()
+        }
+        
+        return { 'lanes' : lanes, 'jobs' : jobs }
+        
+    
+    def GetDBSlowQueries( self ):
+        
+        return [
+            ( 1650000000, 0.25, 'read media_results', 'SELECT hash_id FROM files_info;' ),
+            ( 1650000060, 1.5, 'write content_updates', 'DELETE FROM current_mappings_8 WHERE tag_id = ?;' )
+        ]
+        
+    
     def GetFilesDir( self ):
         
         return self._server_files_dir
@@ -3,6 +3,7 @@ import unittest
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
 from hydrus.core import HydrusGlobals as HG
+from hydrus.core import HydrusIntegerSets
 
 from hydrus.client import ClientConstants as CC
 from hydrus.client import ClientData
@@ -25,3 +26,52 @@ class TestHydrusData( unittest.TestCase ):
         self.assertEqual( HydrusData.ConvertIntToPrettyOrdinalString( 1011 ), '1,011th' )
         
     
+
+class TestHydrusIntegerSets( unittest.TestCase ):
+    
+    def test_sorted_integer_set( self ):
+        
+        big = set( range( 0, 200000, 2 ) )
+        small = { 1, 4, 6, 7, 199998, 250000 }
+        
+        sis = HydrusIntegerSets.SortedIntegerSet( big )
+        
+        self.assertEqual( len( sis ), len( big ) )
+        self.assertEqual( sis, big )
+        self.assertEqual( list( sis ), sorted( big ) )
+        
+        self.assertIn( 4, sis )
+        self.assertNotIn( 5, sis )
+        self.assertNotIn( 250000, sis )
+        
+        self.assertEqual( set( sis.intersection( small ) ), big.intersection( small ) )
+        self.assertEqual( set( sis.intersection( set( range( 100000, 300000 ) ) ) ), big.intersection( range( 100000, 300000 ) ) )
+        self.assertEqual( set( sis.difference( small ) ), big.difference( small ) )
+        self.assertEqual( set( sis.union( small ) ), big.union( small ) )
+        
+        # a set mixed with a sorted set
+        
+        self.assertEqual( big.intersection( HydrusIntegerSets.SortedIntegerSet( small ) ), big.intersection( small ) )
+        
+        sis_copy = sis.copy()
+        
+        sis_copy.difference_update( ( i for i in range( 0, 100000 ) ) )
+        
+        self.assertEqual( set( sis_copy ), { i for i in big if i >= 100000 } )
+        self.assertEqual( len( sis ), len( big ) )
+        
+        sis_copy.add( 3 )
+        sis_copy.add( 3 )
+        sis_copy.discard( 100000 )
+        
+        self.assertEqual( list( sis_copy )[:2], [ 3, 100002 ] )
+        
+        sis_copy.intersection_update( [] )
+        
+        self.assertFalse( sis_copy )
+        
+        # all python ints, for sqlite
+        
+        self.assertEqual( { type( i ) for i in sis }, { int } )
+        
+    
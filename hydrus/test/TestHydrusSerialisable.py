@@ -4,6 +4,7 @@ from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
 from hydrus.core import HydrusSerialisable
 from hydrus.core import HydrusTags
+from hydrus.core.networking import HydrusNetwork
 
 from hydrus.client import ClientApplicationCommand as CAC
 from hydrus.client import ClientConstants as CC
@@ -156,6 +157,100 @@ class TestSerialisables( unittest.TestCase ):
             
         
     
+    def test_SERIALISABLE_TYPE_CONTENT_UPDATE( self ):
+        
+        def normalise( content_update ):
+            
+            return (
+                sorted( ( tuple( row ) for row in content_update.GetNewFiles() ) ),
+                sorted( content_update.GetDeletedFiles() ),
+                sorted( ( ( service_tag_id, sorted( service_hash_ids ) ) for ( service_tag_id, service_hash_ids ) in content_update.GetNewMappings() ) ),
+                sorted( ( ( service_tag_id, sorted( service_hash_ids ) ) for ( service_tag_id, service_hash_ids ) in content_update.GetDeletedMappings() ) ),
+                sorted( ( tuple( row ) for row in content_update.GetNewTagParents() ) ),
+                sorted( ( tuple( row ) for row in content_update.GetDeletedTagSiblings() ) ),
+                content_update.GetNumRows()
+            )
+            
+        
+        def test( obj, dupe_obj ):
+            
+            self.assertEqual( normalise( obj ), normalise( dupe_obj ) )
+            
+        
+        content_update = HydrusNetwork.ContentUpdate()
+        
+        content_update.AddRow( ( HC.CONTENT_TYPE_FILES, HC.CONTENT_UPDATE_ADD, ( 5, 65535, HC.IMAGE_PNG, 1600000000, 640, 480, None, None, None ) ) )
+        content_update.AddRow( ( HC.CONTENT_TYPE_FILES, HC.CONTENT_UPDATE_ADD, ( 3, 1024, HC.VIDEO_WEBM, 1600000001, 1920, 1080, 12500, 300, None ) ) )
+        content_update.AddRow( ( HC.CONTENT_TYPE_FILES, HC.CONTENT_UPDATE_DELETE, 7 ) )
+        content_update.AddRow( ( HC.CONTENT_TYPE_FILES, HC.CONTENT_UPDATE_DELETE, 2 ) )
+        content_update.AddRow( ( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 20, [ 5, 3, 2 ** 40 ] ) ) )
+        content_update.AddRow( ( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 10, list( range( 1000, 0, -3 ) ) ) ) )
+        content_update.AddRow( ( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_DELETE, ( 0, [ 0 ] ) ) )
+        content_update.AddRow( ( HC.CONTENT_TYPE_TAG_PARENTS, HC.CONTENT_UPDATE_ADD, ( 30, 20 ) ) )
+        content_update.AddRow( ( HC.CONTENT_TYPE_TAG_SIBLINGS, HC.CONTENT_UPDATE_DELETE, ( 10, 20 ) ) )
+        
+        self._dump_and_load_and_test( content_update, test )
+        
+        binary_network_bytes = content_update.DumpToBinaryNetworkBytes()
+        
+        self.assertTrue( binary_network_bytes.startswith( HydrusSerialisable.BINARY_NETWORK_BYTES_PREFIX ) )
+        self.assertLess( len( binary_network_bytes ), len( content_update.DumpToNetworkBytes() ) )
+        
+        dupe_content_update = HydrusSerialisable.CreateFromNetworkBytes( binary_network_bytes )
+        
+        self.assertIsInstance( dupe_content_update, HydrusNetwork.ContentUpdate )
+        
+        test( content_update, dupe_content_update )
+        
+        # a binary-loaded update can still go back to json
+        
+        self._dump_and_load_and_test( dupe_content_update, test )
+        
+        # anything without a binary layout falls back to json
+        
+        content_update.AddRow( ( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_PEND, ( 10, [ 1 ] ) ) )
+        
+        self.assertFalse( content_update.DumpToBinaryNetworkBytes().startswith( HydrusSerialisable.BINARY_NETWORK_BYTES_PREFIX ) )
+        
+    
+    def test_SERIALISABLE_TYPE_DEFINITIONS_UPDATE( self ):
+        
+        def test( obj, dupe_obj ):
+            
+            self.assertEqual( obj.GetHashIdsToHashes(), dupe_obj.GetHashIdsToHashes() )
+            self.assertEqual( obj.GetTagIdsToTags(), dupe_obj.GetTagIdsToTags() )
+            
+        
+        definitions_update = HydrusNetwork.DefinitionsUpdate()
+        
+        for i in range( 100 ):
+            
+            definitions_update.AddRow( ( HC.DEFINITIONS_TYPE_HASHES, i * 7, HydrusData.GenerateKey() ) )
+            definitions_update.AddRow( ( HC.DEFINITIONS_TYPE_TAGS, i * 5, 'character:\u30b5\u30e0\u30b9 {}'.format( i ) ) )
+            
+        
+        definitions_update.AddRow( ( HC.DEFINITIONS_TYPE_TAGS, 1000, '' ) )
+        
+        self._dump_and_load_and_test( definitions_update, test )
+        
+        binary_network_bytes = definitions_update.DumpToBinaryNetworkBytes()
+        
+        self.assertTrue( binary_network_bytes.startswith( HydrusSerialisable.BINARY_NETWORK_BYTES_PREFIX ) )
+        
+        dupe_definitions_update = HydrusSerialisable.CreateFromNetworkBytes( binary_network_bytes )
+        
+        test( definitions_update, dupe_definitions_update )
+        
+        self.assertEqual( dupe_definitions_update.GetNumRows(), 201 )
+        
+        # a truncated update is an error, not a short update
+        
+        with self.assertRaises( Exception ):
+            
+            HydrusSerialisable.CreateFromNetworkBytes( binary_network_bytes[ : -20 ] )
+            
+        
+    
     def test_SERIALISABLE_TYPE_DUPLICATE_ACTION_OPTIONS( self ):
         
         def test( obj, dupe_obj ):